@@ -0,0 +1,606 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cumuls import lire_cumuls
+from migrations import SCHEMA_VERSION, appliquer_migrations, version_schema
+from monnaie import Montant, TYPES_DETECTES
+from performance import Histogramme
+
+# ==== BANC D'ESSAI DES PERFORMANCES ====
+# Génère une base synthétique reproductible (abonnés Fixe/Mixte/Bloqué, plusieurs
+# années de dépôts et retraits, carnets, journal), chronomètre sans interface les
+# opérations principales puis compare les percentiles à un résultat de référence.
+#
+#   python benchmark.py --abonnes 2000 --annees 3 --sortie resultats.json
+#   python benchmark.py --reference reference.json          (comparaison)
+#   python benchmark.py --reference reference.json --enregistrer-reference
+
+logger = logging.getLogger(__name__)
+
+TOLERANCE_DEFAUT = 0.25  # +25 % sur le p50 = régression
+ECART_MINIMAL_MS = 1.0   # en deçà, l'écart est du bruit de mesure
+CASES_PAR_PAGE = 31
+PAGES_CARNET = 8
+AGENTS = ["Admin", "Agent Kinshasa", "Agent Gombe", "Agent Limete", "Agent Ngaliema"]
+NOMS = ["Kabila", "Mbuyi", "Kasongo", "Ilunga", "Mukendi", "Kalonji", "Lukusa", "Ngoy",
+        "Banza", "Mwamba", "Kabongo", "Mutombo", "Kazadi", "Nkulu", "Tshibangu", "Mulumba"]
+PRENOMS = ["Jean", "Marie", "Patrick", "Grace", "Joseph", "Esther", "Pierre", "Ruth",
+           "Daniel", "Sarah", "Paul", "Rachel", "David", "Naomi", "Samuel", "Ketsia"]
+MONTANTS_FIXES = [500, 1000, 2000, 5000]
+
+# Requêtes des rapports, reprises des écrans (qui ouvrent des fenêtres Tk)
+SQL_DEPOTS_JOURNALIERS = """
+    SELECT d.date_depot, d.heure, a.nom || ' ' || a.postnom || ' ' || a.prenom,
+           d.montant, d.ref_depot, d.nom_agent
+    FROM depots d
+    JOIN abonne a ON d.numero_client = a.numero_client
+    WHERE d.horodatage >= ? AND d.horodatage < date(?, '+1 day')
+    ORDER BY d.horodatage DESC
+"""  # fenetre_depot.afficher_depots_journaliers
+
+SQL_RAPPORT_GLOBAL = """
+    SELECT a.numero_client, a.nom || ' ' || a.postnom || ' ' || a.prenom,
+           SUM(d.montant) AS "total [MONTANT]", COUNT(d.id)
+    FROM abonne a
+    LEFT JOIN depots d ON a.numero_client = d.numero_client
+    GROUP BY a.numero_client
+    ORDER BY SUM(d.montant) DESC
+"""  # fenetre_depot.afficher_rapport_global
+
+SQL_DOUBLONS = """
+    SELECT numero_client, montant, heure, date_depot, COUNT(*)
+    FROM depots
+    GROUP BY numero_client, montant, heure, date_depot
+    HAVING COUNT(*) > 1
+    ORDER BY date_depot DESC, heure DESC
+"""  # interface_doublons.charger_doublons
+
+
+# ---- Génération des données ----
+class GenerateurDonnees:
+    """Remplit une base vierge avec un volume réaliste et reproductible (graine fixe)"""
+
+    def __init__(self, nb_abonnes: int = 1000, annees: int = 3, depots_par_mois: float = 4,
+                 retraits_par_mois: float = 1, taux_doublons: float = 0.002, graine: int = 42):
+        self.nb_abonnes = nb_abonnes
+        self.annees = annees
+        self.depots_par_mois = depots_par_mois
+        self.retraits_par_mois = retraits_par_mois
+        self.taux_doublons = taux_doublons
+        self.rng = random.Random(graine)
+        self.fin = datetime(2024, 12, 31)
+        self.debut = self.fin - timedelta(days=365 * annees)
+        self._sequence = 0
+
+    def _reference(self, prefixe: str, date: datetime) -> str:
+        self._sequence += 1
+        return f"{prefixe}{date.strftime('%Y%m%d')}-{self._sequence:07d}"
+
+    def _dates_operations(self, depuis: datetime, par_mois: float) -> List[datetime]:
+        """Dates (triées) des opérations d'un abonné, en moyenne par_mois par mois"""
+        jours = (self.fin - depuis).days
+        if jours <= 0 or par_mois <= 0:
+            return []
+        nombre = self.rng.randint(0, max(1, int(round(2 * par_mois * jours / 30))))
+        dates = [
+            depuis + timedelta(days=self.rng.randrange(jours),
+                               seconds=self.rng.randrange(7 * 3600, 18 * 3600))
+            for _ in range(nombre)
+        ]
+        return sorted(dates)
+
+    def remplir(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """Insère toutes les données dans une seule transaction"""
+        rng = self.rng
+        types = {nom: id_ for id_, nom in conn.execute("SELECT id, nom FROM type_compte")}
+
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR IGNORE INTO agent (nom_agent, identifiant, mot_de_passe, role, date_creation) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(nom, nom.lower().replace(" ", "_"), "-", "admin" if nom == "Admin" else "agent",
+              self.debut.strftime("%Y-%m-%d %H:%M:%S")) for nom in AGENTS]
+        )
+
+        depots, retraits, journal, plages, pages = [], [], [], [], []
+        for i in range(1, self.nb_abonnes + 1):
+            numero_client = f"CLI{i:07d}"
+            numero_carte = f"CART{i:07d}"
+            nom, postnom, prenom = rng.choice(NOMS), rng.choice(NOMS), rng.choice(PRENOMS)
+            nom_complet = f"{nom} {postnom} {prenom}"
+            type_compte = rng.choices(["Fixe", "Mixte", "Bloqué"], weights=[4, 4, 2])[0]
+            inscription = self.debut + timedelta(days=rng.randrange(max(1, (self.fin - self.debut).days - 30)))
+            montant_initial = Montant.depuis(rng.choice(MONTANTS_FIXES) if type_compte == "Fixe" else 0)
+
+            cur = conn.execute("""
+                INSERT INTO abonne (
+                    numero_client, numero_carte, nom, postnom, prenom, sexe,
+                    date_naissance, lieu_naissance, adresse, telephone,
+                    type_compte, montant, date_inscription, solde, statut
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 'Actif')
+            """, (
+                numero_client, numero_carte, nom, postnom, prenom, rng.choice("MF"),
+                f"{rng.randint(1950, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                "Kinshasa", f"Avenue {rng.choice(NOMS)} {rng.randint(1, 200)}",
+                f"08{rng.randint(10000000, 99999999)}",
+                type_compte, montant_initial, inscription.strftime("%Y-%m-%d")
+            ))
+            abonne_id = cur.lastrowid
+
+            if type_compte == "Bloqué":
+                conn.execute("""
+                    INSERT INTO compte_bloque (
+                        abonne_id, duree_mois, montant_atteindre,
+                        pourcentage_retrait, frequence_retrait
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, (abonne_id, rng.choice([3, 6, 12]), Montant.depuis(rng.choice([50000, 100000, 200000])),
+                      rng.choice([10, 20, 30]), "Mensuel"))
+            elif type_compte == "Fixe":
+                conn.execute("""
+                    INSERT INTO compte_fixe (
+                        abonne_id, numero_client, numero_carte,
+                        montant_initial, date_debut, date_fin
+                    ) VALUES (?, ?, ?, ?, ?, ?)
+                """, (abonne_id, numero_client, numero_carte, montant_initial,
+                      inscription.strftime("%Y-%m-%d"),
+                      (inscription + timedelta(days=365)).strftime("%Y-%m-%d")))
+
+            # Opérations : dépôts puis retraits, dans l'ordre chronologique ; chaque mouvement
+            # va dans une seule table source, le grand livre étant alimenté par déclencheur
+            operations = [(d, "Dépôt") for d in self._dates_operations(inscription, self.depots_par_mois)]
+            if type_compte != "Fixe":
+                operations += [(d, "Retrait") for d in self._dates_operations(inscription, self.retraits_par_mois)]
+            operations.sort()
+
+            solde = Montant()
+            total_cases = 0
+            for date, operation in operations:
+                jour, heure = date.strftime("%Y-%m-%d"), date.strftime("%H:%M:%S")
+                agent = rng.choice(AGENTS)
+                if operation == "Dépôt":
+                    if type_compte == "Fixe":
+                        nb_cases = min(rng.randint(1, 5), PAGES_CARNET * CASES_PAR_PAGE - total_cases)
+                        if nb_cases <= 0:
+                            continue
+                        montant = montant_initial * nb_cases
+                    else:
+                        nb_cases = 0
+                        montant = Montant.depuis(rng.randint(1, 40) * 500)
+                    reference = self._reference("DEP", date)
+                    depots.append((numero_client, montant, reference, heure, nom_complet,
+                                   jour, agent, rng.choice(["Espèces", "Mobile Money"])))
+                    if rng.random() < self.taux_doublons:
+                        # Saisie en double : enregistrée deux fois, donc comptée deux fois au solde
+                        depots.append((numero_client, montant, self._reference("DEP", date), heure,
+                                       nom_complet, jour, agent, "Espèces"))
+                        solde += montant
+                    if nb_cases:
+                        plages.append((numero_client, numero_carte, reference, total_cases,
+                                       nb_cases, montant_initial, jour))
+                    total_cases += nb_cases
+                    solde += montant
+                else:
+                    montant = min(solde, Montant.depuis(rng.randint(1, 20) * 1000))
+                    if montant < 1000:
+                        continue
+                    reference = self._reference("RET", date)
+                    retraits.append((numero_client, montant, reference, heure, jour, agent, "Complété"))
+                    solde -= montant
+                journal.append((operation, agent, jour, heure, nom_complet,
+                                f"Montant: {montant}, Ref: {reference}"))
+
+            if type_compte == "Fixe":
+                conn.execute("UPDATE compte_fixe SET prochaine_case = ? WHERE abonne_id = ?",
+                             (total_cases, abonne_id))
+                conn.execute("""
+                    INSERT INTO carnet_progression (numero_client, numero_carte, total_cases,
+                                                    pages_completes, montant_epargne, derniere_date)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (numero_client, numero_carte, total_cases, total_cases // CASES_PAR_PAGE,
+                      montant_initial * total_cases, plages[-1][6] if total_cases else None))
+                for page in range(1, PAGES_CARNET + 1):
+                    remplies = min(CASES_PAR_PAGE, max(0, total_cases - (page - 1) * CASES_PAR_PAGE))
+                    if remplies or page == 1:
+                        pages.append((numero_carte, numero_client, page, remplies))
+
+            conn.execute("UPDATE abonne SET solde = ?, date_derniere_operation = ? WHERE id = ?",
+                         (solde, operations[-1][0].strftime("%Y-%m-%d") if operations else None, abonne_id))
+            conn.execute(
+                "INSERT INTO abonne_compte (abonne_id, type_compte_id, date_activation, solde) VALUES (?, ?, ?, ?)",
+                (abonne_id, types[type_compte], inscription.strftime("%Y-%m-%d"), solde)
+            )
+
+        conn.executemany("""
+            INSERT INTO depots (numero_client, montant, ref_depot, heure, nom_complet,
+                                date_depot, nom_agent, methode_paiement)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, depots)
+        conn.executemany("""
+            INSERT INTO retraits (numero_client, montant, ref_retrait, heure, date_retrait, agent, statut)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, retraits)
+        conn.executemany("""
+            INSERT INTO journal (action, acteur, date_action, heure_action, cible, details)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, journal)
+        conn.executemany("""
+            INSERT INTO carnet_depots (numero_client, numero_carte, ref_depot, premiere_case,
+                                       nb_cases, montant_unitaire, date_remplissage)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, plages)
+        conn.executemany("""
+            INSERT INTO compte_fixe_pages (numero_carte, numero_client, page, cases_remplies)
+            VALUES (?, ?, ?, ?)
+        """, pages)
+        conn.commit()
+        conn.execute("ANALYZE")
+        return volumes(conn)
+
+
+def volumes(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Nombre de lignes des tables principales"""
+    tables = ["abonne", "compte_fixe", "compte_fixe_pages", "carnet_depots",
+              "depots", "retraits", "transaction", "journal"]
+    return {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+
+
+# Abonnés dont le solde diffère de la somme de leurs écritures au grand livre
+SQL_ECARTS_SOLDES = """
+    SELECT COUNT(*) FROM abonne a
+    WHERE a.solde <> (SELECT COALESCE(SUM(g.sens * g.montant), 0)
+                      FROM grand_livre g WHERE g.numero_client = a.numero_client)
+"""
+
+
+def creer_base_synthetique(chemin_db: str, generateur: GenerateurDonnees) -> Dict[str, int]:
+    """Crée la base au schéma courant (migrations), la remplit et contrôle les soldes"""
+    if os.path.exists(chemin_db):
+        os.remove(chemin_db)
+    conn = sqlite3.connect(chemin_db)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        appliquer_migrations(conn)
+        conn.isolation_level = None
+        volumes_base = generateur.remplir(conn)
+        ecarts = conn.execute(SQL_ECARTS_SOLDES).fetchone()[0]
+        if ecarts:
+            raise RuntimeError(f"{ecarts} abonnés au solde différent du grand livre")
+        return volumes_base
+    finally:
+        conn.close()
+
+
+# ---- Migrations des anciens schémas ----
+# Variantes de base rencontrées chez les clients, migrées à vide puis avec quelques
+# lignes. Ancien reset_db.py : compte_fixe indexé par abonne_id (sans colonne id),
+# montants REAL en francs, table "transactions" fusionnée par la migration 3.
+SCHEMA_RESET_DB = [
+    """CREATE TABLE abonne (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, numero_client TEXT UNIQUE NOT NULL,
+        numero_carte TEXT UNIQUE NOT NULL, nom TEXT NOT NULL, postnom TEXT, prenom TEXT NOT NULL,
+        sexe TEXT NOT NULL, date_naissance TEXT NOT NULL, lieu_naissance TEXT NOT NULL,
+        adresse TEXT NOT NULL, telephone TEXT NOT NULL, date_inscription TEXT NOT NULL,
+        statut TEXT DEFAULT 'Actif', photo_path TEXT)""",
+    """CREATE TABLE type_compte (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, nom TEXT UNIQUE NOT NULL, description TEXT)""",
+    """CREATE TABLE abonne_compte (
+        abonne_id INTEGER NOT NULL, type_compte_id INTEGER NOT NULL,
+        date_activation TEXT NOT NULL, solde REAL DEFAULT 0,
+        PRIMARY KEY (abonne_id, type_compte_id))""",
+    """CREATE TABLE compte_fixe (
+        abonne_id INTEGER PRIMARY KEY, montant_initial REAL NOT NULL,
+        date_debut TEXT NOT NULL, date_fin TEXT NOT NULL)""",
+    """CREATE TABLE compte_fixe_page (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, compte_fixe_id INTEGER NOT NULL,
+        numero_page INTEGER NOT NULL, cases_remplies INTEGER DEFAULT 0,
+        UNIQUE(compte_fixe_id, numero_page))""",
+    """CREATE TABLE depots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, numero_client TEXT NOT NULL, montant REAL NOT NULL,
+        ref_depot TEXT UNIQUE, heure TEXT NOT NULL, nom_complet TEXT, date_depot TEXT NOT NULL,
+        nom_agent TEXT NOT NULL, methode_paiement TEXT)""",
+    """CREATE TABLE retraits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, numero_client TEXT NOT NULL, montant REAL NOT NULL,
+        ref_retrait TEXT UNIQUE, heure TEXT NOT NULL, date_retrait TEXT NOT NULL,
+        agent TEXT NOT NULL, statut TEXT DEFAULT 'En attente')""",
+    """CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, abonne_id INTEGER NOT NULL, type TEXT NOT NULL,
+        montant REAL NOT NULL, date TEXT NOT NULL, heure TEXT NOT NULL, agent TEXT NOT NULL,
+        statut TEXT DEFAULT 'Complété', reference TEXT UNIQUE NOT NULL, methode_paiement TEXT)""",
+    """CREATE TABLE parametres (
+        cle TEXT PRIMARY KEY, valeur TEXT, description TEXT, modifiable INTEGER DEFAULT 1)""",
+]
+
+DONNEES_RESET_DB = [
+    """INSERT INTO abonne (numero_client, numero_carte, nom, postnom, prenom, sexe, date_naissance,
+                           lieu_naissance, adresse, telephone, date_inscription)
+       VALUES ('CLI0000001', 'CARTE0001', 'KABILA', 'MWAMBA', 'JEAN', 'M', '1990-01-01',
+               'Kinshasa', 'Gombe', '0810000000', '2023-01-02')""",
+    "INSERT INTO type_compte (nom) VALUES ('Fixe')",
+    "INSERT INTO abonne_compte VALUES (1, 1, '2023-01-02', 5000.0)",
+    "INSERT INTO compte_fixe VALUES (1, 500.0, '2023-01-02', '2024-01-02')",
+    """INSERT INTO depots (numero_client, montant, ref_depot, heure, date_depot, nom_agent)
+       VALUES ('CLI0000001', 5500.0, 'DEP-1', '09:00:00', '2023-01-03', 'Agent')""",
+    """INSERT INTO retraits (numero_client, montant, ref_retrait, heure, date_retrait, agent, statut)
+       VALUES ('CLI0000001', 500.0, 'RET-1', '10:00:00', '2023-02-03', 'Agent', 'Validé')""",
+    """INSERT INTO transactions (abonne_id, type, montant, date, heure, agent, reference)
+       VALUES (1, 'Dépôt', 5500.0, '2023-01-03', '09:00:00', 'Agent', 'TRX-1')""",
+    """INSERT INTO transactions (abonne_id, type, montant, date, heure, agent, statut, reference)
+       VALUES (1, 'Retrait', 200.0, '2023-02-04', '11:00:00', 'Agent', 'Annulé', 'TRX-2')""",
+    """INSERT INTO transactions (abonne_id, type, montant, date, heure, agent, reference)
+       VALUES (99, 'Dépôt', 300.0, '2023-02-05', '12:00:00', 'Agent', 'TRX-3')""",  # orpheline
+]
+
+# Requêtes de contrôle après migration : chacune doit retourner 0
+CONTROLES_MIGRATION = {
+    "transactions non complétées ou orphelines au grand livre": """
+        SELECT COUNT(*) FROM "transaction" t
+        WHERE (t.statut IS NOT 'Complété' OR NOT EXISTS (SELECT 1 FROM abonne a WHERE a.id = t.abonne_id))
+          AND (SELECT SUM(g.sens) FROM grand_livre g
+               WHERE g.origine = 'transaction' AND g.origine_id = t.id) <> 0""",
+    "cumuls différents du grand livre": """
+        SELECT COUNT(*) FROM (
+            SELECT nature, SUM(1 - 2 * annulation) AS nombre, SUM((1 - 2 * annulation) * montant) AS montant
+            FROM grand_livre GROUP BY nature
+            EXCEPT
+            SELECT nature, SUM(nombre), SUM(montant) FROM cumul_operations
+            WHERE grain = 'annee' GROUP BY nature)""",
+}
+
+ANCIENS_SCHEMAS = {
+    "base vide": ([], []),
+    "reset_db.py (vide)": (SCHEMA_RESET_DB, []),
+    "reset_db.py": (SCHEMA_RESET_DB, DONNEES_RESET_DB),
+}
+
+
+def verifier_migrations(dossier: str) -> List[str]:
+    """Migre chaque ancien schéma jusqu'à SCHEMA_VERSION ; retourne les échecs"""
+    echecs = []
+    for nom, (schema, donnees) in ANCIENS_SCHEMAS.items():
+        chemin = os.path.join(dossier, "migration.db")
+        if os.path.exists(chemin):
+            os.remove(chemin)
+        conn = sqlite3.connect(chemin)
+        try:
+            for instruction in schema + donnees:
+                conn.execute(instruction)
+            conn.commit()
+            if appliquer_migrations(conn) != SCHEMA_VERSION or version_schema(conn) != SCHEMA_VERSION:
+                raise RuntimeError(f"version {version_schema(conn)} au lieu de {SCHEMA_VERSION}")
+            for controle, sql in CONTROLES_MIGRATION.items():
+                if conn.execute(sql).fetchone()[0]:
+                    raise RuntimeError(controle)
+            print(f"  ✓ {nom}")
+        except Exception as e:
+            print(f"  ✗ {nom}: {e}")
+            echecs.append(nom)
+        finally:
+            conn.close()
+    return echecs
+
+
+# ---- Scénarios chronométrés ----
+def _scenarios(chemin_db: str, lecture: sqlite3.Connection,
+               rng: random.Random) -> List[Tuple[str, Callable, Callable[[object], bool]]]:
+    """(nom, opération, contrôle du résultat) ; les rapports passent par la connexion lecture"""
+    import db
+    from services import DepotService, RetraitService, DemandeDepot, DemandeRetrait
+
+    connexion = lambda: sqlite3.connect(chemin_db, timeout=30, detect_types=TYPES_DETECTES)  # noqa: E731
+    depots, retraits = DepotService(connexion), RetraitService(connexion)
+
+    ids = [r[0] for r in lecture.execute("SELECT id FROM abonne")]
+    ids_retrait = [r[0] for r in lecture.execute("""
+        SELECT ac.abonne_id FROM abonne_compte ac
+        JOIN type_compte tc ON ac.type_compte_id = tc.id
+        WHERE tc.nom = 'Mixte' AND ac.solde >= ?
+    """, (Montant.depuis(50000),))] or ids
+    clients_mixtes = [r[0] for r in lecture.execute(
+        "SELECT numero_client FROM abonne WHERE type_compte = 'Mixte' AND solde >= ?",
+        (Montant.depuis(50000),))] or ["CLI0000001"]
+    jours = [r[0] for r in lecture.execute("SELECT DISTINCT date_depot FROM depots")] or ["2024-01-01"]
+    mois = sorted({j[:7] for j in jours})
+
+    def requete(sql, params=()):
+        return lambda: lecture.execute(sql, params).fetchall()
+
+    def rapport_mensuel():
+        annee, numero = map(int, rng.choice(mois).split("-"))
+        debut = datetime(annee, numero, 1)
+        fin = (debut + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        # interface_retrait.exporter_graphique (mensuel) : cumuls journaliers
+        return lire_cumuls(lecture, "retrait", "jour", debut.strftime("%Y-%m-%d"), fin.strftime("%Y-%m-%d"))
+
+    ok_tuple = lambda r: bool(r and r[0])  # noqa: E731
+    toujours = lambda r: True  # noqa: E731
+    return [
+        ("db.effectuer_depot", lambda: db.effectuer_depot(rng.choice(ids), rng.randint(1, 40) * 500, "Benchmark"), ok_tuple),
+        ("db.effectuer_retrait", lambda: db.effectuer_retrait(rng.choice(ids_retrait), 1000, "Benchmark"), ok_tuple),
+        ("service.depot", lambda: depots.deposer(DemandeDepot(
+            rng.choice(clients_mixtes), rng.randint(1, 40) * 500, "Benchmark")), lambda r: r.succes),
+        ("service.retrait", lambda: retraits.retirer(DemandeRetrait(
+            rng.choice(clients_mixtes), 1000, "Benchmark")), lambda r: r.succes),
+        ("db.get_abonne", lambda: db.get_abonne(rng.choice(ids)), lambda r: r is not None),
+        ("db.rechercher_abonnes.nom", lambda: db.rechercher_abonnes({"nom": rng.choice(NOMS)[:4]}), toujours),
+        ("db.rechercher_abonnes.telephone", lambda: db.rechercher_abonnes({"telephone": f"08{rng.randint(10, 99)}"}), toujours),
+        ("rapport.depots_journaliers", lambda: requete(SQL_DEPOTS_JOURNALIERS, (jour := rng.choice(jours), jour))(), toujours),
+        ("rapport.retraits_mensuels", rapport_mensuel, toujours),
+        ("rapport.global_depots", requete(SQL_RAPPORT_GLOBAL), toujours),
+        ("doublons.depots", requete(SQL_DOUBLONS), toujours),
+        ("db.backup_database", db.backup_database, bool),
+    ]
+
+
+def executer_scenarios(chemin_db: str, dossier: str, iterations: int = 50,
+                       iterations_sauvegarde: int = 3, graine: int = 42) -> Dict[str, Dict]:
+    """Chronomètre chaque scénario (ms) ; un résultat en échec compte comme erreur"""
+    import db
+
+    # Redirige db (chemin mis en cache, pool de connexions) vers la base synthétique
+    db.DBConfig._app_dir = dossier
+    db.DBConfig._db_path = chemin_db
+    db.DBManager._instance = None
+
+    rng = random.Random(graine)
+    resultats = {}
+    lecture = sqlite3.connect(chemin_db, detect_types=TYPES_DETECTES)
+    try:
+        for nom, operation, controle in _scenarios(chemin_db, lecture, rng):
+            histo = Histogramme(nom)
+            n = iterations_sauvegarde if nom == "db.backup_database" else iterations
+            for _ in range(n):
+                debut = time.perf_counter()
+                try:
+                    erreur = not controle(operation())
+                except Exception as e:
+                    logger.error("Erreur scénario %s: %s", nom, str(e))
+                    erreur = True
+                histo.ajouter((time.perf_counter() - debut) * 1000, erreur)
+            resultats[nom] = histo.resume()
+            print(f"  {nom:<34}{resultats[nom]['p50_ms']:>10.2f} ms (p50){resultats[nom]['p95_ms']:>10.2f} ms (p95)")
+    finally:
+        lecture.close()
+    return resultats
+
+
+# ---- Résultats et comparaison ----
+def comparer(resultats: Dict, reference: Dict, tolerance: float = TOLERANCE_DEFAUT) -> List[Dict]:
+    """Compare les p50 à la référence ; statut régression/amélioration/stable/nouveau"""
+    comparaison = []
+    anciens = reference.get("operations", {})
+    for nom, mesure in resultats["operations"].items():
+        ancien = anciens.get(nom)
+        ligne = {"operation": nom, "p50_ms": mesure["p50_ms"], "p95_ms": mesure["p95_ms"]}
+        if not ancien or not ancien.get("p50_ms"):
+            ligne.update(reference_p50_ms=None, ratio=None, statut="nouveau")
+        else:
+            ratio = mesure["p50_ms"] / ancien["p50_ms"]
+            if abs(mesure["p50_ms"] - ancien["p50_ms"]) < ECART_MINIMAL_MS:
+                statut = "stable"
+            elif ratio > 1 + tolerance:
+                statut = "régression"
+            elif ratio < 1 / (1 + tolerance):
+                statut = "amélioration"
+            else:
+                statut = "stable"
+            ligne.update(reference_p50_ms=ancien["p50_ms"], ratio=round(ratio, 2), statut=statut)
+        if mesure["erreurs"] > (ancien or {}).get("erreurs", 0):
+            ligne["statut"] = "régression"
+        comparaison.append(ligne)
+    return comparaison
+
+
+def afficher_comparaison(comparaison: List[Dict]):
+    print(f"{'Opération':<34}{'Réf. p50':>10}{'p50':>10}{'Ratio':>8}  Statut")
+    print("-" * 74)
+    for ligne in comparaison:
+        ref = f"{ligne['reference_p50_ms']:>10.2f}" if ligne["reference_p50_ms"] is not None else f"{'-':>10}"
+        ratio = f"{ligne['ratio']:>8.2f}" if ligne["ratio"] is not None else f"{'-':>8}"
+        print(f"{ligne['operation']:<34}{ref}{ligne['p50_ms']:>10.2f}{ratio}  {ligne['statut']}")
+
+
+def lancer_benchmark(generateur: GenerateurDonnees, iterations: int = 50,
+                     dossier: Optional[str] = None) -> Dict:
+    """Génère la base, chronomètre les scénarios et retourne le résultat complet"""
+    temporaire = dossier is None
+    dossier = dossier or tempfile.mkdtemp(prefix="smoney_bench_")
+    os.makedirs(dossier, exist_ok=True)
+    chemin_db = os.path.join(dossier, "benchmark.db")
+    try:
+        print(f"Génération de la base synthétique ({generateur.nb_abonnes} abonnés, {generateur.annees} ans)...")
+        debut = time.perf_counter()
+        nb_lignes = creer_base_synthetique(chemin_db, generateur)
+        duree_generation = time.perf_counter() - debut
+        print(f"  {sum(nb_lignes.values())} lignes en {duree_generation:.1f} s")
+
+        print("Chronométrage des opérations...")
+        operations = executer_scenarios(chemin_db, dossier, iterations)
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "systeme": platform.platform(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "parametres": {
+                "abonnes": generateur.nb_abonnes,
+                "annees": generateur.annees,
+                "depots_par_mois": generateur.depots_par_mois,
+                "retraits_par_mois": generateur.retraits_par_mois,
+                "iterations": iterations,
+            },
+            "volumes": nb_lignes,
+            "taille_base_ko": round(os.path.getsize(chemin_db) / 1024, 1),
+            "generation_s": round(duree_generation, 2),
+            "operations": operations,
+        }
+    finally:
+        if temporaire:
+            import db
+            db.DBManager._instance = None  # libère les connexions avant la suppression
+            shutil.rmtree(dossier, ignore_errors=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai des performances S-MONEY")
+    parser.add_argument("--abonnes", type=int, default=1000)
+    parser.add_argument("--annees", type=int, default=3)
+    parser.add_argument("--depots-par-mois", type=float, default=4)
+    parser.add_argument("--retraits-par-mois", type=float, default=1)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--dossier", help="Conserve la base générée dans ce dossier")
+    parser.add_argument("--sortie", default="benchmark_resultats.json")
+    parser.add_argument("--reference", help="Résultat de référence (JSON) à comparer")
+    parser.add_argument("--enregistrer-reference", action="store_true",
+                        help="Écrit le résultat comme nouvelle référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE_DEFAUT)
+    parser.add_argument("--verifier-migrations", action="store_true",
+                        help="Migre les anciens schémas connus puis s'arrête")
+    args = parser.parse_args(argv)
+
+    if args.verifier_migrations:
+        print("Migration des anciens schémas...")
+        with tempfile.TemporaryDirectory() as dossier:
+            return 1 if verifier_migrations(dossier) else 0
+
+    generateur = GenerateurDonnees(args.abonnes, args.annees, args.depots_par_mois,
+                                   args.retraits_par_mois, graine=args.graine)
+    resultats = lancer_benchmark(generateur, args.iterations, args.dossier)
+
+    code_retour = 0
+    if args.reference and os.path.exists(args.reference) and not args.enregistrer_reference:
+        with open(args.reference, encoding="utf-8") as f:
+            reference = json.load(f)
+        if reference.get("parametres") != resultats["parametres"]:
+            print("⚠ Paramètres différents de la référence : comparaison indicative")
+        resultats["comparaison"] = comparer(resultats, reference, args.tolerance)
+        print()
+        afficher_comparaison(resultats["comparaison"])
+        if any(l["statut"] == "régression" for l in resultats["comparaison"]):
+            code_retour = 1
+
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats: {args.sortie}")
+
+    if args.enregistrer_reference and args.reference:
+        with open(args.reference, "w", encoding="utf-8") as f:
+            json.dump(resultats, f, ensure_ascii=False, indent=2)
+        print(f"Référence enregistrée: {args.reference}")
+    return code_retour
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,274 @@
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+from demarrage import importer
+
+# ==== CAPTURE PHOTO (WEBCAM) ====
+# Les caméras détectées sont mémorisées d'une session à l'autre (cameras.json) :
+# l'ouverture de la fenêtre de capture ne sonde plus les indices un par un. Un
+# thread de lecture dédié vide la caméra en continu et ne garde que la dernière
+# image (un seul emplacement), avec son aperçu déjà réduit en image PIL ; le
+# thread Tk n'a plus qu'à la copier dans un PhotoImage. La source est
+# interchangeable : la variable EPARGNE_SOURCE_CAPTURE (fichier vidéo ou dossier
+# d'images) rejoue des images à la place de la caméra, pour tester sans matériel.
+
+logger = logging.getLogger(__name__)
+
+INDICES_SONDES = range(4)
+LARGEUR, HAUTEUR = 640, 480
+TAILLE_APERCU = (640, 480)
+INTERVALLE_APERCU_MS = 33
+FICHIER_CAMERAS = "cameras.json"
+VARIABLE_SOURCE = "EPARGNE_SOURCE_CAPTURE"
+EXTENSIONS_IMAGES = (".jpg", ".jpeg", ".png", ".bmp")
+ECHECS_MAX = 50  # lectures ratées d'affilée avant d'abandonner la source
+
+_numeros = itertools.count(1)  # numéros d'images, croissants entre les captures
+
+
+# ---- Sources d'images (BGR, comme OpenCV) ----
+class Source:
+    """Source d'images : caméra, fichier vidéo ou séquence d'images"""
+    intervalle_s = 0.0  # cadence imposée aux sources rejouées (la caméra bloque seule)
+
+    def ouvrir(self) -> bool:
+        raise NotImplementedError
+
+    def lire(self):
+        """Image suivante (tableau BGR) ou None"""
+        raise NotImplementedError
+
+    def fermer(self):
+        pass
+
+
+class SourceCamera(Source):
+    def __init__(self, index: int, largeur: int = LARGEUR, hauteur: int = HAUTEUR):
+        self.index = index
+        self.largeur, self.hauteur = largeur, hauteur
+        self.cap = None
+
+    def ouvrir(self) -> bool:
+        cv2 = importer("cv2")
+        api = cv2.CAP_DSHOW if sys.platform == "win32" else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(self.index, api)
+        if not self.cap.isOpened():
+            self.fermer()
+            return False
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.largeur)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.hauteur)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+
+    def lire(self):
+        ret, image = self.cap.read()
+        return image if ret else None
+
+    def fermer(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class SourceVideo(Source):
+    """Rejoue un fichier vidéo à sa cadence, en boucle"""
+
+    def __init__(self, chemin: str, boucle: bool = True):
+        self.chemin = chemin
+        self.boucle = boucle
+        self.cap = None
+
+    def ouvrir(self) -> bool:
+        cv2 = importer("cv2")
+        self.cap = cv2.VideoCapture(self.chemin)
+        if not self.cap.isOpened():
+            self.fermer()
+            return False
+        self.intervalle_s = 1.0 / (self.cap.get(cv2.CAP_PROP_FPS) or 25)
+        return True
+
+    def lire(self):
+        ret, image = self.cap.read()
+        if not ret and self.boucle:
+            self.cap.set(importer("cv2").CAP_PROP_POS_FRAMES, 0)
+            ret, image = self.cap.read()
+        return image if ret else None
+
+    def fermer(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class SourceSequence(Source):
+    """Rejoue une liste de fichiers images, en boucle"""
+
+    def __init__(self, chemins: List[str], fps: float = 10, boucle: bool = True):
+        self.chemins = list(chemins)
+        self.intervalle_s = 1.0 / fps
+        self.boucle = boucle
+        self.position = 0
+
+    def ouvrir(self) -> bool:
+        self.position = 0
+        return bool(self.chemins)
+
+    def lire(self):
+        if self.position >= len(self.chemins):
+            if not self.boucle:
+                return None
+            self.position = 0
+        chemin = self.chemins[self.position]
+        self.position += 1
+        return importer("cv2").imread(chemin)
+
+
+def source_rejouee(chemin: str) -> Source:
+    """Source rejouant un dossier d'images ou un fichier vidéo"""
+    if os.path.isdir(chemin):
+        return SourceSequence(sorted(
+            os.path.join(chemin, nom) for nom in os.listdir(chemin)
+            if nom.lower().endswith(EXTENSIONS_IMAGES)
+        ))
+    return SourceVideo(chemin)
+
+
+def source_capture(camera: int) -> Source:
+    """Caméra demandée, ou la source rejouée désignée par EPARGNE_SOURCE_CAPTURE"""
+    chemin = os.getenv(VARIABLE_SOURCE)
+    return source_rejouee(chemin) if chemin else SourceCamera(camera)
+
+
+# ---- Détection des caméras ----
+def _chemin_cache() -> str:
+    dossier = os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "MyApp")
+    os.makedirs(dossier, exist_ok=True)
+    return os.path.join(dossier, FICHIER_CAMERAS)
+
+
+def _sonder() -> List[int]:
+    cameras = []
+    for index in INDICES_SONDES:
+        source = SourceCamera(index)
+        try:
+            if source.ouvrir() and source.lire() is not None:
+                cameras.append(index)
+        except Exception as e:
+            logger.error("Erreur caméra %s: %s", index, str(e))
+        finally:
+            source.fermer()
+    return cameras
+
+
+def detecter_cameras(forcer: bool = False) -> List[int]:
+    """Indices des caméras utilisables ; le dernier sondage fructueux est réutilisé"""
+    if os.getenv(VARIABLE_SOURCE):
+        return [0]
+    chemin = _chemin_cache()
+    if not forcer:
+        try:
+            with open(chemin, encoding="utf-8") as f:
+                cameras = json.load(f)["cameras"]
+            if cameras:
+                return cameras
+        except (OSError, ValueError, KeyError):
+            pass
+
+    debut = time.perf_counter()
+    cameras = _sonder()
+    logger.info("Sondage des caméras en %.0f ms: %s", (time.perf_counter() - debut) * 1000, cameras)
+    try:
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump({"cameras": cameras, "date": datetime.now().isoformat(timespec="seconds")}, f)
+    except OSError as e:
+        logger.error("Erreur enregistrement des caméras: %s", str(e))
+    return cameras
+
+
+# ---- Lecture en continu ----
+class Capture:
+    """Thread de lecture d'une source : garde la dernière image et son aperçu réduit"""
+
+    def __init__(self, source: Source, taille_apercu: Tuple[int, int] = TAILLE_APERCU):
+        self.source = source
+        self.taille_apercu = taille_apercu
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._image = None
+        self._apercu: Optional[Image.Image] = None
+        self._numero = 0
+
+    def demarrer(self) -> bool:
+        try:
+            if not self.source.ouvrir():
+                return False
+        except Exception as e:
+            logger.error("Erreur ouverture de la source de capture: %s", str(e))
+            return False
+        self._thread = threading.Thread(target=self._boucle, name="capture", daemon=True)
+        self._thread.start()
+        return True
+
+    def _reduire(self, cv2, image):
+        hauteur, largeur = image.shape[:2]
+        ratio = min(self.taille_apercu[0] / largeur, self.taille_apercu[1] / hauteur)
+        if ratio >= 1:
+            return image
+        return cv2.resize(image, (int(largeur * ratio), int(hauteur * ratio)), interpolation=cv2.INTER_AREA)
+
+    def _boucle(self):
+        cv2 = importer("cv2")
+        echecs = 0
+        while not self._arret.is_set():
+            debut = time.perf_counter()
+            try:
+                image = self.source.lire()
+            except Exception as e:
+                logger.error("Erreur lecture image: %s", str(e))
+                image = None
+            if image is None:
+                echecs += 1
+                if echecs >= ECHECS_MAX:
+                    logger.error("Source de capture muette, lecture arrêtée")
+                    self.source.fermer()  # libère la caméra sans attendre arreter()
+                    break
+                self._arret.wait(0.05)
+                continue
+            echecs = 0
+
+            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            apercu = Image.fromarray(self._reduire(cv2, rgb))
+            with self._verrou:
+                self._image, self._apercu, self._numero = rgb, apercu, next(_numeros)
+
+            if self.source.intervalle_s:
+                self._arret.wait(max(0.0, self.source.intervalle_s - (time.perf_counter() - debut)))
+
+    def image(self):
+        """Dernière image en pleine résolution (tableau RGB) ou None"""
+        with self._verrou:
+            return self._image
+
+    def apercu(self, depuis: int = 0) -> Tuple[int, Optional[Image.Image]]:
+        """(numéro, aperçu) si une image plus récente que depuis est arrivée, sinon (depuis, None)"""
+        with self._verrou:
+            if self._numero > depuis:
+                return self._numero, self._apercu
+            return depuis, None
+
+    def arreter(self):
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        self.source.fermer()
@@ -0,0 +1,305 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from lecture import connexion_lecture
+from monnaie import Montant
+from services import FabriqueConnexion
+
+# ==== INSTANTANÉS DES CLIENTS (CACHE LRU) ====
+# Un dépôt ou un retrait relit plusieurs fois le même abonné (recherche, contrôle
+# du compte fixe, rafraîchissement du solde affiché). Les écrans de dépôt et de
+# retrait partagent ce cache, indexé par numéro client et par numéro de carte.
+# Les services de dépôt et de retrait y reportent le nouveau solde après validation
+# (écriture traversante). Une entrée expire après DUREE_S, pour voir les écritures
+# faites ailleurs (autres postes, autres écrans).
+
+CAPACITE = 256
+DUREE_S = 30.0
+
+
+class InstantaneClient(NamedTuple):
+    """Même ordre que l'ancien tuple de chercher_abonne (indices 0 à 6 inchangés)"""
+    numero_client: str
+    nom: str
+    postnom: str
+    prenom: str
+    numero_carte: str
+    solde: Montant
+    type_compte: str
+    montant_initial: Optional[Montant]
+
+    @property
+    def nom_complet(self) -> str:
+        return f"{self.nom} {self.postnom} {self.prenom}"
+
+
+class CacheClients:
+    """Instantanés des derniers clients consultés (LRU, expiration)"""
+
+    def __init__(self, connexion: FabriqueConnexion, capacite: int = CAPACITE,
+                 duree_s: float = DUREE_S):
+        self.connexion = connexion
+        self.capacite = capacite
+        self.duree_s = duree_s
+        self._verrou = threading.Lock()
+        self._entrees: "OrderedDict[str, Tuple[InstantaneClient, float]]" = OrderedDict()
+        self._cartes: Dict[str, str] = {}  # numero_carte -> numero_client
+
+    def _lire(self, condition: str, parametres: tuple) -> Optional[InstantaneClient]:
+        conn = self.connexion()
+        try:
+            row = conn.execute(f"""
+                SELECT a.numero_client, a.nom, a.postnom, a.prenom, a.numero_carte,
+                       a.solde, a.type_compte, cf.montant_initial
+                FROM abonne a
+                LEFT JOIN compte_fixe cf ON a.numero_carte = cf.numero_carte
+                WHERE {condition}
+            """, parametres).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return InstantaneClient(
+            row[0], row[1] or "", row[2] or "", row[3] or "", row[4],
+            Montant.depuis_base(row[5]), row[6],
+            Montant.depuis_base(row[7]) if row[7] is not None else None,
+        )
+
+    def _en_cache(self, numero_client: Optional[str]) -> Optional[InstantaneClient]:
+        with self._verrou:
+            entree = self._entrees.get(numero_client)
+            if entree is None:
+                return None
+            if time.monotonic() - entree[1] > self.duree_s:
+                self._retirer(numero_client)
+                return None
+            self._entrees.move_to_end(numero_client)
+            return entree[0]
+
+    def _ranger(self, client: Optional[InstantaneClient]) -> Optional[InstantaneClient]:
+        if client is None:
+            return None
+        with self._verrou:
+            self._retirer(client.numero_client)
+            self._entrees[client.numero_client] = (client, time.monotonic())
+            if client.numero_carte:
+                self._cartes[client.numero_carte] = client.numero_client
+            while len(self._entrees) > self.capacite:
+                self._retirer(next(iter(self._entrees)))
+        return client
+
+    def _retirer(self, numero_client: str):
+        entree = self._entrees.pop(numero_client, None)
+        if entree is not None and entree[0].numero_carte:
+            self._cartes.pop(entree[0].numero_carte, None)
+
+    # ---- Lecture ----
+    def par_numero(self, numero_client: str) -> Optional[InstantaneClient]:
+        return self._en_cache(numero_client) or self._ranger(
+            self._lire("a.numero_client = ?", (numero_client,)))
+
+    def par_carte(self, numero_carte: str) -> Optional[InstantaneClient]:
+        return self._en_cache(self._cartes.get(numero_carte)) or self._ranger(
+            self._lire("a.numero_carte = ?", (numero_carte,)))
+
+    def rechercher(self, identifiant: str) -> Optional[InstantaneClient]:
+        """Numéro client ou numéro de carte"""
+        return (self._en_cache(identifiant) or self._en_cache(self._cartes.get(identifiant))
+                or self._ranger(self._lire("a.numero_client = ? OR a.numero_carte = ?",
+                                           (identifiant, identifiant))))
+
+    # ---- Écriture traversante ----
+    def mettre_a_jour(self, numero_client: str, solde: Montant):
+        """Nouveau solde validé par un dépôt ou un retrait"""
+        with self._verrou:
+            entree = self._entrees.get(numero_client)
+            if entree is not None:
+                self._entrees[numero_client] = (entree[0]._replace(solde=solde), time.monotonic())
+                self._entrees.move_to_end(numero_client)
+
+    def invalider(self, numero_client: Optional[str] = None):
+        with self._verrou:
+            if numero_client is None:
+                self._entrees.clear()
+                self._cartes.clear()
+            else:
+                self._retirer(numero_client)
+
+
+# ---- Caches partagés, par base ----
+_caches: Dict[str, CacheClients] = {}
+_verrou_caches = threading.Lock()
+
+
+def cache_clients(chemin_db: str, connexion: FabriqueConnexion) -> CacheClients:
+    """Cache partagé par les écrans ouverts sur chemin_db (créé au premier appel)"""
+    cle = os.path.normcase(os.path.abspath(chemin_db))
+    with _verrou_caches:
+        cache = _caches.get(cle)
+        if cache is None:
+            cache = _caches[cle] = CacheClients(connexion)
+        return cache
+
+
+# ==== PROFIL COMPLET DU CLIENT (VUE 360) ====
+# Une seule requête renvoie l'abonné et ses lignes liées (suppléants, compte,
+# blocage, carnet fixe, dernières opérations), agrégées en JSON par
+# json_group_array / json_object : chaque sous-requête suit un index de la table
+# liée. Les profils sont gardés DUREE_PROFIL_S (ouverture répétée d'une fiche,
+# export PDF juste après l'affichage).
+
+DUREE_PROFIL_S = 5.0
+NB_OPERATIONS = 5
+
+SQL_PROFIL = """
+    SELECT a.*,
+        (SELECT json_group_array(json_object('nom', s.nom, 'telephone', s.telephone))
+         FROM (SELECT nom, telephone FROM suppleant WHERE abonne_id = a.id ORDER BY id) s
+        ) AS json_suppleants,
+        (SELECT json_object('type_compte', tc.nom, 'solde', ac.solde,
+                            'date_activation', ac.date_activation)
+         FROM abonne_compte ac JOIN type_compte tc ON ac.type_compte_id = tc.id
+         WHERE ac.abonne_id = a.id LIMIT 1
+        ) AS json_compte,
+        (SELECT json_object('duree_mois', cb.duree_mois, 'montant_atteindre', cb.montant_atteindre,
+                            'pourcentage_retrait', cb.pourcentage_retrait,
+                            'frequence_retrait', cb.frequence_retrait)
+         FROM compte_bloque cb WHERE cb.abonne_id = a.id
+        ) AS json_compte_bloque,
+        (SELECT json_object('numero_client', cf.numero_client, 'numero_carte', cf.numero_carte,
+                            'montant_initial', cf.montant_initial, 'date_debut', cf.date_debut,
+                            'date_fin', cf.date_fin, 'prochaine_case', cf.prochaine_case,
+                            'total_cases', COALESCE(p.total_cases, cf.prochaine_case),
+                            'pages_completes', COALESCE(p.pages_completes, cf.prochaine_case / 31),
+                            'montant_epargne', p.montant_epargne, 'montant_retire', p.montant_retire,
+                            'derniere_date', p.derniere_date)
+         FROM compte_fixe cf
+         LEFT JOIN carnet_progression p ON p.numero_client = cf.numero_client
+         WHERE cf.numero_carte = a.numero_carte LIMIT 1
+        ) AS json_compte_fixe,
+        (SELECT json_group_array(json_object('id', t.id, 'abonne_id', t.abonne_id, 'type', t.type,
+                                             'montant', t.montant, 'date', t.date, 'heure', t.heure,
+                                             'agent', t.agent, 'statut', t.statut,
+                                             'reference', t.reference,
+                                             'methode_paiement', t.methode_paiement))
+         FROM (SELECT * FROM "transaction" WHERE abonne_id = a.id
+               ORDER BY horodatage DESC LIMIT :nb) t
+        ) AS json_transactions,
+        (SELECT json_group_array(json_object('date_depot', d.date_depot, 'heure', d.heure,
+                                             'montant', d.montant, 'ref_depot', d.ref_depot,
+                                             'nom_agent', d.nom_agent))
+         FROM (SELECT * FROM depots WHERE numero_client = a.numero_client
+               ORDER BY horodatage DESC LIMIT :nb) d
+        ) AS json_depots,
+        (SELECT json_group_array(json_object('date_retrait', r.date_retrait, 'heure', r.heure,
+                                             'montant', r.montant, 'ref_retrait', r.ref_retrait,
+                                             'agent', r.agent))
+         FROM (SELECT * FROM retraits WHERE numero_client = a.numero_client
+               ORDER BY horodatage DESC LIMIT :nb) r
+        ) AS json_retraits
+    FROM abonne a
+    WHERE a.id = :id
+"""
+
+# Parties JSON du profil et leurs champs en centimes
+MONTANTS_PROFIL = {
+    "suppleants": (),
+    "compte": ("solde",),
+    "compte_bloque": ("montant_atteindre",),
+    "compte_fixe": ("montant_initial", "montant_epargne", "montant_retire"),
+    "transactions": ("montant",),
+    "depots": ("montant",),
+    "retraits": ("montant",),
+}
+
+
+def _montants(ligne: Dict, champs: Tuple[str, ...]) -> Dict:
+    for champ in champs:
+        if ligne.get(champ) is not None:
+            ligne[champ] = Montant.depuis_base(ligne[champ])
+    return ligne
+
+
+def lire_profil(conn: sqlite3.Connection, abonne_id: int,
+                nb_operations: int = NB_OPERATIONS) -> Optional[Dict]:
+    """Abonné (colonnes de abonne) et ses parties liées, en une requête
+
+    suppleants, transactions, depots, retraits : listes (plus récentes d'abord) ;
+    compte, compte_bloque, compte_fixe : dictionnaires ou None.
+    """
+    curseur = conn.execute(SQL_PROFIL, {"id": abonne_id, "nb": nb_operations})
+    row = curseur.fetchone()
+    if row is None:
+        return None
+    profil = dict(zip((d[0] for d in curseur.description), row))
+    for partie, champs in MONTANTS_PROFIL.items():
+        valeur = json.loads(profil.pop(f"json_{partie}") or "null")
+        if isinstance(valeur, list):
+            profil[partie] = [_montants(ligne, champs) for ligne in valeur]
+        else:
+            profil[partie] = _montants(valeur, champs) if valeur is not None else None
+    return profil
+
+
+def _copie(profil: Dict) -> Dict:
+    """Copie modifiable par l'appelant (les montants et textes sont immuables)"""
+    return {cle: [dict(ligne) for ligne in valeur] if isinstance(valeur, list)
+            else dict(valeur) if isinstance(valeur, dict) else valeur
+            for cle, valeur in profil.items()}
+
+
+class CacheProfils:
+    """Profils complets récemment ouverts, gardés duree_s secondes"""
+
+    def __init__(self, connexion: FabriqueConnexion, duree_s: float = DUREE_PROFIL_S):
+        self.connexion = connexion
+        self.duree_s = duree_s
+        self._verrou = threading.Lock()
+        self._profils: Dict[int, Tuple[Dict, float]] = {}
+
+    def profil(self, abonne_id: int) -> Optional[Dict]:
+        """Copie du profil (None si l'abonné n'existe pas)"""
+        with self._verrou:
+            entree = self._profils.get(abonne_id)
+        if entree is not None and time.monotonic() - entree[1] <= self.duree_s:
+            return _copie(entree[0])
+
+        conn = self.connexion()
+        try:
+            profil = lire_profil(conn, abonne_id)
+        finally:
+            conn.close()
+        with self._verrou:
+            if profil is None:
+                self._profils.pop(abonne_id, None)
+                return None
+            maintenant = time.monotonic()
+            self._profils = {cle: e for cle, e in self._profils.items()
+                             if maintenant - e[1] <= self.duree_s}
+            self._profils[abonne_id] = (profil, maintenant)
+        return _copie(profil)
+
+    def invalider(self, abonne_id: Optional[int] = None):
+        with self._verrou:
+            if abonne_id is None:
+                self._profils.clear()
+            else:
+                self._profils.pop(abonne_id, None)
+
+
+_profils: Dict[str, CacheProfils] = {}
+
+
+def cache_profils(chemin_db: str, connexion: Optional[FabriqueConnexion] = None) -> CacheProfils:
+    """Cache de profils de chemin_db (lecture seule par défaut), créé au premier appel"""
+    cle = os.path.normcase(os.path.abspath(chemin_db))
+    with _verrou_caches:
+        cache = _profils.get(cle)
+        if cache is None:
+            cache = _profils[cle] = CacheProfils(connexion or (lambda: connexion_lecture(chemin_db)))
+        return cache
@@ -0,0 +1,110 @@
+import argparse
+import logging
+import sqlite3
+import sys
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from migrations import appliquer_migrations, reconstruire_cumuls
+from monnaie import Montant, TYPES_DETECTES
+
+# ==== CUMULS DES OPÉRATIONS PAR PÉRIODE ====
+# Les rapports et graphiques de période lisent la table cumul_operations, tenue à
+# jour par déclencheur à chaque écriture du grand livre (voir migrations) : un
+# graphique annuel lit douze mois de cumuls au lieu d'une année d'opérations.
+# Les périodes sont repérées par leur clé : AAAA-MM-JJ (jour), date du lundi
+# (semaine ISO), AAAA-MM (mois), AAAA (année).
+# Reconstruction complète : python cumuls.py [chemin_db ...] (défaut : base des
+# écrans de dépôt et de retrait, MyApp/data_epargne.db)
+
+logger = logging.getLogger(__name__)
+
+AXES = ("periode", "agent", "type_compte")
+
+
+class Cumul(NamedTuple):
+    cle: tuple  # valeurs des axes demandés
+    nombre: int
+    montant: Montant
+
+
+def cle_periode(grain: str, jour: str) -> str:
+    """Clé de la période du grain contenant jour (AAAA-MM-JJ) ; ValueError si invalide"""
+    d = date.fromisoformat(jour)
+    if grain == "jour":
+        return d.isoformat()
+    if grain == "semaine":
+        return (d - timedelta(days=d.weekday())).isoformat()
+    if grain == "mois":
+        return d.isoformat()[:7]
+    if grain == "annee":
+        return d.isoformat()[:4]
+    raise ValueError(f"Grain inconnu: {grain}")
+
+
+def lire_cumuls(conn: sqlite3.Connection, nature: str, grain: str, debut: str,
+                fin: Optional[str] = None, par: Sequence[str] = ("periode",)) -> List[Cumul]:
+    """Cumuls des périodes contenant debut à fin (dates incluses), regroupés selon par"""
+    if any(axe not in AXES for axe in par):
+        raise ValueError(f"Axe de regroupement invalide: {', '.join(par)}")
+    axes = ", ".join(par)
+    regroupement = f"GROUP BY {axes} HAVING SUM(nombre) <> 0 ORDER BY {axes}" if par else ""
+    lignes = conn.execute(f"""
+        SELECT {axes + ',' if par else ''} SUM(nombre), SUM(montant)
+        FROM cumul_operations
+        WHERE grain = ? AND nature = ? AND periode BETWEEN ? AND ?
+        {regroupement}
+    """, (grain, nature, cle_periode(grain, debut), cle_periode(grain, fin or debut))).fetchall()
+    return [Cumul(tuple(ligne[:-2]), ligne[-2] or 0, Montant.depuis_base(ligne[-1]))
+            for ligne in lignes]
+
+
+def total_cumuls(conn: sqlite3.Connection, nature: str, grain: str, debut: str,
+                 fin: Optional[str] = None) -> Tuple[int, Montant]:
+    """Nombre et montant total des opérations des périodes contenant debut à fin"""
+    cumul = lire_cumuls(conn, nature, grain, debut, fin, par=())[0]
+    return cumul.nombre, cumul.montant
+
+
+def reconstruire(chemin_db: str) -> int:
+    """Recalcule les cumuls d'une base dans une transaction ; retourne le nombre de lignes"""
+    conn = sqlite3.connect(chemin_db, timeout=30, detect_types=TYPES_DETECTES)
+    try:
+        appliquer_migrations(conn)
+        conn.isolation_level = None
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            nb = reconstruire_cumuls(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return nb
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Reconstruit les cumuls des opérations par période")
+    parser.add_argument("bases", nargs="*",
+                        help="Bases à traiter (défaut : base des écrans, MyApp/data_epargne.db)")
+    args = parser.parse_args(argv)
+
+    bases = args.bases
+    if not bases:
+        from db import DBConfig
+        bases = [DBConfig.get_guichets_db_path()]
+
+    code_retour = 0
+    for chemin in bases:
+        try:
+            print(f"{chemin}: {reconstruire(chemin)} lignes de cumuls")
+        except sqlite3.Error as e:
+            logger.error("Erreur reconstruction des cumuls: %s", str(e))
+            code_retour = 1
+    return code_retour
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
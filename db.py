@@ -7,28 +7,43 @@ import time
 from datetime import datetime
 import random
 import traceback
-import psutil
 import logging
-import win32api
+import threading
 import stat
 import tempfile
 import binascii
-from typing import Optional, Dict, Tuple, List, Iterator, Union
+from typing import Optional, Dict, Tuple, List, Iterator, Union, Callable, Any, Sequence
 from contextlib import contextmanager
 from PIL import Image, ImageDraw, ImageFont
 import io
+from migrations import appliquer_migrations
+from performance import chronometrer, ConnexionChronometree
+from file_ecriture import FileEcriture, TAILLE_LOT_DEFAUT
+from lecture import ConnexionLecture, connexion_rapport
+from monnaie import Montant, TYPES_DETECTES
+from services import ErreurMetier, RetraitService, debiter_solde
+from references import cache_reference, charger as charger_references
+from clients import cache_profils
+from pagination import (ABONNES, DEPOTS, JOURNAL, RETRAITS, TAILLE_PAGE, TAILLE_PAGE_EXPORT,
+                        Filtre, Liste, Page, lire_page, parcourir)
 
 # ==== CONFIGURATION ====
 class DBConfig:
     APP_NAME = "MonEpargne"
     DB_NAME = "money_epargne.db"
+    GUICHETS_DB_NAME = "data_epargne.db"  # base des écrans de dépôt et de retrait
     WAL_MODE = True
     MAX_CONNECTIONS = 5
     CONNECTION_TIMEOUT = 30  # seconds
+    _app_dir = None
+    _db_path = None
 
     @classmethod
     def get_app_dir(cls) -> str:
         """Retourne le dossier de l'application avec gestion robuste des permissions"""
+        if cls._app_dir is not None:
+            return cls._app_dir
+
         # 1. Essayer APPDATA
         appdata_dir = os.getenv("APPDATA")
         app_folder = os.path.join(appdata_dir, cls.APP_NAME) if appdata_dir else None
@@ -45,6 +60,7 @@ class DBConfig:
             # Windows: Ajouter permissions explicites (version simplifiée)
             if os.name == 'nt':
                 try:
+                    import win32api
                     import win32security
                     import ntsecuritycon
                     sd = win32security.GetFileSecurity(app_folder, win32security.DACL_SECURITY_INFORMATION)
@@ -65,11 +81,15 @@ class DBConfig:
             app_folder = os.path.abspath(".")
             print(f"Utilisation du dossier courant: {app_folder}")
         
+        cls._app_dir = app_folder
         return app_folder
 
     @classmethod
     def get_db_path(cls) -> str:
-        """Retourne le chemin complet de la base de données"""
+        """Retourne le chemin complet de la base de données (résolu une seule fois)"""
+        if cls._db_path is not None:
+            return cls._db_path
+
         local_db = os.path.join(cls.get_app_dir(), cls.DB_NAME)
 
         # Copier la base originale si nécessaire
@@ -94,8 +114,8 @@ class DBConfig:
         
         # Vérification finale des permissions
         try:
-            with open(local_db, 'a') as f:
-                f.write("\n")  # Test d'écriture
+            with open(local_db, 'a'):
+                pass  # Test d'écriture (sans modifier le fichier)
             print(f"Permissions vérifiées sur {local_db}")
         except Exception as e:
             print(f"Permissions insuffisantes sur {local_db}: {str(e)}")
@@ -103,8 +123,21 @@ class DBConfig:
             local_db = os.path.join(tempfile.gettempdir(), cls.DB_NAME)
             print(f"Utilisation DB temporaire: {local_db}")
         
+        cls._db_path = local_db
         return local_db
 
+    @classmethod
+    def get_guichets_db_path(cls) -> str:
+        """Base des écrans de dépôt et de retrait (MyApp/data_epargne.db)"""
+        dossier = os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "MyApp")
+        os.makedirs(dossier, exist_ok=True)
+        chemin = os.path.join(dossier, cls.GUICHETS_DB_NAME)
+        if not os.path.exists(chemin):
+            original_db = resource_path(cls.GUICHETS_DB_NAME)
+            if os.path.exists(original_db):
+                shutil.copyfile(original_db, chemin)
+        return chemin
+
     @classmethod
     def set_file_permissions(cls, filepath: str):
         """Définit les permissions appropriées pour un fichier"""
@@ -165,24 +198,30 @@ class DBManager:
         self._max_connections = DBConfig.MAX_CONNECTIONS
         self._timeout = DBConfig.CONNECTION_TIMEOUT
         
+    def nouvelle_connexion(self) -> sqlite3.Connection:
+        """Ouvre une connexion configurée (hors pool)"""
+        conn = sqlite3.connect(
+            DBConfig.get_db_path(),
+            timeout=self._timeout,
+            detect_types=TYPES_DETECTES,
+            isolation_level='IMMEDIATE',
+            factory=ConnexionChronometree
+        )
+        # Configuration SQLite optimisée
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 30000")
+        conn.execute("PRAGMA cache_size = -10000")  # 10MB cache
+        return conn
+
     @contextmanager
     def get_connection(self) -> Iterator[sqlite3.Connection]:
         """Gestionnaire de contexte pour les connexions à la base de données"""
         conn = None
         try:
             if len(self._pool) < self._max_connections:
-                conn = sqlite3.connect(
-                    DBConfig.get_db_path(),
-                    timeout=self._timeout,
-                    detect_types=sqlite3.PARSE_DECLTYPES,
-                    isolation_level='IMMEDIATE'
-                )
-                # Configuration SQLite optimisée
-                conn.execute("PRAGMA foreign_keys = ON")
-                conn.execute("PRAGMA journal_mode = WAL")
-                conn.execute("PRAGMA synchronous = NORMAL")
-                conn.execute("PRAGMA busy_timeout = 30000")
-                conn.execute("PRAGMA cache_size = -10000")  # 10MB cache
+                conn = self.nouvelle_connexion()
             else:
                 conn = self._pool.pop()
             
@@ -190,7 +229,10 @@ class DBManager:
             self._pool.append(conn)
             
         except Exception as e:
+            # Annulation ici : après la sortie du bloc with, la connexion est déjà fermée
             if conn:
+                if conn.in_transaction:
+                    conn.rollback()
                 conn.close()
             logger.error("Erreur connexion DB: %s", str(e))
             raise
@@ -201,6 +243,48 @@ def connexion_db() -> Iterator[sqlite3.Connection]:
     with DBManager().get_connection() as conn:
         yield conn
 
+def connexion_lecture_rapports() -> ConnexionLecture:
+    """Connexion en lecture seule pour les rapports et exports (copie si activée)"""
+    return connexion_rapport(DBConfig.get_db_path())
+
+# ==== ÉCRITURES ====
+# Sans file d'écriture, chaque écriture ouvre sa transaction sur une connexion du pool.
+# Avec activer_file_ecriture(), un écrivain unique regroupe les écritures concurrentes
+# (guichets, serveur API) en lots validés par un seul COMMIT.
+_file_ecriture: Optional[FileEcriture] = None
+
+def activer_file_ecriture(taille_lot: int = TAILLE_LOT_DEFAUT) -> FileEcriture:
+    """Démarre l'écrivain unique (idempotent)"""
+    global _file_ecriture
+    if _file_ecriture is None:
+        _file_ecriture = FileEcriture(DBManager().nouvelle_connexion, taille_lot)
+        logger.info("File d'écriture activée (lots de %s opérations)", taille_lot)
+    return _file_ecriture
+
+def desactiver_file_ecriture():
+    """Vide la file puis arrête l'écrivain"""
+    global _file_ecriture
+    file, _file_ecriture = _file_ecriture, None
+    if file is not None:
+        file.arreter()
+
+def ecrire(operation: Callable[[sqlite3.Connection], Any]) -> Any:
+    """
+    Exécute operation(conn) dans une transaction d'écriture et retourne son résultat
+    L'opération ne valide pas elle-même ; une exception annule ses écritures
+    """
+    if _file_ecriture is not None:
+        return _file_ecriture.executer(operation)
+    with DBManager().get_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            resultat = operation(conn)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        return resultat
+
 def diagnostiquer_blocage(chemin_db: str) -> str:
     """Diagnostique les problèmes de blocage de la base"""
     diagnostics = []
@@ -220,6 +304,7 @@ def diagnostiquer_blocage(chemin_db: str) -> str:
             diagnostics.append(f"Fichier de lock présent: {lf}")
 
     try:
+        import psutil
         for proc in psutil.process_iter(['pid', 'name', 'open_files']):
             try:
                 open_files = proc.info.get('open_files')
@@ -437,18 +522,12 @@ def creer_compte_agent(nom: str, identifiant: str, mot_de_passe: str,
             
     except sqlite3.IntegrityError as e:
         logger.error(f"Erreur intégrité: {str(e)}")
-        if conn:
-            conn.rollback()
         raise ValueError("Cet identifiant est déjà utilisé") from e
     except ValueError as e:
         logger.error(f"Erreur validation: {str(e)}")
-        if conn:
-            conn.rollback()
         raise
     except Exception as e:
         logger.error(f"Erreur création compte: {str(e)}", exc_info=True)
-        if conn:
-            conn.rollback()
         raise RuntimeError("Erreur lors de la création du compte") from e
 
 
@@ -466,24 +545,16 @@ def blob_to_photoimage(blob_data: bytes, size: Tuple[int, int] = (60, 60)) -> Op
         return None
 
 # ==== INITIALISATION DE LA BASE ====
+@chronometrer("db.initialiser_base")
 def initialiser_base() -> bool:
     """
-    Initialise la base de données si elle n'existe pas
-    Retourne True si l'initialisation a réussi ou si la base existait déjà
+    Initialise ou met à jour le schéma de la base (migrations versionnées)
+    Retourne True si la base est prête
     """
     try:
-        db_path = DBConfig.get_db_path()
-        
-        # Si la base existe déjà, vérifier sa structure
-        if os.path.exists(db_path):
-            with DBManager().get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='abonne'")
-                if cur.fetchone():
-                    return True  # La base existe et a la bonne structure
-        
-        # Créer une nouvelle base
-        create_empty_db(db_path)
+        with DBManager().get_connection() as conn:
+            appliquer_migrations(conn)
+        charger_references(DBConfig.get_db_path())
         return True
         
     except Exception as e:
@@ -493,200 +564,16 @@ def initialiser_base() -> bool:
 def create_empty_db(db_path: str):
     """Crée une base de données vide avec le schéma approprié"""
     try:
-        with sqlite3.connect(db_path) as conn:
+        conn = sqlite3.connect(db_path)
+        try:
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
             conn.execute("PRAGMA foreign_keys=ON")
-            
-            # Création des tables
-            conn.executescript("""
-            -- Table principale des abonnés
-            CREATE TABLE IF NOT EXISTS abonne (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_client TEXT UNIQUE NOT NULL,
-                numero_carte TEXT UNIQUE NOT NULL,
-                nom TEXT NOT NULL,
-                postnom TEXT,
-                prenom TEXT NOT NULL,
-                sexe TEXT CHECK(sexe IN ('M', 'F')) NOT NULL,
-                date_naissance TEXT NOT NULL,
-                lieu_naissance TEXT NOT NULL,
-                adresse TEXT NOT NULL,
-                telephone TEXT NOT NULL CHECK(length(telephone) = 10),
-                date_inscription TEXT NOT NULL,
-                statut TEXT DEFAULT 'Actif' CHECK(statut IN ('Actif', 'Inactif', 'Bloqué')),
-                photo_path TEXT,
-                UNIQUE(nom, postnom, prenom, telephone)
-            );
-
-            -- Table des suppléants
-            CREATE TABLE IF NOT EXISTS suppleant (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                abonne_id INTEGER NOT NULL,
-                nom TEXT NOT NULL,
-                telephone TEXT NOT NULL,
-                FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE,
-                UNIQUE(abonne_id, nom)
-            );
-            
-            CREATE TABLE IF NOT EXISTS agent (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom_agent TEXT NOT NULL,
-                identifiant TEXT UNIQUE NOT NULL,
-                mot_de_passe TEXT NOT NULL,
-                salt TEXT NOT NULL,
-                role TEXT DEFAULT 'agent',
-                date_creation TEXT,
-                actif INTEGER DEFAULT 1,
-                photo BLOB
-            );
-
-            -- Table des types de compte
-            CREATE TABLE IF NOT EXISTS type_compte (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nom TEXT UNIQUE NOT NULL CHECK(nom IN ('Fixe', 'Mixte', 'Bloqué')),
-                description TEXT
-            );
-
-            -- Table de liaison abonne-type_compte
-            CREATE TABLE IF NOT EXISTS abonne_compte (
-                abonne_id INTEGER NOT NULL,
-                type_compte_id INTEGER NOT NULL,
-                date_activation TEXT NOT NULL,
-                solde REAL DEFAULT 0,
-                PRIMARY KEY (abonne_id, type_compte_id),
-                FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE,
-                FOREIGN KEY (type_compte_id) REFERENCES type_compte(id)
-            );
-            
-            CREATE TABLE IF NOT EXISTS parametres (
-                cle TEXT PRIMARY KEY,
-             valeur TEXT,
-             description TEXT,
-                modifiable INTEGER DEFAULT 1
-            );
-        
-            CREATE TABLE IF NOT EXISTS compte_fixe_cases (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_client TEXT NOT NULL,
-                numero_carte TEXT NOT NULL,
-                ref_depot TEXT NOT NULL,
-                date_remplissage TEXT NOT NULL,
-                montant REAL NOT NULL,
-                FOREIGN KEY (numero_client) REFERENCES abonne(numero_client)
-            );
-            
-            CREATE TABLE IF NOT EXISTS historique_modifications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                table_modifiee TEXT NOT NULL,
-                id_ligne INTEGER NOT NULL,
-                ancienne_valeur TEXT,
-                nouvelle_valeur TEXT,
-                date_modification TEXT NOT NULL,
-                auteur TEXT NOT NULL
-            );
-            
-
-            -- Table spécifique aux comptes bloqués
-            
-            CREATE TABLE IF NOT EXISTS compte_bloque (
-                abonne_id INTEGER PRIMARY KEY,
-                duree_mois INTEGER NOT NULL CHECK(duree_mois > 0),
-                montant_atteindre REAL NOT NULL CHECK(montant_atteindre > 0),
-                pourcentage_retrait INTEGER NOT NULL CHECK(pourcentage_retrait BETWEEN 1 AND 100),
-                frequence_retrait TEXT NOT NULL CHECK(frequence_retrait IN ('Mensuel', 'Trimestriel', 'Semestriel', 'Annuel')),
-                FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE
-            );
-
-            -- Table spécifique aux comptes fixes
-            CREATE TABLE IF NOT EXISTS compte_fixe (
-                abonne_id INTEGER PRIMARY KEY,
-                montant_initial REAL NOT NULL CHECK(montant_initial > 0),
-                date_debut TEXT NOT NULL,
-                date_fin TEXT NOT NULL,
-                FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE
-            );
-            
-            CREATE TABLE IF NOT EXISTS depots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_client TEXT NOT NULL,
-                montant REAL NOT NULL,
-                ref_depot TEXT UNIQUE,
-                heure TEXT NOT NULL,
-                nom_complet TEXT,
-                date_depot TEXT NOT NULL,
-                nom_agent TEXT NOT NULL,
-                methode_paiement TEXT,
-                FOREIGN KEY (numero_client) REFERENCES abonne(numero_client)
-            );
-            
-            CREATE TABLE IF NOT EXISTS retraits (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero_client TEXT NOT NULL,
-                montant REAL NOT NULL,
-                ref_retrait TEXT UNIQUE,
-                heure TEXT NOT NULL,
-                date_retrait TEXT NOT NULL,
-                agent TEXT NOT NULL,
-                statut TEXT DEFAULT 'En attente',
-                FOREIGN KEY (numero_client) REFERENCES abonne(numero_client)
-            );
-
-            -- Pages des carnets fixes
-            CREATE TABLE IF NOT EXISTS compte_fixe_page (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                compte_fixe_id INTEGER NOT NULL,
-                numero_page INTEGER NOT NULL CHECK(numero_page BETWEEN 1 AND 8),
-                cases_remplies INTEGER DEFAULT 0 CHECK(cases_remplies BETWEEN 0 AND 31),
-                FOREIGN KEY (compte_fixe_id) REFERENCES compte_fixe(abonne_id) ON DELETE CASCADE,
-                UNIQUE(compte_fixe_id, numero_page)
-            );
-
-            -- Transactions
-            CREATE TABLE IF NOT EXISTS transaction (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                abonne_id INTEGER NOT NULL,
-                type TEXT NOT NULL CHECK(type IN ('Dépôt', 'Retrait')),
-                montant REAL NOT NULL CHECK(montant > 0),
-                date TEXT NOT NULL,
-                heure TEXT NOT NULL,
-                agent TEXT NOT NULL,
-                statut TEXT DEFAULT 'Complété' CHECK(statut IN ('Complété', 'En attente', 'Annulé')),
-                reference TEXT UNIQUE NOT NULL,
-                methode_paiement TEXT,
-                FOREIGN KEY (abonne_id) REFERENCES abonne(id)
-            );
-
-            -- Journal d'audit
-            CREATE TABLE IF NOT EXISTS journal (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action TEXT NOT NULL,
-                acteur TEXT NOT NULL,
-                date_action TEXT NOT NULL,
-                heure_action TEXT NOT NULL,
-                cible TEXT,
-                details TEXT,
-                ip_address TEXT,
-                user_agent TEXT
-            );
-
-            -- Index pour les recherches fréquentes
-            CREATE INDEX IF NOT EXISTS idx_abonne_nom ON abonne(nom, postnom);
-            CREATE INDEX IF NOT EXISTS idx_abonne_telephone ON abonne(telephone);
-            CREATE INDEX IF NOT EXISTS idx_transaction_date ON transaction(date);
-            CREATE INDEX IF NOT EXISTS idx_transaction_abonne ON transaction(abonne_id);
-            CREATE INDEX IF NOT EXISTS idx_journal_date ON journal(date_action);
-
-            -- Données de base
-            INSERT OR IGNORE INTO type_compte (nom, description) VALUES 
-                ('Fixe', 'Compte avec montant fixe à épargner'),
-                ('Mixte', 'Compte flexible avec options variées'),
-                ('Bloqué', 'Compte avec montant bloqué pour une durée déterminée');
-            """)
-            
-            conn.commit()
-            DBConfig.set_file_permissions(db_path)
-            logger.info("Base de données vide créée avec succès")
+            appliquer_migrations(conn)
+        finally:
+            conn.close()
+        DBConfig.set_file_permissions(db_path)
+        logger.info("Base de données vide créée avec succès")
     except Exception as e:
         logger.error("Erreur création DB: %s", str(e), exc_info=True)
         raise
@@ -728,6 +615,7 @@ def cleanup_lock_files():
             logger.warning(f"Impossible de supprimer le fichier de verrouillage {lf}: {e}")
 
 # ==== FONCTIONS MÉTIER ====
+@chronometrer("db.creer_abonne")
 def creer_abonne(data: Dict) -> Tuple[bool, str]:
     """Crée un nouvel abonné dans la base de données"""
     try:
@@ -777,8 +665,9 @@ def creer_abonne(data: Dict) -> Tuple[bool, str]:
                 ))
             
             # 3. Lier le type de compte
-            cur.execute("SELECT id FROM type_compte WHERE nom = ?", (data['type_compte'],))
-            type_compte_id = cur.fetchone()[0]
+            type_compte_id = cache_reference(DBConfig.get_db_path()).type_compte_id(data['type_compte'])
+            if type_compte_id is None:
+                raise ValueError(f"Type de compte inconnu: {data['type_compte']}")
             
             cur.execute("""
                 INSERT INTO abonne_compte (
@@ -788,7 +677,7 @@ def creer_abonne(data: Dict) -> Tuple[bool, str]:
                 abonne_id,
                 type_compte_id,
                 datetime.now().strftime("%Y-%m-%d"),
-                data.get('montant', 0)
+                Montant.depuis(data.get('montant') or 0)
             ))
             
             # 4. Gestion spécifique au type de compte
@@ -801,7 +690,7 @@ def creer_abonne(data: Dict) -> Tuple[bool, str]:
                 """, (
                     abonne_id,
                     int(data.get('duree_blocage', 3)),
-                    float(data.get('montant_atteindre', 0)),
+                    Montant.depuis(data.get('montant_atteindre') or 0),
                     int(data.get('pourcentage_retrait', 30)),
                     data.get('frequence_retrait', 'Mensuel')
                 ))
@@ -813,219 +702,208 @@ def creer_abonne(data: Dict) -> Tuple[bool, str]:
                     ) VALUES (?, ?, ?, ?)
                 """, (
                     abonne_id,
-                    float(data.get('montant', 0)),
+                    Montant.depuis(data.get('montant') or 0),
                     datetime.now().strftime("%Y-%m-%d"),
                     date_fin
                 ))
-                
-                # Initialiser les pages du carnet
-                for page in range(1, 9):
-                    cur.execute("""
-                        INSERT INTO compte_fixe_page (
-                            compte_fixe_id, numero_page, cases_remplies
-                        ) VALUES (?, ?, ?)
-                    """, (abonne_id, page, 0))
+                # Carnet vide : prochaine_case = 0 (pages déduites du curseur)
             
             # Journaliser l'action
             ajouter_journal(
                 "Création abonné",
                 data.get('agent', 'Système'),
                 numero_client,
-                f"Nouvel abonné {data['nom']} {data['prenom']}"
+                f"Nouvel abonné {data['nom']} {data['prenom']}",
+                conn=conn
             )
             
             conn.commit()
             return True, numero_client
             
     except sqlite3.IntegrityError as e:
-        conn.rollback()
         logger.error("Erreur intégrité création abonné: %s", str(e))
         return False, f"Erreur de données: {str(e)}"
     except Exception as e:
-        conn.rollback()
         logger.error("Erreur création abonné: %s", str(e), exc_info=True)
         return False, f"Erreur système: {str(e)}"
 
-def effectuer_depot(abonne_id: int, montant: float, agent: str) -> Tuple[bool, str]:
+def _operation_depot(conn: sqlite3.Connection, abonne_id: int, montant: Montant,
+                     agent: str, reference: str) -> str:
+    montant = Montant.depuis(montant)
+    cur = conn.cursor()
+    
+    # 1. Vérifier que l'abonné existe et est actif
+    cur.execute("""
+        SELECT a.id, ac.solde, tc.nom 
+        FROM abonne a
+        JOIN abonne_compte ac ON a.id = ac.abonne_id
+        JOIN type_compte tc ON ac.type_compte_id = tc.id
+        WHERE a.id = ? AND a.statut = 'Actif'
+    """, (abonne_id,))
+    
+    if not (abonne := cur.fetchone()):
+        raise ValueError("Abonné introuvable ou inactif")
+    
+    _, ancien_solde, type_compte = abonne
+    
+    # 2. Mettre à jour le solde
+    cur.execute("""
+        UPDATE abonne_compte 
+        SET solde = solde + ?
+        WHERE abonne_id = ?
+        RETURNING solde
+    """, (montant, abonne_id))
+    
+    nouveau_solde = Montant.depuis_base(cur.fetchone()[0])
+    
+    # 3. Enregistrer la transaction
+    cur.execute("""
+        INSERT INTO "transaction" (
+            abonne_id, type, montant, date, heure, agent, reference
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (
+        abonne_id, 
+        'Dépôt', 
+        montant,
+        datetime.now().strftime("%Y-%m-%d"),
+        datetime.now().strftime("%H:%M:%S"),
+        agent,
+        reference
+    ))
+    
+    # 4. Journaliser
+    _inserer_journal(
+        conn,
+        "Dépôt effectué",
+        agent,
+        str(abonne_id),
+        f"Dépôt de {montant.formater()}. Type: {type_compte}. Nouveau solde: {nouveau_solde.formater()}"
+    )
+    return reference
+
+@chronometrer("db.effectuer_depot")
+def effectuer_depot(abonne_id: int, montant: Montant, agent: str) -> Tuple[bool, str]:
     """Effectue un dépôt pour un client"""
     reference = f"DEP-{datetime.now().strftime('%Y%m%d%H%M%S')}-{random.randint(1000, 9999)}"
     
     try:
-        with DBManager().get_connection() as conn:
-            conn.execute("BEGIN IMMEDIATE")
-            cur = conn.cursor()
-            
-            # 1. Vérifier que l'abonné existe et est actif
-            cur.execute("""
-                SELECT a.id, ac.solde, tc.nom 
-                FROM abonne a
-                JOIN abonne_compte ac ON a.id = ac.abonne_id
-                JOIN type_compte tc ON ac.type_compte_id = tc.id
-                WHERE a.id = ? AND a.statut = 'Actif'
-            """, (abonne_id,))
-            
-            if not (abonne := cur.fetchone()):
-                raise ValueError("Abonné introuvable ou inactif")
-            
-            _, ancien_solde, type_compte = abonne
-            
-            # 2. Mettre à jour le solde
-            cur.execute("""
-                UPDATE abonne_compte 
-                SET solde = solde + ?
-                WHERE abonne_id = ?
-                RETURNING solde
-            """, (montant, abonne_id))
-            
-            nouveau_solde = cur.fetchone()[0]
-            
-            # 3. Enregistrer la transaction
-            cur.execute("""
-                INSERT INTO transaction (
-                    abonne_id, type, montant, date, heure, agent, reference
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                abonne_id, 
-                'Dépôt', 
-                montant,
-                datetime.now().strftime("%Y-%m-%d"),
-                datetime.now().strftime("%H:%M:%S"),
-                agent,
-                reference
-            ))
-            
-            # 4. Journaliser
-            ajouter_journal(
-                "Dépôt effectué",
-                agent,
-                str(abonne_id),
-                f"Dépôt de {montant} FC. Type: {type_compte}. Nouveau solde: {nouveau_solde}"
-            )
-            
-            conn.commit()
-            return True, reference
-            
+        return True, ecrire(lambda conn: _operation_depot(conn, abonne_id, montant, agent, reference))
     except ValueError as e:
-        conn.rollback()
         logger.warning("Dépôt refusé: %s", str(e))
         return False, str(e)
     except sqlite3.Error as e:
-        conn.rollback()
         logger.error("Erreur dépôt DB: %s", str(e))
         return False, f"Erreur base de données: {str(e)}"
     except Exception as e:
-        conn.rollback()
         logger.error("Erreur dépôt: %s", str(e), exc_info=True)
         return False, f"Erreur système: {str(e)}"
 
-def effectuer_retrait(abonne_id: int, montant: float, agent: str) -> Tuple[bool, str]:
+def _operation_retrait(conn: sqlite3.Connection, abonne_id: int, montant: Montant,
+                       agent: str, reference: str) -> str:
+    montant = Montant.depuis(montant)
+    cur = conn.cursor()
+    
+    # 1. Vérifier l'éligibilité au retrait
+    cur.execute("""
+        SELECT a.id, ac.solde, tc.nom, 
+               cb.pourcentage_retrait, cb.montant_atteindre
+        FROM abonne a
+        JOIN abonne_compte ac ON a.id = ac.abonne_id
+        JOIN type_compte tc ON ac.type_compte_id = tc.id
+        LEFT JOIN compte_bloque cb ON a.id = cb.abonne_id
+        WHERE a.id = ? AND a.statut = 'Actif'
+    """, (abonne_id,))
+    
+    if not (abonne := cur.fetchone()):
+        raise ValueError("Abonné introuvable ou inactif")
+    
+    _, solde, type_compte, pourcentage, montant_atteindre = abonne
+    solde = Montant.depuis_base(solde)
+    montant_atteindre = Montant.depuis_base(montant_atteindre)
+    
+    # 2. Vérifier les règles selon le type de compte (mêmes règles que RetraitService)
+    if type_compte == 'Bloqué':
+        RetraitService.verifier_plafond_bloque(montant, solde, montant_atteindre, pourcentage)
+    elif solde < montant:
+        raise ValueError("Solde insuffisant")
+    
+    # 3. Débit conditionnel : le solde est revérifié par la requête qui le modifie
+    nouveau_solde = debiter_solde(conn, "abonne_compte", "abonne_id", abonne_id, montant)
+    
+    # 4. Enregistrer la transaction
+    cur.execute("""
+        INSERT INTO "transaction" (
+            abonne_id, type, montant, date, heure, agent, reference, statut
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        abonne_id, 
+        'Retrait', 
+        montant,
+        datetime.now().strftime("%Y-%m-%d"),
+        datetime.now().strftime("%H:%M:%S"),
+        agent,
+        reference,
+        'Complété'
+    ))
+    
+    # 5. Journaliser
+    _inserer_journal(
+        conn,
+        "Retrait effectué",
+        agent,
+        str(abonne_id),
+        f"Retrait de {montant.formater()}. Type: {type_compte}. Nouveau solde: {nouveau_solde.formater()}"
+    )
+    return reference
+
+@chronometrer("db.effectuer_retrait")
+def effectuer_retrait(abonne_id: int, montant: Montant, agent: str) -> Tuple[bool, str]:
     """Effectue un retrait pour un client"""
     reference = f"RET-{datetime.now().strftime('%Y%m%d%H%M%S')}-{random.randint(1000, 9999)}"
     
     try:
-        with DBManager().get_connection() as conn:
-            conn.execute("BEGIN IMMEDIATE")
-            cur = conn.cursor()
-            
-            # 1. Vérifier l'éligibilité au retrait
-            cur.execute("""
-                SELECT a.id, ac.solde, tc.nom, 
-                       cb.pourcentage_retrait, cb.montant_atteindre
-                FROM abonne a
-                JOIN abonne_compte ac ON a.id = ac.abonne_id
-                JOIN type_compte tc ON ac.type_compte_id = tc.id
-                LEFT JOIN compte_bloque cb ON a.id = cb.abonne_id
-                WHERE a.id = ? AND a.statut = 'Actif'
-            """, (abonne_id,))
-            
-            if not (abonne := cur.fetchone()):
-                raise ValueError("Abonné introuvable ou inactif")
-            
-            _, solde, type_compte, pourcentage, montant_atteindre = abonne
-            
-            # 2. Vérifier les règles selon le type de compte
-            if type_compte == 'Bloqué':
-                if solde < montant_atteindre:
-                    raise ValueError(f"Le solde ({solde}) n'a pas atteint le montant requis ({montant_atteindre})")
-                
-                montant_max = solde * (pourcentage / 100)
-                if montant > montant_max:
-                    raise ValueError(f"Montant dépasse le plafond de {pourcentage}% du solde (max: {montant_max})")
-            
-            elif solde < montant:
-                raise ValueError("Solde insuffisant")
-            
-            # 3. Mettre à jour le solde
-            cur.execute("""
-                UPDATE abonne_compte 
-                SET solde = solde - ?
-                WHERE abonne_id = ?
-                RETURNING solde
-            """, (montant, abonne_id))
-            
-            nouveau_solde = cur.fetchone()[0]
-            
-            # 4. Enregistrer la transaction
-            cur.execute("""
-                INSERT INTO transaction (
-                    abonne_id, type, montant, date, heure, agent, reference, statut
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                abonne_id, 
-                'Retrait', 
-                montant,
-                datetime.now().strftime("%Y-%m-%d"),
-                datetime.now().strftime("%H:%M:%S"),
-                agent,
-                reference,
-                'Complété'
-            ))
-            
-            # 5. Journaliser
-            ajouter_journal(
-                "Retrait effectué",
-                agent,
-                str(abonne_id),
-                f"Retrait de {montant} FC. Type: {type_compte}. Nouveau solde: {nouveau_solde}"
-            )
-            
-            conn.commit()
-            return True, reference
-            
-    except ValueError as e:
-        conn.rollback()
+        return True, ecrire(lambda conn: _operation_retrait(conn, abonne_id, montant, agent, reference))
+    except (ValueError, ErreurMetier) as e:
         logger.warning("Retrait refusé: %s", str(e))
         return False, str(e)
     except sqlite3.Error as e:
-        conn.rollback()
         logger.error("Erreur retrait DB: %s", str(e))
         return False, f"Erreur base de données: {str(e)}"
     except Exception as e:
-        conn.rollback()
         logger.error("Erreur retrait: %s", str(e), exc_info=True)
         return False, f"Erreur système: {str(e)}"
 
+def _inserer_journal(conn: sqlite3.Connection, action: str, acteur: str,
+                     cible: Optional[str], details: Optional[str]):
+    conn.execute("""
+        INSERT INTO journal (
+            action, acteur, cible, details, 
+            date_action, heure_action
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, (
+        action, 
+        acteur, 
+        cible, 
+        details,
+        datetime.now().strftime("%Y-%m-%d"),
+        datetime.now().strftime("%H:%M:%S")
+    ))
+
+@chronometrer("db.ajouter_journal")
 def ajouter_journal(action: str, acteur: str, cible: Optional[str] = None, 
-                   details: Optional[str] = None) -> bool:
-    """Ajoute une entrée dans le journal"""
+                   details: Optional[str] = None,
+                   conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Ajoute une entrée dans le journal
+    Avec conn, l'entrée rejoint la transaction en cours (validée par l'appelant) :
+    une seconde connexion attendrait le verrou d'écriture jusqu'au timeout
+    """
     try:
-        with DBManager().get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO journal (
-                    action, acteur, cible, details, 
-                    date_action, heure_action
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                action, 
-                acteur, 
-                cible, 
-                details,
-                datetime.now().strftime("%Y-%m-%d"),
-                datetime.now().strftime("%H:%M:%S")
-            ))
-            conn.commit()
-            return True
+        if conn is not None:
+            _inserer_journal(conn, action, acteur, cible, details)
+        else:
+            ecrire(lambda c: _inserer_journal(c, action, acteur, cible, details))
+        return True
     except Exception as e:
         logger.error("Erreur journalisation: %s", str(e))
         return False
@@ -1068,6 +946,7 @@ def creer_agent(nom: str, identifiant: str, mot_de_passe: str,
         logger.error("Erreur création agent: %s", str(e))
         return False
 
+@chronometrer("db.authentifier_agent")
 def authentifier_agent(identifiant: str, mot_de_passe: str) -> Optional[Dict]:
     """Authentifie un agent"""
     try:
@@ -1106,72 +985,29 @@ def authentifier_agent(identifiant: str, mot_de_passe: str) -> Optional[Dict]:
         logger.error("Erreur authentification: %s", str(e))
         return None
 
+@chronometrer("db.get_abonne")
 def get_abonne(abonne_id: int) -> Optional[Dict]:
-    """Récupère les informations complètes d'un abonné"""
+    """Récupère les informations complètes d'un abonné (profil en une requête, mis en cache)"""
     try:
-        with DBManager().get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            
-            # Informations de base
-            cur.execute("""
-                SELECT a.*, 
-                       GROUP_CONCAT(s.nom, '|') as suppleants,
-                       GROUP_CONCAT(s.telephone, '|') as contacts_suppleants
-                FROM abonne a
-                LEFT JOIN suppleant s ON a.id = s.abonne_id
-                WHERE a.id = ?
-                GROUP BY a.id
-            """, (abonne_id,))
-            
-            if not (abonne := cur.fetchone()):
-                return None
-            
-            result = dict(abonne)
-            
-            # Détails du type de compte
-            cur.execute("""
-                SELECT tc.nom as type_compte, ac.solde
-                FROM abonne_compte ac
-                JOIN type_compte tc ON ac.type_compte_id = tc.id
-                WHERE ac.abonne_id = ?
-            """, (abonne_id,))
-            
-            if compte := cur.fetchone():
-                result.update(dict(compte))
-                
-                # Détails spécifiques au type de compte
-                if compte['type_compte'] == 'Bloqué':
-                    cur.execute("""
-                        SELECT * FROM compte_bloque 
-                        WHERE abonne_id = ?
-                    """, (abonne_id,))
-                    if blocage := cur.fetchone():
-                        result.update(dict(blocage))
-                
-                elif compte['type_compte'] == 'Fixe':
-                    cur.execute("""
-                        SELECT cf.*, 
-                               SUM(cfp.cases_remplies) as total_cases,
-                               COUNT(CASE WHEN cfp.cases_remplies = 31 THEN 1 END) as pages_completes
-                        FROM compte_fixe cf
-                        LEFT JOIN compte_fixe_page cfp ON cf.abonne_id = cfp.compte_fixe_id
-                        WHERE cf.abonne_id = ?
-                    """, (abonne_id,))
-                    if fixe := cur.fetchone():
-                        result.update(dict(fixe))
-            
-            # Dernières transactions
-            cur.execute("""
-                SELECT * FROM transaction
-                WHERE abonne_id = ?
-                ORDER BY date DESC, heure DESC
-                LIMIT 5
-            """, (abonne_id,))
-            result['transactions'] = [dict(row) for row in cur.fetchall()]
-            
-            return result
-            
+        profil = cache_profils(DBConfig.get_db_path()).profil(abonne_id)
+        if profil is None:
+            return None
+
+        suppleants = profil.pop('suppleants')
+        result = {k: v for k, v in profil.items()
+                  if k not in ('compte', 'compte_bloque', 'compte_fixe')}
+        result['suppleants'] = '|'.join(s['nom'] for s in suppleants) or None
+        result['contacts_suppleants'] = '|'.join(s['telephone'] for s in suppleants) or None
+
+        # Détails du type de compte
+        if compte := profil['compte']:
+            result.update(type_compte=compte['type_compte'], solde=compte['solde'])
+            if compte['type_compte'] == 'Bloqué' and profil['compte_bloque']:
+                result.update(profil['compte_bloque'])
+            elif compte['type_compte'] == 'Fixe' and profil['compte_fixe']:
+                result.update(profil['compte_fixe'])
+        return result
+
     except Exception as e:
         logger.error("Erreur récupération abonné: %s", str(e))
         return None
@@ -1259,6 +1095,7 @@ def corriger_comptes_fixes_existants() -> int:
         logger.error(f"Erreur globale correction comptes: {str(e)}", exc_info=True)
         return 0
 
+@chronometrer("db.rechercher_abonnes")
 def rechercher_abonnes(criteres: Dict) -> List[Dict]:
     """Recherche des abonnés selon plusieurs critères"""
     try:
@@ -1312,13 +1149,14 @@ def rechercher_abonnes(criteres: Dict) -> List[Dict]:
         return []
 
 # ==== SAUVEGARDE ET MAINTENANCE ====
+@chronometrer("db.backup_database")
 def backup_database() -> bool:
     """Crée une sauvegarde chiffrée de la base de données"""
     original_path = DBConfig.get_db_path()
     backup_dir = os.path.join(DBConfig.get_app_dir(), "backups")
     os.makedirs(backup_dir, exist_ok=True)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     backup_path = os.path.join(backup_dir, f"backup_{timestamp}.db")
     
     try:
@@ -1379,80 +1217,90 @@ def reinitialiser_mot_de_passe(identifiant: str, nouveau_mot_de_passe: str) -> b
         print(f"Erreur réinitialisation mot de passe: {e}")
         return False
 
+# ==== LISTES PAGINÉES ====
+# Abonnés, dépôts, retraits et journal lus page par page (curseur de clé, voir
+# pagination.py), sur la connexion de lecture des rapports. page_* renvoie une
+# page et le curseur de la suivante ; iterer_* enchaîne les pages à la demande.
+def _page(liste: Liste, apres: Optional[tuple], taille: int, filtres: Sequence[Filtre]) -> Page:
+    try:
+        with connexion_lecture_rapports() as conn:
+            return lire_page(conn, liste, taille, apres, filtres)
+    except sqlite3.Error as e:
+        logger.error("Erreur lecture page %s: %s", liste.table, str(e))
+        return Page([], None)
+
+@chronometrer("db.page_abonnes")
+def page_abonnes(apres: Optional[tuple] = None, taille: int = TAILLE_PAGE,
+                 filtres: Sequence[Filtre] = ()) -> Page:
+    """Abonnés, derniers inscrits d'abord"""
+    return _page(ABONNES, apres, taille, filtres)
+
+@chronometrer("db.page_depots")
+def page_depots(apres: Optional[tuple] = None, taille: int = TAILLE_PAGE,
+                filtres: Sequence[Filtre] = ()) -> Page:
+    """Dépôts, plus récents d'abord"""
+    return _page(DEPOTS, apres, taille, filtres)
+
+@chronometrer("db.page_retraits")
+def page_retraits(apres: Optional[tuple] = None, taille: int = TAILLE_PAGE,
+                  filtres: Sequence[Filtre] = ()) -> Page:
+    """Retraits, plus récents d'abord"""
+    return _page(RETRAITS, apres, taille, filtres)
+
+@chronometrer("db.page_logs")
+def page_logs(apres: Optional[tuple] = None, taille: int = TAILLE_PAGE,
+              filtres: Sequence[Filtre] = ()) -> Page:
+    """Entrées du journal, plus récentes d'abord"""
+    return _page(JOURNAL, apres, taille, filtres)
+
+def iterer_abonnes(filtres: Sequence[Filtre] = (), taille: int = TAILLE_PAGE) -> Iterator[tuple]:
+    return parcourir(connexion_lecture_rapports, ABONNES, taille, filtres)
+
+def iterer_depots(filtres: Sequence[Filtre] = (), taille: int = TAILLE_PAGE) -> Iterator[tuple]:
+    return parcourir(connexion_lecture_rapports, DEPOTS, taille, filtres)
+
+def iterer_retraits(filtres: Sequence[Filtre] = (), taille: int = TAILLE_PAGE) -> Iterator[tuple]:
+    return parcourir(connexion_lecture_rapports, RETRAITS, taille, filtres)
+
+def iterer_logs(filtres: Sequence[Filtre] = (), taille: int = TAILLE_PAGE) -> Iterator[tuple]:
+    return parcourir(connexion_lecture_rapports, JOURNAL, taille, filtres)
+
+@chronometrer("db.get_all_abonnes")
 def get_all_abonnes() -> List[Dict]:
-    """Récupère tous les abonnés"""
+    """Récupère tous les abonnés (préférer page_abonnes / iterer_abonnes)"""
     try:
-        with connexion_db() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT * FROM abonne
-                ORDER BY date_inscription DESC
-            """)
-            return [dict(row) for row in cur.fetchall()]
+        return [ligne._asdict() for ligne in iterer_abonnes(taille=TAILLE_PAGE_EXPORT)]
     except sqlite3.Error as e:
         print(f"Erreur récupération abonnés: {e}")
         return []
 
+@chronometrer("db.get_all_depots")
 def get_all_depots() -> List[Dict]:
-    """Récupère tous les dépôts"""
+    """Récupère tous les dépôts (préférer page_depots / iterer_depots)"""
     try:
-        with connexion_db() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT * FROM depots
-                ORDER BY date_depot DESC, heure DESC
-            """)
-            return [dict(row) for row in cur.fetchall()]
+        return [ligne._asdict() for ligne in iterer_depots(taille=TAILLE_PAGE_EXPORT)]
     except sqlite3.Error as e:
         print(f"Erreur récupération dépôts: {e}")
         return []
 
+@chronometrer("db.get_all_retraits")
 def get_all_retraits() -> List[Dict]:
-    """Récupère tous les retraits"""
+    """Récupère tous les retraits (préférer page_retraits / iterer_retraits)"""
     try:
-        with connexion_db() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT * FROM retraits
-                ORDER BY date_retrait DESC, heure DESC
-            """)
-            return [dict(row) for row in cur.fetchall()]
+        return [ligne._asdict() for ligne in iterer_retraits(taille=TAILLE_PAGE_EXPORT)]
     except sqlite3.Error as e:
         print(f"Erreur récupération retraits: {e}")
         return []
 
+@chronometrer("db.get_all_logs")
 def get_all_logs() -> List[Dict]:
-    """Récupère tous les logs du journal"""
+    """Récupère tous les logs du journal (préférer page_logs / iterer_logs)"""
     try:
-        with connexion_db() as conn:
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT * FROM journal
-                ORDER BY date_action DESC, heure_action DESC
-            """)
-            return [dict(row) for row in cur.fetchall()]
+        return [ligne._asdict() for ligne in iterer_logs(taille=TAILLE_PAGE_EXPORT)]
     except sqlite3.Error as e:
         print(f"Erreur récupération logs: {e}")
         return []
 
-def check_database_integrity():
-    required_tables = {'agent', 'abonne', 'depots', 'retraits', 'compte_fixe', 'compte_page_fixe' , 'transaction', 'compte_bloque', 'abonne_compte' 'journal' , 'type_compte', 'suppleant'}  # Ajoutez toutes vos tables essentielles
-    
-    try:
-        with sqlite3.connect(DBConfig.get_db_path()) as conn:
-            existing_tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
-            return required_tables.issubset(existing_tables)
-    except sqlite3.DatabaseError:
-        return False
-
-if not check_database_integrity():
-    print("Base de données invalide détectée, veuillez exécuter reset_db.py")
-    sys.exit(1)
-    
 # ==================== FONCTIONS POUR LES DEPOTS ====================
 
 def get_client_by_card(numero_carte: str) -> Optional[Dict]:
@@ -1467,52 +1315,54 @@ def get_client_by_card(numero_carte: str) -> Optional[Dict]:
         print(f"Erreur recherche client: {e}")
         return None
 
-def ajouter_depot(numero_client: str, montant: float, ref_depot: str, 
+def _operation_ajout_depot(conn: sqlite3.Connection, numero_client: str, montant: Montant,
+                           ref_depot: str, heure: str, date_depot: str, nom_agent: str,
+                           methode_paiement: str) -> bool:
+    montant = Montant.depuis(montant)
+    cur = conn.cursor()
+    
+    # Vérifier que le client existe et récupérer son nom complet
+    cur.execute("SELECT nom, postnom, prenom FROM abonne WHERE numero_client = ?", (numero_client,))
+    result = cur.fetchone()
+    if not result:
+        return False  # Client non trouvé
+    nom_complet = f"{result[2]} {result[1]} {result[0]}"  # prénom, postnom, nom
+    
+    # Vérifier l'unicité de la référence
+    cur.execute("SELECT COUNT(*) FROM depots WHERE ref_depot = ?", (ref_depot,))
+    if cur.fetchone()[0] > 0:
+        return False  # Référence déjà utilisée
+    
+    # Insérer le dépôt
+    cur.execute("""
+        INSERT INTO depots (
+            numero_client, montant, ref_depot, heure, 
+            date_depot, nom_agent, methode_paiement, nom_complet
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        numero_client, montant, ref_depot, heure,
+        date_depot, nom_agent, methode_paiement, nom_complet
+    ))
+    
+    # Mettre à jour le solde du client
+    cur.execute("""
+        UPDATE abonne 
+        SET solde = solde + ?
+        WHERE numero_client = ?
+    """, (montant, numero_client))
+    
+    _inserer_journal(conn, "Dépôt", nom_agent, numero_client, f"Montant: {montant}, Ref: {ref_depot}")
+    return True
+
+@chronometrer("db.ajouter_depot")
+def ajouter_depot(numero_client: str, montant: Montant, ref_depot: str, 
                  heure: str, date_depot: str, nom_agent: str, 
                  methode_paiement: str = "Espèces") -> bool:
     """Ajoute un nouveau dépôt dans la base"""
     try:
-        with connexion_db() as conn:
-            cur = conn.cursor()
-            
-            # Vérifier que le client existe
-            cur.execute("SELECT COUNT(*) FROM abonne WHERE numero_client = ?", (numero_client,))
-            if cur.fetchone()[0] == 0:
-                return False  # Client non trouvé
-            
-            # Récupérer le nom complet du client
-            cur.execute("SELECT nom, postnom, prenom FROM abonne WHERE numero_client = ?", (numero_client,))
-            result = cur.fetchone()
-            nom_complet = ""
-            if result:
-                nom_complet = f"{result[2]} {result[1]} {result[0]}"  # prénom, postnom, nom
-            
-            # Vérifier l'unicité de la référence
-            cur.execute("SELECT COUNT(*) FROM depots WHERE ref_depot = ?", (ref_depot,))
-            if cur.fetchone()[0] > 0:
-                return False  # Référence déjà utilisée
-            
-            # Insérer le dépôt
-            cur.execute("""
-                INSERT INTO depots (
-                    numero_client, montant, ref_depot, heure, 
-                    date_depot, nom_agent, methode_paiement, nom_complet
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                numero_client, montant, ref_depot, heure,
-                date_depot, nom_agent, methode_paiement, nom_complet
-            ))
-            
-            # Mettre à jour le solde du client
-            cur.execute("""
-                UPDATE abonne 
-                SET solde = solde + ?
-                WHERE numero_client = ?
-            """, (montant, numero_client))
-            
-            conn.commit()
-            ajouter_journal("Dépôt", nom_agent, cible=numero_client, details=f"Montant: {montant}, Ref: {ref_depot}")
-            return True
+        return ecrire(lambda conn: _operation_ajout_depot(
+            conn, numero_client, montant, ref_depot, heure, date_depot, nom_agent, methode_paiement
+        ))
     except sqlite3.Error as e:
         print(f"Erreur ajout dépôt: {e}")
         return False
@@ -1531,6 +1381,7 @@ def optimiser_base() -> bool:
         logger.error("Erreur optimisation DB: %s", str(e))
         return False
 
+@chronometrer("db.check_database_integrity")
 def check_database_integrity():
     """Vérifie l'intégrité structurelle de la base de données"""
     required_tables = {
@@ -1563,7 +1414,7 @@ def check_database_integrity():
             # Vérification rapide du contenu de chaque table
             for table in required_tables:
                 try:
-                    cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+                    cursor.execute(f'SELECT 1 FROM "{table}" LIMIT 1')
                 except sqlite3.Error as e:
                     logger.error(f"Erreur accès table {table}: {e}")
                     return False
@@ -1576,7 +1427,53 @@ def check_database_integrity():
     except Exception as e:
         logger.error(f"Erreur vérification intégrité: {e}")
         return False
-    
+
+# ==== VÉRIFICATIONS DIFFÉRÉES ====
+# La migration et le contrôle d'intégrité ne bloquent plus l'import du module :
+# ils tournent une seule fois dans un thread lancé après l'affichage de la connexion.
+_base_prete = threading.Event()
+_verification_lock = threading.Lock()
+_verification_thread: Optional[threading.Thread] = None
+_verification_resultat: Optional[bool] = None
+
+def lancer_verification_base(apres_succes=None) -> threading.Thread:
+    """Lance (une seule fois) la migration et la vérification d'intégrité en arrière-plan"""
+    global _verification_thread
+
+    def verifier():
+        global _verification_resultat
+        debut = time.perf_counter()
+        try:
+            ok = initialiser_base() and check_database_integrity()
+            if ok and apres_succes:
+                apres_succes()
+        except Exception as e:
+            logger.error("Erreur vérification base: %s", str(e), exc_info=True)
+            ok = False
+        _verification_resultat = ok
+        _base_prete.set()
+        logger.info("Vérification base terminée en %.0f ms (ok=%s)",
+                    (time.perf_counter() - debut) * 1000, ok)
+
+    with _verification_lock:
+        if _verification_thread is None:
+            _verification_thread = threading.Thread(
+                target=verifier, name="verification-base", daemon=True
+            )
+            _verification_thread.start()
+        return _verification_thread
+
+def etat_verification_base() -> Optional[bool]:
+    """Retourne None si la vérification est en cours, sinon son résultat"""
+    return _verification_resultat if _base_prete.is_set() else None
+
+def attendre_base_prete(timeout: Optional[float] = None) -> bool:
+    """Attend la fin de la vérification (la lance si nécessaire) et retourne son résultat"""
+    lancer_verification_base()
+    if not _base_prete.wait(timeout):
+        return False
+    return bool(_verification_resultat)
+
 # ==== POINT D'ENTRÉE ====
 if __name__ == "__main__":
     print("=== INITIALISATION DE L'APPLICATION ===")
@@ -0,0 +1,108 @@
+import importlib
+import logging
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# ==== IMPORTS DIFFÉRÉS ====
+# Les bibliothèques lourdes (ReportLab, FPDF, python-docx, matplotlib, OpenCV...)
+# ne servent qu'aux exports et à la caméra : elles sont chargées au premier usage
+# via importer(), qui mémorise aussi le temps de chargement de chaque module.
+
+logger = logging.getLogger(__name__)
+
+# Temps d'import (ms) des modules chargés à la demande
+TEMPS_IMPORTS: Dict[str, float] = {}
+_verrou = threading.Lock()
+
+# Modules mesurés par le rapport de démarrage
+MODULES_LOURDS = [
+    "reportlab.platypus",
+    "fpdf",
+    "docx",
+    "matplotlib.pyplot",
+    "cv2",
+    "numpy",
+    "tkcalendar",
+    "win32com.client",
+    "num2words",
+    "PIL.Image",
+    "psutil",
+]
+
+MODULES_APPLICATION = [
+    "db",
+    "fenetre_depot",
+    "interface_retrait",
+    "inscription_menu",
+    "export_pdf",
+    "export_retrait",
+    "depot_export",
+]
+
+
+def importer(nom_module: str):
+    """Importe un module au premier usage et mémorise son temps de chargement"""
+    module = sys.modules.get(nom_module)
+    if module is not None:
+        return module
+
+    debut = time.perf_counter()
+    module = importlib.import_module(nom_module)
+    duree = (time.perf_counter() - debut) * 1000
+    with _verrou:
+        TEMPS_IMPORTS.setdefault(nom_module, duree)
+    logger.info("Import différé %s: %.1f ms", nom_module, duree)
+    return module
+
+
+def rapport_imports() -> List[Tuple[str, float]]:
+    """Retourne les imports différés déjà effectués, du plus lent au plus rapide"""
+    with _verrou:
+        return sorted(TEMPS_IMPORTS.items(), key=lambda item: item[1], reverse=True)
+
+
+def mesurer_import(nom_module: str) -> Optional[float]:
+    """Mesure (ms) l'import d'un module dans un processus neuf, None s'il est absent"""
+    code = (
+        "import time, importlib\n"
+        "t = time.perf_counter()\n"
+        f"importlib.import_module({nom_module!r})\n"
+        "print((time.perf_counter() - t) * 1000)\n"
+    )
+    try:
+        resultat = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, timeout=120
+        )
+    except Exception as e:
+        logger.error("Erreur mesure import %s: %s", nom_module, str(e))
+        return None
+    if resultat.returncode != 0:
+        return None
+    try:
+        return float(resultat.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return None
+
+
+def mesurer_imports(modules: Optional[List[str]] = None) -> List[Tuple[str, Optional[float]]]:
+    """Mesure le temps d'import à froid de chaque module (détail du démarrage)"""
+    modules = modules or (MODULES_LOURDS + MODULES_APPLICATION)
+    return [(nom, mesurer_import(nom)) for nom in modules]
+
+
+def afficher_rapport(mesures: List[Tuple[str, Optional[float]]]):
+    """Affiche le détail des temps d'import"""
+    print(f"{'Module':<25}{'Temps (ms)':>12}")
+    print("-" * 37)
+    for nom, duree in mesures:
+        valeur = f"{duree:>12.1f}" if duree is not None else f"{'absent':>12}"
+        print(f"{nom:<25}{valeur}")
+
+
+if __name__ == "__main__":
+    print("=== TEMPS D'IMPORT AU DÉMARRAGE ===")
+    afficher_rapport(mesurer_imports(sys.argv[1:] or None))
@@ -6,6 +6,7 @@ from reportlab.lib.units import inch
 import os
 from datetime import datetime
 import pathlib
+from monnaie import Montant
 
 # Liste des noms de jours en français
 JOURS_SEMAINE = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
@@ -110,7 +111,7 @@ def exporter_depots_journaliers_pdf(depots, total, date_jour):
         _, heure, client, montant, ref, agent = depot
         
         # Formater le montant si c'est un nombre
-        if isinstance(montant, (int, float)):
+        if isinstance(montant, (int, float, Montant)):
             montant_str = f"{montant:,.2f}"
         else:
             montant_str = str(montant)
@@ -223,7 +224,7 @@ def exporter_rapport_global_pdf(clients, total_general):
         code, nom, total, nb_depots = client
         
         # Formater les valeurs numériques
-        total_fmt = f"{total:,.2f}" if isinstance(total, (int, float)) else str(total)
+        total_fmt = f"{total:,.2f}" if isinstance(total, (int, float, Montant)) else str(total)
         nb_depots_str = str(nb_depots) if isinstance(nb_depots, (int, float)) else str(nb_depots)
         
         row = [
@@ -268,7 +269,7 @@ def exporter_rapport_global_pdf(clients, total_general):
     
     # Statistiques supplémentaires
     # Précaution contre les listes vides
-    montants = [c[2] for c in clients if isinstance(c[2], (int, float)) and len(c) > 2]
+    montants = [c[2] for c in clients if isinstance(c[2], (int, float, Montant)) and len(c) > 2]
     
     stats = []
     if clients:
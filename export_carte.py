@@ -1,261 +1,301 @@
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import webbrowser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+from lecture import connexion_rapport
+from monnaie import Montant
+from services import CarnetService
+
+# ==== CARTES DU CARNET FIXE ====
+# Une carte par page du carnet (31 cases), deux cartes par feuille A4.
+# La mise en page, les couleurs et le style des tableaux sont construits une seule
+# fois par processus (à l'import) et partagés par toutes les cartes. En lot, les
+# carnets sont lus en deux requêtes puis rendus dans un seul PDF, ou un PDF par
+# client réparti sur un pool de processus.
+
+logger = logging.getLogger(__name__)
+
+Progression = Callable[[int, int], None]  # (carnets traités, total)
+
+# Mise en page
+LARGEUR, HAUTEUR = A4
+MARGE = 1.5 * cm
+COLONNES = 2
+LARGEUR_COLONNE = (LARGEUR - 2 * MARGE - 0.5 * cm) / COLONNES
+HAUTEUR_CARTE = 19 * cm
+Y_DEPART = HAUTEUR - MARGE - 3.0 * cm  # Position de départ après l'en-tête
+LARGEURS_TABLEAU = [1.0 * cm, 1.4 * cm, 4.0 * cm, 2.2 * cm]
+ENTETE_TABLEAU = ["N°", "MISE", "REFERENCE", "DATE"]
+
+# Couleurs
+COULEUR_TEXTE = colors.black
+COULEUR_TITRE = colors.HexColor("#128C7E")
+COULEUR_ENTETE = colors.HexColor("#075E54")
+COULEUR_FOOTER = colors.darkred
+
+# Style partagé par tous les tableaux de cartes
+STYLE_CARTE = TableStyle([
+    # Entête
+    ('BACKGROUND', (0, 0), (-1, 0), COULEUR_ENTETE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+
+    # Bordures
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+    ('BOX', (0, 0), (-1, -1), 1, colors.gray),
+
+    # Alignement
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+    # Solde
+    ('FONT', (2, -1), (3, -1), 'Helvetica-Bold', 9),
+    ('ALIGN', (2, -1), (3, -1), 'RIGHT'),
+
+    # Alternance des couleurs de fond
+    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.whitesmoke, colors.white]),
+])
+
+
+def get_db_path():
+    """Chemin de la base locale (copiée depuis le paquet au premier lancement)"""
+    appdata_dir = os.getenv("APPDATA")
+    app_folder = os.path.join(appdata_dir, "MyApp")
+    os.makedirs(app_folder, exist_ok=True)
+    local_db = os.path.join(app_folder, "data_epargne.db")
+
+    if not os.path.exists(local_db):
+        try:
+            base_path = sys._MEIPASS
+        except Exception:
+            base_path = os.path.abspath(".")
+        original_db = os.path.join(base_path, "data_epargne.db")
+        if os.path.exists(original_db):
+            shutil.copyfile(original_db, local_db)
+
+    return local_db
+
+
+# ---- Lecture ----
+def lire_carnets(conn, numeros_clients: Optional[Sequence[str]] = None) -> List[Dict]:
+    """
+    Carnets des comptes fixes (tous, ou ceux de numeros_clients) en deux requêtes :
+    [{numero_client, nom_client, montant_initial, total_cases, tranches}]
+    """
+    filtre, params = "", ()
+    if numeros_clients is not None:
+        filtre = "WHERE cf.numero_client IN (SELECT value FROM json_each(?))"
+        params = (json.dumps(list(numeros_clients)),)
+
+    carnets = {}
+    for numero_client, nom_client, montant_initial in conn.execute(f"""
+        SELECT cf.numero_client,
+               TRIM(COALESCE(a.nom, '') || ' ' || COALESCE(a.postnom, '') || ' ' || COALESCE(a.prenom, '')),
+               cf.montant_initial
+        FROM compte_fixe cf
+        JOIN abonne a ON a.numero_client = cf.numero_client
+        {filtre}
+        ORDER BY a.nom, a.postnom, a.prenom
+    """, params):
+        carnets.setdefault(numero_client, {
+            "numero_client": numero_client,
+            "nom_client": nom_client,
+            "montant_initial": Montant.depuis_base(montant_initial),
+            "depots": [],
+        })
+
+    for numero_client, ref_depot, date_remplissage, premiere_case, nb_cases in conn.execute(f"""
+        SELECT d.numero_client, d.ref_depot, d.date_remplissage, d.premiere_case, d.nb_cases
+        FROM carnet_depots d
+        JOIN compte_fixe cf ON cf.numero_client = d.numero_client
+        {filtre}
+        ORDER BY d.numero_client, d.premiere_case
+    """, params):
+        if numero_client in carnets:
+            carnets[numero_client]["depots"].append(
+                (ref_depot, date_remplissage, premiere_case, nb_cases))
+
+    resultat = []
+    for carnet in carnets.values():
+        depots = carnet.pop("depots")
+        carnet["total_cases"] = sum(nb_cases for _, _, _, nb_cases in depots)
+        carnet["tranches"] = CarnetService.tranches_par_page(depots)
+        resultat.append(carnet)
+    return resultat
+
+
+# ---- Dessin ----
+def _date_courte(date_case: str) -> str:
+    """AAAA-MM-JJ → JJ/MM/AA"""
+    try:
+        annee, mois, jour = date_case.split('-')
+        return f"{jour}/{mois}/{annee[2:]}"
+    except (AttributeError, ValueError):
+        return date_case or ""
+
+
+def _tableau_carte(tranches: List, montant_initial: Montant) -> Table:
+    """Tableau d'une carte : une ligne par case, chaque tranche couvrant nb lignes"""
+    mise = f"{montant_initial:,.0f}"
+    lignes = [ENTETE_TABLEAU]
+    for ref_depot, date_case, nb_cases in tranches:
+        ligne = [mise, ref_depot or "", _date_courte(date_case)]
+        numero = len(lignes)
+        lignes.extend([str(numero + i)] + ligne for i in range(nb_cases))
+    cases = len(lignes) - 1
+    lignes.append(["", "", "SOLDE:", f"{montant_initial * cases:,.0f} FC"])
+
+    tableau = Table(lignes, colWidths=LARGEURS_TABLEAU)
+    tableau.setStyle(STYLE_CARTE)
+    return tableau
+
+
+def _dessiner_entete(c, carnet: Dict, numero_feuille: int):
+    montant_initial = carnet["montant_initial"]
+    montant_total = montant_initial * carnet["total_cases"]
+
+    c.setFont("Helvetica-Bold", 14)
+    c.setFillColor(COULEUR_ENTETE)
+    c.drawCentredString(LARGEUR / 2, HAUTEUR - 0.7 * cm,
+                        "SERVICE CENTRAL D'EPARGNE POUR LA PROMOTION DE L'ENTREPRENEURIAT")
+
+    c.setFont("Helvetica-Bold", 12)
+    c.setFillColor(COULEUR_TITRE)
+    c.drawCentredString(LARGEUR / 2, HAUTEUR - 1.7 * cm, f"PAGE N°{numero_feuille}")
+
+    c.setFont("Helvetica", 10)
+    c.setFillColor(COULEUR_TEXTE)
+    c.drawString(MARGE, HAUTEUR - 2.7 * cm, f"Client: {carnet['nom_client']}")
+    c.drawString(LARGEUR / 2, HAUTEUR - 2.7 * cm, f"N° Client: {carnet['numero_client']}")
+    c.drawString(MARGE, HAUTEUR - 3.2 * cm, f"Montant unitaire: {montant_initial:,.0f} FC")
+    c.drawString(LARGEUR / 2, HAUTEUR - 3.2 * cm, f"Total épargné: {montant_total:,.0f} FC")
+
+    c.setStrokeColor(COULEUR_ENTETE)
+    c.setLineWidth(1)
+    c.line(MARGE, HAUTEUR - 3.7 * cm, LARGEUR - MARGE, HAUTEUR - 3.7 * cm)
+
+
+def _dessiner_pied(c):
+    footer_y = 0.7 * cm
+    c.setStrokeColor(COULEUR_FOOTER)
+    c.setLineWidth(1)
+    c.line(MARGE, footer_y + 0.3 * cm, LARGEUR - MARGE, footer_y + 0.3 * cm)
+
+    c.setFont("Helvetica-Bold", 10)
+    c.setFillColor(COULEUR_FOOTER)
+    c.drawCentredString(LARGEUR / 2, footer_y, "$-MONEY/Easy save, Easy get")
+
+
+def dessiner_carnet(c, carnet: Dict) -> int:
+    """Ajoute les feuilles d'un carnet au canvas c ; retourne le nombre de feuilles"""
+    tranches = carnet["tranches"]
+    total_cartes = max(tranches, default=0)
+    feuilles = 0
+    for premiere in range(1, total_cartes + 1, COLONNES):
+        feuilles += 1
+        _dessiner_entete(c, carnet, feuilles)
+        for col, page in enumerate(range(premiere, min(premiere + COLONNES, total_cartes + 1))):
+            x = MARGE + col * (LARGEUR_COLONNE + 0.5 * cm)
+            tableau = _tableau_carte(tranches.get(page, []), carnet["montant_initial"])
+            tableau.wrapOn(c, LARGEUR_COLONNE, HAUTEUR_CARTE)
+            tableau.drawOn(c, x, Y_DEPART - tableau._height - 0.5 * cm)
+
+            c.setFont("Helvetica-Bold", 11)
+            c.setFillColor(COULEUR_ENTETE)
+            c.drawString(x, Y_DEPART, f"PAGE {page}")
+        _dessiner_pied(c)
+        c.showPage()
+    return feuilles
+
+
+def _rendre_fichier(carnet: Dict, chemin: str) -> str:
+    """Un carnet dans son propre PDF (exécuté dans un processus du pool)"""
+    c = canvas.Canvas(chemin, pagesize=A4)
+    dessiner_carnet(c, carnet)
+    c.save()
+    return chemin
+
+
+# ---- Exports ----
 def exporter_cartes_compte_fixe(data):
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import cm
-    from reportlab.lib import colors
-    import tempfile
-    import webbrowser
-    import sqlite3
-    import os
-    import sys
-    import shutil
-    from datetime import datetime
-    from reportlab.platypus import Table, TableStyle, Paragraph
-    from reportlab.lib.styles import ParagraphStyle
-
-    # Fonction pour obtenir le chemin de la base de données
-    def get_db_path():
-        appdata_dir = os.getenv("APPDATA")
-        app_folder = os.path.join(appdata_dir, "MyApp")
-        os.makedirs(app_folder, exist_ok=True)
-        local_db = os.path.join(app_folder, "data_epargne.db")
-
-        if not os.path.exists(local_db):
-            def resource_path(relative_path):
-                try:
-                    base_path = sys._MEIPASS
-                except Exception:
-                    base_path = os.path.abspath(".")
-                return os.path.join(base_path, relative_path)
-            
-            original_db = resource_path("data_epargne.db")
-            if os.path.exists(original_db):
-                shutil.copyfile(original_db, local_db)
-
-        return local_db
-
-    # Données
-    numero_client = data["numero_client"]
-    nom_client = data["nom_client"]
-    montant_initial = data["montant_initial"]
-    ref_depot = data.get("ref", datetime.now().strftime("%Y%m%d%H%M"))
-
-    # Connexion à la base de données
-    conn = sqlite3.connect(get_db_path())
-    cur = conn.cursor()
-    
-    # Récupérer les cases
-    cur.execute("""
-        SELECT ref_depot, date_remplissage 
-        FROM compte_fixe_cases 
-        WHERE numero_client = ?
-        ORDER BY date_remplissage, id
-    """, (numero_client,))
-    cases = cur.fetchall()
-    conn.close()
-    
-    total_cases = len(cases)
-    montant_total = total_cases * montant_initial
-
-    # Création du PDF
+    """Cartes d'un client (data : numero_client, nom_client, montant_initial) ; ouvre le PDF"""
+    with connexion_rapport(get_db_path()) as conn:
+        carnets = lire_carnets(conn, [data["numero_client"]])
+    carnet = carnets[0] if carnets else {"numero_client": data["numero_client"], "total_cases": 0,
+                                         "tranches": {}}
+    carnet["nom_client"] = data["nom_client"]
+    carnet["montant_initial"] = Montant.depuis(data["montant_initial"])
+
     temp_file = tempfile.NamedTemporaryFile(suffix='.pdf', delete=False)
-    filename = temp_file.name
-    c = canvas.Canvas(filename, pagesize=A4)
-    width, height = A4
-
-    # Paramètres de mise en page
-    marge = 1.5 * cm
-    espace_ligne = 0.6 * cm
-    colonnes = 2
-    largeur_colonne = (width - 2 * marge - 0.5*cm) / colonnes
-    hauteur_carte = 19 * cm
-    y_start = height - marge - 3.0 * cm  # Position de départ après l'en-tête
-
-    # Couleurs
-    couleur_texte = colors.black
-    couleur_titre = colors.HexColor("#128C7E")
-    couleur_entete = colors.HexColor("#075E54")
-    couleur_ligne = colors.HexColor("#E5E5E5")
-    couleur_footer_border = colors.darkred
-    couleur_fond_entete = colors.HexColor("#075E54")
-    couleur_texte_entete = colors.white
-
-    # En-tête principal (sur chaque page)
-    def draw_header(page_num):
-        # SERVICE CENTRAL D'EPARGNE...
-        c.setFont("Helvetica-Bold", 14)
-        c.setFillColor(couleur_entete)
-        c.drawCentredString(width / 2, height - 0.7*cm, "SERVICE CENTRAL D'EPARGNE POUR LA PROMOTION DE L'ENTREPRENEURIAT")
-        
-        # PAGE N°X
-        c.setFont("Helvetica-Bold", 12)
-        c.setFillColor(couleur_titre)
-        c.drawCentredString(width / 2, height - 1.7*cm, f"PAGE N°{page_num}")
-        
-        # Informations client
-        c.setFont("Helvetica", 10)
-        c.setFillColor(couleur_texte)
-        c.drawString(marge, height - 2.7*cm, f"Client: {nom_client}")
-        c.drawString(width / 2, height - 2.7*cm, f"N° Client: {numero_client}")
-        
-        c.drawString(marge, height - 3.2*cm, f"Montant unitaire: {montant_initial:,.0f} FC")
-        c.drawString(width / 2, height - 3.2*cm, f"Total épargné: {montant_total:,.0f} FC")
-        
-        # Ligne séparatrice
-        c.setStrokeColor(couleur_entete)
-        c.setLineWidth(1)
-        c.line(marge, height - 3.7*cm, width - marge, height - 3.7*cm)
-
-    # Pied de page avec bordure
-    def draw_footer():
-        footer_y = 0.7 * cm
-        footer_text = "$-MONEY/Easy save, Easy get"
-        
-        # Bordure en haut du pied de page
-        c.setStrokeColor(couleur_footer_border)
-        c.setLineWidth(1)
-        c.line(marge, footer_y + 0.3*cm, width - marge, footer_y + 0.3*cm)
-        
-        # Texte du pied de page
-        c.setFont("Helvetica-Bold", 10)
-        c.setFillColor(couleur_footer_border)
-        c.drawCentredString(width / 2, footer_y, footer_text)
-
-    # Dessiner une carte avec tableau
-    def draw_card(x, y, card_title, cases_subset):
-        # Préparer les données du tableau
-        table_data = []
-        
-        # Entête du tableau
-        table_data.append([
-            Paragraph("N°", style_header),
-            Paragraph("MISE", style_header),
-            Paragraph("REFERENCE", style_header),
-            Paragraph("DATE", style_header)
-        ])
-        
-        # Cases
-        for idx, case in enumerate(cases_subset):
-            numero_case = idx + 1
-            ref_depot_case, date_case = case
-            
-            # Formater la date
-            try:
-                date_parts = date_case.split('-')
-                date_formatted = f"{date_parts[2]}/{date_parts[1]}/{date_parts[0][2:]}"
-            except:
-                date_formatted = date_case
-            
-            table_data.append([
-                Paragraph(str(numero_case)), 
-                Paragraph(f"{montant_initial:,.0f}"), 
-                Paragraph(ref_depot_case), 
-                Paragraph(date_formatted)
-            ])
-        
-        # Solde
-        table_data.append([
-            "", 
-            "", 
-            Paragraph("<b>SOLDE:</b>"), 
-            Paragraph(f"<b>{montant_initial * len(cases_subset):,.0f} FC</b>")
-        ])
-        
-        # Créer le tableau
-        col_widths = [1.0*cm, 1.4*cm, 4.0*cm, 2.2*cm]
-        table = Table(table_data, colWidths=col_widths)
-        
-        # Style du tableau
-        table_style = TableStyle([
-            # Style de l'entête
-            ('BACKGROUND', (0, 0), (-1, 0), couleur_fond_entete),
-            ('TEXTCOLOR', (0, 0), (-1, 0), couleur_texte_entete),
-            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            
-            # Bordures
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.gray),
-            
-            # Alignement
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Style du solde
-            ('FONT', (2, -1), (3, -1), 'Helvetica-Bold'),
-            ('ALIGN', (2, -1), (3, -1), 'RIGHT'),
-            
-            # Alternance des couleurs de fond
-            ('BACKGROUND', (0, 1), (-1, -2), colors.white),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.whitesmoke, colors.white]),
-        ])
-        
-        table.setStyle(table_style)
-        
-        # Dessiner le tableau
-        table.wrapOn(c, largeur_colonne, hauteur_carte)
-        table.drawOn(c, x, y - table._height - 0.5*cm)
-        
-        # Titre de la carte
-        c.setFont("Helvetica-Bold", 11)
-        c.setFillColor(couleur_entete)
-        c.drawString(x, y, card_title)
-        
-        return table._height
-
-    # Définir les styles pour les paragraphes
-    style_header = ParagraphStyle(
-        'Header',
-        fontName='Helvetica-Bold',
-        fontSize=9,
-        textColor=couleur_texte_entete,
-        alignment=1  # Centré
-    )
-
-    # Calcul du nombre de pages
-    cases_per_card = 31
-    total_cards = (total_cases + cases_per_card - 1) // cases_per_card
-    total_pages = (total_cards + 1) // 2  # 2 cartes par page
-
-    # Génération des pages
-    case_index = 0
-    page_num = 1
-
-    while case_index < total_cases:
-        # Entête de page avec "PAGE N°X"
-        draw_header(page_num)
-        
-        # Position initiale pour les cartes
-        y = y_start
-        
-        # Deux cartes par page
-        for col in range(colonnes):
-            if case_index >= total_cases:
-                break
-                
-            x = marge + col * (largeur_colonne + 0.5*cm)
-            card_title = f"PAGE {((page_num - 1) * colonnes) + col + 1}"
-            
-            # Sélection des cases pour cette carte
-            end_index = min(case_index + cases_per_card, total_cases)
-            card_cases = cases[case_index:end_index]
-            case_index = end_index
-            
-            # Dessiner la carte avec tableau
-            card_height = draw_card(x, y, card_title, card_cases)
-            
-            # Ajuster la position Y pour la prochaine carte
-            # (non utilisé ici car nous avons deux cartes côte à côte)
-        
-        # Pied de page avec bordure
-        draw_footer()
-        
-        # Nouvelle page si nécessaire
-        if case_index < total_cases:
-            c.showPage()
-            page_num += 1
-
-    # Enregistrement et ouverture du PDF
-    c.save()
+    temp_file.close()
+    filename = _rendre_fichier(carnet, temp_file.name)
     webbrowser.open(filename)
-    return filename
\ No newline at end of file
+    return filename
+
+
+def exporter_carnets_lot(destination: str, numeros_clients: Optional[Sequence[str]] = None,
+                         par_client: bool = False, processus: Optional[int] = None,
+                         progression: Optional[Progression] = None,
+                         chemin_db: Optional[str] = None) -> List[str]:
+    """
+    Cartes de tous les comptes fixes (ou de numeros_clients), carnets vides exclus.
+    par_client=False : un seul PDF (destination = fichier .pdf ou dossier) ;
+    par_client=True : un PDF par client dans le dossier destination, rendus par un
+    pool de processus. progression(faits, total) est appelée après chaque carnet.
+    Retourne les chemins des PDF créés.
+    """
+    debut = time.perf_counter()
+    with connexion_rapport(chemin_db or get_db_path()) as conn:
+        carnets = [c for c in lire_carnets(conn, numeros_clients) if c["total_cases"]]
+    total = len(carnets)
+    signaler = progression or (lambda faits, total: None)
+    signaler(0, total)
+    horodatage = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    if not par_client:
+        if destination.lower().endswith(".pdf"):
+            chemin = destination
+            os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+        else:
+            os.makedirs(destination, exist_ok=True)
+            chemin = os.path.join(destination, f"carnets_{horodatage}.pdf")
+        c = canvas.Canvas(chemin, pagesize=A4)
+        for i, carnet in enumerate(carnets, 1):
+            dessiner_carnet(c, carnet)
+            signaler(i, total)
+        c.save()
+        chemins = [chemin]
+    else:
+        os.makedirs(destination, exist_ok=True)
+        taches = [(carnet, os.path.join(destination, f"carnet_{carnet['numero_client']}_{horodatage}.pdf"))
+                  for carnet in carnets]
+        chemins = []
+        if processus == 1 or total <= 1:
+            for i, (carnet, chemin) in enumerate(taches, 1):
+                chemins.append(_rendre_fichier(carnet, chemin))
+                signaler(i, total)
+        else:
+            with ProcessPoolExecutor(max_workers=processus) as pool:
+                futurs = [pool.submit(_rendre_fichier, carnet, chemin) for carnet, chemin in taches]
+                for i, futur in enumerate(as_completed(futurs), 1):
+                    chemins.append(futur.result())
+                    signaler(i, total)
+            chemins.sort()
+
+    logger.info("Carnets exportés: %d en %.1f s", total, time.perf_counter() - debut)
+    return chemins
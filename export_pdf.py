@@ -1,11 +1,16 @@
+import copy
+import io
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from fpdf import FPDF
 from num2words import num2words
+import monnaie
+from monnaie import Montant
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.table import WD_TABLE_ALIGNMENT
-import win32com.client
 
 # --- Chemins pour la compatibilité avec pyinstaller ---
 def get_documents_path():
@@ -33,14 +38,48 @@ os.makedirs(DOSSIER_EXPORT, exist_ok=True)
 
 # === Fonctions utilitaires ===
 def formater_montant(montant):
-    """Formate un montant en entier avec séparateur de milliers et devise"""
-    return f"{int(round(float(montant))):,}".replace(",", " ") + " FC"
+    """Formate un montant avec séparateur de milliers et devise"""
+    return monnaie.formater_montant(montant)
+
+@lru_cache(maxsize=4096)
+def nombre_en_lettres(nombre):
+    """num2words mémorisé (les mêmes montants reviennent sans cesse)"""
+    return num2words(nombre, lang='fr')
 
 def convertir_en_lettres(montant):
     """Convertit un montant en lettres avec devise complète"""
-    montant_entier = int(round(float(montant)))
-    mots = num2words(montant_entier, lang='fr').capitalize()
-    return mots + " francs congolais"
+    francs, centimes = divmod(abs(Montant.depuis(montant).centimes), 100)
+    mots = nombre_en_lettres(francs).capitalize() + " francs congolais"
+    if centimes:
+        mots += f" et {nombre_en_lettres(centimes)} centimes"
+    return mots
+
+def _date_heure(data):
+    """(date, heure) du champ date_heure « JJ/MM/AAAA HH:MM »"""
+    date_heure = data["date_heure"].split(' ')
+    date = date_heure[0] if len(date_heure) > 0 else datetime.now().strftime("%d/%m/%Y")
+    heure = date_heure[1][:5] if len(date_heure) > 1 else datetime.now().strftime("%H:%M")
+    return date, heure
+
+def _libelles(operation):
+    """Libellés des champs du bordereau, dans l'ordre d'affichage"""
+    return ["Nom du client", "Numéro client", "Numéro de carte",
+            "Montant versé" if operation == "depot" else "Montant retiré",
+            "En lettres", "Ancien solde", "Nouveau solde",
+            "Référence", "Date", "Heure", "Agent en service"]
+
+def _valeurs(data, date, heure):
+    """Valeurs des champs, dans l'ordre de _libelles"""
+    return [str(data["nom_complet"]), str(data["numero_client"]), str(data["numero_carte"]),
+            formater_montant(data["montant"]), convertir_en_lettres(data["montant"]),
+            formater_montant(data["ancien_solde"]), formater_montant(data["nouveau_solde"]),
+            str(data["ref"]), date, heure, str(data["nom_agent"])]
+
+def _nom_fichier(data, operation, extension):
+    horodatage = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Nettoyer le nom pour l'utiliser dans un chemin de fichier
+    nom_abonne = data["nom_complet"].replace(" ", "_").replace("/", "-")[:30]  # Limite à 30 caractères
+    return os.path.join(DOSSIER_EXPORT, f"bordereau_{operation}_{nom_abonne}_{horodatage}.{extension}")
 
 # === Classe PDF pour créer le bordereau ===
 class BordereauPDF(FPDF):
@@ -92,89 +131,82 @@ class BordereauPDF(FPDF):
         self.set_font("Arial", "", 8)
         self.cell(130, 6, str(valeur), 1, 1, "L")
 
-    def generer_bordereau(self, data, y_depart, operation):
-        """Génère un bordereau complet"""
-        # En-tête
+    def cadre_bordereau(self, y_depart, operation):
+        """Partie fixe d'un bordereau : en-tête, libellés, cadres vides, signatures"""
         self.en_tete(y_depart, "ORIGINAL", operation)
         
-        # Position de départ pour les champs
         self.set_xy(10, y_depart + 30)
+        for label in _libelles(operation):
+            self.champ(label, "")
         
-        # Formatage des dates
-        date_heure = data["date_heure"].split(' ')
-        date = date_heure[0] if len(date_heure) > 0 else datetime.now().strftime("%d/%m/%Y")
-        heure = date_heure[1][:5] if len(date_heure) > 1 else datetime.now().strftime("%H:%M")
-        
-        # Champs communs
-        self.champ("Nom du client", data["nom_complet"])
-        self.champ("Numéro client", data["numero_client"])
-        self.champ("Numéro de carte", data["numero_carte"])
-        
-        # Champs spécifiques à l'opération
-        if operation == "depot":
-            self.champ("Montant versé", formater_montant(data["montant"]))
-        else:  # retrait
-            self.champ("Montant retiré", formater_montant(data["montant"]))
-        
-        # Montant en lettres
-        self.champ("En lettres", convertir_en_lettres(data["montant"]))
-        
-        # Soldes
-        self.champ("Ancien solde", formater_montant(data["ancien_solde"]))
-        self.champ("Nouveau solde", formater_montant(data["nouveau_solde"]))
-        
-        # Référence et dates
-        self.champ("Référence", data["ref"])
-        self.champ("Date", date)
-        self.champ("Heure", heure)
-        self.champ("Agent en service", data["nom_agent"])
-        
-        # Signatures
+        # Signatures (la date « Fait à » est ajoutée par remplir_bordereau)
         self.ln(4)
-        y = self.get_y()
-        
         self.set_font("Arial", "", 8)
-        self.cell(90, 6, "Signature de l'abonné: ________________________", ln=0, align="L")
-        self.cell(0, 6, f"Fait à Kinshasa, le {date}", ln=1, align="R")
-        
+        self.cell(90, 6, "Signature de l'abonné: ________________________", ln=1, align="L")
         self.cell(90, 6, "", ln=0, align="L")
         self.cell(0, 6, "Signature de l'agent: ________________________", ln=1, align="R")
 
-# === Fonction pour générer le PDF ===
-def exporter_bordereau_pdf(data, operation="depot"):
-    """Génère un PDF avec deux bordereaux (ORIGINAL et DUPLICATA)"""
+    def remplir_bordereau(self, y_depart, valeurs, date):
+        """Écrit les valeurs dans les cadres posés par cadre_bordereau"""
+        self.set_font("Arial", "", 8)
+        for i, valeur in enumerate(valeurs):
+            self.set_xy(70, y_depart + 30 + 6 * i)
+            self.cell(130, 6, valeur, 0, 0, "L")
+        self.set_xy(100, y_depart + 30 + 6 * len(valeurs) + 4)
+        self.cell(0, 6, f"Fait à Kinshasa, le {date}", ln=1, align="R")
+
+    def generer_bordereau(self, data, y_depart, operation):
+        """Génère un bordereau complet"""
+        date, heure = _date_heure(data)
+        self.cadre_bordereau(y_depart, operation)
+        self.remplir_bordereau(y_depart, _valeurs(data, date, heure), date)
+
+# === Modèles précompilés ===
+# La partie fixe des bordereaux (logo, en-têtes, cadres, signatures) est construite
+# une seule fois par opération ; chaque bordereau copie le modèle et n'écrit que
+# les valeurs.
+@lru_cache(maxsize=None)
+def _modele_pdf(operation):
     pdf = BordereauPDF()
     
-    # Premier bordereau (ORIGINAL) en haut
-    pdf.generer_bordereau(data, 10, operation)
-    
-    # Ligne séparatrice au milieu
+    # ORIGINAL en haut, DUPLICATA en bas, séparés par une ligne
+    pdf.cadre_bordereau(10, operation)
     pdf.set_draw_color(150, 150, 150)
     pdf.set_line_width(0.2)
     pdf.line(10, 140, 200, 140)
+    pdf.cadre_bordereau(145, operation)
+    return pdf
+
+def prechauffer_modeles(operations=("depot",)):
+    """Construit les modèles à l'avance (à l'ouverture d'un écran, en arrière-plan)"""
+    try:
+        for operation in operations:
+            _modele_pdf(operation)
+            _modele_word(operation)
+        nombre_en_lettres(0)
+    except Exception as e:
+        print(f"Erreur préparation des modèles de bordereau : {e}")
+
+# === Fonction pour générer le PDF ===
+def exporter_bordereau_pdf(data, operation="depot"):
+    """Génère un PDF avec deux bordereaux (ORIGINAL et DUPLICATA)"""
+    date, heure = _date_heure(data)
+    valeurs = _valeurs(data, date, heure)
     
-    # Deuxième bordereau (DUPLICATA) en bas
-    pdf.generer_bordereau(data, 145, operation)
+    pdf = copy.deepcopy(_modele_pdf(operation))
+    pdf.remplir_bordereau(10, valeurs, date)
+    pdf.remplir_bordereau(145, valeurs, date)
 
-    # Enregistrer le fichier avec le nom de l'abonné
-    horodatage = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Nettoyer le nom pour l'utiliser dans un chemin de fichier
-    nom_abonne = data["nom_complet"].replace(" ", "_").replace("/", "-")[:30]  # Limite à 30 caractères
-    filename = f"bordereau_{operation}_{nom_abonne}_{horodatage}.pdf"
-    chemin_fichier = os.path.join(DOSSIER_EXPORT, filename)
+    chemin_fichier = _nom_fichier(data, operation, "pdf")
     pdf.output(chemin_fichier)
-
     return chemin_fichier
 
 # === Fonction pour générer le Word ===
-def exporter_bordereau_word(data, operation="depot"):
-    """Génère un document Word avec le bordereau"""
-    # Formatage des dates
-    date_heure = data["date_heure"].split(' ')
-    date = date_heure[0] if len(date_heure) > 0 else datetime.now().strftime("%d/%m/%Y")
-    heure = date_heure[1][:5] if len(date_heure) > 1 else datetime.now().strftime("%H:%M")
-    
-    # Création du document
+FAIT_A = "Fait à Kinshasa, le "
+
+@lru_cache(maxsize=None)
+def _modele_word(operation):
+    """Document Word du bordereau, valeurs vides (contenu .docx)"""
     doc = Document()
     
     # Titre
@@ -193,47 +225,31 @@ def exporter_bordereau_word(data, operation="depot"):
     doc.add_paragraph("Av. Kinsimba n°83 Q/Munganga, C/Ngaliema").alignment = 1
     doc.add_paragraph("Tél: +243 82 58 65 51 | E-mail: save.money.get@gmail.com").alignment = 1
     
-    # Tableau des informations
-    table = doc.add_table(rows=0, cols=2)
-    table.style = 'Table Grid'
-    table.alignment = WD_TABLE_ALIGNMENT.CENTER
-    
-    # Fonction pour ajouter une ligne
-    def ajouter_ligne(label, valeur):
-        row = table.add_row().cells
-        row[0].text = label
-        row[1].text = valeur
-        row[0].paragraphs[0].runs[0].bold = True
-    
-    # Données communes
-    ajouter_ligne("Nom du client", data["nom_complet"])
-    ajouter_ligne("Numéro client", data["numero_client"])
-    ajouter_ligne("Numéro de carte", data["numero_carte"])
-    
-    # Données spécifiques
-    if operation == "depot":
-        ajouter_ligne("Montant versé", formater_montant(data["montant"]))
-    else:
-        ajouter_ligne("Montant retiré", formater_montant(data["montant"]))
-    
-    ajouter_ligne("En lettres", convertir_en_lettres(data["montant"]))
-    ajouter_ligne("Ancien solde", formater_montant(data["ancien_solde"]))
-    ajouter_ligne("Nouveau solde", formater_montant(data["nouveau_solde"]))
-    ajouter_ligne("Référence", data["ref"])
-    ajouter_ligne("Date", date)
-    ajouter_ligne("Heure", heure)
-    ajouter_ligne("Agent en service", data["nom_agent"])
+    def tableau(valeurs_en_gras):
+        table = doc.add_table(rows=0, cols=2)
+        table.style = 'Table Grid'
+        table.alignment = WD_TABLE_ALIGNMENT.CENTER
+        for label in _libelles(operation):
+            row = table.add_row().cells
+            row[0].text = label
+            row[1].text = ""
+            row[0].paragraphs[0].runs[0].bold = True
+            if valeurs_en_gras:
+                row[1].paragraphs[0].runs[0].bold = True
     
-    # Signatures
-    doc.add_paragraph()
-    signature_frame = doc.add_paragraph()
-    signature_frame.add_run("Signature de l'abonné: ________________________").bold = True
-    signature_frame.add_run("\t\t\t\t")
-    signature_frame.add_run(f"Fait à Kinshasa, le {date}")
+    def signatures():
+        doc.add_paragraph()
+        signature_frame = doc.add_paragraph()
+        signature_frame.add_run("Signature de l'abonné: ________________________").bold = True
+        signature_frame.add_run("\t\t\t\t")
+        signature_frame.add_run(FAIT_A)
+        
+        doc.add_paragraph()
+        signature_frame2 = doc.add_paragraph()
+        signature_frame2.add_run("\t\t\t\tSignature de l'agent: ________________________")
     
-    doc.add_paragraph()
-    signature_frame2 = doc.add_paragraph()
-    signature_frame2.add_run("\t\t\t\tSignature de l'agent: ________________________")
+    tableau(False)
+    signatures()
     
     # Séparateur pour le duplicata
     doc.add_paragraph("\n" + "="*100 + "\n")
@@ -244,53 +260,47 @@ def exporter_bordereau_word(data, operation="depot"):
     title_dup.runs[0].font.size = Pt(14)
     title_dup.alignment = 1
     
-    # Copier tout le contenu précédent pour le duplicata
-    table_dup = doc.add_table(rows=0, cols=2)
-    table_dup.style = 'Table Grid'
-    table_dup.alignment = WD_TABLE_ALIGNMENT.CENTER
-    
-    for row in table.rows:
-        new_row = table_dup.add_row()
-        for i, cell in enumerate(row.cells):
-            new_row.cells[i].text = cell.text
-            new_row.cells[i].paragraphs[0].runs[0].bold = True
+    tableau(True)
+    signatures()
     
-    # Signatures du duplicata
-    doc.add_paragraph()
-    signature_frame_dup = doc.add_paragraph()
-    signature_frame_dup.add_run("Signature de l'abonné: ________________________").bold = True
-    signature_frame_dup.add_run("\t\t\t\t")
-    signature_frame_dup.add_run(f"Fait à Kinshasa, le {date}")
+    contenu = io.BytesIO()
+    doc.save(contenu)
+    return contenu.getvalue()
+
+def exporter_bordereau_word(data, operation="depot"):
+    """Génère un document Word avec le bordereau"""
+    date, heure = _date_heure(data)
+    valeurs = _valeurs(data, date, heure)
     
-    doc.add_paragraph()
-    signature_frame2_dup = doc.add_paragraph()
-    signature_frame2_dup.add_run("\t\t\t\tSignature de l'agent: ________________________")
+    doc = Document(io.BytesIO(_modele_word(operation)))
+    for table in doc.tables:
+        for row, valeur in zip(table.rows, valeurs):
+            row.cells[1].paragraphs[0].runs[0].text = valeur
+    for paragraphe in doc.paragraphs:
+        for run in paragraphe.runs:
+            if run.text == FAIT_A:
+                run.text = FAIT_A + date
     
-    # Enregistrer le fichier avec le nom de l'abonné
-    horodatage = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Nettoyer le nom pour l'utiliser dans un chemin de fichier
-    nom_abonne = data["nom_complet"].replace(" ", "_").replace("/", "-")[:30]  # Limite à 30 caractères
-    filename = f"bordereau_{operation}_{nom_abonne}_{horodatage}.docx"
-    chemin_fichier = os.path.join(DOSSIER_EXPORT, filename)
+    chemin_fichier = _nom_fichier(data, operation, "docx")
     doc.save(chemin_fichier)
-    
     return chemin_fichier
 
 # === Fonction pour générer les bordereaux SANS impression/ouverture ===
+_executeur = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bordereaux")
+
 def generer_bordereaux(data, operation="depot"):
-    """Génère et enregistre les bordereaux (PDF + Word) sans les ouvrir/imprimer"""
+    """Génère et enregistre les bordereaux (PDF + Word, en parallèle) sans les ouvrir/imprimer"""
     try:
-        # Générer les documents
+        futur_word = _executeur.submit(exporter_bordereau_word, data, operation)
         pdf_path = exporter_bordereau_pdf(data, operation)
-        word_path = exporter_bordereau_word(data, operation)
-        return pdf_path, word_path
+        return pdf_path, futur_word.result()
 
     except Exception as e:
         print(f"Erreur génération bordereau : {e}")
         return None, None
 
 def exporter_releve_client_pdf(data):
-        """Génère un PDF avec le relevé des dépôts d'un client"""
+        """Génère le relevé de compte d'un client (data["lignes"] est lu au fil de l'écriture)"""
         try:
          # Créer le PDF
             pdf = FPDF()
@@ -304,7 +314,7 @@ def exporter_releve_client_pdf(data):
             # Titre
             pdf.set_xy(30, 10)
             pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 8, "RELEVÉ DE DÉPÔTS POUR L'ABONNÉ", ln=True, align="C")
+            pdf.cell(0, 8, "RELEVÉ DE COMPTE DE L'ABONNÉ", ln=True, align="C")
         
             # Informations de l'entreprise
             pdf.set_font("Arial", "B", 9)
@@ -346,38 +356,52 @@ def exporter_releve_client_pdf(data):
             pdf.set_font("Arial", "", 10)
             pdf.cell(0, 6, data["duree_compte"], ln=1)
         
+            pdf.set_font("Arial", "B", 10)
+            pdf.cell(40, 6, "Période:", ln=0)
+            pdf.set_font("Arial", "", 10)
+            pdf.cell(0, 6, data["periode"], ln=1)
+        
+            totaux = data["totaux"]
+            pdf.set_font("Arial", "B", 10)
+            pdf.cell(40, 6, "Solde d'ouverture:", ln=0)
+            pdf.set_font("Arial", "", 10)
+            pdf.cell(0, 6, formater_montant(totaux.solde_ouverture), ln=1)
+        
             # Entête du tableau
-            pdf.ln(10)
+            colonnes = [("Date", 22), ("Heure", 16), ("Opération", 32), ("Référence", 40),
+                        ("Crédit (FC)", 26), ("Débit (FC)", 26), ("Solde (FC)", 28)]
+            pdf.ln(6)
             pdf.set_font("Arial", "B", 9)
             pdf.set_fill_color(200, 220, 255)  # Couleur d'arrière-plan pour l'en-tête
-            pdf.cell(40, 8, "Date", border=1, align="C", fill=True)
-            pdf.cell(25, 8, "Heure", border=1, align="C", fill=True)
-            pdf.cell(40, 8, "Montant (FC)", border=1, align="C", fill=True)
-            pdf.cell(45, 8, "Référence", border=1, align="C", fill=True)
-            pdf.cell(40, 8, "Agent", border=1, align="C", fill=True, ln=1)
+            for i, (titre, largeur) in enumerate(colonnes):
+                pdf.cell(largeur, 8, titre, border=1, align="C", fill=True, ln=int(i == len(colonnes) - 1))
         
-            # Détails des dépôts
+            # Lignes du relevé, au fil des pages lues
             pdf.set_font("Arial", "", 9)
             fill = False
-            for depot in data["depots"]:
-            # Alternance de couleur pour les lignes
+            for ligne in data["lignes"]:
+                # Alternance de couleur pour les lignes
                 if fill:
                     pdf.set_fill_color(224, 235, 255)  # Bleu clair
                 else:
                     pdf.set_fill_color(255, 255, 255)  # Blanc
-                    fill = not fill
+                fill = not fill
             
-                pdf.cell(40, 6, depot[0], border=1, align="C", fill=True)
-                pdf.cell(25, 6, depot[1], border=1, align="C", fill=True)
-                pdf.cell(40, 6, f"{depot[2]:,} FC".replace(",", " "), border=1, align="R", fill=True)
-                pdf.cell(45, 6, depot[3], border=1, align="C", fill=True)
-                pdf.cell(40, 6, depot[4], border=1, align="C", fill=True, ln=1)
-        
-            # Total
+                pdf.cell(22, 6, ligne.date, border=1, align="C", fill=True)
+                pdf.cell(16, 6, ligne.heure, border=1, align="C", fill=True)
+                pdf.cell(32, 6, ligne.libelle, border=1, align="L", fill=True)
+                pdf.cell(40, 6, ligne.reference or "", border=1, align="C", fill=True)
+                pdf.cell(26, 6, formater_montant(ligne.credit) if ligne.credit else "", border=1, align="R", fill=True)
+                pdf.cell(26, 6, formater_montant(ligne.debit) if ligne.debit else "", border=1, align="R", fill=True)
+                pdf.cell(28, 6, formater_montant(ligne.solde), border=1, align="R", fill=True, ln=1)
+        
+            # Totaux
             pdf.set_font("Arial", "B", 10)
             pdf.set_fill_color(180, 200, 255)  # Couleur différente pour le total
-            pdf.cell(105, 8, "TOTAL DES DÉPÔTS:", border=1, align="R", fill=True)
-            pdf.cell(40, 8, f"{data['total_depots']:,} FC".replace(",", " "), border=1, align="R", fill=True, ln=1)
+            pdf.cell(110, 8, "TOTAUX DE LA PÉRIODE:", border=1, align="R", fill=True)
+            pdf.cell(26, 8, formater_montant(totaux.total_credits), border=1, align="R", fill=True)
+            pdf.cell(26, 8, formater_montant(totaux.total_debits), border=1, align="R", fill=True)
+            pdf.cell(28, 8, formater_montant(totaux.solde_cloture), border=1, align="R", fill=True, ln=1)
         
             # Date de génération
             pdf.ln(10)
@@ -387,7 +411,7 @@ def exporter_releve_client_pdf(data):
             # Enregistrer le fichier
             nom_abonne = data["nom_complet"].replace(" ", "_").replace("/", "-")[:30]
             horodatage = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"releve_depots_{nom_abonne}_{horodatage}.pdf"
+            filename = f"releve_compte_{nom_abonne}_{horodatage}.pdf"
             chemin_fichier = os.path.join(DOSSIER_EXPORT, filename)
             pdf.output(chemin_fichier)
         
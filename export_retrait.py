@@ -8,9 +8,11 @@ from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.table import WD_TABLE_ALIGNMENT
 from num2words import num2words
-import win32api
-import win32com.client
+import monnaie
+from monnaie import Montant
 from datetime import datetime
+from functools import lru_cache
+from demarrage import importer
 import ctypes
 import ctypes.wintypes
 
@@ -38,15 +40,29 @@ LOGO_PATH = os.path.join(DOSSIER_BASE_SCRIPT, "epargne.png")
 os.makedirs(DOSSIER_EXPORT, exist_ok=True)
 
 
+def date_operation(data):
+    """Date et heure du retrait (champ date_heure « JJ/MM/AAAA HH:MM »), à défaut maintenant"""
+    try:
+        return datetime.strptime(data["date_heure"], "%d/%m/%Y %H:%M")
+    except (KeyError, TypeError, ValueError):
+        return datetime.now()
+
 def formater_montant(montant):
-    """Formate un montant en entier avec séparateur de milliers et devise"""
-    return f"{int(round(float(montant))):,}".replace(",", " ") + " FC"
+    """Formate un montant avec séparateur de milliers et devise"""
+    return monnaie.formater_montant(montant)
+
+@lru_cache(maxsize=4096)
+def nombre_en_lettres(nombre):
+    """num2words mémorisé (les mêmes montants reviennent sans cesse)"""
+    return num2words(nombre, lang='fr')
 
 def convertir_en_lettres(montant):
     """Convertit un montant en lettres avec devise complète"""
-    montant_entier = int(round(float(montant)))
-    mots = num2words(montant_entier, lang='fr').capitalize()
-    return mots + " francs congolais"
+    francs, centimes = divmod(abs(Montant.depuis(montant).centimes), 100)
+    mots = nombre_en_lettres(francs).capitalize() + " francs congolais"
+    if centimes:
+        mots += f" et {nombre_en_lettres(centimes)} centimes"
+    return mots
 
 def exporter_pdf(data):
     # Récupération des données
@@ -59,7 +75,7 @@ def exporter_pdf(data):
     numero_client = data["numero_client"]
     numero_carte = data["numero_carte"]
     commission = data.get("commission", 0.0)
-    montant_net = float(montant) - float(commission)
+    montant_net = Montant.depuis(montant) - Montant.depuis(commission)
 
     # Formatage des valeurs
     montant_formate = formater_montant(montant)
@@ -69,8 +85,9 @@ def exporter_pdf(data):
     montant_net_formate = formater_montant(montant_net)
     montant_lettre = convertir_en_lettres(montant)
     
-    date_str = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    date_signature = datetime.now().strftime('%d/%m/%Y')
+    date_retrait = date_operation(data)
+    date_str = date_retrait.strftime('%d/%m/%Y %H:%M')
+    date_signature = date_retrait.strftime('%d/%m/%Y')
 
     # Création du fichier
     filename = f"{nom_complet.replace(' ', '_')}_retrait_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
@@ -164,7 +181,7 @@ def exporter_word(data):
     numero_client = data["numero_client"]
     numero_carte = data["numero_carte"]
     commission = data.get("commission", 0.0)
-    montant_net = float(montant) - float(commission)
+    montant_net = Montant.depuis(montant) - Montant.depuis(commission)
 
     # Formatage des valeurs
     montant_formate = formater_montant(montant)
@@ -174,8 +191,9 @@ def exporter_word(data):
     montant_net_formate = formater_montant(montant_net)
     montant_lettre = convertir_en_lettres(montant)
     
-    date_str = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-    date_signature = datetime.now().strftime('%d/%m/%Y')
+    date_retrait = date_operation(data)
+    date_str = date_retrait.strftime('%d/%m/%Y %H:%M')
+    date_signature = date_retrait.strftime('%d/%m/%Y')
 
     # Création du fichier
     filename = f"{nom_complet.replace(' ', '_')}_retrait_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.docx"
@@ -245,33 +263,11 @@ def exporter_word(data):
     return path
 
 def imprimer_bordereau(data, commission=0.0):
-    """Imprime le bordereau et retourne les chemins des fichiers générés"""
+    """Met le bordereau en file d'impression et retourne le numéro du travail"""
     try:
-        # Créer une copie des données avec la commission
         data_with_commission = data.copy()
         data_with_commission["commission"] = commission
-        
-        # Générer les documents
-        pdf_path = exporter_pdf(data_with_commission)
-        word_path = exporter_word(data_with_commission)
-        
-        # Ouvrir les documents pour impression
-        try:
-            os.startfile(pdf_path)
-        except:
-            print("Ouverture PDF échouée")
-            
-        try:
-            word = win32com.client.Dispatch("Word.Application")
-            docx = word.Documents.Open(word_path)
-            docx.PrintOut()
-            docx.Close(False)
-            word.Quit()
-        except Exception as e:
-            print("Erreur impression Word:", e)
-            
-        return pdf_path, word_path
-
+        return importer("file_impression").file_impression().soumettre("retrait", data_with_commission)
     except Exception as e:
         print(f"Erreur impression bordereau : {e}")
-        return None, None
\ No newline at end of file
+        return None
\ No newline at end of file
@@ -1,18 +1,25 @@
 # === interface_depot.py ===
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import random
 import sqlite3
+import logging
 import os
 import sys
 import threading
-import export_pdf
-import export_carte
-import interface_doublons
 import shutil
-from depot_export import exporter_depots_journaliers_pdf, exporter_rapport_global_pdf
+import webbrowser
+from migrations import appliquer_migrations
+from demarrage import importer
+from performance import chronometrer, ConnexionChronometree
+from services import DepotService, CarnetService, DemandeDepot, CleSaisie, ReleveService
+from lecture import connexion_rapport, activer_selon_parametres
+from monnaie import Montant, TYPES_DETECTES
+from references import cache_reference, charger as charger_references
+from clients import cache_clients
+from cumuls import lire_cumuls
 
+logger = logging.getLogger(__name__)
 
 # --- Couleurs modernes style WhatsApp/Facebook ---
 PRIMARY_COLOR = "#128C7E"
@@ -48,35 +55,24 @@ def get_db_path():
 
     return local_db
 
-def verifier_structure_bd():
-    """Vérifie et met à jour la structure de la base de données"""
-    with connexion_db() as conn:
-        cur = conn.cursor()
-        
-        # Vérifier si la colonne 'numero_carte' existe dans 'compte_fixe'
-        cur.execute("PRAGMA table_info(compte_fixe)")
-        colonnes = [col[1] for col in cur.fetchall()]
-        
-        if 'numero_carte' not in colonnes:
-            try:
-                cur.execute("ALTER TABLE compte_fixe ADD COLUMN numero_carte TEXT")
-                conn.commit()
-            except sqlite3.Error as e:
-                print(f"Erreur modification table: {str(e)}")
-        
-        # Vérifier si la colonne 'numero_carte' existe dans 'compte_fixe_pages'
-        cur.execute("PRAGMA table_info(compte_fixe_pages)")
-        colonnes = [col[1] for col in cur.fetchall()]
-        if 'numero_carte' not in colonnes:
-            try:
-                cur.execute("ALTER TABLE compte_fixe_pages ADD COLUMN numero_carte TEXT")
-                conn.commit()
-            except sqlite3.Error as e:
-                print(f"Erreur modification table: {str(e)}")
+def verifier_structure_bd() -> bool:
+    """Met à jour la structure de la base de données (migrations versionnées)"""
+    try:
+        conn = connexion_db()
+        try:
+            appliquer_migrations(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error("Erreur migration de la base: %s", str(e))
+        return False
+    charger_references(get_db_path())
+    activer_selon_parametres(get_db_path())
+    return True
 
 def connexion_db():
     chemin_db = get_db_path()
-    conn = sqlite3.connect(chemin_db)
+    conn = sqlite3.connect(chemin_db, detect_types=TYPES_DETECTES, factory=ConnexionChronometree)
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
@@ -107,11 +103,24 @@ class FenetreDepot(tk.Toplevel):
         self.state('zoomed')
         self.configure(bg=BACKGROUND_COLOR)
         self.nom_agent = nom_agent
+
+        # Schéma à jour avant tout accès (montants en centimes, clés d'idempotence)
+        if not verifier_structure_bd():
+            messagebox.showerror("Erreur", "Mise à jour de la base de données impossible. "
+                                 "Consultez le journal de l'application.", parent=parent)
+            self.destroy()
+            return
+
         self.dernier_bordereau = {}
         self.dernier_ref = tk.StringVar()
+        self.clients = cache_clients(get_db_path(), connexion_db)
+        self.depot_service = DepotService(connexion_db, references=cache_reference(get_db_path()),
+                                          clients=self.clients)
+        self.carnet_service = CarnetService(connexion_db)
+        self.cle_depot = CleSaisie()  # un double envoi non confirmé ne crée qu'un dépôt
         
-        # Vérifier la structure de la BD
-        verifier_structure_bd()
+        # Modèles de bordereau préparés en arrière-plan (bordereau immédiat après dépôt)
+        threading.Thread(target=lambda: importer("export_pdf").prechauffer_modeles(), daemon=True).start()
         
         # Style moderne
         self.style = ttk.Style()
@@ -262,17 +271,14 @@ class FenetreDepot(tk.Toplevel):
         self.label_ref.pack(side='right', padx=10)
     
     def get_parametre(self, cle):
-        """Récupère un paramètre depuis la base de données"""
-        with connexion_db() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT valeur FROM parametres WHERE cle = ?", (cle,))
-            result = cur.fetchone()
-            if result:
-                try:
-                    return float(result[0])
-                except:
-                    return result[0]
+        """Récupère un paramètre (cache des données de référence)"""
+        valeur = cache_reference(get_db_path()).donnees().parametres.get(cle)
+        if valeur is None:
             return None
+        try:
+            return float(valeur)
+        except ValueError:
+            return valeur
     
     def validate_amount(self, value):
         """Validation du champ montant"""
@@ -295,7 +301,7 @@ class FenetreDepot(tk.Toplevel):
                         WHERE numero_client = d.numero_client) as nom_client,
                        montant, ref_depot, nom_agent
                 FROM depots d
-                ORDER BY date_depot DESC, heure DESC
+                ORDER BY horodatage DESC
                 LIMIT 30
             """)
             for row in cur.fetchall():
@@ -314,6 +320,7 @@ class FenetreDepot(tk.Toplevel):
         self.label_solde.config(text=f"Solde Actuel : {abonne[5]:,.2f} FC")
         return True
     
+    @chronometrer("ui.depot.recherche")
     def chercher_abonne(self):
         """Recherche un abonné dans la base de données"""
         numero_client = self.entries["entry_numero_client"].get().strip()
@@ -323,29 +330,15 @@ class FenetreDepot(tk.Toplevel):
             messagebox.showerror("Erreur", "Veuillez entrer un numéro client ou un numéro de carte.", parent=self)
             return None
 
-        with connexion_db() as conn:
-            cur = conn.cursor()
-            abonne = None
-            
-            try:
-                if numero_client:
-                    cur.execute("""
-                        SELECT a.numero_client, a.nom, a.postnom, a.prenom, a.numero_carte, a.solde, a.type_compte 
-                        FROM abonne a 
-                        WHERE a.numero_client = ?
-                    """, (numero_client,))
-                else:
-                    cur.execute("""
-                        SELECT a.numero_client, a.nom, a.postnom, a.prenom, a.numero_carte, a.solde, a.type_compte 
-                        FROM abonne a 
-                        WHERE a.numero_carte = ?
-                    """, (numero_carte,))
-                
-                abonne = cur.fetchone()
-                
-            except sqlite3.Error as e:
-                messagebox.showerror("Erreur BD", f"Erreur base de données: {str(e)}", parent=self)
-                return None
+        # Instantané partagé avec l'écran de retrait (solde tenu à jour par les services)
+        try:
+            if numero_client:
+                abonne = self.clients.par_numero(numero_client)
+            else:
+                abonne = self.clients.par_carte(numero_carte)
+        except sqlite3.Error as e:
+            messagebox.showerror("Erreur BD", f"Erreur base de données: {str(e)}", parent=self)
+            return None
 
         if not abonne:
             messagebox.showerror("Erreur", "Aucun abonné trouvé avec ces identifiants", parent=self)
@@ -353,6 +346,7 @@ class FenetreDepot(tk.Toplevel):
         
         return abonne
     
+    @chronometrer("ui.depot")
     def effectuer_depot(self):
         """Effectue un dépôt sur le compte de l'abonné"""
         abonne = self.chercher_abonne()
@@ -364,223 +358,62 @@ class FenetreDepot(tk.Toplevel):
         self.label_nom_client.config(text=f"Nom du Client : {nom_complet}")
         self.label_solde.config(text=f"Solde Actuel : {abonne[5]:,.2f} FC")
 
-        # Vérification du type de compte
-        if abonne[6] == "Fixe" and self.type_compte_var.get() == "normal":
-            messagebox.showerror("Erreur", 
-                                f"{nom_complet} a un compte fixe et ne peut pas effectuer de dépôt mixte.",
-                                parent=self)
-            return
-
         try:
-            montant = float(self.entries["entry_montant"].get().strip())
-            if montant <= 0:
-                raise ValueError
+            montant = Montant.depuis(self.entries["entry_montant"].get().strip())
         except ValueError:
             messagebox.showerror("Erreur", "Montant invalide (nombre positif requis)", parent=self)
             return
 
-        # Déterminer le type de dépôt
-        is_depot_fixe = (
-            self.type_compte_var.get() == "fixe" and 
-            abonne[6] == "Fixe"
-        )
-
-        # Règles pour les comptes fixes (UNIQUEMENT si l'option "Fixe" est sélectionnée)
-        if is_depot_fixe:
-            with connexion_db() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT montant_initial, numero_carte
-                    FROM compte_fixe 
-                    WHERE numero_client = ?
-                """, (abonne[0],))
-                result = cur.fetchone()
-                
-                if not result or result[0] <= 0:
-                    messagebox.showerror("Erreur", "Configuration du compte fixe invalide", parent=self)
-                    return
-                    
-                montant_initial = result[0]
-                numero_carte = result[1]  # Récupérer le numéro de carte du compte fixe
-                
-                if montant < montant_initial:
-                    messagebox.showerror(
-                        "Erreur", 
-                        f"Minimum pour compte fixe: {montant_initial:,.2f} FC",
-                        parent=self
-                    )
-                    return
-                    
-                # Vérifier si le montant est un multiple du montant initial
-                if montant % montant_initial != 0:
-                    messagebox.showerror("Erreur", 
-                                        f"Pour un compte fixe, le montant doit être un multiple de {montant_initial:,.2f} FC",
-                                        parent=self)
-                    return
-                
-                # Calculer le nombre de cases à ajouter
-                nb_cases = int(montant / montant_initial)
-                
-                # Vérifier si le compte a déjà 8 pages complètes (248 cases)
-                cur.execute("""
-                    SELECT SUM(cases_remplies) 
-                    FROM compte_fixe_pages 
-                    WHERE numero_client = ?
-                """, (abonne[0],))
-                total_cases = cur.fetchone()[0] or 0
-                
-                if total_cases + nb_cases > 248:
-                    messagebox.showerror("Compte fixe bloqué", 
-                                        "Ce compte fixe a atteint le maximum de 8 pages (248 cases). Aucun dépôt supplémentaire n'est possible.",
-                                        parent=self)
-                    return
-        else:  # Règles pour les dépôts mixtes/normaux
-            depot_min_normal = self.get_parametre('depot_min') or 500  # Valeur par défaut 500 si non trouvé
-            if montant < depot_min_normal:
-                messagebox.showerror(
-                    "Erreur", 
-                    f"Dépôt minimum: {depot_min_normal} FC",
-                    parent=self
-                )
-                return
+        # Règles métier (compte fixe, carnet, minimum) et écriture : DepotService
+        resultat = self.depot_service.deposer(DemandeDepot(
+            numero_client=abonne[0],
+            montant=montant,
+            agent=self.nom_agent,
+            mode=self.type_compte_var.get(),
+            cle_idempotence=self.cle_depot.pour(abonne[0], montant, self.type_compte_var.get())
+        ))
+        if not resultat.succes:
+            messagebox.showerror(resultat.titre, resultat.message, parent=self)
+            return
+        self.cle_depot.reinitialiser()  # résultat confirmé : un nouveau dépôt identique est légitime
 
-        heure = datetime.now().strftime("%H:%M:%S")
-        date_depot = datetime.now().strftime("%Y-%m-%d")
-        ref_depot = f"DEP{datetime.now().strftime('%Y%m%d')}-{random.randint(10000,99999)}"
-        numero_client = abonne[0]
-        ancien_solde = abonne[5]
-        nouveau_solde = ancien_solde + montant
+        self.dernier_bordereau.clear()
+        self.dernier_bordereau.update(resultat.bordereau(self.nom_agent))
 
-        with connexion_db() as conn:
+        self.dernier_ref.set(f"Réf: {resultat.reference}")
+        if resultat.doublon:
+            messagebox.showinfo(
+                "Déjà enregistré",
+                f"Ce dépôt est déjà enregistré (réf. {resultat.reference}) : il n'a pas été répété.",
+                parent=self
+            )
+            return
+        messagebox.showinfo(resultat.titre, resultat.message, parent=self)
+        
+        # Actualiser l'affichage
+        self.afficher_nom_et_solde()
+        self.hist_tree.delete(*self.hist_tree.get_children())
+        self.charger_historique()
+        
+        # Vérifier la progression après dépôt (uniquement pour dépôts fixes)
+        if resultat.depot_fixe:
+            self.verifier_compte_fixe(resultat.reference)
+        
+        # Générer et afficher les chemins des bordereaux
+        def generer_et_afficher():
             try:
-                cur = conn.cursor()
-                
-                # Mettre à jour le solde dans la table abonne
-                cur.execute("UPDATE abonne SET solde = ? WHERE numero_client = ?", (nouveau_solde, numero_client))
-                
-                # Insérer le dépôt
-                cur.execute("""
-                    INSERT INTO depots (numero_client, heure, montant, date_depot, ref_depot, nom_agent)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (numero_client, heure, montant, date_depot, ref_depot, self.nom_agent))
-                
-                # Gestion spécifique du compte fixe (UNIQUEMENT pour dépôts fixes)
-                if is_depot_fixe:
-                    # Insérer les cases dans compte_fixe_cases
-                    for i in range(nb_cases):
-                        cur.execute("""
-                            INSERT INTO compte_fixe_cases (
-                                numero_client, numero_carte, ref_depot, 
-                                date_remplissage, montant
-                            ) VALUES (?, ?, ?, ?, ?)
-                        """, (
-                            numero_client, 
-                            numero_carte,
-                            ref_depot,
-                            datetime.now().strftime("%Y-%m-%d"),
-                            montant_initial
-                        ))
-                    
-                    # Gestion des pages
-                    cases_restantes = nb_cases
-                    
-                    # Trouver les pages existantes non pleines
-                    cur.execute("""
-                        SELECT page, cases_remplies 
-                        FROM compte_fixe_pages 
-                        WHERE numero_client = ? AND cases_remplies < 31
-                        ORDER BY page
-                    """, (abonne[0],))
-                    pages_non_pleines = cur.fetchall()
-                    
-                    # Remplir les pages existantes d'abord
-                    for page in pages_non_pleines:
-                        if cases_restantes <= 0:
-                            break
-                            
-                        page_num, cases_remplies = page
-                        cases_possibles = 31 - cases_remplies
-                        cases_a_ajouter = min(cases_restantes, cases_possibles)
-                        
-                        cur.execute("""
-                            UPDATE compte_fixe_pages 
-                            SET cases_remplies = cases_remplies + ?
-                            WHERE numero_client = ? AND page = ?
-                        """, (cases_a_ajouter, numero_client, page_num))
-                        
-                        cases_restantes -= cases_a_ajouter
-                    
-                    # Créer de nouvelles pages si nécessaire
-                    while cases_restantes > 0:
-                        # Trouver le numéro de la dernière page
-                        cur.execute("""
-                            SELECT MAX(page) 
-                            FROM compte_fixe_pages 
-                            WHERE numero_client = ?
-                        """, (numero_client,))
-                        last_page = cur.fetchone()[0] or 0
-                        
-                        if last_page >= 8:
-                            messagebox.showwarning("Attention", "Le plafond de 8 pages a été atteint! Les cases restantes ne seront pas ajoutées.", parent=self)
-                            break
-                            
-                        new_page = last_page + 1
-                        cases_a_ajouter = min(cases_restantes, 31)
-                        
-                        cur.execute("""
-                            INSERT INTO compte_fixe_pages (numero_client, numero_carte, page, cases_remplies)
-                            VALUES (?, ?, ?, ?)
-                        """, (numero_client, numero_carte, new_page, cases_a_ajouter))
-                        
-                        cases_restantes -= cases_a_ajouter
-                
-                conn.commit()
-
-                self.dernier_bordereau.clear()
-                self.dernier_bordereau.update({
-                    "nom_complet": nom_complet,
-                    "numero_client": numero_client,
-                    "numero_carte": abonne[4],
-                    "montant": montant,
-                    "ancien_solde": ancien_solde,
-                    "nouveau_solde": nouveau_solde,
-                    "ref": ref_depot,
-                    "date_heure": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                    "nom_agent": self.nom_agent
-                })
-
-                self.dernier_ref.set(f"Réf: {ref_depot}")
-                messagebox.showinfo("Succès", f"Dépôt de {montant:,.2f} FC effectué avec succès.", parent=self)
-                ajouter_journal("Dépôt", self.nom_agent, nom_complet)
-                
-                # Actualiser l'affichage
-                self.afficher_nom_et_solde()
-                self.hist_tree.delete(*self.hist_tree.get_children())
-                self.charger_historique()
-                
-                # Vérifier la progression après dépôt (uniquement pour dépôts fixes)
-                if is_depot_fixe:
-                    self.verifier_compte_fixe(ref_depot)
-                
-                # Générer et afficher les chemins des bordereaux
-                def generer_et_afficher():
-                    try:
-                        pdf_path, word_path = export_pdf.generer_bordereaux(self.dernier_bordereau, "depot")
-                        messagebox.showinfo(
-                            "Bordereaux générés",
-                            f"Bordereaux enregistrés avec succès!\n\n"
-                            f"PDF: {pdf_path}\n"
-                            f"Word: {word_path}",
-                            parent=self
-                        )
-                    except Exception as e:
-                        messagebox.showerror("Erreur", f"Erreur lors de la génération: {str(e)}", parent=self)
-                
-                threading.Thread(target=generer_et_afficher).start()
-
+                pdf_path, word_path = importer("export_pdf").generer_bordereaux(self.dernier_bordereau, "depot")
+                messagebox.showinfo(
+                    "Bordereaux générés",
+                    f"Bordereaux enregistrés avec succès!\n\n"
+                    f"PDF: {pdf_path}\n"
+                    f"Word: {word_path}",
+                    parent=self
+                )
             except Exception as e:
-                conn.rollback()
-                messagebox.showerror("Erreur", f"Erreur base de données : {e}", parent=self)
+                messagebox.showerror("Erreur", f"Erreur lors de la génération: {str(e)}", parent=self)
+        
+        threading.Thread(target=generer_et_afficher).start()
     
     def verifier_compte_fixe(self, ref_depot=None):
         """Vérifie la progression du compte fixe"""
@@ -593,191 +426,166 @@ class FenetreDepot(tk.Toplevel):
             return
             
         numero_client = abonne[0]
-        with connexion_db() as conn:
-            cur = conn.cursor()
-        
-            try:
-                # Requête optimisée pour récupérer les données de progression
-                cur.execute("""
-                    SELECT 
-                        cf.montant_initial,
-                        (SELECT COUNT(*) FROM compte_fixe_pages 
-                         WHERE numero_client = ? AND cases_remplies = 31) AS pages_completes,
-                        (SELECT SUM(cases_remplies) FROM compte_fixe_pages 
-                         WHERE numero_client = ?) AS total_cases,
-                        (SELECT SUM(montant) FROM retraits 
-                         WHERE numero_client = ?) AS total_retires
-                    FROM compte_fixe cf
-                    WHERE cf.numero_client = ?
-                """, (numero_client, numero_client, numero_client, numero_client))
-            
-                result = cur.fetchone()
-            
-                if not result:
-                    messagebox.showerror("Erreur", "Compte fixe non trouvé", parent=self)
-                    return
-            
-                montant_initial = result[0]
-                pages_remplies = result[1] or 0
-                total_cases = result[2] or 0
-                total_retires = result[3] or 0
-                
-                total_epargne = total_cases * montant_initial
-                montant_restant = total_epargne - total_retires
-            
-                # Récupérer les données détaillées des pages
-                cur.execute("""
-                    SELECT page, cases_remplies
-                    FROM compte_fixe_pages
-                    WHERE numero_client = ?
-                    ORDER BY page
-                """, (numero_client,))
-                pages_data = cur.fetchall()
-            
-                # Calculer le pourcentage de progression
-                total_possible = 8 * 31  # 8 pages x 31 cases
-                pourcentage = (total_cases / total_possible) * 100 if total_possible > 0 else 0
-            
-                # Créer une fenêtre pour afficher les résultats
-                fen_progression = tk.Toplevel(self)
-                fen_progression.title("Progression du Compte Fixe")
-                fen_progression.geometry("500x800")
-                fen_progression.configure(bg=BACKGROUND_COLOR)
-            
-                # Style
-                style = ttk.Style()
-                style.configure('TFrame', background=BACKGROUND_COLOR)
-                style.configure('TLabel', background=BACKGROUND_COLOR, foreground=TEXT_COLOR, font=('Helvetica', 12))
-                style.configure('Title.TLabel', font=('Helvetica', 14, 'bold'), foreground=PRIMARY_COLOR)
-            
-                main_frame = ttk.Frame(fen_progression)
-                main_frame.pack(fill='both', expand=True, padx=20, pady=20)
-            
-                # Titre
-                ttk.Label(main_frame, 
-                     text="PROGRESSION DU COMPTE FIXE", 
-                     style='Title.TLabel').pack(pady=10)
-            
-                # Informations
-                ttk.Label(main_frame, 
-                     text=f"Client: {abonne[1]} {abonne[2]} {abonne[3]}").pack(anchor='w', pady=5)
-            
-                ttk.Label(main_frame, 
-                     text=f"Numéro client: {abonne[0]}").pack(anchor='w', pady=5)
-            
-                ttk.Label(main_frame, 
-                     text=f"Montant initial: {montant_initial:,.2f} FC").pack(anchor='w', pady=5)
-            
-                # Affichage des pages complètes et cases remplies
-                ttk.Label(main_frame, 
-                     text=f"Pages complètes: {pages_remplies}/8").pack(anchor='w', pady=5)
-            
-                ttk.Label(main_frame, 
-                     text=f"Cases remplies: {total_cases}/248").pack(anchor='w', pady=5)
-            
-                ttk.Label(main_frame, 
-                     text=f"Montant épargné: {total_epargne:,.2f} FC").pack(anchor='w', pady=5)
-                     
-                ttk.Label(main_frame, 
-                     text=f"Montant retiré: {total_retires:,.2f} FC").pack(anchor='w', pady=5)
-                     
-                ttk.Label(main_frame, 
-                     text=f"Montant restant: {montant_restant:,.2f} FC", 
-                     font=('Helvetica', 11, 'bold')).pack(anchor='w', pady=5)
-            
-                # Barre de progression
-                progress_frame = ttk.Frame(main_frame)
-                progress_frame.pack(fill='x', pady=15)
-            
-                ttk.Label(progress_frame, 
-                     text="Progression globale:").pack(anchor='w')
-            
-                progress = ttk.Progressbar(progress_frame, 
-                                      orient='horizontal', 
-                                      length=400, 
-                                      mode='determinate',
-                                      maximum=100)
-                progress.pack(fill='x', pady=5)
-                progress['value'] = pourcentage
+        try:
+            progression = self.carnet_service.progression(numero_client)
+            if not progression:
+                messagebox.showerror("Erreur", "Compte fixe non trouvé", parent=self)
+                return
             
-                ttk.Label(progress_frame, 
-                     text=f"{pourcentage:.1f}%").pack(anchor='e')
+            montant_initial = progression.montant_initial
+            pages_remplies = progression.pages_completes
+            total_cases = progression.total_cases
+            total_retires = progression.total_retires
+            total_epargne = progression.total_epargne
+            montant_restant = progression.montant_restant
+            pages_data = progression.pages
+            pourcentage = progression.pourcentage
             
-                # Message d'encouragement
-                if pourcentage >= 90:
-                    message = "Félicitations! Votre compte fixe est presque terminé!"
-                    color = "green"
-                elif pourcentage >= 50:
-                    message = "Continuez ainsi! Vous avez déjà fait plus de la moitié!"
-                    color = "blue"
-                else:
-                    message = "Bonne progression! Continuez à épargner régulièrement."
-                    color = "orange"
+            # Créer une fenêtre pour afficher les résultats
+            fen_progression = tk.Toplevel(self)
+            fen_progression.title("Progression du Compte Fixe")
+            fen_progression.geometry("500x800")
+            fen_progression.configure(bg=BACKGROUND_COLOR)
+        
+            # Style
+            style = ttk.Style()
+            style.configure('TFrame', background=BACKGROUND_COLOR)
+            style.configure('TLabel', background=BACKGROUND_COLOR, foreground=TEXT_COLOR, font=('Helvetica', 12))
+            style.configure('Title.TLabel', font=('Helvetica', 14, 'bold'), foreground=PRIMARY_COLOR)
+        
+            main_frame = ttk.Frame(fen_progression)
+            main_frame.pack(fill='both', expand=True, padx=20, pady=20)
+        
+            # Titre
+            ttk.Label(main_frame, 
+                 text="PROGRESSION DU COMPTE FIXE", 
+                 style='Title.TLabel').pack(pady=10)
+        
+            # Informations
+            ttk.Label(main_frame, 
+                 text=f"Client: {abonne[1]} {abonne[2]} {abonne[3]}").pack(anchor='w', pady=5)
+        
+            ttk.Label(main_frame, 
+                 text=f"Numéro client: {abonne[0]}").pack(anchor='w', pady=5)
+        
+            ttk.Label(main_frame, 
+                 text=f"Montant initial: {montant_initial:,.2f} FC").pack(anchor='w', pady=5)
+        
+            # Affichage des pages complètes et cases remplies
+            ttk.Label(main_frame, 
+                 text=f"Pages complètes: {pages_remplies}/8").pack(anchor='w', pady=5)
+        
+            ttk.Label(main_frame, 
+                 text=f"Cases remplies: {total_cases}/248").pack(anchor='w', pady=5)
+        
+            ttk.Label(main_frame, 
+                 text=f"Montant épargné: {total_epargne:,.2f} FC").pack(anchor='w', pady=5)
+                 
+            ttk.Label(main_frame, 
+                 text=f"Montant retiré: {total_retires:,.2f} FC").pack(anchor='w', pady=5)
             
-                ttk.Label(main_frame, 
-                     text=message,
-                     foreground=color,
-                     font=('Helvetica', 11, 'italic')).pack(pady=10)
+            ttk.Label(main_frame, 
+                 text=f"Dernier remplissage: {progression.derniere_date or '-'}").pack(anchor='w', pady=5)
+                 
+            ttk.Label(main_frame, 
+                 text=f"Montant restant: {montant_restant:,.2f} FC", 
+                 font=('Helvetica', 11, 'bold')).pack(anchor='w', pady=5)
+        
+            # Barre de progression
+            progress_frame = ttk.Frame(main_frame)
+            progress_frame.pack(fill='x', pady=15)
+        
+            ttk.Label(progress_frame, 
+                 text="Progression globale:").pack(anchor='w')
+        
+            progress = ttk.Progressbar(progress_frame, 
+                                  orient='horizontal', 
+                                  length=400, 
+                                  mode='determinate',
+                                  maximum=100)
+            progress.pack(fill='x', pady=5)
+            progress['value'] = pourcentage
+        
+            ttk.Label(progress_frame, 
+                 text=f"{pourcentage:.1f}%").pack(anchor='e')
+        
+            # Message d'encouragement
+            if pourcentage >= 90:
+                message = "Félicitations! Votre compte fixe est presque terminé!"
+                color = "green"
+            elif pourcentage >= 50:
+                message = "Continuez ainsi! Vous avez déjà fait plus de la moitié!"
+                color = "blue"
+            else:
+                message = "Bonne progression! Continuez à épargner régulièrement."
+                color = "orange"
+        
+            ttk.Label(main_frame, 
+                 text=message,
+                 foreground=color,
+                 font=('Helvetica', 11, 'italic')).pack(pady=10)
+        
+            def exporter_cartes():
+                try:
+                    data = {
+                        "numero_client": numero_client,
+                        "nom_client": f"{abonne[1]} {abonne[2]} {abonne[3]}",
+                        "montant_initial": montant_initial,
+                        "pages": pages_data,
+                        "ref": ref_depot  # Passer la référence du dépôt
+                    }
+                    importer("export_carte").exporter_cartes_compte_fixe(data)
+                except Exception as e:
+                    messagebox.showerror("Erreur", f"Erreur lors de l'export: {str(e)}", parent=fen_progression)
+
+            ttk.Button(main_frame, 
+                        text="Exporter les Cartes PDF", 
+                        command=exporter_cartes).pack(pady=10)
             
-                def exporter_cartes():
+            def reinitialiser_compte():
+                """Réinitialise le compte fixe à zéro"""
+                if messagebox.askyesno("Confirmation", 
+                                      "Voulez-vous réinitialiser ce compte fixe?\n\nTous les dépôts et retraits seront supprimés et le solde remis à zéro. Cette action est irréversible!",
+                                      parent=fen_progression):
                     try:
-                        data = {
-                            "numero_client": numero_client,
-                            "nom_client": f"{abonne[1]} {abonne[2]} {abonne[3]}",
-                            "montant_initial": montant_initial,
-                            "pages": pages_data,
-                            "ref": ref_depot  # Passer la référence du dépôt
-                        }
-                        export_carte.exporter_cartes_compte_fixe(data)
+                        with connexion_db() as conn:
+                            cur = conn.cursor()
+                            
+                            # Vider le carnet (plages de cases, pages, curseur)
+                            CarnetService.reinitialiser(conn, numero_client)
+                            
+                            # Supprimer les dépôts et retraits
+                            cur.execute("DELETE FROM depots WHERE numero_client = ?", (numero_client,))
+                            cur.execute("DELETE FROM retraits WHERE numero_client = ?", (numero_client,))
+                            
+                            # Réinitialiser le solde
+                            cur.execute("UPDATE abonne SET solde = 0 WHERE numero_client = ?", (numero_client,))
+                            
+                            conn.commit()
+                            self.clients.invalider(numero_client)
+                            
+                            messagebox.showinfo("Succès", "Compte fixe réinitialisé avec succès!", parent=fen_progression)
+                            fen_progression.destroy()
+                            self.afficher_nom_et_solde()
                     except Exception as e:
-                        messagebox.showerror("Erreur", f"Erreur lors de l'export: {str(e)}", parent=fen_progression)
-
-                ttk.Button(main_frame, 
-                            text="Exporter les Cartes PDF", 
-                            command=exporter_cartes).pack(pady=10)
-                
-                def reinitialiser_compte():
-                    """Réinitialise le compte fixe à zéro"""
-                    if messagebox.askyesno("Confirmation", 
-                                          "Voulez-vous réinitialiser ce compte fixe?\n\nTous les dépôts et retraits seront supprimés et le solde remis à zéro. Cette action est irréversible!",
-                                          parent=fen_progression):
-                        try:
-                            with connexion_db() as conn:
-                                cur = conn.cursor()
-                                
-                                # Supprimer les pages du compte fixe
-                                cur.execute("DELETE FROM compte_fixe_pages WHERE numero_client = ?", (numero_client,))
-                                
-                                # Supprimer les dépôts et retraits
-                                cur.execute("DELETE FROM depots WHERE numero_client = ?", (numero_client,))
-                                cur.execute("DELETE FROM retraits WHERE numero_client = ?", (numero_client,))
-                                
-                                # Réinitialiser le solde
-                                cur.execute("UPDATE abonne SET solde = 0 WHERE numero_client = ?", (numero_client,))
-                                
-                                conn.commit()
-                                
-                                messagebox.showinfo("Succès", "Compte fixe réinitialisé avec succès!", parent=fen_progression)
-                                fen_progression.destroy()
-                                self.afficher_nom_et_solde()
-                        except Exception as e:
-                            messagebox.showerror("Erreur", f"Erreur lors de la réinitialisation: {str(e)}", parent=fen_progression)
+                        messagebox.showerror("Erreur", f"Erreur lors de la réinitialisation: {str(e)}", parent=fen_progression)
 
-                ttk.Button(main_frame, 
-                          text="Réinitialiser Compte", 
-                          command=reinitialiser_compte,
-                          style="TButton").pack(pady=10)
-            
-                # Bouton fermer
-                ttk.Button(main_frame, 
-                          text="Fermer", 
-                          command=fen_progression.destroy).pack(pady=10)
-            
-            except Exception as e:
-                messagebox.showerror("Erreur", f"Erreur lors de la vérification: {str(e)}", parent=self)
+            ttk.Button(main_frame, 
+                      text="Réinitialiser Compte", 
+                      command=reinitialiser_compte,
+                      style="TButton").pack(pady=10)
         
+            # Bouton fermer
+            ttk.Button(main_frame, 
+                      text="Fermer", 
+                      command=fen_progression.destroy).pack(pady=10)
+        
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors de la vérification: {str(e)}", parent=self)
+    
+    @chronometrer("ui.depot.historique_client")
     def afficher_historique_client(self):
-        """Affiche l'historique complet des dépôts d'un client"""
+        """Affiche le relevé du client (dépôts et retraits, solde courant), page par page"""
         abonne = self.chercher_abonne()
         if not abonne:
             messagebox.showerror("Erreur", "Veuillez d'abord rechercher un client", parent=self)
@@ -785,111 +593,142 @@ class FenetreDepot(tk.Toplevel):
 
         numero_client = abonne[0]
         nom_complet = f"{abonne[1]} {abonne[2]} {abonne[3]}"
+        releve = ReleveService(lambda: connexion_rapport(get_db_path()))
         
-        with connexion_db() as conn:
-            cur = conn.cursor()
-            
-            # Récupérer la date d'inscription
-            cur.execute("SELECT date_inscription FROM abonne WHERE numero_client = ?", (numero_client,))
-            date_inscription = cur.fetchone()[0]
-            
-            # Calculer la durée du compte
+        # Récupérer la date d'inscription
+        conn = connexion_db()
+        try:
+            date_inscription = conn.execute("SELECT date_inscription FROM abonne WHERE numero_client = ?",
+                                            (numero_client,)).fetchone()[0]
+        finally:
+            conn.close()
+        
+        # Calculer la durée du compte
+        try:
+            date_insc = datetime.strptime(date_inscription, "%Y-%m-%d")
+            duree = (datetime.now() - date_insc).days
+            annees = duree // 365
+            mois = (duree % 365) // 30
+            duree_txt = f"{annees} an(s) et {mois} mois"
+        except:
+            duree_txt = "Inconnue"
+        
+        # Créer la fenêtre d'historique
+        fen_hist = tk.Toplevel(self)
+        fen_hist.title(f"Relevé de compte - {nom_complet}")
+        fen_hist.geometry("1000x600")
+        fen_hist.configure(bg=BACKGROUND_COLOR)
+        
+        # Titre
+        tk.Label(fen_hist, 
+                text=f"RELEVÉ DE COMPTE - {nom_complet.upper()}", 
+                font=("Helvetica", 16, "bold"),
+                bg=PRIMARY_COLOR,
+                fg="white").pack(fill="x", padx=10, pady=10)
+        
+        # Informations client et période
+        info_frame = tk.Frame(fen_hist, bg=BACKGROUND_COLOR)
+        info_frame.pack(fill="x", padx=10, pady=5)
+        
+        tk.Label(info_frame, 
+                text=f"N° Client: {numero_client} | Date inscription: {date_inscription} | Durée: {duree_txt}",
+                font=("Helvetica", 10),
+                bg=BACKGROUND_COLOR).pack(side="left")
+        
+        debut_var, fin_var = tk.StringVar(), tk.StringVar()
+        ttk.Button(info_frame, text="Filtrer", command=lambda: charger()).pack(side="right", padx=5)
+        ttk.Entry(info_frame, textvariable=fin_var, width=12).pack(side="right")
+        tk.Label(info_frame, text="au", bg=BACKGROUND_COLOR).pack(side="right", padx=3)
+        ttk.Entry(info_frame, textvariable=debut_var, width=12).pack(side="right")
+        tk.Label(info_frame, text="Du (AAAA-MM-JJ)", bg=BACKGROUND_COLOR).pack(side="right", padx=3)
+        
+        # Boutons et totaux (en bas), puis le tableau
+        btn_frame = tk.Frame(fen_hist, bg=BACKGROUND_COLOR)
+        btn_frame.pack(side="bottom", fill="x", padx=10, pady=10)
+        
+        label_totaux = tk.Label(fen_hist, 
+                font=("Helvetica", 12, "bold"),
+                bg=SECONDARY_COLOR,
+                fg="white")
+        label_totaux.pack(side="bottom", fill="x", padx=10, pady=5)
+        
+        columns = ("Date", "Heure", "Opération", "Crédit (FC)", "Débit (FC)", "Solde (FC)", "Référence", "Agent")
+        tree = ttk.Treeview(fen_hist, columns=columns, show="headings", height=20)
+        
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=120, anchor="center")
+        
+        scrollbar = ttk.Scrollbar(fen_hist, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        
+        tree.pack(side="left", fill="both", expand=True, padx=10, pady=10)
+        scrollbar.pack(side="right", fill="y")
+        
+        etat = {"periode": (None, None), "suivante": None}
+        
+        def periode():
+            return debut_var.get().strip() or None, fin_var.get().strip() or None
+        
+        def afficher_page():
+            page = releve.page(numero_client, *etat["periode"], apres=etat["suivante"])
+            for ligne in page.lignes:
+                tree.insert("", "end", values=(
+                    ligne.date, ligne.heure, ligne.libelle,
+                    f"{ligne.credit:,.2f}" if ligne.credit else "",
+                    f"{ligne.debit:,.2f}" if ligne.debit else "",
+                    f"{ligne.solde:,.2f}", ligne.reference or "", ligne.agent or ""))
+            etat["suivante"] = page.suivante
+            btn_suite.config(state="normal" if page.suivante else "disabled")
+        
+        def charger():
             try:
-                date_insc = datetime.strptime(date_inscription, "%Y-%m-%d")
-                duree = (datetime.now() - date_insc).days
-                annees = duree // 365
-                mois = (duree % 365) // 30
-                duree_txt = f"{annees} an(s) et {mois} mois"
-            except:
-                duree_txt = "Inconnue"
-            
-            # Récupérer les dépôts
-            cur.execute("""
-                SELECT date_depot, heure, montant, ref_depot, nom_agent
-                FROM depots
-                WHERE numero_client = ?
-                ORDER BY date_depot DESC, heure DESC
-            """, (numero_client,))
-            depots = cur.fetchall()
-            
-            # Créer la fenêtre d'historique
-            fen_hist = tk.Toplevel(self)
-            fen_hist.title(f"Historique des dépôts - {nom_complet}")
-            fen_hist.geometry("1000x600")
-            fen_hist.configure(bg=BACKGROUND_COLOR)
-            
-            # Titre
-            tk.Label(fen_hist, 
-                    text=f"HISTORIQUE DES DÉPÔTS - {nom_complet.upper()}", 
-                    font=("Helvetica", 16, "bold"),
-                    bg=PRIMARY_COLOR,
-                    fg="white").pack(fill="x", padx=10, pady=10)
-            
-            # Informations client
-            info_frame = tk.Frame(fen_hist, bg=BACKGROUND_COLOR)
-            info_frame.pack(fill="x", padx=10, pady=5)
-            
-            tk.Label(info_frame, 
-                    text=f"N° Client: {numero_client} | Date inscription: {date_inscription} | Durée: {duree_txt}",
-                    font=("Helvetica", 10),
-                    bg=BACKGROUND_COLOR).pack(side="left")
-            
-            # Treeview pour afficher les dépôts
-            columns = ("Date", "Heure", "Montant (FC)", "Référence", "Agent")
-            tree = ttk.Treeview(fen_hist, columns=columns, show="headings", height=20)
-            
-            for col in columns:
-                tree.heading(col, text=col)
-                tree.column(col, width=150, anchor="center")
-            
-            scrollbar = ttk.Scrollbar(fen_hist, orient="vertical", command=tree.yview)
-            tree.configure(yscrollcommand=scrollbar.set)
-            
-            tree.pack(side="left", fill="both", expand=True, padx=10, pady=10)
-            scrollbar.pack(side="right", fill="y")
-            
-            # Ajouter les données
-            total = 0
-            for depot in depots:
-                tree.insert("", "end", values=(depot[0], depot[1], f"{depot[2]:,.2f}", depot[3], depot[4]))
-                total += depot[2]
-            
-            # Afficher le total
-            tk.Label(fen_hist, 
-                    text=f"TOTAL DES DÉPÔTS: {total:,.2f} FC", 
-                    font=("Helvetica", 12, "bold"),
-                    bg=SECONDARY_COLOR,
-                    fg="white").pack(fill="x", padx=10, pady=5)
-            
-            # Bouton pour exporter en PDF
-            def exporter_releve_pdf():
-                try:
-                    # Préparer les données pour le PDF
-                    data = {
-                        "nom_complet": nom_complet,
-                        "numero_client": numero_client,
-                        "date_inscription": date_inscription,
-                        "duree_compte": duree_txt,
-                        "depots": depots,
-                        "total_depots": total
-                    }
-                    # Note: Cette fonction doit être définie dans export_pdf
-                    export_pdf.exporter_releve_client_pdf(data)
-                except Exception as e:
-                    messagebox.showerror("Erreur PDF", f"Erreur lors de la génération du PDF: {str(e)}", parent=fen_hist)
-            
-            btn_frame = tk.Frame(fen_hist, bg=BACKGROUND_COLOR)
-            btn_frame.pack(fill="x", padx=10, pady=10)
-            
-            ttk.Button(btn_frame, 
-                     text="Exporter PDF", 
-                     command=exporter_releve_pdf,
-                     style="TButton").pack(side="left", padx=5)
-            
-            ttk.Button(btn_frame, 
-                     text="Fermer", 
-                     command=fen_hist.destroy,
-                     style="TButton").pack(side="right", padx=5)
+                totaux = releve.totaux(numero_client, *periode())
+            except ValueError:
+                messagebox.showerror("Erreur", "Format de date invalide. Utilisez AAAA-MM-JJ.", parent=fen_hist)
+                return
+            etat["periode"], etat["suivante"] = periode(), None
+            tree.delete(*tree.get_children())
+            label_totaux.config(text=(
+                f"OUVERTURE: {totaux.solde_ouverture:,.2f} FC | CRÉDITS: {totaux.total_credits:,.2f} FC | "
+                f"DÉBITS: {totaux.total_debits:,.2f} FC | SOLDE: {totaux.solde_cloture:,.2f} FC "
+                f"({totaux.nb_lignes} opérations)"))
+            afficher_page()
+        
+        # Bouton pour exporter en PDF (lignes lues au fil de l'écriture)
+        def exporter_releve_pdf():
+            try:
+                debut, fin = etat["periode"]
+                data = {
+                    "nom_complet": nom_complet,
+                    "numero_client": numero_client,
+                    "date_inscription": date_inscription,
+                    "duree_compte": duree_txt,
+                    "periode": f"{debut or 'origine'} au {fin or datetime.now().strftime('%Y-%m-%d')}",
+                    "totaux": releve.totaux(numero_client, debut, fin),
+                    "lignes": releve.parcourir(numero_client, debut, fin),
+                }
+                importer("export_pdf").exporter_releve_client_pdf(data)
+            except Exception as e:
+                messagebox.showerror("Erreur PDF", f"Erreur lors de la génération du PDF: {str(e)}", parent=fen_hist)
+        
+        ttk.Button(btn_frame, 
+                 text="Exporter PDF", 
+                 command=exporter_releve_pdf,
+                 style="TButton").pack(side="left", padx=5)
+        
+        btn_suite = ttk.Button(btn_frame, 
+                 text="Afficher la suite", 
+                 command=afficher_page,
+                 style="TButton")
+        btn_suite.pack(side="left", padx=5)
+        
+        ttk.Button(btn_frame, 
+                 text="Fermer", 
+                 command=fen_hist.destroy,
+                 style="TButton").pack(side="right", padx=5)
+        
+        charger()
     
     def afficher_comptes_fixes(self):
         """Affiche tous les comptes fixes avec numéro carte et numéro client"""
@@ -917,6 +756,50 @@ class FenetreDepot(tk.Toplevel):
                         bg=PRIMARY_COLOR,
                         fg="white").pack(fill="x", padx=10, pady=10)
                 
+                # Impression des carnets : sélection, ou tous les comptes fixes
+                barre_lot = ttk.Frame(fen_comptes)
+                barre_lot.pack(side="bottom", fill="x", padx=10, pady=5)
+                progression_lot = ttk.Progressbar(barre_lot, orient='horizontal', mode='determinate')
+                etat_lot = ttk.Label(barre_lot, text="")
+                
+                def imprimer_carnets():
+                    numeros = [tree.item(item, "values")[0] for item in tree.selection()] or None
+                    par_client = messagebox.askyesnocancel(
+                        "Impression des carnets",
+                        "Un PDF par client ?\n\nOui : un fichier par client\nNon : un seul PDF pour tous",
+                        parent=fen_comptes)
+                    if par_client is None:
+                        return
+                    destination = filedialog.askdirectory(title="Dossier des carnets", parent=fen_comptes)
+                    if not destination:
+                        return
+                    
+                    def signaler(faits, total):
+                        def maj():
+                            progression_lot.configure(maximum=max(total, 1), value=faits)
+                            etat_lot.configure(text=f"{faits}/{total} carnets")
+                        fen_comptes.after(0, maj)
+                    
+                    def executer():
+                        try:
+                            chemins = importer("export_carte").exporter_carnets_lot(
+                                destination, numeros, par_client=par_client, progression=signaler)
+                            messagebox.showinfo("Succès", f"{len(chemins)} PDF créé(s) dans:\n{destination}",
+                                                parent=fen_comptes)
+                            if not par_client and chemins:
+                                webbrowser.open(chemins[0])
+                        except Exception as e:
+                            messagebox.showerror("Erreur", f"Erreur lors de l'impression: {str(e)}",
+                                                 parent=fen_comptes)
+                    
+                    threading.Thread(target=executer, daemon=True).start()
+                
+                ttk.Button(barre_lot, 
+                         text="Imprimer les carnets", 
+                         command=imprimer_carnets).pack(side="left")
+                progression_lot.pack(side="left", fill="x", expand=True, padx=10)
+                etat_lot.pack(side="left")
+                
                 # Treeview pour afficher les comptes
                 columns = ("N° Client", "Nom Client", "N° Carte", "Montant Initial")
                 tree = ttk.Treeview(fen_comptes, columns=columns, show="headings", height=25)
@@ -948,11 +831,12 @@ class FenetreDepot(tk.Toplevel):
             except sqlite3.Error as e:
                 messagebox.showerror("Erreur BD", f"Erreur base de données: {str(e)}", parent=self)
     
+    @chronometrer("ui.rapport.depots_journaliers")
     def afficher_depots_journaliers(self):
         """Affiche les dépôts effectués aujourd'hui"""
         today = datetime.now().strftime("%Y-%m-%d")
         
-        with connexion_db() as conn:
+        with connexion_rapport(get_db_path()) as conn:
             cur = conn.cursor()
             
             try:
@@ -962,12 +846,16 @@ class FenetreDepot(tk.Toplevel):
                            d.montant, d.ref_depot, d.nom_agent
                     FROM depots d
                     JOIN abonne a ON d.numero_client = a.numero_client
-                    WHERE d.date_depot = ?
-                    ORDER BY d.heure DESC
-                """, (today,))
+                    WHERE d.horodatage >= ? AND d.horodatage < date(?, '+1 day')
+                    ORDER BY d.horodatage DESC
+                """, (today, today))
                 
                 depots = cur.fetchall()
                 
+                # Totaux du jour par agent, depuis les cumuls
+                par_agent = lire_cumuls(conn, "depot", "jour", today, par=("agent",))
+                total = sum((cumul.montant for cumul in par_agent), Montant())
+                
                 # Créer une nouvelle fenêtre pour afficher les résultats
                 fen_depots = tk.Toplevel(self)
                 fen_depots.title(f"Dépôts Journaliers - {today}")
@@ -996,17 +884,20 @@ class FenetreDepot(tk.Toplevel):
                 scrollbar.pack(side="right", fill="y")
                 
                 # Ajouter les données
-                total = 0
                 for depot in depots:
                     tree.insert("", "end", values=(depot[1], depot[2], f"{depot[3]:,.2f} FC", depot[4], depot[5]))
-                    total += depot[3]
                 
-                # Afficher le total
+                # Afficher le total et la répartition par agent
                 tk.Label(fen_depots, 
                         text=f"TOTAL DES DÉPÔTS: {total:,.2f} FC", 
                         font=("Helvetica", 12, "bold"),
                         bg=SECONDARY_COLOR,
                         fg="white").pack(fill="x", padx=10, pady=5)
+                tk.Label(fen_depots, 
+                        text=" | ".join(f"{cumul.cle[0] or '—'}: {cumul.nombre} dépôt(s), {cumul.montant:,.2f} FC"
+                                        for cumul in par_agent), 
+                        font=("Helvetica", 10),
+                        bg=BACKGROUND_COLOR).pack(fill="x", padx=10)
                 
                 # Bouton pour exporter en PDF
                 btn_frame = tk.Frame(fen_depots, bg=BACKGROUND_COLOR)
@@ -1015,7 +906,7 @@ class FenetreDepot(tk.Toplevel):
                 # Fonction pour exporter en PDF dans un thread
                 def exporter_en_pdf():
                     try:
-                        chemin = exporter_depots_journaliers_pdf(depots, total, today)
+                        chemin = importer("depot_export").exporter_depots_journaliers_pdf(depots, total, today)
                         messagebox.showinfo("Succès", f"Rapport journalier exporté avec succès dans :\n{chemin}", parent=fen_depots)
                     except Exception as e:
                         messagebox.showerror("Erreur", f"Erreur lors de l'export : {str(e)}", parent=fen_depots)
@@ -1033,16 +924,17 @@ class FenetreDepot(tk.Toplevel):
             except Exception as e:
                 messagebox.showerror("Erreur", f"Erreur lors de la récupération des dépôts: {str(e)}", parent=self)
     
+    @chronometrer("ui.rapport.global_depots")
     def afficher_rapport_global(self):
         """Affiche un rapport global de tous les dépôts"""
-        with connexion_db() as conn:
+        with connexion_rapport(get_db_path()) as conn:
             cur = conn.cursor()
             
             try:
                 # Récupérer tous les dépôts groupés par client
                 cur.execute("""
                     SELECT a.numero_client, a.nom || ' ' || a.postnom || ' ' || a.prenom, 
-                           SUM(d.montant), COUNT(d.id)
+                           SUM(d.montant) AS "total [MONTANT]", COUNT(d.id)
                     FROM abonne a
                     LEFT JOIN depots d ON a.numero_client = d.numero_client
                     GROUP BY a.numero_client
@@ -1104,7 +996,7 @@ class FenetreDepot(tk.Toplevel):
                 # Fonction pour exporter en PDF dans un thread
                 def exporter_en_pdf():
                     try:
-                        chemin = exporter_rapport_global_pdf(clients, total_general)
+                        chemin = importer("depot_export").exporter_rapport_global_pdf(clients, total_general)
                         messagebox.showinfo("Succès", f"Rapport global exporté avec succès dans :\n{chemin}", parent=fen_rapport)
                     except Exception as e:
                         messagebox.showerror("Erreur", f"Erreur lors de l'export : {str(e)}", parent=fen_rapport)
@@ -1123,20 +1015,20 @@ class FenetreDepot(tk.Toplevel):
                 messagebox.showerror("Erreur", f"Erreur lors de la génération du rapport: {str(e)}", parent=self)
     
     def imprimer_pdf(self):
-        """Génère le bordereau de dépôt en PDF et affiche le chemin"""
+        """Met le bordereau de dépôt en file d'impression (rendu et impression en arrière-plan)"""
         if not self.dernier_bordereau:
-            messagebox.showerror("Erreur", "Aucun bordereau disponible à générer", parent=self)
+            messagebox.showerror("Erreur", "Aucun bordereau disponible à imprimer", parent=self)
             return
         
         try:
-            pdf_path, _ = export_pdf.generer_bordereaux(self.dernier_bordereau, "depot")
+            travail = importer("file_impression").file_impression().soumettre("depot", self.dernier_bordereau)
             messagebox.showinfo(
-                "PDF généré",
-                f"Bordereau PDF enregistré avec succès!\n\nChemin: {pdf_path}",
+                "Impression",
+                f"Bordereau mis en file d'impression (travail n° {travail})",
                 parent=self
             )
         except Exception as e:
-            messagebox.showerror("Erreur", f"Erreur lors de la génération: {str(e)}", parent=self)
+            messagebox.showerror("Erreur", f"Erreur lors de l'impression: {str(e)}", parent=self)
     
     def exporter_word(self):
         """Génère le bordereau de dépôt en Word et affiche le chemin"""
@@ -1145,7 +1037,7 @@ class FenetreDepot(tk.Toplevel):
             return
         
         try:
-            _, word_path = export_pdf.generer_bordereaux(self.dernier_bordereau, "depot")
+            _, word_path = importer("export_pdf").generer_bordereaux(self.dernier_bordereau, "depot")
             messagebox.showinfo(
                 "Word généré",
                 f"Bordereau Word enregistré avec succès!\n\nChemin: {word_path}",
@@ -1162,7 +1054,7 @@ class FenetreDepot(tk.Toplevel):
         fen_doublons.geometry("1000x600")
         
         # Intégrer l'interface de gestion des doublons
-        interface_doublons.DoublonsInterface(fen_doublons)
+        importer("interface_doublons").DoublonsInterface(fen_doublons)
 
 # --- Pour tester l'interface seule ---
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+import performance
+
+# ==== FILE D'ÉCRITURE (ÉCRIVAIN UNIQUE, VALIDATION GROUPÉE) ====
+# Les opérations d'écriture sont déposées dans une file ; un thread écrivain unique
+# les regroupe par lots et valide chaque lot en une seule transaction (un seul
+# fsync). Chaque opération s'exécute dans son propre SAVEPOINT : un échec n'annule
+# que cette opération, et son Future reçoit l'exception. Les Futures ne sont
+# résolus qu'après le COMMIT du lot.
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Operation = Callable[[sqlite3.Connection], T]
+
+TAILLE_LOT_DEFAUT = 64
+ATTENTE_LOT_MS = 2.0  # délai laissé aux opérations concurrentes pour rejoindre le lot
+
+
+class FileEcriture:
+    """Thread écrivain qui exécute les opérations soumises par lots transactionnels"""
+
+    def __init__(self, connexion: Callable[[], sqlite3.Connection],
+                 taille_lot: int = TAILLE_LOT_DEFAUT, attente_ms: float = ATTENTE_LOT_MS,
+                 nom: str = "file-ecriture"):
+        self._connexion = connexion
+        self.taille_lot = max(1, taille_lot)
+        self.attente = attente_ms / 1000
+        self._file: "queue.Queue[Optional[Tuple[Operation, Future]]]" = queue.Queue()
+        self._arret = threading.Event()
+        self.nb_lots = 0
+        self.nb_operations = 0
+        self._thread = threading.Thread(target=self._boucle, name=nom, daemon=True)
+        self._thread.start()
+
+    def soumettre(self, operation: Operation) -> "Future[T]":
+        """Met operation(conn) en file ; le Future donne son résultat après validation"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("Soumission depuis le thread écrivain : utiliser la connexion reçue")
+        if self._arret.is_set():
+            raise RuntimeError("File d'écriture arrêtée")
+        futur: Future = Future()
+        self._file.put((operation, futur))
+        return futur
+
+    def executer(self, operation: Operation, timeout: Optional[float] = None) -> T:
+        """soumettre() puis attend le résultat (relève l'exception de l'opération)"""
+        return self.soumettre(operation).result(timeout)
+
+    def arreter(self, timeout: Optional[float] = None):
+        """Traite les opérations déjà en file puis arrête l'écrivain"""
+        if not self._arret.is_set():
+            self._arret.set()
+            self._file.put(None)
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+    # ---- Thread écrivain ----
+    def _collecter(self, premier) -> Tuple[List[Tuple[Operation, Future]], bool]:
+        """Complète le lot avec les opérations arrivées pendant la fenêtre d'attente"""
+        lot = [premier]
+        limite = time.monotonic() + self.attente
+        while len(lot) < self.taille_lot:
+            restant = limite - time.monotonic()
+            try:
+                element = self._file.get(timeout=restant) if restant > 0 else self._file.get_nowait()
+            except queue.Empty:
+                break
+            if element is None:
+                return lot, True
+            lot.append(element)
+        return lot, False
+
+    def _boucle(self):
+        conn = self._connexion()
+        conn.isolation_level = None  # transactions gérées explicitement
+        try:
+            while True:
+                premier = self._file.get()
+                if premier is None:
+                    break
+                lot, fin = self._collecter(premier)
+                self._executer_lot(conn, lot)
+                if fin:
+                    break
+            # Arrêt : vide ce qui reste en file
+            reste = []
+            while True:
+                try:
+                    element = self._file.get_nowait()
+                except queue.Empty:
+                    break
+                if element is not None:
+                    reste.append(element)
+            for i in range(0, len(reste), self.taille_lot):
+                self._executer_lot(conn, reste[i:i + self.taille_lot])
+        finally:
+            conn.close()
+
+    def _executer_lot(self, conn: sqlite3.Connection, lot: List[Tuple[Operation, Future]]):
+        debut = time.perf_counter()
+        resultats = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            logger.error("Erreur ouverture du lot d'écriture: %s", str(e))
+            for _, futur in lot:
+                futur.set_exception(e)
+            return
+
+        for operation, futur in lot:
+            if not futur.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT operation")
+            try:
+                resultats.append((futur, operation(conn), None))
+                conn.execute("RELEASE operation")
+            except Exception as e:
+                conn.execute("ROLLBACK TO operation")
+                conn.execute("RELEASE operation")
+                resultats.append((futur, None, e))
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.error("Erreur validation du lot d'écriture (%s opérations): %s", len(lot), str(e))
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for futur, _, _ in resultats:
+                futur.set_exception(e)
+            return
+
+        self.nb_lots += 1
+        self.nb_operations += len(resultats)
+        performance.enregistrer("ecriture.lot", (time.perf_counter() - debut) * 1000)
+        for futur, valeur, erreur in resultats:
+            if erreur is not None:
+                futur.set_exception(erreur)
+            else:
+                futur.set_result(valeur)
+
+    @property
+    def taille_moyenne_lot(self) -> float:
+        return self.nb_operations / self.nb_lots if self.nb_lots else 0.0
@@ -0,0 +1,357 @@
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from demarrage import importer
+from monnaie import Montant
+
+# ==== FILE D'IMPRESSION DES BORDEREAUX ====
+# Le guichet dépose le bordereau dans une file persistante (base SQLite séparée,
+# impressions.db) et reprend la main aussitôt. Un thread d'impression rend les
+# bordereaux (PDF) par lots et envoie les fichiers du lot en un seul appel à
+# l'imprimante ; si l'envoi s'interrompt, seuls les travaux partis en entier sont
+# marqués imprimés, le travail interrompu est retenté avec un délai croissant et
+# les suivants restent en file. Tant que l'imprimante est hors ligne, les travaux
+# restent en file, et ils survivent à un redémarrage de l'application.
+# La destination est interchangeable : ImprimanteWindows, ou DossierSpool (un
+# dossier, pour Linux et les tests sans imprimante).
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 10
+ATTENTE_S = 2.0            # file vide ou imprimante hors ligne : prochain essai
+DELAI_REESSAI_S = 5.0      # doublé à chaque échec...
+DELAI_REESSAI_MAX_S = 300.0
+TENTATIVES_MAX = 8         # ... puis le travail passe en échec
+
+EN_ATTENTE, IMPRIME, ECHEC = "en_attente", "imprimé", "échec"
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS travaux (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type_bordereau TEXT NOT NULL,
+    donnees TEXT NOT NULL,
+    statut TEXT NOT NULL DEFAULT 'en_attente',
+    tentatives INTEGER NOT NULL DEFAULT 0,
+    prochain_essai REAL NOT NULL DEFAULT 0,
+    fichiers TEXT,
+    derniere_erreur TEXT,
+    cree_le TEXT NOT NULL,
+    imprime_le TEXT
+)"""
+
+
+# ---- Sérialisation des données du bordereau ----
+def _encoder(valeur):
+    if isinstance(valeur, Montant):
+        return {"__montant__": valeur.centimes}
+    if isinstance(valeur, datetime):
+        return {"__datetime__": valeur.isoformat()}
+    raise TypeError(f"Valeur non sérialisable: {valeur!r}")
+
+
+def _decoder(objet: Dict):
+    if "__montant__" in objet:
+        return Montant(objet["__montant__"])
+    if "__datetime__" in objet:
+        return datetime.fromisoformat(objet["__datetime__"])
+    return objet
+
+
+# ---- Rendu : type de bordereau → fichiers à imprimer ----
+def _rendre_depot(data: Dict) -> List[str]:
+    return [importer("export_pdf").exporter_bordereau_pdf(data, "depot")]
+
+
+def _rendre_retrait(data: Dict) -> List[str]:
+    return [importer("export_retrait").exporter_pdf(data)]
+
+
+RENDUS: Dict[str, Callable[[Dict], List[str]]] = {
+    "depot": _rendre_depot,
+    "retrait": _rendre_retrait,
+}
+
+
+# ---- Imprimantes ----
+class EnvoiInterrompu(Exception):
+    """Envoi d'un lot interrompu : les envoyes premiers fichiers sont partis"""
+
+    def __init__(self, envoyes: int, erreur: Exception):
+        super().__init__(str(erreur))
+        self.envoyes = envoyes
+
+
+class Imprimante:
+    """Destination des bordereaux rendus"""
+
+    def disponible(self) -> bool:
+        return True
+
+    def imprimer(self, chemins: List[str]):
+        """Envoie un lot de fichiers dans l'ordre ; EnvoiInterrompu en cas d'échec"""
+        for envoyes, chemin in enumerate(chemins):
+            try:
+                self.envoyer(chemin)
+            except Exception as e:
+                raise EnvoiInterrompu(envoyes, e) from e
+
+    def envoyer(self, chemin: str):
+        """Envoie un fichier ; lève une exception en cas d'échec"""
+        raise NotImplementedError
+
+
+# Constantes winspool (win32print ne les expose pas toutes)
+_STATUT_BLOQUANT = 0x00000002 | 0x00000010 | 0x00000080  # erreur, plus de papier, hors ligne
+_ATTRIBUT_HORS_LIGNE = 0x00000400
+
+
+class ImprimanteWindows(Imprimante):
+    """Imprimante Windows (par défaut ou nommée), via le verbe d'impression du shell"""
+
+    def __init__(self, nom_imprimante: Optional[str] = None):
+        self.nom_imprimante = nom_imprimante
+
+    def disponible(self) -> bool:
+        try:
+            win32print = importer("win32print")
+        except ImportError:
+            return True  # état inconnu : l'envoi dira si l'imprimante répond
+        try:
+            poignee = win32print.OpenPrinter(self.nom_imprimante or win32print.GetDefaultPrinter())
+            try:
+                info = win32print.GetPrinter(poignee, 2)
+            finally:
+                win32print.ClosePrinter(poignee)
+        except Exception as e:
+            logger.error("Imprimante inaccessible: %s", str(e))
+            return False
+        return not (info["Status"] & _STATUT_BLOQUANT or info["Attributes"] & _ATTRIBUT_HORS_LIGNE)
+
+    def envoyer(self, chemin: str):
+        if self.nom_imprimante:
+            importer("win32api").ShellExecute(0, "printto", chemin, f'"{self.nom_imprimante}"', ".", 0)
+        else:
+            os.startfile(chemin, "print")
+
+
+class DossierSpool(Imprimante):
+    """
+    Dépose les bordereaux dans un dossier (Linux, tests, imprimante surveillant un
+    dossier). Un fichier HORS_LIGNE dans ce dossier simule une imprimante hors ligne.
+    """
+
+    def __init__(self, dossier: str):
+        self.dossier = dossier
+        os.makedirs(dossier, exist_ok=True)
+
+    def disponible(self) -> bool:
+        return os.path.isdir(self.dossier) and not os.path.exists(os.path.join(self.dossier, "HORS_LIGNE"))
+
+    def envoyer(self, chemin: str):
+        cible = os.path.join(self.dossier, os.path.basename(chemin))
+        temporaire = cible + ".part"
+        shutil.copyfile(chemin, temporaire)
+        os.replace(temporaire, cible)  # le fichier n'apparaît que complet
+
+
+def dossier_application() -> str:
+    dossier = os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "MyApp")
+    os.makedirs(dossier, exist_ok=True)
+    return dossier
+
+
+def imprimante_par_defaut() -> Imprimante:
+    if sys.platform == "win32":
+        return ImprimanteWindows()
+    return DossierSpool(os.path.join(dossier_application(), "spool"))
+
+
+# ---- File ----
+class FileImpression:
+    """File persistante des bordereaux à imprimer et son thread d'impression"""
+
+    def __init__(self, chemin_db: str, imprimante: Optional[Imprimante] = None,
+                 taille_lot: int = TAILLE_LOT, attente_s: float = ATTENTE_S):
+        self.chemin_db = chemin_db
+        self.imprimante = imprimante or imprimante_par_defaut()
+        self.taille_lot = max(1, taille_lot)
+        self.attente_s = attente_s
+        self._reveil = threading.Event()
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._hors_ligne = False
+        conn = self._connexion()
+        try:
+            conn.execute(SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_travaux_statut ON travaux(statut, prochain_essai)")
+        finally:
+            conn.close()
+
+    def _connexion(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.chemin_db, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    # ---- Guichet ----
+    def soumettre(self, type_bordereau: str, data: Dict) -> int:
+        """Met un bordereau en file ; retourne le numéro du travail"""
+        if type_bordereau not in RENDUS:
+            raise ValueError(f"Type de bordereau inconnu: {type_bordereau}")
+        conn = self._connexion()
+        try:
+            with conn:
+                cur = conn.execute("""
+                    INSERT INTO travaux (type_bordereau, donnees, cree_le)
+                    VALUES (?, ?, ?)
+                """, (type_bordereau, json.dumps(data, default=_encoder),
+                      datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        finally:
+            conn.close()
+        self._reveil.set()
+        return cur.lastrowid
+
+    def etat(self) -> Dict[str, int]:
+        """Nombre de travaux par statut"""
+        conn = self._connexion()
+        try:
+            return dict(conn.execute("SELECT statut, COUNT(*) FROM travaux GROUP BY statut"))
+        finally:
+            conn.close()
+
+    def relancer_echecs(self) -> int:
+        """Remet en file les travaux en échec"""
+        conn = self._connexion()
+        try:
+            with conn:
+                n = conn.execute("""
+                    UPDATE travaux SET statut = ?, tentatives = 0, prochain_essai = 0
+                    WHERE statut = ?
+                """, (EN_ATTENTE, ECHEC)).rowcount
+        finally:
+            conn.close()
+        self._reveil.set()
+        return n
+
+    # ---- Impression ----
+    def traiter_lot(self) -> int:
+        """Rend et imprime un lot de travaux échus ; retourne le nombre de travaux traités"""
+        if not self.imprimante.disponible():
+            if not self._hors_ligne:
+                logger.warning("Imprimante hors ligne : bordereaux conservés en file")
+            self._hors_ligne = True
+            return 0
+        if self._hors_ligne:
+            logger.info("Imprimante de nouveau disponible")
+        self._hors_ligne = False
+
+        conn = self._connexion()
+        try:
+            travaux = conn.execute("""
+                SELECT id, type_bordereau, donnees, fichiers, tentatives
+                FROM travaux
+                WHERE statut = ? AND prochain_essai <= ?
+                ORDER BY id
+                LIMIT ?
+            """, (EN_ATTENTE, time.time(), self.taille_lot)).fetchall()
+
+            prets = []
+            for id_travail, type_bordereau, donnees, fichiers, tentatives in travaux:
+                chemins = json.loads(fichiers) if fichiers else []
+                if not chemins or not all(os.path.exists(c) for c in chemins):
+                    try:
+                        chemins = RENDUS[type_bordereau](json.loads(donnees, object_hook=_decoder))
+                    except Exception as e:
+                        logger.error("Erreur rendu du bordereau %s: %s", id_travail, str(e))
+                        self._echec(conn, id_travail, tentatives, e)
+                        continue
+                    with conn:
+                        conn.execute("UPDATE travaux SET fichiers = ? WHERE id = ?",
+                                     (json.dumps(chemins), id_travail))
+                prets.append((id_travail, tentatives, chemins))
+
+            # Un seul envoi pour tout le lot ; en cas d'interruption, les travaux partis
+            # en entier sont marqués imprimés pour ne pas être réimprimés
+            erreur = None
+            envoyes = sum(len(chemins) for _, _, chemins in prets)
+            try:
+                self.imprimante.imprimer([c for _, _, chemins in prets for c in chemins])
+            except EnvoiInterrompu as e:
+                erreur, envoyes = e, e.envoyes
+            except Exception as e:
+                erreur, envoyes = e, 0  # nombre de fichiers partis inconnu
+
+            imprimes = []
+            for id_travail, tentatives, chemins in prets:
+                if erreur is not None and envoyes < len(chemins):
+                    logger.error("Erreur envoi du bordereau %s: %s", id_travail, str(erreur))
+                    self._echec(conn, id_travail, tentatives, erreur)
+                    break  # les suivants restent en file pour le prochain passage
+                envoyes -= len(chemins)
+                imprimes.append(id_travail)
+            maintenant = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with conn:
+                conn.executemany("""
+                    UPDATE travaux SET statut = ?, imprime_le = ?, derniere_erreur = NULL
+                    WHERE id = ?
+                """, [(IMPRIME, maintenant, id_travail) for id_travail in imprimes])
+            return len(travaux)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _echec(conn: sqlite3.Connection, id_travail: int, tentatives: int, erreur: Exception):
+        tentatives += 1
+        statut = ECHEC if tentatives >= TENTATIVES_MAX else EN_ATTENTE
+        delai = min(DELAI_REESSAI_MAX_S, DELAI_REESSAI_S * 2 ** (tentatives - 1))
+        with conn:
+            conn.execute("""
+                UPDATE travaux
+                SET statut = ?, tentatives = ?, prochain_essai = ?, derniere_erreur = ?
+                WHERE id = ?
+            """, (statut, tentatives, time.time() + delai, str(erreur), id_travail))
+
+    def _boucle(self):
+        while not self._arret.is_set():
+            try:
+                traites = self.traiter_lot()
+            except Exception as e:
+                logger.error("Erreur file d'impression: %s", str(e))
+                traites = 0
+            if not traites:
+                self._reveil.wait(self.attente_s)
+                self._reveil.clear()
+
+    def demarrer(self) -> "FileImpression":
+        if self._thread is None:
+            self._arret.clear()
+            self._thread = threading.Thread(target=self._boucle, name="file-impression", daemon=True)
+            self._thread.start()
+        return self
+
+    def arreter(self, timeout: Optional[float] = None):
+        self._arret.set()
+        self._reveil.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# ---- File de l'application ----
+_file: Optional[FileImpression] = None
+_verrou = threading.Lock()
+
+
+def file_impression() -> FileImpression:
+    """File d'impression partagée par les guichets (créée et démarrée au premier appel)"""
+    global _file
+    with _verrou:
+        if _file is None:
+            _file = FileImpression(os.path.join(dossier_application(), "impressions.db")).demarrer()
+        return _file
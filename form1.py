@@ -7,18 +7,20 @@ import os
 import sys
 import sqlite3
 import shutil
-from fenetre_depot import FenetreDepot
-from interface_retrait import interface_retrait
-from inscription_menu import InscriptionInterface
 import db
+import performance
+import references
+from demarrage import importer
 from typing import Dict, Optional, Tuple
 import webbrowser
+import multiprocessing
 import stat
 import tempfile
 import logging
-import win32api
-import win32security
-import ntsecuritycon
+import time
+
+# Référence pour mesurer le temps d'affichage de la fenêtre de connexion
+DEBUT_DEMARRAGE = time.perf_counter()
 
 # Juste après les imports
 db_path = os.path.join(db.DBConfig.get_app_dir(), 'money_epargne.db')
@@ -257,6 +259,11 @@ class LoginWindow(tk.Toplevel):
             self.password_entry.focus()
             return
             
+        # La base doit être migrée avant la première authentification
+        if not db.attendre_base_prete(timeout=30):
+            messagebox.showerror("Erreur", "La base de données n'est pas disponible", parent=self)
+            return
+            
         # Vérification des identifiants
         agent = db.authentifier_agent(username, password)
         
@@ -409,6 +416,10 @@ class PasswordResetWindow(tk.Toplevel):
             messagebox.showwarning("Mot de passe faible", "Le mot de passe doit contenir au moins 6 caractères", parent=self)
             return
             
+        if not db.attendre_base_prete(timeout=30):
+            messagebox.showerror("Erreur", "La base de données n'est pas disponible", parent=self)
+            return
+            
         # Vérifier que l'identifiant existe
         try:
             with db.connexion_db() as conn:
@@ -535,6 +546,10 @@ class InscriptionWindow(tk.Toplevel):
             messagebox.showwarning("Mot de passe faible", "Le mot de passe doit contenir au moins 6 caractères")
             return
             
+        if not db.attendre_base_prete(timeout=30):
+            messagebox.showerror("Erreur", "La base de données n'est pas disponible")
+            return
+            
         # Création du compte
         try:
             if db.creer_compte_agent(nom, identifiant, mdp, photo_path=self.photo_path):
@@ -570,15 +585,6 @@ class Application(tk.Tk):
             self.destroy()
             return
         
-        # Initialisation de la base de données
-        if not db.initialiser_base():
-            messagebox.showerror("Erreur", "Impossible d'initialiser la base de données")
-            self.destroy()
-            return
-        
-        # Créer un admin par défaut si aucun compte existe
-        self.create_default_admin()
-        
         # Style
         self.setup_styles()
         
@@ -591,9 +597,30 @@ class Application(tk.Tk):
         # Fenêtre de connexion
         self.show_login_window()
         
+        # Migration et intégrité de la base en arrière-plan, une fois la connexion affichée
+        self.after(100, self.demarrer_verifications)
+        
         # Rafraîchissement automatique
         self.bind("<FocusIn>", self.refresh_on_focus)
     
+    def demarrer_verifications(self):
+        """Lance la vérification de la base sans bloquer l'affichage"""
+        logger.info("Fenêtre de connexion affichée en %.0f ms",
+                    (time.perf_counter() - DEBUT_DEMARRAGE) * 1000)
+        db.lancer_verification_base(apres_succes=self.create_default_admin)
+        self.after(200, self.surveiller_verifications)
+    
+    def surveiller_verifications(self):
+        """Signale le résultat de la vérification de la base une fois terminée"""
+        etat = db.etat_verification_base()
+        if etat is None:
+            self.after(200, self.surveiller_verifications)
+        elif not etat:
+            messagebox.showerror("Erreur", 
+                               "Impossible d'initialiser la base de données.\n"
+                               "Veuillez exécuter reset_db.py")
+            self.destroy()
+    
     def create_default_admin(self):
         """Crée un admin par défaut si aucun compte n'existe"""
         try:
@@ -664,6 +691,7 @@ class Application(tk.Tk):
         self.manage_menu = tk.Menu(self.menubar, tearoff=0)
         self.manage_menu.add_command(label="Gérer les agents", command=self.manage_agents, state=tk.DISABLED)
         self.manage_menu.add_command(label="Paramètres", command=self.open_settings, state=tk.DISABLED)
+        self.manage_menu.add_command(label="Performances", command=self.open_performance, state=tk.DISABLED)
         self.menubar.add_cascade(label="Gestion", menu=self.manage_menu)
         
         # Menu Aide
@@ -775,15 +803,18 @@ class Application(tk.Tk):
         if logged_in and self.current_agent['role'].lower() == 'admin':
             self.manage_menu.entryconfig(0, state=state)  # Gérer les agents
             self.manage_menu.entryconfig(1, state=state)  # Paramètres
+            self.manage_menu.entryconfig(2, state=state)  # Performances
         else:
             self.manage_menu.entryconfig(0, state=tk.DISABLED)
             self.manage_menu.entryconfig(1, state=tk.DISABLED)
+            self.manage_menu.entryconfig(2, state=tk.DISABLED)
         
         # Boutons rapides
         self.quick_deposit_btn.config(state=state)
         self.quick_withdraw_btn.config(state=state)
         self.quick_client_btn.config(state=state)
     
+    @performance.chronometrer("ui.accueil.statistiques")
     def update_stats(self):
         """Met à jour les statistiques affichées"""
         for widget in self.stats_subframe.winfo_children():
@@ -799,15 +830,15 @@ class Application(tk.Tk):
                 clients = cur.fetchone()[0]
                 
                 # Total des dépôts
-                cur.execute("SELECT SUM(montant) FROM depots")
+                cur.execute('SELECT SUM(montant) AS "total [MONTANT]" FROM depots')
                 total_depots = cur.fetchone()[0] or 0
                 
                 # Total des retraits
-                cur.execute("SELECT SUM(montant) FROM retraits")
+                cur.execute('SELECT SUM(montant) AS "total [MONTANT]" FROM retraits')
                 total_retraits = cur.fetchone()[0] or 0
                 
                 # Solde total
-                cur.execute("SELECT SUM(solde) FROM abonne_compte")
+                cur.execute('SELECT SUM(solde) AS "total [MONTANT]" FROM abonne_compte')
                 solde_total = cur.fetchone()[0] or 0
                 
                 # Création des cartes de stats
@@ -836,31 +867,18 @@ class Application(tk.Tk):
         
         self.stats_subframe.columnconfigure(column, weight=1)
     
+    @performance.chronometrer("ui.accueil.activites")
     def load_recent_activities(self):
         """Charge les activités récentes"""
         for item in self.activity_tree.get_children():
             self.activity_tree.delete(item)
             
-        try:
-            with db.connexion_db() as conn:
-                conn.row_factory = sqlite3.Row
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT date_action || ' ' || heure_action as datetime, 
-                           action, 
-                           acteur || ' - ' || COALESCE(cible, '') as details
-                    FROM journal
-                    ORDER BY date_action DESC, heure_action DESC
-                    LIMIT 20
-                """)
-                
-                for row in cur.fetchall():
-                    self.activity_tree.insert("", "end", 
-                                            values=(row['datetime'], 
-                                                   row['action'], 
-                                                   row['details']))
-        except sqlite3.Error as e:
-            print(f"Erreur chargement activités: {e}")
+        # Première page du journal seulement (20 lignes)
+        for entree in db.page_logs(taille=20).lignes:
+            self.activity_tree.insert("", "end",
+                                    values=(f"{entree.date_action} {entree.heure_action}",
+                                            entree.action,
+                                            f"{entree.acteur} - {entree.cible or ''}"))
     
     def refresh_interface(self):
         """Rafraîchit l'interface après chaque opération"""
@@ -868,7 +886,7 @@ class Application(tk.Tk):
             messagebox.showwarning("Non connecté", "Veuillez vous connecter d'abord")
             return
             
-        interface_retrait(self.current_agent['nom'])
+        importer("interface_retrait").interface_retrait(self.current_agent['nom'])
         db.ajouter_journal("Ouverture interface", self.current_agent['nom'], "Retrait")
     
     def refresh_on_focus(self, event):
@@ -889,7 +907,7 @@ class Application(tk.Tk):
         y = self.winfo_y() + 50
         inscription_window.geometry(f"+{x}+{y}")
         # Initialiser l'interface d'inscription
-        InscriptionInterface(inscription_window)
+        importer("inscription_menu").InscriptionInterface(inscription_window)
         
         # Ajouter une entrée dans le journal
         db.ajouter_journal("Ouverture interface", self.current_agent['nom'], "Inscription")
@@ -907,7 +925,9 @@ class Application(tk.Tk):
             return
             
         # Ouvrir la fenêtre de dépôt avec callback de rafraîchissement
-        depot_window = FenetreDepot(self, self.current_agent['nom'])
+        depot_window = importer("fenetre_depot").FenetreDepot(self, self.current_agent['nom'])
+        if not depot_window.winfo_exists():
+            return  # base non migrée : la fenêtre s'est refermée
         db.ajouter_journal("Ouverture interface", self.current_agent['nom'], "Dépôt")
         
         # Rafraîchir après fermeture
@@ -927,7 +947,7 @@ class Application(tk.Tk):
         retrait_window.title("Interface de Retrait")
     
         # Ouvrir l'interface de retrait - PASSER LA FENÊTRE EN PARAMÈTRE
-        interface_retrait(self.current_agent['nom'], retrait_window)
+        importer("interface_retrait").interface_retrait(self.current_agent['nom'], retrait_window)
     
         # Rafraîchir après fermeture
         retrait_window.protocol("WM_DELETE_WINDOW", lambda: [
@@ -975,6 +995,19 @@ class Application(tk.Tk):
             self.refresh_interface()
         ])
     
+    def open_performance(self):
+        """Ouvre le panneau des performances (administrateurs uniquement)"""
+        if not hasattr(self, 'current_agent'):
+            messagebox.showwarning("Non connecté", "Veuillez vous connecter d'abord")
+            return
+            
+        if self.current_agent['role'].lower() != 'admin':
+            messagebox.showwarning("Permission refusée", "Seuls les administrateurs peuvent consulter les performances")
+            return
+            
+        PerformanceWindow(self)
+        db.ajouter_journal("Ouverture interface", self.current_agent['nom'], "Performances")
+    
     def open_docs(self):
         """Ouvre la documentation"""
         webbrowser.open("https://docs.example.com")
@@ -1346,35 +1379,14 @@ class SettingsWindow(tk.Toplevel):
         settings_frame.columnconfigure(1, weight=1)
     
     def load_settings(self):
-        """Charge les paramètres actuels"""
+        """Charge les paramètres actuels (cache des données de référence)"""
         try:
-            with db.connexion_db() as conn:
-                cur = conn.cursor()
-                # Créer la table si elle n'existe pas
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS parametres (
-                        cle TEXT PRIMARY KEY,
-                        valeur TEXT
-                    )
-                """)
-                
-                # Insérer les valeurs par défaut si la table est vide
-                cur.execute("SELECT COUNT(*) FROM parametres")
-                if cur.fetchone()[0] == 0:
-                    cur.execute("INSERT INTO parametres VALUES ('taux_interet', '5.0')")
-                    cur.execute("INSERT INTO parametres VALUES ('depot_min', '500')")
-                    cur.execute("INSERT INTO parametres VALUES ('retrait_min', '1000')")
-                    conn.commit()
-                
-                # Charger les paramètres
-                cur.execute("SELECT cle, valeur FROM parametres")
-                for row in cur.fetchall():
-                    self.settings[row[0]] = row[1]
-                
-                # Mettre à jour les champs
-                self.interest_rate.insert(0, self.settings.get('taux_interet', '5.0'))
-                self.min_deposit.insert(0, self.settings.get('depot_min', '500'))
-                self.min_withdrawal.insert(0, self.settings.get('retrait_min', '1000'))
+            self.settings = dict(references.cache_reference(db.DBConfig.get_db_path()).donnees().parametres)
+            
+            # Mettre à jour les champs
+            self.interest_rate.insert(0, self.settings.get('taux_interet', '5.0'))
+            self.min_deposit.insert(0, self.settings.get('depot_min', '500'))
+            self.min_withdrawal.insert(0, self.settings.get('retrait_min', '1000'))
         except Exception as e:
             messagebox.showerror("Erreur", f"Impossible de charger les paramètres: {e}")
     
@@ -1389,21 +1401,129 @@ class SettingsWindow(tk.Toplevel):
             
             with db.connexion_db() as conn:
                 cur = conn.cursor()
-                
-                for key, value in new_settings.items():
-                    cur.execute("UPDATE parametres SET valeur = ? WHERE cle = ?", (value, key))
-                    if cur.rowcount == 0:
-                        cur.execute("INSERT INTO parametres VALUES (?, ?)", (key, value))
-                
+                cur.executemany("""
+                    INSERT INTO parametres (cle, valeur) VALUES (?, ?)
+                    ON CONFLICT(cle) DO UPDATE SET valeur = excluded.valeur
+                """, list(new_settings.items()))
                 conn.commit()
-                messagebox.showinfo("Succès", "Paramètres enregistrés avec succès")
+            # Les écrans de ce processus relisent les paramètres sans attendre data_version
+            references.invalider()
+            messagebox.showinfo("Succès", "Paramètres enregistrés avec succès")
         except PermissionError as pe:
             messagebox.showerror("Erreur de permission", f"L'application n'a pas les droits nécessaires: {str(pe)}")
         except Exception as e:
             messagebox.showerror("Erreur", f"Impossible d'enregistrer les paramètres: {e}")
 
+class PerformanceWindow(tk.Toplevel):
+    """Panneau des performances : percentiles par opération et requêtes lentes"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.title("Performances")
+        self.geometry("900x550")
+        
+        # Centrer la fenêtre
+        parent.update_idletasks()
+        x = parent.winfo_x() + (parent.winfo_width() - 900) // 2
+        y = parent.winfo_y() + (parent.winfo_height() - 550) // 2
+        self.geometry(f"+{x}+{y}")
+        
+        self.setup_ui()
+        self.load_stats()
+    
+    def setup_ui(self):
+        """Configure l'interface utilisateur"""
+        main_frame = ttk.Frame(self)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        notebook = ttk.Notebook(main_frame)
+        notebook.pack(fill="both", expand=True)
+        
+        # Onglet Opérations
+        ops_frame = ttk.Frame(notebook)
+        notebook.add(ops_frame, text="Opérations")
+        
+        columns = ("operation", "compteur", "erreurs", "moyenne", "p50", "p95", "p99", "max")
+        headings = ("Opération", "Appels", "Erreurs", "Moy. (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)")
+        self.ops_tree = ttk.Treeview(ops_frame, columns=columns, show="headings")
+        for col, text in zip(columns, headings):
+            self.ops_tree.heading(col, text=text)
+            self.ops_tree.column(col, width=80, anchor="e")
+        self.ops_tree.column("operation", width=260, anchor="w")
+        self.ops_tree.pack(side="left", fill="both", expand=True)
+        
+        scrollbar = ttk.Scrollbar(ops_frame, orient="vertical", command=self.ops_tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.ops_tree.configure(yscrollcommand=scrollbar.set)
+        
+        # Onglet Requêtes lentes
+        slow_frame = ttk.Frame(notebook)
+        notebook.add(slow_frame, text="Requêtes lentes")
+        
+        self.slow_tree = ttk.Treeview(slow_frame, columns=("date", "duree", "sql", "parametres"), show="headings")
+        self.slow_tree.heading("date", text="Date")
+        self.slow_tree.heading("duree", text="Durée (ms)")
+        self.slow_tree.heading("sql", text="Requête")
+        self.slow_tree.heading("parametres", text="Paramètres")
+        self.slow_tree.column("date", width=130)
+        self.slow_tree.column("duree", width=80, anchor="e")
+        self.slow_tree.column("sql", width=450)
+        self.slow_tree.column("parametres", width=200)
+        self.slow_tree.pack(fill="both", expand=True)
+        
+        # Boutons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill="x", pady=10)
+        
+        ttk.Button(button_frame, text="Actualiser", command=self.load_stats).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Réinitialiser", command=self.reset_stats).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="Exporter le profil", command=self.export_profile).pack(side="right", padx=5)
+    
+    def load_stats(self):
+        """Charge les statistiques de performance"""
+        for tree in (self.ops_tree, self.slow_tree):
+            for item in tree.get_children():
+                tree.delete(item)
+        
+        for stat in performance.statistiques():
+            self.ops_tree.insert("", "end", values=(
+                stat["operation"], stat["compteur"], stat["erreurs"], f"{stat['moyenne_ms']:.1f}",
+                f"{stat['p50_ms']:.1f}", f"{stat['p95_ms']:.1f}", f"{stat['p99_ms']:.1f}", f"{stat['max_ms']:.1f}"
+            ))
+        
+        for requete in performance.requetes_lentes():
+            self.slow_tree.insert("", "end", values=(
+                requete["date"], f"{requete['duree_ms']:.0f}", requete["sql"], requete["parametres"]
+            ))
+    
+    def reset_stats(self):
+        """Remet les compteurs à zéro"""
+        if messagebox.askyesno("Confirmation", "Réinitialiser les statistiques de performance ?", parent=self):
+            performance.reinitialiser()
+            self.load_stats()
+    
+    def export_profile(self):
+        """Exporte un instantané du profil pour le support"""
+        chemin = filedialog.asksaveasfilename(
+            parent=self,
+            title="Exporter le profil de performance",
+            defaultextension=".json",
+            initialfile=f"profil_performance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            filetypes=[("Fichier JSON", "*.json")]
+        )
+        if not chemin:
+            return
+        try:
+            performance.exporter_profil(chemin)
+            messagebox.showinfo("Succès", f"Profil exporté dans :\n{chemin}", parent=self)
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Impossible d'exporter le profil: {e}", parent=self)
+
 # ==================== POINT D'ENTRÉE ====================
 if __name__ == "__main__":
+    # Processus du pool d'export (export_carte) dans l'exécutable figé
+    multiprocessing.freeze_support()
+    
     # Vérification initiale des permissions
     try:
         if not setup_permissions():
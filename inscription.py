@@ -21,6 +21,8 @@ import stat
 import shutil
 from typing import Optional, List, Dict, Tuple
 import subprocess
+from migrations import appliquer_migrations
+from monnaie import Montant, TYPES_DETECTES
 
 # ==================== CONFIGURATION DE LA BASE DE DONNÉES CENTRALE ====================
 
@@ -76,7 +78,7 @@ def connexion_db() -> sqlite3.Connection:
     """Établit une connexion à la base centrale"""
     db_path = get_db_path()
     try:
-        conn = sqlite3.connect(db_path, timeout=30)
+        conn = sqlite3.connect(db_path, timeout=30, detect_types=TYPES_DETECTES)
         conn.execute("PRAGMA journal_mode=WAL")
         conn.execute("PRAGMA foreign_keys=ON")
         return conn
@@ -84,105 +86,17 @@ def connexion_db() -> sqlite3.Connection:
         raise sqlite3.OperationalError(f"Impossible de se connecter à la base centrale: {str(e)}\nChemin: {db_path}")
 
 def initialiser_base():
-    """Vérifie et initialise la structure de la base si nécessaire"""
+    """Initialise ou met à jour la structure de la base (migrations versionnées)"""
     try:
         with connexion_db() as conn:
+            appliquer_migrations(conn)
             cur = conn.cursor()
-            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='abonne'")
-            if not cur.fetchone():
-                # Créer la structure de base
-                schema = """
-                CREATE TABLE IF NOT EXISTS agent (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nom_agent TEXT NOT NULL,
-                    identifiant TEXT UNIQUE NOT NULL,
-                    mot_de_passe TEXT NOT NULL,
-                    photo BLOB,
-                    role TEXT DEFAULT 'agent',
-                    date_creation TEXT,
-                    actif INTEGER DEFAULT 1
-                );
-                
-                CREATE TABLE IF NOT EXISTS abonne (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_client TEXT UNIQUE NOT NULL,
-                    numero_carte TEXT UNIQUE NOT NULL,
-                    nom TEXT NOT NULL,
-                    postnom TEXT,
-                    prenom TEXT,
-                    sexe TEXT CHECK(sexe IN ('M', 'F')),
-                    date_naissance TEXT,
-                    lieu_naissance TEXT,
-                    adresse TEXT,
-                    telephone TEXT,
-                    suppleant TEXT,
-                    contact_suppleant TEXT,
-                    type_compte TEXT NOT NULL CHECK(type_compte IN ('Fixe', 'Mixte', 'Bloque')),
-                    montant REAL,
-                    photo TEXT,
-                    date_inscription TEXT,
-                    solde REAL DEFAULT 0,
-                    duree_blocage INTEGER DEFAULT 0,
-                    montant_atteindre REAL DEFAULT 0,
-                    pourcentage_retrait INTEGER DEFAULT 30,
-                    frequence_retrait TEXT DEFAULT 'Mensuel',
-                    date_derniere_operation TEXT,
-                    statut TEXT DEFAULT 'Actif' CHECK(statut IN ('Actif', 'Inactif', 'Bloqué'))
-                );
-                
-                CREATE TABLE IF NOT EXISTS depots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_client TEXT NOT NULL,
-                    montant REAL NOT NULL,
-                    ref_depot TEXT UNIQUE,
-                    heure TEXT NOT NULL,
-                    date_depot TEXT NOT NULL,
-                    nom_agent TEXT NOT NULL,
-                    methode_paiement TEXT
-                );
-                
-                CREATE TABLE IF NOT EXISTS retraits (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_client TEXT NOT NULL,
-                    montant REAL NOT NULL,
-                    ref_retrait TEXT UNIQUE,
-                    heure TEXT NOT NULL,
-                    date_retrait TEXT NOT NULL,
-                    agent TEXT NOT NULL,
-                    statut TEXT DEFAULT 'En attente'
-                );
-                
-                CREATE TABLE IF NOT EXISTS journal (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    action TEXT NOT NULL,
-                    acteur TEXT NOT NULL,
-                    date_action TEXT NOT NULL,
-                    heure_action TEXT NOT NULL,
-                    cible TEXT,
-                    details TEXT
-                );
-                
-                CREATE TABLE IF NOT EXISTS compte_fixe (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_client TEXT NOT NULL,
-                    numero_carte TEXT UNIQUE NOT NULL,
-                    montant_initial REAL NOT NULL,
-                    date_debut TEXT NOT NULL,
-                    date_fin TEXT NOT NULL
-                );
-                
-                CREATE TABLE IF NOT EXISTS compte_fixe_pages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    numero_carte TEXT NOT NULL,
-                    numero_client TEXT NOT NULL,
-                    page INTEGER NOT NULL,
-                    cases_remplies INTEGER DEFAULT 0
-                );
-                
-                INSERT INTO agent (nom_agent, identifiant, mot_de_passe, role, date_creation) 
-                VALUES ('Admin', 'admin', '8c6976e5b5410415bde908bd4dee15dfb167a9c873fc4bb8a81f6f2ab448a918', 'admin', datetime('now'));
-                """
-                cur.executescript(schema)
+            cur.execute("SELECT COUNT(*) FROM agent")
+            if cur.fetchone()[0] == 0:
+                cur.execute("""
+                    INSERT INTO agent (nom_agent, identifiant, mot_de_passe, role, date_creation)
+                    VALUES ('Admin', 'admin', '8c6976e5b5410415bde908bd4dee15dfb167a9c873fc4bb8a81f6f2ab448a918', 'admin', datetime('now'))
+                """)
                 conn.commit()
                 print("Structure de base de données initialisée")
     except Exception as e:
@@ -757,7 +671,7 @@ class InscriptionInterface:
                     self.data["suppleant"].get() or "",
                     self.data["contact_suppleant"].get() or "",
                     self.data["type_compte"].get(),
-                    float(self.data["montant"].get() or 0),
+                    Montant.depuis(self.data["montant"].get() or 0),
                     self.data["photo"].get() or "",
                     datetime.date.today().isoformat(),
                     0,  # solde initial
@@ -999,7 +913,7 @@ class InscriptionInterface:
                 par_type = cur.fetchall()
                 
                 # Total des soldes
-                cur.execute("SELECT SUM(solde) FROM abonne")
+                cur.execute('SELECT SUM(solde) AS "total [MONTANT]" FROM abonne')
                 total_soldes = cur.fetchone()[0] or 0
                 
                 # Rapport
@@ -10,33 +10,40 @@ import shutil
 import random
 import sqlite3
 from PIL import Image, ImageTk
-try:
-    import cv2
-    import numpy as np
-    CV2_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: OpenCV not available - {e}")
-    CV2_AVAILABLE = False
-    cv2 = None
-    np = None
+from demarrage import importer
+from performance import chronometrer
+from monnaie import Montant
+from services import CarnetService
+import capture
+
+# OpenCV/numpy ne sont chargés qu'à la première utilisation de la caméra
+cv2 = None
+np = None
+CV2_AVAILABLE = None
+
+def cv2_disponible() -> bool:
+    """Importe OpenCV au premier usage et indique s'il est disponible"""
+    global cv2, np, CV2_AVAILABLE
+    if CV2_AVAILABLE is None:
+        try:
+            cv2 = importer("cv2")
+            np = importer("numpy")
+            CV2_AVAILABLE = True
+        except ImportError as e:
+            print(f"Warning: OpenCV not available - {e}")
+            CV2_AVAILABLE = False
+    return CV2_AVAILABLE
 import tempfile
-from fpdf import FPDF
 import subprocess
 import webbrowser
 import traceback
-from interface_retrait import interface_retrait
-from fenetre_depot import FenetreDepot
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from typing import Optional
 import logging
 
 # Import des modules de la base de données
+from clients import cache_profils
 from db import (
-    connexion_db, initialiser_base, ajouter_journal,generate_unique_id,
+    DBConfig, connexion_db, initialiser_base, ajouter_journal,generate_unique_id,
     generer_numero_carte_unique, initialiser_pages_compte_fixe, hash_password, resource_path
 )
 
@@ -126,87 +133,58 @@ BUTTON_HOVER = "#075E54"
 ERROR_COLOR = "#FF5252"
 
 class WebcamCapture:
+    """Caméra de la fenêtre de capture (lecture en continu : voir capture.py)"""
     def __init__(self):
-        self.cap = None
+        self.flux = None
         self.current_camera_index = 0
         self.camera_list = []
         
-    def detect_cameras(self):
-        """Détecte les caméras disponibles"""
-        if not CV2_AVAILABLE:
+    def detect_cameras(self, forcer=False):
+        """Détecte les caméras disponibles (sondage mémorisé entre les sessions)"""
+        if not cv2_disponible():
             return []  # Retourne une liste vide si OpenCV n'est pas installé
-            
-        index = 0
-        arr = []
-        for i in range(0, 4):  # Vérifie les 4 premiers indices
-            try:
-                cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-                if cap is not None and cap.isOpened():
-                    ret, frame = cap.read()
-                    if ret:
-                        arr.append(i)
-                    cap.release()
-            except Exception as e:
-                print(f"Erreur caméra {i}: {str(e)}")
-                continue
-        self.camera_list = arr
-        return arr
+        self.camera_list = capture.detecter_cameras(forcer)
+        return self.camera_list
     
     def start_capture(self, index=0):
         """Démarre la capture vidéo"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return False
             
-        if self.cap is not None:
+        if self.flux is not None:
             self.stop_capture()
             
         if index >= len(self.camera_list):
             return False
             
         self.current_camera_index = index
-        try:
-            self.cap = cv2.VideoCapture(self.camera_list[index], cv2.CAP_DSHOW)
-            if self.cap.isOpened():
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                return True
-        except Exception as e:
-            print(f"Erreur démarrage capture: {str(e)}")
+        self.flux = capture.Capture(capture.source_capture(self.camera_list[index]))
+        if self.flux.demarrer():
+            return True
+        self.flux = None
         return False
     
     def get_frame(self):
-        """Capture une frame de la webcam"""
-        if not CV2_AVAILABLE:
-            return None
-            
-        if self.cap is None or not self.cap.isOpened():
+        """Dernière image capturée (RGB, pleine résolution)"""
+        if self.flux is None:
             return None
-            
-        try:
-            ret, frame = self.cap.read()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                return frame
-        except Exception as e:
-            print(f"Erreur capture frame: {str(e)}")
-        return None
+        return self.flux.image()
+    
+    def get_preview(self, depuis=0):
+        """(numéro, aperçu PIL réduit) si une image plus récente que depuis est arrivée"""
+        if self.flux is None:
+            return depuis, None
+        return self.flux.apercu(depuis)
     
     def stop_capture(self):
         """Arrête la capture vidéo"""
-        if not CV2_AVAILABLE:
-            return
-            
-        if self.cap is not None:
-            try:
-                if self.cap.isOpened():
-                    self.cap.release()
-            except:
-                pass
-            self.cap = None
+        if self.flux is not None:
+            self.flux.arreter()
+            self.flux = None
     
     def switch_camera(self):
         """Change de caméra"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return False
             
         if not self.camera_list:
@@ -280,7 +258,7 @@ class InscriptionInterface:
             self.nom_agent = "Agent_" + datetime.datetime.now().strftime("%Y%m%d_%H%M")
             print(f"Avertissement: Utilisation du nom d'agent par défaut: {self.nom_agent}")
         
-        FenetreDepot(self.parent, self.nom_agent)
+        importer("fenetre_depot").FenetreDepot(self.parent, self.nom_agent)
         
     def create_header(self):
         """Crée l'en-tête de l'application"""
@@ -311,7 +289,7 @@ class InscriptionInterface:
     
     def ouvrir_interface_retrait(self):
         """Ouvre l'interface de retrait"""
-        interface_retrait(self.nom_agent)
+        importer("interface_retrait").interface_retrait(self.nom_agent)
     
     def create_main_frame(self):
         """Crée le cadre principal avec une répartition 60/40"""
@@ -603,7 +581,7 @@ class InscriptionInterface:
     def lancer_interface_capture(self):
         """Lance l'interface de capture indépendante"""
         # Vérifier si OpenCV est disponible
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             messagebox.showwarning("Fonction désactivée", 
                                   "OpenCV n'est pas installé. La capture caméra est désactivée.")
             return
@@ -614,10 +592,11 @@ class InscriptionInterface:
             messagebox.showerror("Erreur", "Aucune webcam détectée")
             return
             
-        # Démarrer la capture
+        # Démarrer la capture (caméras mémorisées : nouveau sondage si elles ont changé)
         if not self.webcam.start_capture():
-            messagebox.showerror("Erreur", "Impossible de démarrer la webcam")
-            return
+            if not self.webcam.detect_cameras(forcer=True) or not self.webcam.start_capture():
+                messagebox.showerror("Erreur", "Impossible de démarrer la webcam")
+                return
             
         # Créer la fenêtre de capture
         capture_win = tk.Toplevel()
@@ -654,22 +633,24 @@ class InscriptionInterface:
         capture_win.bind('<space>', lambda e: self.capture_image(capture_win))
         capture_win.focus_force()
         
+        apercu_courant = {"numero": 0, "photo": None}
+        
         def update_video():
-            """Mise à jour de l'image vidéo"""
-            frame = self.webcam.get_frame()
-            if frame is not None:
-                try:
-                    img = Image.fromarray(frame)
-                    img = img.resize((640, 480), Image.LANCZOS)
-                    photo = ImageTk.PhotoImage(img)
+            """Affiche le dernier aperçu, préparé par le thread de capture"""
+            if not capture_win.winfo_exists():
+                return
+            numero, apercu = self.webcam.get_preview(apercu_courant["numero"])
+            if apercu is not None:
+                apercu_courant["numero"] = numero
+                photo = apercu_courant["photo"]
+                if photo is None or (photo.width(), photo.height()) != apercu.size:
+                    photo = ImageTk.PhotoImage(apercu)
+                    apercu_courant["photo"] = photo
                     video_label.config(image=photo)
                     video_label.image = photo
-                    capture_win.after(10, update_video)
-                except Exception as e:
-                    print(f"Erreur mise à jour vidéo: {str(e)}")
-                    capture_win.after(100, update_video)
-            else:
-                capture_win.after(100, update_video)
+                else:
+                    photo.paste(apercu)
+            capture_win.after(capture.INTERVALLE_APERCU_MS, update_video)
         
         update_video()
         
@@ -912,32 +893,18 @@ class InscriptionInterface:
             if conn:
                 conn.close()
 
+    @chronometrer("ui.profil")
     def afficher_profil(self, abonne_id):
         """Affiche les détails d'un abonné dans une nouvelle fenêtre"""
-        conn = None
         try:
-            conn = connexion_db()
-            conn.row_factory = sqlite3.Row
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM abonne WHERE id=?", (abonne_id,))
-            abonne = cur.fetchone()
+            # Profil complet (compte fixe compris) en une requête, servi par le cache
+            abonne = cache_profils(DBConfig.get_db_path()).profil(abonne_id)
             
             if not abonne:
                 messagebox.showerror("Erreur", "Abonné introuvable")
                 return
             
-            # Récupérer les infos spécifiques au compte fixe si nécessaire
-            type_compte = abonne['type_compte']
-            infos_compte_fixe = None
-            if type_compte == "Fixe":
-                cur.execute("""
-                    SELECT cf.montant_initial, cf.date_debut, cf.date_fin,
-                           (SELECT COUNT(*) FROM compte_fixe_pages WHERE numero_carte = ? AND cases_remplies = 31) as pages_completes,
-                           (SELECT SUM(cases_remplies) FROM compte_fixe_pages WHERE numero_carte = ?) as total_cases
-                    FROM compte_fixe cf
-                    WHERE cf.numero_carte = ?
-                """, (abonne['numero_carte'], abonne['numero_carte'], abonne['numero_carte']))
-                infos_compte_fixe = cur.fetchone()
+            infos_compte_fixe = abonne['compte_fixe'] if abonne['type_compte'] == "Fixe" else None
             
             profile_win = tk.Toplevel()
             profile_win.title(f"Profil de l'abonné {abonne['nom']} {abonne['prenom']}")
@@ -1062,7 +1029,7 @@ class InscriptionInterface:
                     ("Date fin:", date_fin),
                     ("Pages complètes:", f"{pages_completes}/8"),
                     ("Cases remplies:", f"{total_cases}/248"),
-                    ("Montant épargné:", f"{int(montant_initial * total_cases)} FC")
+                    ("Montant épargné:", f"{int(Montant.depuis_base(infos_compte_fixe['montant_epargne']))} FC")
                 ])
             
             for i, (text, value) in enumerate(labels):
@@ -1092,10 +1059,8 @@ class InscriptionInterface:
                          command=lambda: self.afficher_carnet_fixe(abonne['numero_carte'])).pack(side='left', padx=10)
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de l'affichage du profil: {str(e)}")
-        finally:
-            if conn:
-                conn.close()
 
+    @chronometrer("ui.inscription")
     def enregistrer(self):
         """Enregistre un nouvel abonné"""
         if not self.validate_fields():
@@ -1135,7 +1100,7 @@ class InscriptionInterface:
                     "suppleant": self.data["suppleant"].get() or "",
                     "contact_suppleant": self.data["contact_suppleant"].get() or "",
                     "type_compte": type_compte,
-                    "montant": float(self.data["montant"].get() or 0),
+                    "montant": Montant.depuis(self.data["montant"].get() or 0),
                     "photo": self.data["photo"].get() or "",
                     "date_inscription": datetime.date.today().isoformat(),
                     "solde": 0,
@@ -1151,7 +1116,7 @@ class InscriptionInterface:
                 if type_compte == "Bloqué":
                     data_values.update({
                         "duree_blocage": int(self.data["duree_blocage"].get()),
-                        "montant_atteindre": float(self.data["montant_atteindre"].get() or 0),
+                        "montant_atteindre": Montant.depuis(self.data["montant_atteindre"].get() or 0),
                         "pourcentage_retrait": int(self.data["pourcentage_retrait"].get()),
                         "frequence_retrait": self.data["frequence_retrait"].get()
                     })
@@ -1211,7 +1176,7 @@ class InscriptionInterface:
                 
                 message = f"Abonné enregistré avec succès!"
                 if type_compte == "Fixe":
-                    message += f"\nCompte fixe configuré avec un montant initial de {data_values['montant']} FC"
+                    message += f"\nCompte fixe configuré avec un montant initial de {data_values['montant'].formater()}"
                 
                 messagebox.showinfo("Succès", message)
                 self.afficher_donnees()
@@ -1237,11 +1202,11 @@ class InscriptionInterface:
             # Récupérer les infos du compte fixe
             cur.execute("""
                 SELECT cf.montant_initial, cf.date_debut, cf.date_fin,
-                       (SELECT COUNT(*) FROM compte_fixe_pages WHERE numero_carte = ? AND cases_remplies = 31) as pages_completes,
-                       (SELECT SUM(cases_remplies) FROM compte_fixe_pages WHERE numero_carte = ?) as total_cases
+                       p.pages_completes, p.total_cases
                 FROM compte_fixe cf
+                LEFT JOIN carnet_progression p ON p.numero_client = cf.numero_client
                 WHERE cf.numero_carte = ?
-            """, (numero_carte, numero_carte, numero_carte))
+            """, (numero_carte,))
             
             compte_fixe = cur.fetchone()
             
@@ -1253,14 +1218,8 @@ class InscriptionInterface:
             pages_completes = compte_fixe[3] or 0
             total_cases = compte_fixe[4] or 0
             
-            # Récupérer les pages existantes
-            cur.execute("""
-                SELECT page, cases_remplies 
-                FROM compte_fixe_pages 
-                WHERE numero_carte = ? 
-                ORDER BY page
-            """, (numero_carte,))
-            pages_existantes = {row[0]: row[1] for row in cur.fetchall()}
+            # Remplissage des pages, déduit du nombre de cases
+            pages_existantes = dict(CarnetService.pages(total_cases))
             
             # Créer la fenêtre
             fen_carnet = tk.Toplevel(self.parent)
@@ -1348,6 +1307,12 @@ class InscriptionInterface:
     def exporter_carnet_pdf(self, numero_carte, montant_initial, pages_existantes):
         """Exporte le carnet de compte fixe en PDF"""
         try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib import colors
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.enums import TA_CENTER
+            
             with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
                 fichier = tmp.name
             
@@ -1515,7 +1480,7 @@ class InscriptionInterface:
         """Enregistre la configuration des retraits pour un compte bloqué"""
         conn = None
         try:
-            montant = float(self.montant_atteindre_var.get())
+            montant = Montant.depuis(self.montant_atteindre_var.get())
             pourcentage = int(self.pourcentage_retrait_var.get())
             frequence = self.frequence_retrait_var.get()
             
@@ -1530,6 +1495,7 @@ class InscriptionInterface:
                 WHERE id = ?
             """, (montant, pourcentage, frequence, abonne_id))
             conn.commit()
+            cache_profils(DBConfig.get_db_path()).invalider(abonne_id)
             
             messagebox.showinfo("Succès", "Configuration enregistrée avec succès!")
         except ValueError:
@@ -1543,6 +1509,7 @@ class InscriptionInterface:
     def exporter_pdf(self, abonne):
         """Exporte le profil de l'abonné en PDF"""
         try:
+            FPDF = importer("fpdf").FPDF
             pdf = FPDF()
             pdf.add_page()
             pdf.set_font("Arial", 'B', 16)
@@ -1615,11 +1582,11 @@ class InscriptionInterface:
                     cur = conn.cursor()
                     cur.execute("""
                         SELECT cf.montant_initial, cf.date_debut, cf.date_fin,
-                               (SELECT COUNT(*) FROM compte_fixe_pages WHERE numero_carte = ? AND cases_remplies = 31) as pages_completes,
-                               (SELECT SUM(cases_remplies) FROM compte_fixe_pages WHERE numero_carte = ?) as total_cases
+                               COALESCE(p.pages_completes, 0), COALESCE(p.total_cases, 0), p.montant_epargne
                         FROM compte_fixe cf
+                        LEFT JOIN carnet_progression p ON p.numero_client = cf.numero_client
                         WHERE cf.numero_carte = ?
-                    """, (abonne['numero_carte'], abonne['numero_carte'], abonne['numero_carte']))
+                    """, (abonne['numero_carte'],))
                     infos_compte_fixe = cur.fetchone()
                 except Exception as e:
                     print(f"Erreur récupération compte fixe: {str(e)}")
@@ -1662,7 +1629,7 @@ class InscriptionInterface:
                     f"Date fin: {infos_compte_fixe[2]}",
                     f"Pages complètes: {infos_compte_fixe[3]}/8",
                     f"Cases remplies: {infos_compte_fixe[4]}/248",
-                    f"Montant épargné: {infos_compte_fixe[0] * infos_compte_fixe[4]:,.2f} FC"
+                    f"Montant épargné: {Montant.depuis_base(infos_compte_fixe[5]):,.2f} FC"
                 ])
         
             for info in infos:
@@ -1752,12 +1719,15 @@ class InscriptionInterface:
             cur.execute("SELECT numero_carte FROM abonne WHERE id = ?", (abonne_id,))
             numero_carte = cur.fetchone()[0]
             
+            cur.execute("DELETE FROM carnet_depots WHERE numero_carte = ?", (numero_carte,))
+            cur.execute("DELETE FROM carnet_progression WHERE numero_carte = ?", (numero_carte,))
             cur.execute("DELETE FROM compte_fixe_pages WHERE numero_carte = ?", (numero_carte,))
             cur.execute("DELETE FROM compte_fixe WHERE numero_carte = ?", (numero_carte,))
             
             # Puis supprimer l'abonné
             cur.execute("DELETE FROM abonne WHERE id=?", (abonne_id,))
             conn.commit()
+            cache_profils(DBConfig.get_db_path()).invalider(abonne_id)
             
             ajouter_journal("Suppression", "Admin", f"Abonné supprimé: {nom_complet}")
             
@@ -1769,6 +1739,7 @@ class InscriptionInterface:
             if conn:
                 conn.close()
     
+    @chronometrer("ui.inscription.recherche")
     def rechercher_abonne(self):
         """Recherche des abonnés par nom, prénom ou numéro"""
         if not hasattr(self, 'scrollable_frame'):
@@ -1946,6 +1917,7 @@ class InscriptionInterface:
             if conn:
                 conn.close()
     
+    @chronometrer("ui.rapport.global_abonnes")
     def rapport_global(self):
         """Affiche les statistiques globales"""
         conn = None
@@ -1974,7 +1946,7 @@ class InscriptionInterface:
             
             # Statistiques par type de compte
             cur.execute("""
-                SELECT type_compte, COUNT(*), SUM(solde)
+                SELECT type_compte, COUNT(*), SUM(solde) AS "total [MONTANT]"
                 FROM abonne
                 GROUP BY type_compte
             """)
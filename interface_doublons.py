@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from db import connexion_db
+from db import connexion_db, connexion_lecture_rapports
+from monnaie import Montant
 from datetime import datetime
 import webbrowser
 import tempfile
@@ -92,7 +93,7 @@ class DoublonsInterface:
         for item in self.tree.get_children():
             self.tree.delete(item)
             
-        conn = connexion_db()
+        conn = connexion_lecture_rapports()
         cursor = conn.cursor()
         
         try:
@@ -122,6 +123,7 @@ class DoublonsInterface:
             
         item = self.tree.item(selected[0])["values"]
         numero_client, montant, heure, date_depot, _ = item
+        montant = Montant.depuis(montant)
         
         conn = connexion_db()
         cursor = conn.cursor()
@@ -157,7 +159,7 @@ class DoublonsInterface:
             messagebox.showinfo(
                 "Succès",
                 f"{len(ids_a_supprimer)} doublon(s) supprimé(s)\n"
-                f"Montant déduit: {montant_total}",
+                f"Montant déduit: {montant_total.formater()}",
                 parent=self.root
             )
             
@@ -177,6 +179,7 @@ class DoublonsInterface:
             
         item = self.tree.item(selected[0])["values"]
         numero_client, montant, heure, date_depot, _ = item
+        montant = Montant.depuis(montant)
         
         conn = connexion_db()
         cursor = conn.cursor()
@@ -208,7 +211,7 @@ class DoublonsInterface:
             messagebox.showinfo(
                 "Succès",
                 f"Toutes les occurrences ({len(ids)}) ont été supprimées\n"
-                f"Montant déduit: {montant_total}",
+                f"Montant déduit: {montant_total.formater()}",
                 parent=self.root
             )
             
@@ -13,10 +13,15 @@ import hashlib
 import logging
 import shutil
 from typing import Optional, Tuple
-import export_retrait
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_pdf import PdfPages
-import math
+from demarrage import importer
+from migrations import appliquer_migrations
+from performance import chronometrer, ConnexionChronometree
+from services import RetraitService, DemandeRetrait, CleSaisie
+from lecture import connexion_rapport
+from monnaie import Montant, TYPES_DETECTES
+from references import cache_reference
+from clients import cache_clients
+from cumuls import lire_cumuls, total_cumuls
 
 # Configuration des couleurs
 BG_COLOR = "#f0f8ff"
@@ -102,7 +107,9 @@ def connexion_db() -> sqlite3.Connection:
             conn = sqlite3.connect(
                 chemin_db,
                 timeout=30,
-                check_same_thread=False
+                check_same_thread=False,
+                detect_types=TYPES_DETECTES,
+                factory=ConnexionChronometree
             )
             conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("PRAGMA synchronous=NORMAL")
@@ -120,6 +127,19 @@ def connexion_db() -> sqlite3.Connection:
     
     raise sqlite3.Error("Échec inattendu de connexion")
 
+def verifier_structure_bd() -> bool:
+    """Met à jour la structure de la base de données (migrations versionnées)"""
+    try:
+        conn = connexion_db()
+        try:
+            appliquer_migrations(conn)
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.error("Erreur migration de la base: %s", str(e))
+        return False
+
 def hash_password(password: str, salt: str = "fixed_salt_value") -> str:
     return hashlib.sha256((password + salt).encode()).hexdigest()
 
@@ -174,23 +194,26 @@ def create_default_avatar(name: str, size: Tuple[int, int] = (60, 60)) -> ImageT
     return ImageTk.PhotoImage(img)
 
 def get_parametre(cle: str, default: float) -> float:
-    try:
-        with connexion_db() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT valeur FROM parametres WHERE cle = ?", (cle,))
-            result = cur.fetchone()
-            return float(result[0]) if result else default
-    except sqlite3.Error as e:
-        logger.error(f"Erreur récupération paramètre {cle}: {e}")
-        return default
+    """Paramètre numérique (cache des données de référence)"""
+    return cache_reference(get_db_path()).parametre(cle, default)
 
 def interface_retrait(nom_agent, parent_window=None):
     # CORRECTION PRINCIPALE : Utiliser la fenêtre parente si fournie
     root = parent_window if parent_window else tk.Toplevel()
     
+    # Schéma à jour avant tout accès (montants en centimes, clés d'idempotence)
+    if not verifier_structure_bd():
+        messagebox.showerror("Erreur", "Mise à jour de la base de données impossible. "
+                             "Consultez le journal de l'application.", parent=root)
+        root.destroy()
+        return
+    
     # Récupération des paramètres système
     taux_interet = get_parametre('taux_interet', 5.0)
     montant_min_retrait = get_parametre('retrait_min', 1000.0)
+    clients = cache_clients(get_db_path(), connexion_db)
+    retrait_service = RetraitService(connexion_db, references=cache_reference(get_db_path()),
+                                     clients=clients)
     
     root.title("SERVICE CENTRAL D'EPARGNE POUR LA PROMOTION DE L'ENTREPRENEURIAT - S-MONEY")
     root.geometry("1000x700")
@@ -280,15 +303,17 @@ def interface_retrait(nom_agent, parent_window=None):
     current_abonne = None
     current_id_client = None
     current_numero_carte = None
-    current_solde = 0.0
+    current_solde = Montant()
     dernier_retrait_data = None
-    montant_initial = 0.0
+    cle_retrait = CleSaisie()  # un double envoi non confirmé ne crée qu'un retrait
+    montant_initial = Montant()
     type_compte = ""
     
     type_global_var = tk.StringVar(value="fixe")
     interet_var = tk.StringVar(value=f"{taux_interet}%")
     
     # Fonctions principales
+    @chronometrer("ui.retrait.recherche")
     def rechercher():
         nonlocal current_abonne, current_id_client, current_solde, current_numero_carte, montant_initial, type_compte
         identifiant = entree_id.get().strip()
@@ -301,57 +326,46 @@ def interface_retrait(nom_agent, parent_window=None):
         root.update()
         
         try:
-            with connexion_db() as conn:
-                conn.row_factory = sqlite3.Row
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT 
-                        a.nom, a.postnom, a.prenom, 
-                        a.numero_client, a.numero_carte, a.solde,
-                        a.type_compte, cf.montant_initial
-                    FROM abonne a
-                    LEFT JOIN compte_fixe cf ON a.numero_carte = cf.numero_carte
-                    WHERE a.numero_client=? OR a.numero_carte=?
-                """, (identifiant, identifiant))
-                res = cur.fetchone()
-                
-                if not res:
-                    messagebox.showerror("Erreur", "Abonné introuvable.")
-                    current_abonne = None
-                    current_id_client = None
-                    current_numero_carte = None
-                    current_solde = 0.0
-                    montant_initial = 0.0
-                    label_nom_val.config(text="")
-                    label_solde_val.config(text="")
-                    label_type_compte.config(text="")
-                    return
+            # Instantané partagé avec l'écran de dépôt (solde tenu à jour par les services)
+            res = clients.rechercher(identifiant)
+            
+            if not res:
+                messagebox.showerror("Erreur", "Abonné introuvable.")
+                current_abonne = None
+                current_id_client = None
+                current_numero_carte = None
+                current_solde = Montant()
+                montant_initial = Montant()
+                label_nom_val.config(text="")
+                label_solde_val.config(text="")
+                label_type_compte.config(text="")
+                return
 
-                nom_complet = f"{res['nom']} {res['postnom']} {res['prenom']}"
-                num_client = res['numero_client']
-                current_numero_carte = res['numero_carte']
-                solde = res['solde'] or 0.0
-                type_compte = res['type_compte'] or "Inconnu"
-                montant_initial = res['montant_initial'] or 0.0
+            nom_complet = res.nom_complet
+            num_client = res.numero_client
+            current_numero_carte = res.numero_carte
+            solde = res.solde
+            type_compte = res.type_compte or "Inconnu"
+            montant_initial = res.montant_initial or Montant()
 
-                current_abonne = nom_complet
-                current_id_client = num_client
-                current_solde = solde
+            current_abonne = nom_complet
+            current_id_client = num_client
+            current_solde = solde
 
-                label_nom_val.config(text=nom_complet)
-                label_solde_val.config(text=f"{solde:,.0f} FC".replace(",", " "))
-                label_type_compte.config(text=type_compte)
-                
-                # Mise à jour de la couleur selon le type de compte
-                if type_compte == "Fixe":
-                    label_type_compte.config(foreground=ACCENT_COLOR)
-                elif type_compte == "Mixte":
-                    label_type_compte.config(foreground=SUCCESS_COLOR)
-                else:
-                    label_type_compte.config(foreground=TEXT_COLOR)
-                
-                label_solde_val.config(foreground=SUCCESS_COLOR)
-                root.after(1000, lambda: label_solde_val.config(foreground=TEXT_COLOR))
+            label_nom_val.config(text=nom_complet)
+            label_solde_val.config(text=f"{solde:,.0f} FC".replace(",", " "))
+            label_type_compte.config(text=type_compte)
+            
+            # Mise à jour de la couleur selon le type de compte
+            if type_compte == "Fixe":
+                label_type_compte.config(foreground=ACCENT_COLOR)
+            elif type_compte == "Mixte":
+                label_type_compte.config(foreground=SUCCESS_COLOR)
+            else:
+                label_type_compte.config(foreground=TEXT_COLOR)
+            
+            label_solde_val.config(foreground=SUCCESS_COLOR)
+            root.after(1000, lambda: label_solde_val.config(foreground=TEXT_COLOR))
                 
         except sqlite3.Error as e:
             messagebox.showerror("Erreur", f"Erreur base de données: {str(e)}")
@@ -372,9 +386,7 @@ def interface_retrait(nom_agent, parent_window=None):
                 interet_label.grid(row=6, column=0, sticky=tk.W, padx=5, pady=5)
                 interet_menu.grid(row=6, column=1, sticky=tk.W, padx=5, pady=5)
 
-    def generer_ref():
-        return f"R{random.randint(100000, 999999)}"
-
+    @chronometrer("ui.retrait")
     def effectuer_retrait():
         nonlocal current_solde, current_id_client, dernier_retrait_data, montant_initial, type_compte
         if current_id_client is None:
@@ -382,179 +394,56 @@ def interface_retrait(nom_agent, parent_window=None):
             return
         
         try:
-            montant = float(entree_montant.get())
+            montant = Montant.depuis(entree_montant.get())
         except ValueError:
             messagebox.showerror("Erreur", "Montant invalide.")
             return
         
-        if montant <= 0:
-            messagebox.showerror("Erreur", "Le montant doit être supérieur à 0.")
-            return
-        
         type_retrait = type_retrait_var.get()
-        type_global = type_global_var.get() if type_retrait == "global" else ""
-        
-        # Vérification des règles de type de compte
-        if type_retrait == "global":
-            if type_compte == "Fixe" and type_global != "fixe":
-                messagebox.showerror("Erreur", 
-                    "Ce compte fixe ne peut que faire un retrait global de type fixe.")
-                return
-                
-            if type_compte == "Mixte" and type_global == "fixe":
-                messagebox.showerror("Erreur", 
-                    "Ce compte mixte ne peut pas faire un retrait global de type fixe.")
-                return
-                
-            if type_global == "bloqué":
-                messagebox.showerror("Erreur", 
-                    "Ce type de retrait n'est pas encore défini. Veuillez contactez l'administrateur.")
-                return
-        
-        if type_retrait == "partiel" or (type_retrait == "global" and type_global == "mixte"):
-            if montant < montant_min_retrait:
-                messagebox.showerror("Erreur", 
-                    f"Le montant minimum de retrait est {montant_min_retrait:,.0f} FC")
+        taux_interet_saisi = None
+        if type_retrait == "global" and type_global_var.get() == "mixte":
+            try:
+                taux_interet_saisi = float(interet_var.get().replace("%", ""))
+            except ValueError as e:
+                messagebox.showerror("Erreur", f"Erreur de taux ou montant : {e}")
                 return
         
-        type_retrait = type_retrait_var.get()
-        montant_retrait = 0.0
-        commission = 0.0
-        montant_net = 0.0
-        
         retrait_button.config(state=tk.DISABLED, text="Traitement en cours...")
-        root.update()
-        time.sleep(0.5)
+        retrait_button.update_idletasks()
         
-        if type_retrait == "partiel":
-            solde_apres = current_solde - montant
-            if type_compte == "Fixe" and montant_initial > 0 and solde_apres < montant_initial:
-                max_retrait = current_solde - montant_initial
-                messagebox.showerror("Erreur", 
-                    f"Le solde après retrait doit être au moins égal au montant initial ({montant_initial:,.0f} FC).\n"
-                    f"Vous pouvez retirer au maximum {max_retrait:,.0f} FC.")
-                retrait_button.config(state=tk.NORMAL, text="Effectuer retrait")
+        try:
+            # Règles (type de compte, minimum, commission, intérêts) et écriture : RetraitService
+            resultat = retrait_service.retirer(DemandeRetrait(
+                numero_client=current_id_client,
+                montant=montant,
+                agent=nom_agent,
+                type_retrait=type_retrait,
+                type_global=type_global_var.get() if type_retrait == "global" else "",
+                taux_interet=taux_interet_saisi,
+                cle_idempotence=cle_retrait.pour(current_id_client, montant, type_retrait,
+                                                 type_global_var.get(), taux_interet_saisi)
+            ))
+            if not resultat.succes:
+                messagebox.showerror(resultat.titre, resultat.message)
                 return
-            montant_retrait = montant
-            montant_net = montant
-        
-        elif type_retrait == "global":
-            type_global = type_global_var.get()
+            cle_retrait.reinitialiser()  # résultat confirmé : un nouveau retrait identique est légitime
             
-            if type_global == "fixe":
-                commission = montant_initial
-                montant_retrait = current_solde
-                montant_net = montant_retrait - commission
-                
-                if montant_net < 0:
-                    messagebox.showerror("Erreur", "Fonds insuffisants pour couvrir la commission.")
-                    retrait_button.config(state=tk.NORMAL, text="Effectuer retrait")
-                    return
-                    
-            elif type_global == "mixte":
-                try:
-                    taux_str = interet_var.get().replace("%", "")
-                    taux = float(taux_str) / 100
-                    interet = montant * taux
-                    montant_retrait = montant + interet
-                    montant_net = montant
-                    commission = interet
-                except Exception as e:
-                    messagebox.showerror("Erreur", f"Erreur de taux ou montant : {e}")
-                    retrait_button.config(state=tk.NORMAL, text="Effectuer retrait")
-                    return
-            else:
-                montant_retrait = montant
-                montant_net = montant
-
-        if montant_retrait > current_solde:
-            # Gestion spéciale pour compte mixte avec solde insuffisant
-            if type_retrait == "global" and type_global == "mixte":
-                taux_str = interet_var.get().replace("%", "")
-                taux = float(taux_str) / 100
-                montant_max = current_solde / (1 + taux)
-                montant_max = math.floor(montant_max)
-                montant_commission = montant_max * taux
-                montant_total = montant_max + montant_commission
-                
-                messagebox.showerror("Erreur", 
-                    f"L'abonné {current_abonne} a un solde insuffisant et ne peut retirer que {montant_max:,.0f} FC\n"
-                    f"(soit un total de {montant_total:,.0f} FC avec commission).")
-                retrait_button.config(state=tk.NORMAL, text="Effectuer retrait")
-                return
-            else:
-                messagebox.showerror("Erreur", 
-                    f"Fonds insuffisants.\nSolde actuel : {current_solde:,.0f} FC")
-                retrait_button.config(state=tk.NORMAL, text="Effectuer retrait")
+            dernier_retrait_data = resultat.bordereau()
+            if resultat.doublon:
+                messagebox.showinfo(
+                    "Déjà enregistré",
+                    f"Ce retrait est déjà enregistré (réf. {resultat.reference}) : il n'a pas été répété."
+                )
                 return
+            current_solde = resultat.nouveau_solde
+            label_solde_val.config(text=f"{current_solde:,.0f} FC".replace(",", " "))
+            entree_montant.delete(0, tk.END)
             
-        ref = generer_ref()
-        maintenant = datetime.datetime.now()
-        
-        try:
-            with connexion_db() as conn:
-                cur = conn.cursor()
-                
-                cur.execute("""
-                    INSERT INTO retraits (
-                        numero_client, montant, ref_retrait, 
-                        heure, date_retrait, agent
-                    ) VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    current_id_client,
-                    montant_retrait,
-                    ref,
-                    maintenant.strftime("%H:%M:%S"),
-                    maintenant.strftime("%Y-%m-%d"),
-                    nom_agent
-                ))
-                
-                cur.execute("""
-                    UPDATE abonne 
-                    SET solde = solde - ?
-                    WHERE numero_client = ?
-                """, (montant_retrait, current_id_client))
-                
-                conn.commit()
-                
-                ajouter_journal(
-                    "Retrait", 
-                    nom_agent, 
-                    cible=current_id_client,
-                    details=f"Montant: {montant_retrait:,.0f} FC, Ref: {ref}"
-                )
-                
-                dernier_retrait_data = {
-                    "numero_client": current_id_client,
-                    "numero_carte": current_numero_carte,
-                    "nom_complet": current_abonne,
-                    "montant_retire": montant_retrait,
-                    "commission": commission,
-                    "montant_net": montant_net,
-                    "ancien_solde": current_solde,
-                    "nouveau_solde": current_solde - montant_retrait,
-                    "date_heure": maintenant.strftime("%d/%m/%Y %H:%M"),
-                    "ref": ref,
-                    "agent": nom_agent,
-                    "montant_initial": montant_initial
-                }
-                
-                cur.execute("SELECT solde FROM abonne WHERE numero_client=?", (current_id_client,))
-                current_solde = cur.fetchone()[0] or 0.0
-                label_solde_val.config(text=f"{current_solde:,.0f} FC".replace(",", " "))
-                entree_montant.delete(0, tk.END)
-                
-                messagebox.showinfo("✅ Succès", 
-                    f"Retrait effectué avec succès pour {current_abonne}\n"
-                    f"• Montant net : {montant_net:,.0f} FC\n"
-                    f"• Commission : {commission:,.0f} FC\n"
-                    f"• Nouveau solde : {current_solde:,.0f} FC")
-                
-                label_solde_val.config(foreground=SUCCESS_COLOR)
-                root.after(2000, lambda: label_solde_val.config(foreground=TEXT_COLOR))
+            messagebox.showinfo(resultat.titre, resultat.message)
+            
+            label_solde_val.config(foreground=SUCCESS_COLOR)
+            root.after(2000, lambda: label_solde_val.config(foreground=TEXT_COLOR))
                 
-        except sqlite3.Error as e:
-            messagebox.showerror("Erreur", f"Erreur base de données: {str(e)}")
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur inattendue: {str(e)}")
         finally:
@@ -621,7 +510,7 @@ def interface_retrait(nom_agent, parent_window=None):
                     SELECT date_retrait, heure, montant, ref_retrait, agent
                     FROM retraits
                     WHERE numero_client=?
-                    ORDER BY date_retrait DESC, heure DESC
+                    ORDER BY horodatage DESC
                 """, (current_id_client,))
                 resultats = cur.fetchall()
                 
@@ -670,15 +559,15 @@ def interface_retrait(nom_agent, parent_window=None):
                     "nouveau_solde": dernier_retrait_data["nouveau_solde"],
                     "ref": dernier_retrait_data["ref"],
                     "numero_client": dernier_retrait_data["numero_client"],
-                    "numero_carte": dernier_retrait_data["numero_carte"]
+                    "numero_carte": dernier_retrait_data["numero_carte"],
+                    "date_heure": dernier_retrait_data["date_heure"]  # heure du retrait, pas de l'impression
                 }
                 
-                threading.Thread(
-                    target=export_retrait.imprimer_bordereau,
-                    args=(data, dernier_retrait_data["commission"])
-                ).start()
+                travail = importer("export_retrait").imprimer_bordereau(data, dernier_retrait_data["commission"])
+                if travail is None:
+                    raise RuntimeError("file d'impression indisponible")
                 
-                messagebox.showinfo("Impression", "Bordereau envoyé à l'imprimante")
+                messagebox.showinfo("Impression", f"Bordereau mis en file d'impression (travail n° {travail})")
             except Exception as e:
                 messagebox.showerror("Erreur", f"Échec de l'impression : {str(e)}")
         else:
@@ -695,12 +584,13 @@ def interface_retrait(nom_agent, parent_window=None):
                     "nouveau_solde": dernier_retrait_data["nouveau_solde"],
                     "ref": dernier_retrait_data["ref"],
                     "numero_client": dernier_retrait_data["numero_client"],
-                    "numero_carte": dernier_retrait_data["numero_carte"]
+                    "numero_carte": dernier_retrait_data["numero_carte"],
+                    "date_heure": dernier_retrait_data["date_heure"]  # heure du retrait, pas de l'impression
                 }
                 
                 data["commission"] = dernier_retrait_data["commission"]
                 
-                pdf_path = export_retrait.exporter_pdf(data)
+                pdf_path = importer("export_retrait").exporter_pdf(data)
                 messagebox.showinfo("PDF", f"Bordereau sauvegardé dans :\n{pdf_path}")
                 webbrowser.open_new(pdf_path)
             except Exception as e:
@@ -719,12 +609,13 @@ def interface_retrait(nom_agent, parent_window=None):
                     "nouveau_solde": dernier_retrait_data["nouveau_solde"],
                     "ref": dernier_retrait_data["ref"],
                     "numero_client": dernier_retrait_data["numero_client"],
-                    "numero_carte": dernier_retrait_data["numero_carte"]
+                    "numero_carte": dernier_retrait_data["numero_carte"],
+                    "date_heure": dernier_retrait_data["date_heure"]  # heure du retrait, pas de l'impression
                 }
                 
                 data["commission"] = dernier_retrait_data["commission"]
                 
-                word_path = export_retrait.exporter_word(data)
+                word_path = importer("export_retrait").exporter_word(data)
                 messagebox.showinfo("Word", f"Bordereau sauvegardé dans :\n{word_path}")
                 webbrowser.open_new(word_path)
             except Exception as e:
@@ -829,6 +720,7 @@ def interface_retrait(nom_agent, parent_window=None):
         ttk.Button(btn_frame, text="📉 Exporter Graphique", 
                   command=lambda: exporter_graphique("annuel", date_annuel.get() + "-01-01")).pack(pady=5, fill=tk.X)
 
+    @chronometrer("ui.rapport.retraits_pdf")
     def generer_rapport_pdf(report_type, ref_date):
         try:
             ref_date = datetime.datetime.strptime(ref_date, "%Y-%m-%d")
@@ -855,24 +747,31 @@ def interface_retrait(nom_agent, parent_window=None):
             end_date = datetime.datetime(ref_date.year, 12, 31)
             title = f"Rapport Annuel - {ref_date.year}"
         
-        # Fetch data from database
+        # Totaux lus dans les cumuls ; le tableau détaille les opérations d'une journée,
+        # ou la répartition par agent et type de compte pour une période plus longue
+        grain = {"journalier": "jour", "hebdomadaire": "semaine", "mensuel": "mois", "annuel": "annee"}[report_type]
         try:
-            with connexion_db() as conn:
-                conn.row_factory = sqlite3.Row
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT r.date_retrait, r.heure, a.nom, a.postnom, a.prenom, 
-                           r.montant, r.ref_retrait, r.agent
-                    FROM retraits r
-                    JOIN abonne a ON r.numero_client = a.numero_client
-                    WHERE r.date_retrait BETWEEN ? AND ?
-                    ORDER BY r.date_retrait, r.heure
-                """, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
-                retraits = cur.fetchall()
-                
-                if not retraits:
+            with connexion_rapport(get_db_path()) as conn:
+                nb_retraits, total = total_cumuls(conn, "retrait", grain, start_date.strftime("%Y-%m-%d"))
+                if not nb_retraits:
                     messagebox.showinfo("Information", "Aucun retrait trouvé pour cette période.")
                     return
+                
+                if report_type == "journalier":
+                    conn.row_factory = sqlite3.Row
+                    cur = conn.cursor()
+                    cur.execute("""
+                        SELECT r.date_retrait, r.heure, a.nom, a.postnom, a.prenom, 
+                               r.montant, r.ref_retrait, r.agent
+                        FROM retraits r
+                        JOIN abonne a ON r.numero_client = a.numero_client
+                        WHERE r.horodatage >= ? AND r.horodatage < date(?, '+1 day')
+                        ORDER BY r.horodatage
+                    """, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
+                    retraits = cur.fetchall()
+                else:
+                    repartition = lire_cumuls(conn, "retrait", grain, start_date.strftime("%Y-%m-%d"),
+                                              par=("agent", "type_compte"))
         except sqlite3.Error as e:
             messagebox.showerror("Erreur", f"Erreur base de données: {str(e)}")
             return
@@ -884,6 +783,8 @@ def interface_retrait(nom_agent, parent_window=None):
             rapports_dir = get_rapports_dir()
             filename = os.path.join(rapports_dir, f"rapport_retraits_{report_type}_{timestamp}.pdf")
             
+            plt = importer("matplotlib.pyplot")
+            PdfPages = importer("matplotlib.backends.backend_pdf").PdfPages
             with PdfPages(filename) as pdf:
                 # Create a figure
                 plt.figure(figsize=(11, 8.5))  # Letter size
@@ -905,29 +806,32 @@ def interface_retrait(nom_agent, parent_window=None):
                            fontsize=10)
                 
                 # Create table data
-                table_data = [
-                    ["Date", "Heure", "Client", "Montant (FC)", "Référence", "Agent"]
-                ]
-                
-                total = 0
-                for retrait in retraits:
-                    nom_complet = f"{retrait['nom']} {retrait['postnom']} {retrait['prenom']}"
-                    montant = retrait['montant']
-                    total += montant
-                    
-                    table_data.append([
-                        retrait['date_retrait'],
-                        retrait['heure'],
-                        nom_complet,
-                        f"{montant:,.0f}",
-                        retrait['ref_retrait'],
-                        retrait['agent']
-                    ])
+                if report_type == "journalier":
+                    table_data = [
+                        ["Date", "Heure", "Client", "Montant (FC)", "Référence", "Agent"]
+                    ]
+                    for retrait in retraits:
+                        nom_complet = f"{retrait['nom']} {retrait['postnom']} {retrait['prenom']}"
+                        table_data.append([
+                            retrait['date_retrait'],
+                            retrait['heure'],
+                            nom_complet,
+                            f"{retrait['montant']:,.0f}",
+                            retrait['ref_retrait'],
+                            retrait['agent']
+                        ])
+                else:
+                    table_data = [
+                        ["Agent", "Type de compte", "Nombre de retraits", "Montant (FC)"]
+                    ]
+                    for cumul in repartition:
+                        agent, type_compte = cumul.cle
+                        table_data.append([agent or "—", type_compte or "—", cumul.nombre, f"{cumul.montant:,.0f}"])
                 
                 # Add summary
                 plt.figtext(0.1, 0.78, f"Période: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}", 
                            fontsize=10)
-                plt.figtext(0.1, 0.75, f"Nombre de retraits: {len(retraits)}", 
+                plt.figtext(0.1, 0.75, f"Nombre de retraits: {nb_retraits}", 
                            fontsize=10)
                 plt.figtext(0.1, 0.72, f"Total des retraits: {total:,.0f} FC", 
                            fontsize=10, fontweight='bold')
@@ -969,6 +873,7 @@ def interface_retrait(nom_agent, parent_window=None):
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la génération du PDF: {str(e)}")
     
+    @chronometrer("ui.rapport.retraits_donnees")
     def exporter_donnees_brutes(report_type, ref_date):
         """Exporte les données brutes au format CSV"""
         try:
@@ -998,7 +903,7 @@ def interface_retrait(nom_agent, parent_window=None):
         
         # Fetch data from database
         try:
-            with connexion_db() as conn:
+            with connexion_rapport(get_db_path()) as conn:
                 conn.row_factory = sqlite3.Row
                 cur = conn.cursor()
                 cur.execute("""
@@ -1006,8 +911,8 @@ def interface_retrait(nom_agent, parent_window=None):
                            r.montant, r.ref_retrait, r.agent
                     FROM retraits r
                     JOIN abonne a ON r.numero_client = a.numero_client
-                    WHERE r.date_retrait BETWEEN ? AND ?
-                    ORDER BY r.date_retrait, r.heure
+                    WHERE r.horodatage >= ? AND r.horodatage < date(?, '+1 day')
+                    ORDER BY r.horodatage
                 """, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
                 retraits = cur.fetchall()
                 
@@ -1043,6 +948,7 @@ def interface_retrait(nom_agent, parent_window=None):
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de l'export des données: {str(e)}")
     
+    @chronometrer("ui.rapport.retraits_graphique")
     def exporter_graphique(report_type, ref_date):
         """Exporte un graphique des retraits au format PNG"""
         try:
@@ -1056,36 +962,29 @@ def interface_retrait(nom_agent, parent_window=None):
             start_date = ref_date
             end_date = ref_date
             title = f"Rapport Journalier - {ref_date.strftime('%d/%m/%Y')}"
-            group_by = "heure"
+            grain, axe = "jour", "agent"
         elif report_type == "hebdomadaire":
             start_date = ref_date - datetime.timedelta(days=ref_date.weekday())
             end_date = start_date + datetime.timedelta(days=6)
             title = f"Rapport Hebdomadaire - Semaine {ref_date.isocalendar()[1]}"
-            group_by = "date_retrait"
+            grain, axe = "jour", "periode"
         elif report_type == "mensuel":
             start_date = datetime.datetime(ref_date.year, ref_date.month, 1)
             next_month = start_date.replace(day=28) + datetime.timedelta(days=4)
             end_date = next_month - datetime.timedelta(days=next_month.day)
             title = f"Rapport Mensuel - {ref_date.strftime('%B %Y')}"
-            group_by = "date_retrait"
+            grain, axe = "jour", "periode"
         elif report_type == "annuel":
             start_date = datetime.datetime(ref_date.year, 1, 1)
             end_date = datetime.datetime(ref_date.year, 12, 31)
             title = f"Rapport Annuel - {ref_date.year}"
-            group_by = "strftime('%m', date_retrait)"
+            grain, axe = "mois", "periode"
         
-        # Fetch aggregated data from database
+        # Données agrégées lues dans les cumuls (une ligne par jour, mois ou agent)
         try:
-            with connexion_db() as conn:
-                cur = conn.cursor()
-                cur.execute(f"""
-                    SELECT {group_by} AS periode, SUM(montant) AS total
-                    FROM retraits
-                    WHERE date_retrait BETWEEN ? AND ?
-                    GROUP BY periode
-                    ORDER BY periode
-                """, (start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
-                data = cur.fetchall()
+            with connexion_rapport(get_db_path()) as conn:
+                data = lire_cumuls(conn, "retrait", grain, start_date.strftime("%Y-%m-%d"),
+                                   end_date.strftime("%Y-%m-%d"), par=(axe,))
                 
                 if not data:
                     messagebox.showinfo("Information", "Aucun retrait trouvé pour cette période.")
@@ -1096,13 +995,14 @@ def interface_retrait(nom_agent, parent_window=None):
         
         # Generate chart
         try:
-            periods = [row[0] for row in data]
-            totals = [row[1] for row in data]
+            periods = [cumul.cle[0] or "—" for cumul in data]
+            totals = [float(cumul.montant) for cumul in data]
             
+            plt = importer("matplotlib.pyplot")
             plt.figure(figsize=(10, 6))
             plt.bar(periods, totals, color=ACCENT_COLOR)
-            plt.title(f"Retraits par période\n{title}", fontsize=14)
-            plt.xlabel("Période", fontsize=12)
+            plt.title(f"Retraits par {'agent' if axe == 'agent' else 'période'}\n{title}", fontsize=14)
+            plt.xlabel("Agent" if axe == "agent" else "Période", fontsize=12)
             plt.ylabel("Montant total (FC)", fontsize=12)
             plt.xticks(rotation=45, ha='right')
             plt.tight_layout()
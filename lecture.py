@@ -0,0 +1,176 @@
+import glob
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from monnaie import TYPES_DETECTES
+from performance import ConnexionChronometree
+
+# ==== CONNEXIONS DE LECTURE (RAPPORTS) ====
+# Les rapports et exports s'ouvrent en lecture seule (mode=ro, query_only) sans
+# transaction implicite : en WAL, ils ne prennent jamais le verrou d'écriture et
+# ne bloquent pas les guichets. En option, ils lisent une copie de la base
+# rafraîchie périodiquement par l'API de sauvegarde de SQLite.
+
+logger = logging.getLogger(__name__)
+
+INTERVALLE_COPIE_S = 300
+GENERATIONS_CONSERVEES = 2
+PARAMETRE_COPIE = "copie_rapports_minutes"
+
+
+class ConnexionLecture(ConnexionChronometree):
+    """Connexion en lecture seule ; fermée à la sortie du bloc with"""
+
+    @contextmanager
+    def lecture_coherente(self):
+        """Transaction différée : toutes les requêtes du bloc voient le même état"""
+        self.execute("BEGIN DEFERRED")
+        try:
+            yield self
+        finally:
+            self.execute("COMMIT")
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _uri_lecture(chemin_db: str) -> str:
+    return pathlib.Path(os.path.abspath(chemin_db)).as_uri() + "?mode=ro"
+
+
+def connexion_lecture(chemin_db: str, timeout: float = 30) -> ConnexionLecture:
+    """Ouvre chemin_db en lecture seule"""
+    conn = sqlite3.connect(_uri_lecture(chemin_db), uri=True, timeout=timeout,
+                           isolation_level=None, detect_types=TYPES_DETECTES,
+                           factory=ConnexionLecture)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+    return conn
+
+
+class CopieLecture:
+    """Copie de la base servant aux rapports, rafraîchie par l'API de sauvegarde"""
+
+    def __init__(self, chemin_source: str, dossier: Optional[str] = None,
+                 intervalle_s: float = INTERVALLE_COPIE_S):
+        self.chemin_source = os.path.abspath(chemin_source)
+        self.dossier = dossier or os.path.join(os.path.dirname(self.chemin_source), "copies_rapports")
+        self.intervalle_s = intervalle_s
+        self.chemin_copie: Optional[str] = None
+        self.date_copie: Optional[datetime] = None
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(self.dossier, exist_ok=True)
+
+    def rafraichir(self) -> str:
+        """Copie la base dans une nouvelle génération et bascule les rapports dessus"""
+        with self._verrou:
+            debut = time.perf_counter()
+            base = os.path.splitext(os.path.basename(self.chemin_source))[0]
+            chemin = os.path.join(self.dossier, f"{base}_{datetime.now():%Y%m%d_%H%M%S_%f}.db")
+            source = connexion_lecture(self.chemin_source)
+            destination = sqlite3.connect(chemin)
+            try:
+                # Une seule étape : lecture cohérente, sans bloquer les écritures (WAL)
+                source.backup(destination)
+                destination.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                destination.close()
+                source.close()
+
+            self.chemin_copie, self.date_copie = chemin, datetime.now()
+            logger.info("Copie des rapports rafraîchie en %.0f ms: %s",
+                        (time.perf_counter() - debut) * 1000, chemin)
+            self._purger(base)
+            return chemin
+
+    def _purger(self, base: str):
+        """Supprime les anciennes générations (celles encore ouvertes sont gardées)"""
+        copies = sorted(glob.glob(os.path.join(self.dossier, f"{base}_*.db")))
+        for chemin in copies[:-GENERATIONS_CONSERVEES]:
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+
+    def demarrer(self):
+        """Première copie immédiate puis rafraîchissement périodique en arrière-plan"""
+        self.rafraichir()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name="copie-rapports", daemon=True)
+            self._thread.start()
+        return self
+
+    def _boucle(self):
+        while not self._arret.wait(self.intervalle_s):
+            try:
+                self.rafraichir()
+            except Exception as e:
+                logger.error("Erreur rafraîchissement copie des rapports: %s", str(e))
+
+    def arreter(self):
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def connexion(self) -> ConnexionLecture:
+        return connexion_lecture(self.chemin_copie or self.chemin_source)
+
+
+# ---- Copies actives, par base source ----
+_copies: Dict[str, CopieLecture] = {}
+_verrou_copies = threading.Lock()
+
+
+def _cle(chemin_db: str) -> str:
+    return os.path.normcase(os.path.abspath(chemin_db))
+
+
+def activer_copie(chemin_db: str, intervalle_s: float = INTERVALLE_COPIE_S) -> CopieLecture:
+    """Les rapports de chemin_db liront désormais une copie périodique (idempotent)"""
+    with _verrou_copies:
+        copie = _copies.get(_cle(chemin_db))
+        if copie is None:
+            copie = CopieLecture(chemin_db, intervalle_s=intervalle_s).demarrer()
+            _copies[_cle(chemin_db)] = copie
+        return copie
+
+
+def desactiver_copie(chemin_db: str):
+    with _verrou_copies:
+        copie = _copies.pop(_cle(chemin_db), None)
+    if copie is not None:
+        copie.arreter()
+
+
+def activer_selon_parametres(chemin_db: str) -> Optional[CopieLecture]:
+    """Active la copie si le paramètre copie_rapports_minutes est supérieur à 0"""
+    try:
+        with connexion_lecture(chemin_db) as conn:
+            row = conn.execute("SELECT valeur FROM parametres WHERE cle = ?",
+                               (PARAMETRE_COPIE,)).fetchone()
+        minutes = float(row[0]) if row else 0.0
+        if minutes > 0:
+            return activer_copie(chemin_db, minutes * 60)
+        desactiver_copie(chemin_db)
+    except (sqlite3.Error, ValueError) as e:
+        logger.error("Erreur activation copie des rapports: %s", str(e))
+    return None
+
+
+def connexion_rapport(chemin_db: str) -> ConnexionLecture:
+    """Connexion de lecture pour un rapport : la copie si elle est active, sinon la base"""
+    copie = _copies.get(_cle(chemin_db))
+    if copie is not None:
+        return copie.connexion()
+    return connexion_lecture(chemin_db)
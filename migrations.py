@@ -0,0 +1,880 @@
+import re
+import sqlite3
+import logging
+from typing import Callable, List, Tuple
+
+# ==== MIGRATIONS VERSIONNÉES DU SCHÉMA ====
+# Chaque étape est numérotée et idempotente : elle peut être rejouée sur une base
+# créée par db.create_empty_db, par reset_db.py ou par les anciens écrans (schéma
+# "plat" de inscription.py) et amène toutes ces variantes au même schéma.
+# Le numéro de la dernière étape appliquée est stocké dans PRAGMA user_version.
+
+logger = logging.getLogger(__name__)
+
+
+def colonnes_table(conn: sqlite3.Connection, table: str) -> set:
+    """Retourne l'ensemble des colonnes d'une table (vide si la table n'existe pas)"""
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def table_existe(conn: sqlite3.Connection, table: str) -> bool:
+    """Indique si une table existe"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()
+    return row is not None
+
+
+def ajouter_colonnes(conn: sqlite3.Connection, table: str, colonnes: List[Tuple[str, str]]):
+    """Ajoute les colonnes manquantes d'une table (ALTER TABLE ... ADD COLUMN)"""
+    existantes = colonnes_table(conn, table)
+    for nom, definition in colonnes:
+        if nom not in existantes:
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {nom} {definition}')
+
+
+# ---- 1. Tables de base ----
+SCHEMA_DE_BASE = [
+    """CREATE TABLE IF NOT EXISTS agent (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom_agent TEXT NOT NULL,
+        identifiant TEXT UNIQUE NOT NULL,
+        mot_de_passe TEXT NOT NULL,
+        salt TEXT,
+        role TEXT DEFAULT 'agent',
+        date_creation TEXT,
+        actif INTEGER DEFAULT 1,
+        photo BLOB
+    )""",
+    """CREATE TABLE IF NOT EXISTS abonne (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_client TEXT UNIQUE NOT NULL,
+        numero_carte TEXT UNIQUE NOT NULL,
+        nom TEXT NOT NULL,
+        postnom TEXT,
+        prenom TEXT,
+        sexe TEXT CHECK(sexe IN ('M', 'F')),
+        date_naissance TEXT,
+        lieu_naissance TEXT,
+        adresse TEXT,
+        telephone TEXT,
+        suppleant TEXT,
+        contact_suppleant TEXT,
+        type_compte TEXT,
+        montant REAL,
+        photo TEXT,
+        photo_path TEXT,
+        date_inscription TEXT,
+        solde REAL DEFAULT 0,
+        duree_blocage INTEGER DEFAULT 0,
+        montant_atteindre REAL DEFAULT 0,
+        pourcentage_retrait INTEGER DEFAULT 30,
+        frequence_retrait TEXT DEFAULT 'Mensuel',
+        date_derniere_operation TEXT,
+        statut TEXT DEFAULT 'Actif' CHECK(statut IN ('Actif', 'Inactif', 'Bloqué'))
+    )""",
+    """CREATE TABLE IF NOT EXISTS suppleant (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        abonne_id INTEGER NOT NULL,
+        nom TEXT NOT NULL,
+        telephone TEXT NOT NULL,
+        FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE,
+        UNIQUE(abonne_id, nom)
+    )""",
+    """CREATE TABLE IF NOT EXISTS type_compte (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nom TEXT UNIQUE NOT NULL CHECK(nom IN ('Fixe', 'Mixte', 'Bloqué')),
+        description TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS abonne_compte (
+        abonne_id INTEGER NOT NULL,
+        type_compte_id INTEGER NOT NULL,
+        date_activation TEXT NOT NULL,
+        solde REAL DEFAULT 0,
+        PRIMARY KEY (abonne_id, type_compte_id),
+        FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE,
+        FOREIGN KEY (type_compte_id) REFERENCES type_compte(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS parametres (
+        cle TEXT PRIMARY KEY,
+        valeur TEXT,
+        description TEXT,
+        modifiable INTEGER DEFAULT 1
+    )""",
+    """CREATE TABLE IF NOT EXISTS compte_bloque (
+        abonne_id INTEGER PRIMARY KEY,
+        duree_mois INTEGER NOT NULL CHECK(duree_mois > 0),
+        montant_atteindre REAL NOT NULL CHECK(montant_atteindre > 0),
+        pourcentage_retrait INTEGER NOT NULL CHECK(pourcentage_retrait BETWEEN 1 AND 100),
+        frequence_retrait TEXT NOT NULL CHECK(frequence_retrait IN ('Mensuel', 'Trimestriel', 'Semestriel', 'Annuel')),
+        FOREIGN KEY (abonne_id) REFERENCES abonne(id) ON DELETE CASCADE
+    )""",
+    """CREATE TABLE IF NOT EXISTS compte_fixe (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        abonne_id INTEGER,
+        numero_client TEXT,
+        numero_carte TEXT,
+        montant_initial REAL NOT NULL CHECK(montant_initial > 0),
+        date_debut TEXT NOT NULL,
+        date_fin TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS compte_fixe_pages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_carte TEXT NOT NULL,
+        numero_client TEXT NOT NULL,
+        page INTEGER NOT NULL,
+        cases_remplies INTEGER DEFAULT 0 CHECK(cases_remplies BETWEEN 0 AND 31)
+    )""",
+    """CREATE TABLE IF NOT EXISTS compte_fixe_cases (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_client TEXT NOT NULL,
+        numero_carte TEXT NOT NULL,
+        ref_depot TEXT NOT NULL,
+        date_remplissage TEXT NOT NULL,
+        montant REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS historique_modifications (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_modifiee TEXT NOT NULL,
+        id_ligne INTEGER NOT NULL,
+        ancienne_valeur TEXT,
+        nouvelle_valeur TEXT,
+        date_modification TEXT NOT NULL,
+        auteur TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS depots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_client TEXT NOT NULL,
+        montant REAL NOT NULL,
+        ref_depot TEXT UNIQUE,
+        heure TEXT NOT NULL,
+        nom_complet TEXT,
+        date_depot TEXT NOT NULL,
+        nom_agent TEXT NOT NULL,
+        methode_paiement TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS retraits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_client TEXT NOT NULL,
+        montant REAL NOT NULL,
+        ref_retrait TEXT UNIQUE,
+        heure TEXT NOT NULL,
+        date_retrait TEXT NOT NULL,
+        agent TEXT NOT NULL,
+        statut TEXT DEFAULT 'En attente'
+    )""",
+    """CREATE TABLE IF NOT EXISTS "transaction" (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        abonne_id INTEGER NOT NULL,
+        type TEXT NOT NULL CHECK(type IN ('Dépôt', 'Retrait')),
+        montant REAL NOT NULL CHECK(montant > 0),
+        date TEXT NOT NULL,
+        heure TEXT NOT NULL,
+        agent TEXT NOT NULL,
+        statut TEXT DEFAULT 'Complété' CHECK(statut IN ('Complété', 'En attente', 'Annulé')),
+        reference TEXT UNIQUE NOT NULL,
+        methode_paiement TEXT,
+        FOREIGN KEY (abonne_id) REFERENCES abonne(id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS journal (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        acteur TEXT NOT NULL,
+        date_action TEXT NOT NULL,
+        heure_action TEXT NOT NULL,
+        cible TEXT,
+        details TEXT,
+        ip_address TEXT,
+        user_agent TEXT
+    )""",
+]
+
+
+def _migration_schema_de_base(conn: sqlite3.Connection):
+    """Crée les tables manquantes et les types de compte"""
+    for instruction in SCHEMA_DE_BASE:
+        conn.execute(instruction)
+    conn.executemany(
+        "INSERT OR IGNORE INTO type_compte (nom, description) VALUES (?, ?)",
+        [
+            ('Fixe', 'Compte avec montant fixe à épargner'),
+            ('Mixte', 'Compte flexible avec options variées'),
+            ('Bloqué', 'Compte avec montant bloqué pour une durée déterminée'),
+        ]
+    )
+
+
+# ---- 2. Colonnes utilisées par les écrans mais absentes de certaines variantes ----
+def _migration_colonnes_manquantes(conn: sqlite3.Connection):
+    """Ajoute les colonnes attendues par les écrans dépôt/retrait/inscription"""
+    ajouter_colonnes(conn, "abonne", [
+        ("postnom", "TEXT"),
+        ("suppleant", "TEXT"),
+        ("contact_suppleant", "TEXT"),
+        ("type_compte", "TEXT"),
+        ("montant", "REAL"),
+        ("photo", "TEXT"),
+        ("photo_path", "TEXT"),
+        ("date_inscription", "TEXT"),
+        ("solde", "REAL DEFAULT 0"),
+        ("duree_blocage", "INTEGER DEFAULT 0"),
+        ("montant_atteindre", "REAL DEFAULT 0"),
+        ("pourcentage_retrait", "INTEGER DEFAULT 30"),
+        ("frequence_retrait", "TEXT DEFAULT 'Mensuel'"),
+        ("date_derniere_operation", "TEXT"),
+        ("statut", "TEXT DEFAULT 'Actif'"),
+    ])
+    ajouter_colonnes(conn, "agent", [
+        ("salt", "TEXT"),
+        ("role", "TEXT DEFAULT 'agent'"),
+        ("date_creation", "TEXT"),
+        ("actif", "INTEGER DEFAULT 1"),
+        ("photo", "BLOB"),
+    ])
+    ajouter_colonnes(conn, "compte_fixe", [
+        ("abonne_id", "INTEGER"),
+        ("numero_client", "TEXT"),
+        ("numero_carte", "TEXT"),
+    ])
+    ajouter_colonnes(conn, "compte_fixe_pages", [
+        ("numero_carte", "TEXT"),
+        ("numero_client", "TEXT"),
+    ])
+    ajouter_colonnes(conn, "compte_fixe_cases", [("montant", "REAL DEFAULT 0")])
+    ajouter_colonnes(conn, "depots", [
+        ("nom_complet", "TEXT"),
+        ("methode_paiement", "TEXT"),
+    ])
+    ajouter_colonnes(conn, "retraits", [("statut", "TEXT DEFAULT 'En attente'")])
+    ajouter_colonnes(conn, "journal", [
+        ("cible", "TEXT"),
+        ("details", "TEXT"),
+        ("ip_address", "TEXT"),
+        ("user_agent", "TEXT"),
+    ])
+
+    # Comptes fixes créés par le schéma normalisé (clé abonne_id uniquement)
+    if "abonne_id" in colonnes_table(conn, "compte_fixe"):
+        conn.execute("""
+            UPDATE compte_fixe
+            SET numero_client = (SELECT a.numero_client FROM abonne a WHERE a.id = compte_fixe.abonne_id),
+                numero_carte = (SELECT a.numero_carte FROM abonne a WHERE a.id = compte_fixe.abonne_id)
+            WHERE numero_client IS NULL AND abonne_id IS NOT NULL
+        """)
+
+
+# ---- 3. Ancienne table "transactions" de reset_db.py ----
+def _migration_table_transactions(conn: sqlite3.Connection):
+    """Fusionne l'ancienne table transactions dans "transaction" """
+    if not table_existe(conn, "transactions"):
+        return
+    conn.execute("""
+        INSERT OR IGNORE INTO "transaction" (
+            abonne_id, type, montant, date, heure, agent,
+            statut, reference, methode_paiement
+        )
+        SELECT abonne_id, type, montant, date, heure, agent,
+               statut, reference, methode_paiement
+        FROM transactions
+    """)
+    conn.execute("DROP TABLE transactions")
+
+
+# ---- 4. Paramètres par défaut ----
+def _migration_parametres_defaut(conn: sqlite3.Connection):
+    """Insère les paramètres par défaut s'ils sont absents"""
+    conn.executemany(
+        "INSERT OR IGNORE INTO parametres (cle, valeur, description) VALUES (?, ?, ?)",
+        [
+            ('taux_interet', '5.0', "Taux d'intérêt des retraits globaux (comptes mixtes)"),
+            ('depot_min', '500', "Montant minimum d'un dépôt"),
+            ('retrait_min', '1000', "Montant minimum d'un retrait"),
+        ]
+    )
+
+
+# ---- 5. Index ----
+INDEX = [
+    "CREATE INDEX IF NOT EXISTS idx_abonne_nom ON abonne(nom, postnom)",
+    "CREATE INDEX IF NOT EXISTS idx_abonne_telephone ON abonne(telephone)",
+    "CREATE INDEX IF NOT EXISTS idx_abonne_type_compte ON abonne(type_compte)",
+    "CREATE INDEX IF NOT EXISTS idx_compte_fixe_client ON compte_fixe(numero_client)",
+    "CREATE INDEX IF NOT EXISTS idx_compte_fixe_carte ON compte_fixe(numero_carte)",
+    "CREATE INDEX IF NOT EXISTS idx_compte_fixe_pages_carte ON compte_fixe_pages(numero_carte, page)",
+    "CREATE INDEX IF NOT EXISTS idx_compte_fixe_pages_client ON compte_fixe_pages(numero_client)",
+    "CREATE INDEX IF NOT EXISTS idx_depots_client ON depots(numero_client)",
+    "CREATE INDEX IF NOT EXISTS idx_depots_date ON depots(date_depot, heure)",
+    "CREATE INDEX IF NOT EXISTS idx_retraits_client ON retraits(numero_client)",
+    "CREATE INDEX IF NOT EXISTS idx_retraits_date ON retraits(date_retrait, heure)",
+    'CREATE INDEX IF NOT EXISTS idx_transaction_date ON "transaction"(date)',
+    'CREATE INDEX IF NOT EXISTS idx_transaction_abonne ON "transaction"(abonne_id)',
+    "CREATE INDEX IF NOT EXISTS idx_journal_date ON journal(date_action, heure_action)",
+]
+
+
+def _migration_index(conn: sqlite3.Connection):
+    """Crée les index des recherches et rapports fréquents"""
+    # L'ancien idx_journal_date ne couvrait que date_action
+    conn.execute("DROP INDEX IF EXISTS idx_journal_date")
+    for instruction in INDEX:
+        conn.execute(instruction)
+
+
+# ---- 6. Copie des rapports ----
+def _migration_parametre_copie_rapports(conn: sqlite3.Connection):
+    """Paramètre de la copie de lecture des rapports (0 = rapports sur la base)"""
+    conn.execute(
+        "INSERT OR IGNORE INTO parametres (cle, valeur, description) VALUES (?, ?, ?)",
+        ('copie_rapports_minutes', '0',
+         "Intervalle (minutes) de la copie de la base lue par les rapports, 0 pour désactiver")
+    )
+
+
+# ---- 7. Montants en centimes entiers ----
+# Colonnes déclarées MONTANT (affinité NUMERIC : les entiers restent entiers),
+# converties par monnaie.Montant. SQLite ne sait pas changer le type d'une colonne :
+# chaque table est reconstruite (clés étrangères désactivées par appliquer_migrations).
+COLONNES_MONTANT = {
+    "abonne": ["montant", "solde", "montant_atteindre"],
+    "abonne_compte": ["solde"],
+    "compte_bloque": ["montant_atteindre"],
+    "compte_fixe": ["montant_initial"],
+    "compte_fixe_cases": ["montant"],
+    "depots": ["montant"],
+    "retraits": ["montant"],
+    "transaction": ["montant"],
+}
+
+
+def _types_colonnes(conn: sqlite3.Connection, table: str) -> dict:
+    return {row[1]: (row[2] or "").upper() for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def reconstruire_table_montants(conn: sqlite3.Connection, table: str, colonnes: List[str]):
+    """Recrée table avec les colonnes en centimes (type MONTANT), index et déclencheurs compris"""
+    types = _types_colonnes(conn, table)
+    a_convertir = [c for c in colonnes if c in types and types[c] != "MONTANT"]
+    if not a_convertir:
+        return
+
+    sql_table = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()[0]
+    dependances = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name=? AND sql IS NOT NULL",
+        (table,)
+    )]
+
+    temporaire = f"{table}_centimes"
+    sql_nouvelle, n = re.subn(
+        r'^(\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?)("?)' + re.escape(table) + r'\2',
+        lambda m: f'{m.group(1)}"{temporaire}"', sql_table, count=1, flags=re.IGNORECASE
+    )
+    if n != 1:
+        raise sqlite3.DatabaseError(f"Définition de la table {table} non reconnue")
+    for colonne in a_convertir:
+        sql_nouvelle, n = re.subn(
+            r'(\b' + re.escape(colonne) + r'"?\s+)(?:REAL|FLOAT|DOUBLE|NUMERIC|DECIMAL|INTEGER)\b(?:\s*\([\d\s,]*\))?',
+            r'\1MONTANT', sql_nouvelle, count=1, flags=re.IGNORECASE
+        )
+        if n != 1:
+            raise sqlite3.DatabaseError(f"Type de la colonne {table}.{colonne} non reconnu")
+
+    noms = list(types)
+    selection = ", ".join(
+        f'CAST(ROUND("{c}" * 100) AS INTEGER)' if c in a_convertir else f'"{c}"' for c in noms
+    )
+    liste = ", ".join(f'"{c}"' for c in noms)
+    conn.execute(sql_nouvelle)
+    conn.execute(f'INSERT INTO "{temporaire}" ({liste}) SELECT {selection} FROM "{table}"')
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{temporaire}" RENAME TO "{table}"')
+    for instruction in dependances:
+        conn.execute(instruction)
+
+
+def _migration_montants_centimes(conn: sqlite3.Connection):
+    """Convertit les montants en centimes entiers"""
+    for table, colonnes in COLONNES_MONTANT.items():
+        if table_existe(conn, table):
+            reconstruire_table_montants(conn, table, colonnes)
+    # Les paramètres restent en francs (saisis et affichés tels quels)
+
+
+# ---- 8. Carnet fixe : une plage de cases par dépôt ----
+# compte_fixe_cases (une ligne par case) est remplacée par carnet_depots (une ligne
+# par dépôt : première case et nombre de cases) et par le curseur
+# compte_fixe.prochaine_case ; compte_fixe_pages est recalculée depuis le curseur.
+def _migration_carnet_par_plages(conn: sqlite3.Connection):
+    """Dépôts du carnet fixe en plages de cases et curseur de la prochaine case"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS carnet_depots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_client TEXT NOT NULL,
+        numero_carte TEXT NOT NULL,
+        ref_depot TEXT,
+        premiere_case INTEGER NOT NULL CHECK(premiere_case >= 0),
+        nb_cases INTEGER NOT NULL CHECK(nb_cases > 0),
+        montant_unitaire MONTANT NOT NULL,
+        date_remplissage TEXT NOT NULL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_carnet_depots_client "
+                 "ON carnet_depots(numero_client, premiere_case)")
+    ajouter_colonnes(conn, "compte_fixe", [("prochaine_case", "INTEGER NOT NULL DEFAULT 0")])
+
+    # Cases existantes regroupées par dépôt, dans l'ordre de remplissage
+    if table_existe(conn, "compte_fixe_cases"):
+        conn.execute("""
+            INSERT INTO carnet_depots (
+                numero_client, numero_carte, ref_depot, premiere_case, nb_cases,
+                montant_unitaire, date_remplissage
+            )
+            SELECT numero_client, MAX(numero_carte), ref_depot,
+                   SUM(COUNT(*)) OVER (PARTITION BY numero_client ORDER BY MIN(id)) - COUNT(*),
+                   COUNT(*), MAX(montant), MIN(date_remplissage)
+            FROM compte_fixe_cases
+            GROUP BY numero_client, ref_depot
+            ORDER BY numero_client, MIN(id)
+        """)
+        conn.execute("DROP TABLE compte_fixe_cases")
+
+    # Cases comptées par les pages sans détail par case : plage de reprise
+    conn.execute("""
+        INSERT INTO carnet_depots (
+            numero_client, numero_carte, ref_depot, premiere_case, nb_cases,
+            montant_unitaire, date_remplissage
+        )
+        SELECT cf.numero_client, cf.numero_carte, 'REPRISE', d.cases,
+               MIN(p.cases, 248) - d.cases, cf.montant_initial, COALESCE(cf.date_debut, '')
+        FROM compte_fixe cf
+        JOIN (SELECT numero_client, SUM(cases_remplies) AS cases
+              FROM compte_fixe_pages GROUP BY numero_client) p
+          ON p.numero_client = cf.numero_client
+        JOIN (SELECT c.numero_client, COALESCE(SUM(d.nb_cases), 0) AS cases
+              FROM compte_fixe c LEFT JOIN carnet_depots d ON d.numero_client = c.numero_client
+              GROUP BY c.numero_client) d
+          ON d.numero_client = cf.numero_client
+        WHERE cf.numero_carte IS NOT NULL AND MIN(p.cases, 248) > d.cases
+    """)
+    conn.execute("""
+        UPDATE compte_fixe
+        SET prochaine_case = (SELECT COALESCE(SUM(nb_cases), 0) FROM carnet_depots d
+                              WHERE d.numero_client = compte_fixe.numero_client)
+    """)
+
+    # Pages recalculées depuis le curseur
+    conn.execute("""
+        UPDATE compte_fixe_pages
+        SET cases_remplies = (
+            SELECT MAX(0, MIN(31, cf.prochaine_case - (compte_fixe_pages.page - 1) * 31))
+            FROM compte_fixe cf WHERE cf.numero_client = compte_fixe_pages.numero_client
+        )
+        WHERE numero_client IN (SELECT numero_client FROM compte_fixe)
+    """)
+    conn.execute("""
+        WITH RECURSIVE numeros(page) AS (SELECT 1 UNION ALL SELECT page + 1 FROM numeros WHERE page < 8)
+        INSERT INTO compte_fixe_pages (numero_carte, numero_client, page, cases_remplies)
+        SELECT cf.numero_carte, cf.numero_client, n.page,
+               MIN(31, cf.prochaine_case - (n.page - 1) * 31)
+        FROM compte_fixe cf
+        JOIN numeros n ON cf.prochaine_case > (n.page - 1) * 31
+        WHERE cf.numero_client IS NOT NULL AND cf.numero_carte IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM compte_fixe_pages p
+                          WHERE p.numero_client = cf.numero_client AND p.page = n.page)
+    """)
+
+
+# ---- 9. Résumé de progression du carnet fixe ----
+# Une ligne par compte fixe, tenue à jour par les dépôts et retraits (services) :
+# les écrans lisent cette ligne au lieu de recompter pages et retraits.
+def _migration_resume_carnet(conn: sqlite3.Connection):
+    """Table carnet_progression, initialisée depuis les plages et les retraits"""
+    conn.execute("""CREATE TABLE IF NOT EXISTS carnet_progression (
+        numero_client TEXT PRIMARY KEY,
+        numero_carte TEXT,
+        total_cases INTEGER NOT NULL DEFAULT 0,
+        pages_completes INTEGER NOT NULL DEFAULT 0,
+        montant_epargne MONTANT NOT NULL DEFAULT 0,
+        montant_retire MONTANT NOT NULL DEFAULT 0,
+        derniere_date TEXT
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_carnet_progression_carte "
+                 "ON carnet_progression(numero_carte)")
+    conn.execute("""
+        INSERT OR IGNORE INTO carnet_progression (
+            numero_client, numero_carte, total_cases, pages_completes,
+            montant_epargne, montant_retire, derniere_date
+        )
+        SELECT cf.numero_client, cf.numero_carte, cf.prochaine_case, cf.prochaine_case / 31,
+               COALESCE((SELECT SUM(d.nb_cases * d.montant_unitaire) FROM carnet_depots d
+                         WHERE d.numero_client = cf.numero_client), 0),
+               COALESCE((SELECT SUM(r.montant) FROM retraits r
+                         WHERE r.numero_client = cf.numero_client), 0),
+               (SELECT MAX(d.date_remplissage) FROM carnet_depots d
+                WHERE d.numero_client = cf.numero_client AND d.date_remplissage <> '')
+        FROM compte_fixe cf
+        WHERE cf.numero_client IS NOT NULL
+        ORDER BY cf.rowid
+    """)
+
+
+# ---- 10. Clés d'idempotence des dépôts et retraits ----
+# Chaque envoi porte une clé générée par le guichet : un index unique empêche
+# qu'un double clic ou une nouvelle tentative écrive l'opération deux fois, et
+# operations_idempotentes garde le résultat d'origine pour le renvoyer.
+def _migration_cles_idempotence(conn: sqlite3.Connection):
+    """Colonne cle_idempotence (index unique) et table des résultats par clé"""
+    for table in ("depots", "retraits"):
+        ajouter_colonnes(conn, table, [("cle_idempotence", "TEXT")])
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_cle_idempotence "
+                     f"ON {table}(cle_idempotence) WHERE cle_idempotence IS NOT NULL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS operations_idempotentes (
+        cle TEXT PRIMARY KEY,
+        operation TEXT NOT NULL,
+        reference TEXT,
+        resultat TEXT NOT NULL,
+        cree_le TEXT NOT NULL
+    )""")
+
+
+
+# ---- 11. Liste paginée des abonnés ----
+# pagination.ABONNES trie sur IFNULL(date_inscription, '') puis id : index sur
+# cette expression (les autres listes suivent les index de date existants).
+def _migration_index_liste_abonnes(conn: sqlite3.Connection):
+    """Index de la liste des abonnés par date d'inscription"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_abonne_inscription "
+                 "ON abonne(IFNULL(date_inscription, ''))")
+
+
+# ---- 12. Horodatage triable des opérations et du journal ----
+# Colonne horodatage 'AAAA-MM-JJ HH:MM:SS' (date et heure réunies, ordre ISO) :
+# tris récents et périodes deviennent un parcours de plage d'un seul index.
+# Les déclencheurs la tiennent à jour pour toutes les écritures, y compris les
+# requêtes des écrans qui ne la renseignent pas.
+HORODATAGES = {
+    "depots": ("date_depot", "heure"),
+    "retraits": ("date_retrait", "heure"),
+    "transaction": ("date", "heure"),
+    "journal": ("date_action", "heure_action"),
+}
+TAILLE_LOT_HORODATAGE = 5000
+
+
+def _migration_horodatage(conn: sqlite3.Connection):
+    """Colonne horodatage (remplie par lots), index décroissant et déclencheurs"""
+    for table, (date, heure) in HORODATAGES.items():
+        if not table_existe(conn, table):
+            continue
+        ajouter_colonnes(conn, table, [("horodatage", "TEXT")])
+        expression = f"{date} || ' ' || {heure}"
+
+        dernier = conn.execute(f'SELECT MAX(id) FROM "{table}"').fetchone()[0] or 0
+        for debut in range(0, dernier, TAILLE_LOT_HORODATAGE):
+            conn.execute(f'UPDATE "{table}" SET horodatage = {expression} '
+                         f'WHERE id > ? AND id <= ? AND horodatage IS NULL',
+                         (debut, debut + TAILLE_LOT_HORODATAGE))
+        if dernier:
+            logger.info("Horodatage de %s rempli jusqu'à l'id %d", table, dernier)
+
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_horodatage '
+                     f'ON "{table}"(horodatage DESC, id DESC)')
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_horodatage_insertion
+            AFTER INSERT ON "{table}" WHEN NEW.horodatage IS NULL
+            BEGIN
+                UPDATE "{table}" SET horodatage = NEW.{date} || ' ' || NEW.{heure} WHERE id = NEW.id;
+            END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_horodatage_modification
+            AFTER UPDATE OF {date}, {heure} ON "{table}"
+            BEGIN
+                UPDATE "{table}" SET horodatage = NEW.{date} || ' ' || NEW.{heure} WHERE id = NEW.id;
+            END""")
+
+
+# ---- 13. Grand livre des mouvements ----
+# Une écriture par mouvement d'argent, quelle que soit la table d'origine (dépôts
+# et retraits des guichets, "transaction" des comptes normalisés). Nature
+# 'depot' ou 'retrait', sens +1 (crédit du client, débit de la caisse) ou -1.
+# Le grand livre est en ajout seul : une ligne d'origine supprimée ou corrigée
+# produit une écriture d'annulation (sens inverse, même horodatage), jamais une
+# modification. Les index couvrants servent le relevé d'un client
+# (numero_client, horodatage) et les rapports de période (horodatage).
+SQL_GRAND_LIVRE = [
+    """CREATE TABLE IF NOT EXISTS grand_livre (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        numero_client TEXT NOT NULL,
+        horodatage TEXT NOT NULL,
+        nature TEXT NOT NULL CHECK(nature IN ('depot', 'retrait')),
+        annulation INTEGER NOT NULL DEFAULT 0 CHECK(annulation IN (0, 1)),
+        sens INTEGER NOT NULL CHECK(sens IN (1, -1)),
+        montant MONTANT NOT NULL,
+        reference TEXT,
+        agent TEXT,
+        contrepartie TEXT NOT NULL DEFAULT 'caisse',
+        origine TEXT NOT NULL,
+        origine_id INTEGER NOT NULL,
+        cree_le TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime'))
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_grand_livre_client "
+    "ON grand_livre(numero_client, horodatage, sens, montant, nature, reference)",
+    "CREATE INDEX IF NOT EXISTS idx_grand_livre_horodatage "
+    "ON grand_livre(horodatage, nature, sens, montant, numero_client)",
+    "CREATE INDEX IF NOT EXISTS idx_grand_livre_origine ON grand_livre(origine, origine_id)",
+    """CREATE TRIGGER IF NOT EXISTS trg_grand_livre_sans_modification
+        BEFORE UPDATE ON grand_livre
+        BEGIN SELECT RAISE(ABORT, 'grand_livre: écritures en ajout seul'); END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_grand_livre_sans_suppression
+        BEFORE DELETE ON grand_livre
+        BEGIN SELECT RAISE(ABORT, 'grand_livre: écritures en ajout seul'); END""",
+]
+
+# Table d'origine -> expressions SQL de l'écriture ({r} : NEW ou la table). Seules
+# les lignes vérifiant "condition" entrent au grand livre : les transactions non
+# complétées et les lignes sans abonné (orphelines) en sont exclues.
+ORIGINES_GRAND_LIVRE = {
+    "depots": {
+        "nature": "'depot'", "sens": "1", "client": "{r}.numero_client",
+        "date": "{r}.date_depot", "heure": "{r}.heure", "reference": "{r}.ref_depot",
+        "agent": "{r}.nom_agent", "condition": "{r}.numero_client IS NOT NULL",
+    },
+    "retraits": {
+        "nature": "'retrait'", "sens": "-1", "client": "{r}.numero_client",
+        "date": "{r}.date_retrait", "heure": "{r}.heure", "reference": "{r}.ref_retrait",
+        "agent": "{r}.agent", "condition": "{r}.numero_client IS NOT NULL",
+    },
+    "transaction": {
+        "nature": "CASE {r}.type WHEN 'Dépôt' THEN 'depot' ELSE 'retrait' END",
+        "sens": "CASE {r}.type WHEN 'Dépôt' THEN 1 ELSE -1 END",
+        "client": "(SELECT a.numero_client FROM abonne a WHERE a.id = {r}.abonne_id)",
+        "date": "{r}.date", "heure": "{r}.heure", "reference": "{r}.reference",
+        "agent": "{r}.agent",
+        "condition": "{r}.statut = 'Complété' AND "
+                     "EXISTS (SELECT 1 FROM abonne a WHERE a.id = {r}.abonne_id)",
+    },
+}
+
+
+def _ecriture_grand_livre(table: str, ligne: str) -> Tuple[str, str]:
+    """(SELECT produisant l'écriture de la ligne, condition d'entrée au grand livre)"""
+    e = {cle: valeur.format(r=ligne) for cle, valeur in ORIGINES_GRAND_LIVRE[table].items()}
+    return (f"SELECT {e['client']}, {e['date']} || ' ' || {e['heure']}, {e['nature']}, "
+            f"0, {e['sens']}, {ligne}.montant, {e['reference']}, {e['agent']}, "
+            f"'{table}', {ligne}.id", e["condition"])
+
+
+INSERTION_GRAND_LIVRE = ("INSERT INTO grand_livre (numero_client, horodatage, nature, annulation, "
+                         "sens, montant, reference, agent, origine, origine_id) ")
+
+# Annulation de la dernière écriture de la ligne si elle est encore active : le
+# contre-passement reprend ce que le grand livre a enregistré (rien pour une ligne
+# qui n'y est jamais entrée ou déjà annulée)
+ANNULATION_GRAND_LIVRE = """SELECT g.numero_client, g.horodatage, g.nature, 1, -g.sens, g.montant,
+               g.reference, g.agent, g.origine, g.origine_id
+        FROM grand_livre g
+        WHERE g.id = (SELECT MAX(x.id) FROM grand_livre x
+                      WHERE x.origine = '{table}' AND x.origine_id = {ligne}.id)
+          AND g.annulation = 0"""
+
+
+def _declencheurs_grand_livre(conn: sqlite3.Connection, table: str):
+    """(Re)crée les déclencheurs d'insertion, suppression et correction d'une table"""
+    ecriture, condition = _ecriture_grand_livre(table, "NEW")
+    annulation = ANNULATION_GRAND_LIVRE.format(table=table, ligne="OLD")
+    for evenement in ("insertion", "suppression", "correction"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_grand_livre_{evenement}")
+    conn.execute(f"""CREATE TRIGGER trg_{table}_grand_livre_insertion
+        AFTER INSERT ON "{table}"
+        BEGIN {INSERTION_GRAND_LIVRE}{ecriture} WHERE {condition}; END""")
+    conn.execute(f"""CREATE TRIGGER trg_{table}_grand_livre_suppression
+        AFTER DELETE ON "{table}"
+        BEGIN {INSERTION_GRAND_LIVRE}{annulation}; END""")
+    colonnes = "abonne_id, type, montant, statut" if table == "transaction" else "numero_client, montant"
+    conn.execute(f"""CREATE TRIGGER trg_{table}_grand_livre_correction
+        AFTER UPDATE OF {colonnes} ON "{table}"
+        BEGIN
+            {INSERTION_GRAND_LIVRE}{annulation};
+            {INSERTION_GRAND_LIVRE}{ecriture} WHERE {condition};
+        END""")
+
+
+def _migration_grand_livre(conn: sqlite3.Connection):
+    """Table grand_livre remplie depuis les tables d'origine, déclencheurs et vues"""
+    for instruction in SQL_GRAND_LIVRE:
+        conn.execute(instruction)
+
+    for table in ORIGINES_GRAND_LIVRE:
+        if not table_existe(conn, table):
+            continue
+        ecriture, condition = _ecriture_grand_livre(table, f'"{table}"')
+        ignorees = conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE NOT ({condition})').fetchone()[0]
+        if ignorees:
+            logger.warning("Grand livre: %d lignes de %s ignorées (sans abonné ou non complétées)",
+                           ignorees, table)
+        conn.execute(f'{INSERTION_GRAND_LIVRE}{ecriture} FROM "{table}" WHERE {condition} ORDER BY id')
+        _declencheurs_grand_livre(conn, table)
+
+    # Vues de compatibilité : anciennes colonnes, écritures non annulées
+    for vue, nature, reference, date, agent in (
+        ("livre_depots", "depot", "ref_depot", "date_depot", "nom_agent"),
+        ("livre_retraits", "retrait", "ref_retrait", "date_retrait", "agent"),
+    ):
+        conn.execute(f"""CREATE VIEW IF NOT EXISTS {vue} AS
+            SELECT g.origine_id AS id, g.numero_client, g.montant, g.reference AS {reference},
+                   substr(g.horodatage, 12) AS heure, substr(g.horodatage, 1, 10) AS {date},
+                   g.agent AS {agent}, g.horodatage, g.origine
+            FROM grand_livre g
+            WHERE g.nature = '{nature}' AND g.annulation = 0
+              AND NOT EXISTS (SELECT 1 FROM grand_livre x
+                              WHERE x.origine = g.origine AND x.origine_id = g.origine_id
+                                AND x.annulation = 1 AND x.id > g.id)""")
+
+
+# ---- 14. Cumuls par période ----
+# Nombre et montant des opérations par période (jour, semaine ISO repérée par son
+# lundi, mois, année), nature, agent et type de compte. Chaque écriture du grand
+# livre met à jour ses quatre périodes dans la même transaction (une annulation
+# retranche l'opération) ; reconstruire_cumuls repart du grand livre complet.
+GRAINS_CUMULS = {
+    "jour": "substr({h}, 1, 10)",
+    "semaine": "date({h}, 'weekday 0', '-6 days')",
+    "mois": "substr({h}, 1, 7)",
+    "annee": "substr({h}, 1, 4)",
+}
+
+SQL_CUMULS = [
+    """CREATE TABLE IF NOT EXISTS cumul_operations (
+        grain TEXT NOT NULL CHECK(grain IN ('jour', 'semaine', 'mois', 'annee')),
+        nature TEXT NOT NULL,
+        periode TEXT NOT NULL,
+        agent TEXT NOT NULL DEFAULT '',
+        type_compte TEXT NOT NULL DEFAULT '',
+        nombre INTEGER NOT NULL DEFAULT 0,
+        montant MONTANT NOT NULL DEFAULT 0,
+        PRIMARY KEY (grain, nature, periode, agent, type_compte)
+    ) WITHOUT ROWID""",
+]
+
+_TYPE_COMPTE_CUMUL = "IFNULL((SELECT a.type_compte FROM abonne a WHERE a.numero_client = {g}.numero_client), '')"
+
+
+def _cumuls_ecriture() -> str:
+    """INSERT ... ON CONFLICT ajoutant l'écriture NEW à ses quatre périodes"""
+    periodes = " UNION ALL ".join(f"SELECT '{grain}' AS grain, {expression.format(h='NEW.horodatage')} AS periode"
+                                  for grain, expression in GRAINS_CUMULS.items())
+    return f"""INSERT INTO cumul_operations (grain, nature, periode, agent, type_compte, nombre, montant)
+        SELECT p.grain, NEW.nature, p.periode, IFNULL(NEW.agent, ''), {_TYPE_COMPTE_CUMUL.format(g="NEW")},
+               1 - 2 * NEW.annulation, (1 - 2 * NEW.annulation) * NEW.montant
+        FROM ({periodes}) p
+        WHERE 1
+        ON CONFLICT(grain, nature, periode, agent, type_compte) DO UPDATE SET
+            nombre = nombre + excluded.nombre,
+            montant = montant + excluded.montant"""
+
+
+def reconstruire_cumuls(conn: sqlite3.Connection) -> int:
+    """Recalcule tous les cumuls depuis le grand livre ; retourne le nombre de lignes"""
+    conn.execute("DELETE FROM cumul_operations")
+    for grain, expression in GRAINS_CUMULS.items():
+        conn.execute(f"""INSERT INTO cumul_operations
+                (grain, nature, periode, agent, type_compte, nombre, montant)
+            SELECT '{grain}', g.nature, {expression.format(h="g.horodatage")}, IFNULL(g.agent, ''),
+                   {_TYPE_COMPTE_CUMUL.format(g="g")} AS type_compte,
+                   SUM(1 - 2 * g.annulation), SUM((1 - 2 * g.annulation) * g.montant)
+            FROM grand_livre g
+            GROUP BY 1, 2, 3, 4, 5""")
+    return conn.execute("SELECT COUNT(*) FROM cumul_operations").fetchone()[0]
+
+
+def _migration_cumuls(conn: sqlite3.Connection):
+    """Table cumul_operations remplie depuis le grand livre, déclencheur d'alimentation"""
+    for instruction in SQL_CUMULS:
+        conn.execute(instruction)
+    reconstruire_cumuls(conn)
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_grand_livre_cumuls
+        AFTER INSERT ON grand_livre
+        BEGIN {_cumuls_ecriture()}; END""")
+
+
+# ---- 15. Grand livre : transactions non complétées et lignes orphelines ----
+# Les déclencheurs de la version 13 inscrivaient toute ligne de "transaction",
+# quel que soit son statut : ils sont recréés avec la condition d'entrée, et les
+# écritures actives des transactions non complétées sont annulées (les cumuls
+# suivent par leur déclencheur).
+def _migration_grand_livre_conditions(conn: sqlite3.Connection):
+    """Déclencheurs du grand livre recréés, transactions non complétées annulées"""
+    for table in ORIGINES_GRAND_LIVRE:
+        if table_existe(conn, table):
+            _declencheurs_grand_livre(conn, table)
+    if table_existe(conn, "transaction"):
+        conn.execute(f"""{INSERTION_GRAND_LIVRE}
+            SELECT g.numero_client, g.horodatage, g.nature, 1, -g.sens, g.montant,
+                   g.reference, g.agent, g.origine, g.origine_id
+            FROM "transaction" t
+            JOIN grand_livre g ON g.id = (SELECT MAX(x.id) FROM grand_livre x
+                                          WHERE x.origine = 'transaction' AND x.origine_id = t.id)
+            WHERE g.annulation = 0 AND t.statut IS NOT 'Complété'
+            ORDER BY t.id""")
+
+# Liste ordonnée : (version, description, fonction). Ne jamais renuméroter.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "Schéma de base", _migration_schema_de_base),
+    (2, "Colonnes manquantes", _migration_colonnes_manquantes),
+    (3, "Fusion de la table transactions", _migration_table_transactions),
+    (4, "Paramètres par défaut", _migration_parametres_defaut),
+    (5, "Index", _migration_index),
+    (6, "Paramètre de copie des rapports", _migration_parametre_copie_rapports),
+    (7, "Montants en centimes", _migration_montants_centimes),
+    (8, "Carnet fixe par plages de cases", _migration_carnet_par_plages),
+    (9, "Résumé de progression du carnet fixe", _migration_resume_carnet),
+    (10, "Clés d'idempotence des dépôts et retraits", _migration_cles_idempotence),
+    (11, "Index de la liste des abonnés", _migration_index_liste_abonnes),
+    (12, "Horodatage triable des opérations et du journal", _migration_horodatage),
+    (13, "Grand livre des mouvements", _migration_grand_livre),
+    (14, "Cumuls des opérations par période", _migration_cumuls),
+    (15, "Grand livre : transactions non complétées et orphelines", _migration_grand_livre_conditions),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def version_schema(conn: sqlite3.Connection) -> int:
+    """Retourne la version du schéma (PRAGMA user_version)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def appliquer_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Applique les migrations en attente dans une seule transaction
+    Retourne la version du schéma après migration
+    """
+    if version_schema(conn) >= SCHEMA_VERSION:
+        return SCHEMA_VERSION
+
+    isolation_precedente = conn.isolation_level
+    conn.isolation_level = None  # transaction gérée explicitement
+    # Les reconstructions de tables exigent des clés étrangères inactives
+    # (PRAGMA sans effet dans une transaction : réglé avant BEGIN)
+    cles_etrangeres = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Relecture sous verrou : un autre poste a pu migrer entre-temps
+            version = version_schema(conn)
+            for numero, description, migration in MIGRATIONS:
+                if numero > version:
+                    logger.info("Migration %d: %s", numero, description)
+                    migration(conn)
+            violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                logger.warning("Migration: %d références orphelines conservées", len(violations))
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute(f"PRAGMA foreign_keys = {'ON' if cles_etrangeres else 'OFF'}")
+        conn.isolation_level = isolation_precedente
+
+    logger.info("Schéma à jour (version %d)", SCHEMA_VERSION)
+    return SCHEMA_VERSION
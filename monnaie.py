@@ -0,0 +1,165 @@
+import sqlite3
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from fractions import Fraction
+from functools import total_ordering
+from typing import Union
+
+# ==== MONTANTS EN CENTIMES ====
+# Les montants sont stockés en centimes entiers (colonnes déclarées MONTANT) et
+# manipulés avec Montant : les sommes et comparaisons sont exactes, sans dérive
+# des flottants. Un nombre ordinaire combiné à un Montant est lu en francs.
+#
+# Lecture : une colonne MONTANT est convertie automatiquement si la connexion est
+# ouverte avec detect_types=TYPES_DETECTES ; pour un agrégat, nommer la colonne
+# avec le type : SUM(montant) AS "total [MONTANT]".
+# Écriture : un Montant passé en paramètre est enregistré en centimes.
+
+DEVISE = "FC"
+TYPES_DETECTES = sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+_CENTIME = Decimal("0.01")
+
+Nombre = Union[int, float, Decimal, str, "Montant"]
+
+
+@total_ordering
+class Montant:
+    """Montant en centimes entiers (virgule fixe, deux décimales)"""
+
+    __slots__ = ("centimes",)
+
+    def __init__(self, centimes: int = 0):
+        self.centimes = int(centimes)
+
+    # ---- Construction ----
+    @classmethod
+    def depuis(cls, valeur: Nombre) -> "Montant":
+        """Montant à partir d'une valeur en francs (nombre ou saisie « 1 000,50 »)"""
+        if isinstance(valeur, Montant):
+            return valeur
+        if valeur is None:
+            raise ValueError("Montant absent")
+        if isinstance(valeur, str):
+            texte = valeur.replace(" ", "").replace(" ", "").replace(DEVISE, "").replace(",", ".")
+            try:
+                decimal = Decimal(texte)
+            except InvalidOperation:
+                raise ValueError(f"Montant invalide: {valeur!r}")
+        else:
+            decimal = Decimal(str(valeur)) if isinstance(valeur, float) else Decimal(valeur)
+        if not decimal.is_finite():
+            raise ValueError(f"Montant invalide: {valeur!r}")
+        return cls(int((decimal * 100).quantize(Decimal(1), ROUND_HALF_UP)))
+
+    @classmethod
+    def depuis_base(cls, valeur) -> "Montant":
+        """Montant à partir d'une valeur stockée en centimes (None → 0)"""
+        if valeur is None:
+            return cls(0)
+        if isinstance(valeur, Montant):
+            return valeur
+        return cls(int(round(float(valeur))))
+
+    @property
+    def francs(self) -> Decimal:
+        return Decimal(self.centimes) * _CENTIME
+
+    # ---- Arithmétique ----
+    @staticmethod
+    def _autre(valeur) -> "Montant":
+        return valeur if isinstance(valeur, Montant) else Montant.depuis(valeur)
+
+    def __add__(self, autre):
+        return Montant(self.centimes + self._autre(autre).centimes)
+
+    __radd__ = __add__  # permet sum() (0 + Montant)
+
+    def __sub__(self, autre):
+        return Montant(self.centimes - self._autre(autre).centimes)
+
+    def __rsub__(self, autre):
+        return Montant(self._autre(autre).centimes - self.centimes)
+
+    def __mul__(self, facteur):
+        if isinstance(facteur, Montant):
+            return NotImplemented
+        facteur = Decimal(str(facteur)) if isinstance(facteur, float) else Decimal(facteur)
+        return Montant(int((self.centimes * facteur).quantize(Decimal(1), ROUND_HALF_UP)))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, diviseur):
+        if isinstance(diviseur, Montant):
+            return self.centimes / diviseur.centimes
+        return self * (1 / Decimal(str(diviseur)))
+
+    def __floordiv__(self, autre: "Montant") -> int:
+        return self.centimes // self._autre(autre).centimes
+
+    def __mod__(self, autre) -> "Montant":
+        return Montant(self.centimes % self._autre(autre).centimes)
+
+    def pourcentage(self, taux: Nombre) -> "Montant":
+        """taux % du montant, arrondi au centime"""
+        return self * (Decimal(str(taux)) / 100)
+
+    def multiple_de(self, unite: Nombre) -> bool:
+        unite = self._autre(unite)
+        return unite.centimes > 0 and self.centimes % unite.centimes == 0
+
+    def __neg__(self):
+        return Montant(-self.centimes)
+
+    def __abs__(self):
+        return Montant(abs(self.centimes))
+
+    # ---- Comparaisons ----
+    def __eq__(self, autre):
+        try:
+            return self.centimes == self._autre(autre).centimes
+        except (ValueError, TypeError, InvalidOperation):
+            return NotImplemented
+
+    def __lt__(self, autre):
+        return self.centimes < self._autre(autre).centimes
+
+    def __hash__(self):
+        return hash(Fraction(self.centimes, 100))
+
+    def __bool__(self):
+        return self.centimes != 0
+
+    # ---- Conversions / affichage ----
+    def __float__(self):
+        return self.centimes / 100
+
+    def __int__(self):
+        return int(self.centimes / 100)
+
+    def __str__(self):
+        signe = "-" if self.centimes < 0 else ""
+        entier, centimes = divmod(abs(self.centimes), 100)
+        return f"{signe}{entier}.{centimes:02d}"
+
+    def __repr__(self):
+        return f"Montant({self})"
+
+    def __format__(self, spec: str):
+        return format(self.francs, spec) if spec else str(self)
+
+    def formater(self, devise: str = DEVISE) -> str:
+        """« 1 234 FC », ou « 1 234,50 FC » s'il y a des centimes"""
+        signe = "-" if self.centimes < 0 else ""
+        entier, centimes = divmod(abs(self.centimes), 100)
+        texte = f"{entier:,}".replace(",", " ")
+        if centimes:
+            texte += f",{centimes:02d}"
+        return f"{signe}{texte} {devise}".rstrip()
+
+
+def formater_montant(montant, devise: str = DEVISE) -> str:
+    """Formate un montant (Montant ou francs) avec séparateur de milliers et devise"""
+    return Montant.depuis(montant if montant is not None else 0).formater(devise)
+
+
+sqlite3.register_adapter(Montant, lambda m: m.centimes)
+sqlite3.register_converter("MONTANT", lambda valeur: Montant.depuis_base(valeur.decode()))
@@ -0,0 +1,113 @@
+import sqlite3
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from services import FabriqueConnexion
+
+# ==== LISTES PAGINÉES (CURSEURS DE CLÉ) ====
+# Les listes longues (abonnés, dépôts, retraits, journal) se lisent page par page,
+# de la plus récente à la plus ancienne. La page suivante repart de la clé de tri
+# de la dernière ligne lue (horodatage, id) au lieu d'un OFFSET : chaque page
+# suit l'index de l'horodatage, quelle que soit sa position dans la liste. Les lignes
+# sont des tuples nommés (pas de dictionnaire par ligne).
+
+TAILLE_PAGE = 100
+TAILLE_PAGE_EXPORT = 1000  # parcours complets (exports, get_all_*)
+OPERATEURS = ("=", "<>", "<", "<=", ">", ">=", "LIKE")
+
+Filtre = Tuple[str, str, Any]  # (colonne, opérateur, valeur)
+
+
+@dataclass(frozen=True)
+class Liste:
+    """Table listée : colonnes lues et clé de tri (dernière expression : id)"""
+    table: str
+    colonnes: Tuple[str, ...]
+    tri: Tuple[str, ...]
+    enregistrement: type = field(init=False, compare=False)
+
+    def __post_init__(self):
+        nom = "".join(mot.capitalize() for mot in self.table.split("_"))
+        object.__setattr__(self, "enregistrement", namedtuple(nom, self.colonnes))
+
+
+ABONNES = Liste("abonne", (
+    "id", "numero_client", "numero_carte", "nom", "postnom", "prenom", "sexe",
+    "date_naissance", "lieu_naissance", "adresse", "telephone", "suppleant",
+    "contact_suppleant", "type_compte", "montant", "photo", "photo_path",
+    "date_inscription", "solde", "duree_blocage", "montant_atteindre",
+    "pourcentage_retrait", "frequence_retrait", "date_derniere_operation", "statut",
+), tri=("IFNULL(date_inscription, '')", "id"))
+
+DEPOTS = Liste("depots", (
+    "id", "numero_client", "montant", "ref_depot", "heure", "nom_complet",
+    "date_depot", "nom_agent", "methode_paiement", "horodatage",
+), tri=("horodatage", "id"))
+
+RETRAITS = Liste("retraits", (
+    "id", "numero_client", "montant", "ref_retrait", "heure", "date_retrait",
+    "agent", "statut", "horodatage",
+), tri=("horodatage", "id"))
+
+JOURNAL = Liste("journal", (
+    "id", "action", "acteur", "date_action", "heure_action", "cible", "details",
+    "ip_address", "user_agent", "horodatage",
+), tri=("horodatage", "id"))
+
+
+@dataclass
+class Page:
+    lignes: List[tuple]
+    suivante: Optional[tuple]  # curseur de la page suivante, None en fin de liste
+
+
+def _condition(liste: Liste, filtres: Sequence[Filtre]) -> Tuple[List[str], List[Any]]:
+    clauses, parametres = [], []
+    for colonne, operateur, valeur in filtres:
+        operateur = operateur.upper()
+        if colonne not in liste.colonnes or operateur not in OPERATEURS:
+            raise ValueError(f"Filtre invalide sur {liste.table}: {colonne} {operateur}")
+        clauses.append(f"{colonne} {operateur} ?")
+        parametres.append(valeur)
+    return clauses, parametres
+
+
+def lire_page(conn: sqlite3.Connection, liste: Liste, taille: int = TAILLE_PAGE,
+              apres: Optional[tuple] = None, filtres: Sequence[Filtre] = ()) -> Page:
+    """Page de taille lignes, plus récentes d'abord, après le curseur apres"""
+    clauses, parametres = _condition(liste, filtres)
+    cle = ", ".join(liste.tri)
+    if apres is not None:
+        # Borne sur la première expression : l'index d'expression (abonne) reste utilisé
+        clauses.append(f"{liste.tri[0]} <= ? AND ({cle}) < ({', '.join('?' * len(liste.tri))})")
+        parametres.extend((apres[0], *apres))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    ordre = ", ".join(f"{expression} DESC" for expression in liste.tri)
+
+    curseur = conn.execute(f"""
+        SELECT {", ".join(liste.colonnes)}, {cle}
+        FROM "{liste.table}" {where}
+        ORDER BY {ordre}
+        LIMIT ?
+    """, (*parametres, taille + 1))
+    lignes = curseur.fetchmany(taille + 1)
+    n = len(liste.colonnes)
+    suivante = tuple(lignes[taille - 1][n:]) if len(lignes) > taille else None
+    return Page([liste.enregistrement._make(ligne[:n]) for ligne in lignes[:taille]], suivante)
+
+
+def parcourir(connexion: FabriqueConnexion, liste: Liste, taille: int = TAILLE_PAGE,
+              filtres: Sequence[Filtre] = ()) -> Iterator[tuple]:
+    """Toutes les lignes, page par page (une requête courte par page)"""
+    apres = None
+    while True:
+        conn = connexion()
+        try:
+            page = lire_page(conn, liste, taille, apres, filtres)
+        finally:
+            conn.close()
+        yield from page.lignes
+        if page.suivante is None:
+            return
+        apres = page.suivante
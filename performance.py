@@ -0,0 +1,209 @@
+import functools
+import json
+import logging
+import platform
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# ==== INSTRUMENTATION DES PERFORMANCES ====
+# Chaque opération chronométrée (fonction db, gestionnaire d'écran, requête SQL)
+# alimente un histogramme en mémoire : les N dernières durées servent au calcul
+# des percentiles p50/p95/p99 affichés dans le panneau administrateur.
+
+logger = logging.getLogger(__name__)
+
+TAILLE_ECHANTILLON = 2000       # durées conservées par opération
+SEUIL_REQUETE_LENTE_MS = 200.0  # au-delà, la requête est journalisée avec ses paramètres
+MAX_REQUETES_LENTES = 200
+
+
+class Histogramme:
+    """Durées (ms) d'une opération : compteur, total et dernier échantillon"""
+    __slots__ = ("nom", "compteur", "total_ms", "max_ms", "erreurs", "echantillon")
+
+    def __init__(self, nom: str):
+        self.nom = nom
+        self.compteur = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.erreurs = 0
+        self.echantillon = deque(maxlen=TAILLE_ECHANTILLON)
+
+    def ajouter(self, duree_ms: float, erreur: bool = False):
+        self.compteur += 1
+        self.total_ms += duree_ms
+        self.max_ms = max(self.max_ms, duree_ms)
+        if erreur:
+            self.erreurs += 1
+        self.echantillon.append(duree_ms)
+
+    def percentile(self, p: float) -> float:
+        """Percentile (0-100) calculé sur l'échantillon"""
+        valeurs = sorted(self.echantillon)
+        if not valeurs:
+            return 0.0
+        rang = min(len(valeurs) - 1, max(0, int(round(p / 100 * len(valeurs))) - 1))
+        return valeurs[rang]
+
+    def resume(self) -> Dict:
+        return {
+            "operation": self.nom,
+            "compteur": self.compteur,
+            "erreurs": self.erreurs,
+            "moyenne_ms": round(self.total_ms / self.compteur, 2) if self.compteur else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_ms, 2),
+        }
+
+
+_verrou = threading.Lock()
+_histogrammes: Dict[str, Histogramme] = {}
+_requetes_lentes = deque(maxlen=MAX_REQUETES_LENTES)
+
+
+def enregistrer(nom: str, duree_ms: float, erreur: bool = False):
+    """Ajoute une mesure à l'histogramme de l'opération"""
+    with _verrou:
+        histo = _histogrammes.get(nom)
+        if histo is None:
+            histo = _histogrammes[nom] = Histogramme(nom)
+        histo.ajouter(duree_ms, erreur)
+
+
+@contextmanager
+def mesurer(nom: str):
+    """Chronomètre un bloc de code"""
+    debut = time.perf_counter()
+    erreur = False
+    try:
+        yield
+    except Exception:
+        erreur = True
+        raise
+    finally:
+        enregistrer(nom, (time.perf_counter() - debut) * 1000, erreur)
+
+
+def chronometrer(nom: Optional[str] = None):
+    """Décorateur : chronomètre chaque appel de la fonction"""
+    def decorateur(fonction):
+        operation = nom or f"{fonction.__module__}.{fonction.__qualname__}"
+
+        @functools.wraps(fonction)
+        def wrapper(*args, **kwargs):
+            with mesurer(operation):
+                return fonction(*args, **kwargs)
+        return wrapper
+    return decorateur
+
+
+# ---- Requêtes SQL ----
+def _enregistrer_requete(sql: str, params, duree_ms: float, erreur: bool):
+    mots = str(sql).split(None, 1)
+    enregistrer(f"sql.{mots[0].lower() if mots else '?'}", duree_ms, erreur)
+    if duree_ms >= SEUIL_REQUETE_LENTE_MS:
+        texte = " ".join(str(sql).split())
+        with _verrou:
+            _requetes_lentes.append({
+                "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "duree_ms": round(duree_ms, 2),
+                "sql": texte,
+                "parametres": repr(params),
+            })
+        logger.warning("Requête lente (%.0f ms): %s | paramètres: %r", duree_ms, texte, params)
+
+
+class CurseurChronometre(sqlite3.Cursor):
+    """Curseur qui chronomètre chaque requête"""
+
+    def execute(self, sql, parameters=()):
+        debut = time.perf_counter()
+        erreur = False
+        try:
+            return super().execute(sql, parameters)
+        except Exception:
+            erreur = True
+            raise
+        finally:
+            _enregistrer_requete(sql, parameters, (time.perf_counter() - debut) * 1000, erreur)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        debut = time.perf_counter()
+        erreur = False
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except Exception:
+            erreur = True
+            raise
+        finally:
+            _enregistrer_requete(sql, f"{len(seq_of_parameters)} lignes",
+                                 (time.perf_counter() - debut) * 1000, erreur)
+
+
+class ConnexionChronometree(sqlite3.Connection):
+    """Connexion dont toutes les requêtes passent par CurseurChronometre (factory=)"""
+
+    def cursor(self, factory=CurseurChronometre):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ---- Consultation / export ----
+def statistiques() -> List[Dict]:
+    """Résumé de toutes les opérations, les plus coûteuses en premier"""
+    with _verrou:
+        resumes = [h.resume() for h in _histogrammes.values()]
+    return sorted(resumes, key=lambda r: r["p95_ms"], reverse=True)
+
+
+def requetes_lentes() -> List[Dict]:
+    """Dernières requêtes lentes (la plus récente en premier)"""
+    with _verrou:
+        return list(reversed(_requetes_lentes))
+
+
+def reinitialiser():
+    """Vide les histogrammes et la liste des requêtes lentes"""
+    with _verrou:
+        _histogrammes.clear()
+        _requetes_lentes.clear()
+
+
+def instantane() -> Dict:
+    """Profil complet (pour le support)"""
+    try:
+        from demarrage import rapport_imports
+        imports = [{"module": nom, "ms": round(ms, 1)} for nom, ms in rapport_imports()]
+    except Exception:
+        imports = []
+    return {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "systeme": platform.platform(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seuil_requete_lente_ms": SEUIL_REQUETE_LENTE_MS,
+        "operations": statistiques(),
+        "requetes_lentes": requetes_lentes(),
+        "imports_differes": imports,
+    }
+
+
+def exporter_profil(chemin: str) -> str:
+    """Écrit l'instantané du profil dans un fichier JSON"""
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(instantane(), f, ensure_ascii=False, indent=2)
+    logger.info("Profil de performance exporté: %s", chemin)
+    return chemin
@@ -0,0 +1,143 @@
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from monnaie import Montant
+from services import DEPOT_MIN_DEFAUT, RETRAIT_MIN_DEFAUT, TAUX_INTERET_DEFAUT
+
+# ==== DONNÉES DE RÉFÉRENCE (CACHE) ====
+# Paramètres (taux, minimums) et types de compte, lus une fois par base et par
+# processus puis servis depuis la mémoire. La validité est contrôlée au plus toutes
+# les INTERVALLE_VERIFICATION_S par PRAGMA data_version sur une connexion dédiée :
+# la valeur change dès qu'une autre connexion (autre poste, autre écran) a validé
+# une écriture, et le cache est alors relu. L'enregistrement des paramètres
+# invalide le cache immédiatement (invalider).
+
+logger = logging.getLogger(__name__)
+
+INTERVALLE_VERIFICATION_S = 2.0
+
+
+@dataclass(frozen=True)
+class DonneesReference:
+    parametres: Dict[str, str] = field(default_factory=dict)  # valeurs brutes
+    types_compte: Dict[str, int] = field(default_factory=dict)  # nom -> id
+
+    def nombre(self, cle: str, defaut: float) -> float:
+        """Valeur numérique d'un paramètre, defaut si absent ou invalide"""
+        try:
+            valeur = self.parametres.get(cle)
+            return float(valeur) if valeur is not None else defaut
+        except (TypeError, ValueError):
+            return defaut
+
+    @property
+    def taux_interet(self) -> float:
+        return self.nombre("taux_interet", TAUX_INTERET_DEFAUT)
+
+    @property
+    def depot_min(self) -> Montant:
+        return Montant.depuis(self.nombre("depot_min", DEPOT_MIN_DEFAUT))
+
+    @property
+    def retrait_min(self) -> Montant:
+        return Montant.depuis(self.nombre("retrait_min", RETRAIT_MIN_DEFAUT))
+
+
+class CacheReference:
+    """Données de référence d'une base, relues seulement si la base a changé"""
+
+    def __init__(self, chemin_db: str, intervalle_s: float = INTERVALLE_VERIFICATION_S):
+        self.chemin_db = os.path.abspath(chemin_db)
+        self.intervalle_s = intervalle_s
+        self._verrou = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._version: Optional[int] = None
+        self._donnees: Optional[DonneesReference] = None
+        self._verifie = 0.0
+
+    def _connexion(self) -> sqlite3.Connection:
+        if self._conn is None:
+            uri = pathlib.Path(self.chemin_db).as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+        return self._conn
+
+    @staticmethod
+    def _charger(conn: sqlite3.Connection) -> DonneesReference:
+        return DonneesReference(
+            parametres={cle: valeur for cle, valeur in conn.execute("SELECT cle, valeur FROM parametres")},
+            types_compte={nom: id_ for id_, nom in conn.execute("SELECT id, nom FROM type_compte")},
+        )
+
+    def donnees(self) -> DonneesReference:
+        donnees = self._donnees
+        if donnees is not None and time.monotonic() - self._verifie < self.intervalle_s:
+            return donnees
+        with self._verrou:
+            if self._donnees is not None and time.monotonic() - self._verifie < self.intervalle_s:
+                return self._donnees
+            try:
+                conn = self._connexion()
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if self._donnees is None or version != self._version:
+                    self._donnees, self._version = self._charger(conn), version
+            except sqlite3.Error as e:
+                logger.error("Erreur chargement des données de référence: %s", str(e))
+                if self._donnees is None:
+                    self._donnees, self._version = DonneesReference(), None  # valeurs par défaut
+            self._verifie = time.monotonic()
+            return self._donnees
+
+    def invalider(self):
+        with self._verrou:
+            self._donnees = None
+
+    def parametre(self, cle: str, defaut: float) -> float:
+        return self.donnees().nombre(cle, defaut)
+
+    def type_compte_id(self, nom: str) -> Optional[int]:
+        return self.donnees().types_compte.get(nom)
+
+    def fermer(self):
+        with self._verrou:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ---- Caches actifs, par base ----
+_caches: Dict[str, CacheReference] = {}
+_verrou_caches = threading.Lock()
+
+
+def _cle(chemin_db: str) -> str:
+    return os.path.normcase(os.path.abspath(chemin_db))
+
+
+def cache_reference(chemin_db: str) -> CacheReference:
+    """Cache des données de référence de chemin_db (créé au premier appel)"""
+    cache = _caches.get(_cle(chemin_db))
+    if cache is None:
+        with _verrou_caches:
+            cache = _caches.setdefault(_cle(chemin_db), CacheReference(chemin_db))
+    return cache
+
+
+def charger(chemin_db: str) -> DonneesReference:
+    """Chargement au démarrage (après les migrations)"""
+    return cache_reference(chemin_db).donnees()
+
+
+def invalider(chemin_db: Optional[str] = None):
+    """Invalide le cache d'une base, ou de toutes si chemin_db est None"""
+    if chemin_db is not None:
+        cache_reference(chemin_db).invalider()
+        return
+    for cache in list(_caches.values()):
+        cache.invalider()
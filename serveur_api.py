@@ -0,0 +1,399 @@
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import logging
+import sqlite3
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, fields
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import performance
+from file_ecriture import FileEcriture, TAILLE_LOT_DEFAUT
+from lecture import activer_copie, connexion_rapport, desactiver_copie
+from migrations import appliquer_migrations
+from monnaie import Montant, TYPES_DETECTES
+from references import cache_reference
+from services import (ConsultationService, DemandeDepot, DemandeRetrait, DepotService,
+                      ResultatDepot, ResultatRetrait, RetraitService)
+
+# ==== SERVEUR API LOCAL (HTTP/JSON) ====
+# Un seul poste possède la base ; les guichets lui envoient leurs opérations sur
+# le réseau local au lieu d'ouvrir le fichier SQLite partagé. Les écritures passent
+# par la file d'écriture (écrivain unique, validation groupée des requêtes
+# simultanées), les lectures par un pool de threads.
+#
+#   python serveur_api.py --base C:\...\data_epargne.db --hote 0.0.0.0 --port 8765 --jeton secret
+#
+# Sans --base, la base des écrans de dépôt et de retrait (MyApp/data_epargne.db).
+# Par défaut le serveur n'écoute que le poste local ; une écoute réseau (--hote
+# 0.0.0.0) exige un jeton.
+#
+#   GET  /sante
+#   GET  /abonnes?q=terme&limite=50
+#   GET  /abonnes/<numero_client>
+#   POST /depots      {"numero_client", "montant", "agent", "mode"}
+#   POST /retraits    {"numero_client", "montant", "agent", "type_retrait", "type_global", "taux_interet"}
+#   GET  /rapports/journalier?date=AAAA-MM-JJ
+#   GET  /rapports/mensuel?annee=AAAA&mois=MM
+
+logger = logging.getLogger(__name__)
+
+HOTE_DEFAUT = "127.0.0.1"
+PORT_DEFAUT = 8765
+TAILLE_MAX_CORPS = 64 * 1024
+DELAI_INACTIVITE = 30  # secondes avant fermeture d'une connexion keep-alive
+MESSAGES_HTTP = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                 405: "Method Not Allowed", 413: "Payload Too Large", 422: "Unprocessable Entity",
+                 500: "Internal Server Error"}
+
+
+class ErreurRequete(Exception):
+    """Requête HTTP invalide (statut + message renvoyés au client)"""
+
+    def __init__(self, statut: int, message: str):
+        super().__init__(message)
+        self.statut = statut
+
+
+def _json_defaut(valeur):
+    if isinstance(valeur, datetime):
+        return valeur.isoformat(timespec="seconds")
+    if isinstance(valeur, Montant):
+        return float(valeur)  # deux décimales : relu exactement par Montant.depuis
+    raise TypeError(f"Type non sérialisable: {type(valeur).__name__}")
+
+
+def _resultat_json(resultat) -> Tuple[int, Dict]:
+    """ResultatDepot/ResultatRetrait -> (statut HTTP, corps)"""
+    return (200 if resultat.succes else 422), asdict(resultat)
+
+
+def _hote_local(hote: str) -> bool:
+    """Indique si l'adresse d'écoute n'est joignable que depuis le poste"""
+    if hote == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(hote).is_loopback
+    except ValueError:
+        return False
+
+
+class ServeurAPI:
+    """Serveur asyncio : une coroutine par connexion, SQLite dans des threads"""
+
+    def __init__(self, chemin_db: str, hote: str = HOTE_DEFAUT, port: int = PORT_DEFAUT,
+                 lecteurs: int = 4, jeton: Optional[str] = None,
+                 taille_lot: int = TAILLE_LOT_DEFAUT, copie_rapports_min: float = 0):
+        if not jeton and not _hote_local(hote):
+            raise ValueError(f"Écoute sur {hote} sans jeton refusée : indiquez --jeton")
+        self.chemin_db = chemin_db
+        self.hote = hote
+        self.port = port
+        self.jeton = jeton
+        self.taille_lot = taille_lot
+        self.copie_rapports_min = copie_rapports_min
+        self.file = None
+        # Threads qui attendent le résultat de leur opération dans la file d'écriture
+        self._ecrivain = ThreadPoolExecutor(max_workers=32, thread_name_prefix="api-ecriture")
+        self._lecteurs = ThreadPoolExecutor(max_workers=lecteurs, thread_name_prefix="api-lecteur")
+        self.depots = DepotService(self.connexion, references=cache_reference(chemin_db))
+        self.retraits = RetraitService(self.connexion, references=cache_reference(chemin_db))
+        self.consultation = ConsultationService(self.connexion, self.connexion_rapports)
+        self._serveur = None
+
+    def connexion(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.chemin_db, timeout=30, detect_types=TYPES_DETECTES,
+                               factory=performance.ConnexionChronometree)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def connexion_rapports(self) -> sqlite3.Connection:
+        return connexion_rapport(self.chemin_db)
+
+    def preparer_base(self):
+        """Mode WAL et schéma à jour avant d'accepter des connexions"""
+        conn = sqlite3.connect(self.chemin_db)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            appliquer_migrations(conn)
+        finally:
+            conn.close()
+
+    # ---- Cycle de vie ----
+    async def demarrer(self):
+        self.preparer_base()
+        # Un seul écrivain : les écritures sont sérialisées sans attente de verrou
+        self.file = FileEcriture(self.connexion, self.taille_lot, nom="api-ecrivain")
+        self.depots.file = self.retraits.file = self.file
+        if self.copie_rapports_min > 0:
+            activer_copie(self.chemin_db, self.copie_rapports_min * 60)
+        self._serveur = await asyncio.start_server(self._traiter_connexion, self.hote, self.port)
+        adresses = ", ".join(str(s.getsockname()) for s in self._serveur.sockets)
+        logger.info("Serveur API à l'écoute sur %s (base: %s)", adresses, self.chemin_db)
+        return self._serveur
+
+    async def servir(self):
+        serveur = await self.demarrer()
+        async with serveur:
+            await serveur.serve_forever()
+
+    async def arreter(self):
+        if self._serveur:
+            self._serveur.close()
+            await self._serveur.wait_closed()
+        self._ecrivain.shutdown(wait=True)
+        self._lecteurs.shutdown(wait=True)
+        if self.file:
+            self.file.arreter()
+        desactiver_copie(self.chemin_db)
+
+    async def _ecrire(self, fonction, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._ecrivain, fonction, *args)
+
+    async def _lire(self, fonction, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._lecteurs, fonction, *args)
+
+    # ---- HTTP ----
+    async def _traiter_connexion(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    ligne = await asyncio.wait_for(reader.readline(), DELAI_INACTIVITE)
+                except asyncio.TimeoutError:
+                    break
+                if not ligne.strip():
+                    break
+                garder = await self._traiter_requete(ligne, reader, writer)
+                if not garder:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _traiter_requete(self, ligne: bytes, reader, writer) -> bool:
+        entetes = {}
+        while True:
+            entete = await reader.readline()
+            if entete in (b"\r\n", b"\n", b""):
+                break
+            nom, _, valeur = entete.decode("latin-1").partition(":")
+            entetes[nom.strip().lower()] = valeur.strip()
+
+        garder = entetes.get("connection", "").lower() != "close"
+        try:
+            methode, cible, _ = ligne.decode("latin-1").split(" ", 2)
+            longueur = int(entetes.get("content-length", 0) or 0)
+            if longueur > TAILLE_MAX_CORPS:
+                raise ErreurRequete(413, "Corps de requête trop volumineux")
+            corps = await reader.readexactly(longueur) if longueur else b""
+            if self.jeton and not hmac.compare_digest(entetes.get("x-jeton", "").encode("utf-8"),
+                                                      self.jeton.encode("utf-8")):
+                raise ErreurRequete(401, "Jeton d'accès invalide")
+
+            url = urllib.parse.urlsplit(cible)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            donnees = json.loads(corps) if corps else {}
+            if not isinstance(donnees, dict):
+                raise ErreurRequete(400, "Le corps de la requête doit être un objet JSON")
+            with performance.mesurer(f"api.{methode} {self._gabarit(url.path)}"):
+                statut, reponse = await self._router(methode, url.path, params, donnees)
+        except ErreurRequete as e:
+            statut, reponse = e.statut, {"erreur": str(e)}
+        except (ValueError, json.JSONDecodeError) as e:
+            statut, reponse = 400, {"erreur": f"Requête invalide: {e}"}
+        except Exception as e:
+            logger.error("Erreur API: %s", str(e), exc_info=True)
+            statut, reponse = 500, {"erreur": "Erreur interne du serveur"}
+
+        contenu = json.dumps(reponse, ensure_ascii=False, default=_json_defaut).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {statut} {MESSAGES_HTTP.get(statut, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(contenu)}\r\n"
+            f"Connection: {'keep-alive' if garder else 'close'}\r\n\r\n".encode("latin-1") + contenu
+        )
+        await writer.drain()
+        return garder
+
+    @staticmethod
+    def _gabarit(chemin: str) -> str:
+        """Chemin normalisé pour les statistiques (/abonnes/CLI123 -> /abonnes/{id})"""
+        morceaux = chemin.rstrip("/").split("/")
+        if len(morceaux) == 3 and morceaux[1] == "abonnes":
+            return "/abonnes/{id}"
+        return chemin
+
+    async def _router(self, methode: str, chemin: str, params: Dict, donnees: Dict) -> Tuple[int, object]:
+        chemin = chemin.rstrip("/") or "/"
+        routes = {
+            "/sante": {"GET": self._sante},
+            "/abonnes": {"GET": self._rechercher},
+            "/depots": {"POST": self._deposer},
+            "/retraits": {"POST": self._retirer},
+            "/rapports/journalier": {"GET": self._rapport_journalier},
+            "/rapports/mensuel": {"GET": self._rapport_mensuel},
+        }
+        if chemin.startswith("/abonnes/"):
+            if methode != "GET":
+                raise ErreurRequete(405, "Méthode non autorisée")
+            return await self._profil(urllib.parse.unquote(chemin[len("/abonnes/"):]))
+        if chemin not in routes:
+            raise ErreurRequete(404, "Ressource introuvable")
+        if methode not in routes[chemin]:
+            raise ErreurRequete(405, "Méthode non autorisée")
+        return await routes[chemin][methode](params, donnees)
+
+    # ---- Points d'accès ----
+    async def _sante(self, params, donnees):
+        return 200, {"statut": "ok", "base": self.chemin_db,
+                     "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+
+    async def _rechercher(self, params, donnees):
+        terme = params.get("q", "").strip()
+        if not terme:
+            raise ErreurRequete(400, "Paramètre q obligatoire")
+        limite = min(int(params.get("limite", 50)), 500)
+        return 200, await self._lire(self.consultation.rechercher, terme, limite)
+
+    async def _profil(self, numero_client: str):
+        profil = await self._lire(self.consultation.profil, numero_client)
+        if profil is None:
+            raise ErreurRequete(404, "Abonné introuvable")
+        return 200, profil
+
+    async def _deposer(self, params, donnees):
+        try:
+            demande = DemandeDepot(
+                numero_client=str(donnees["numero_client"]),
+                montant=Montant.depuis(donnees["montant"]),
+                agent=str(donnees["agent"]),
+                mode=donnees.get("mode", "normal"),
+                methode_paiement=donnees.get("methode_paiement"),
+                cle_idempotence=donnees.get("cle_idempotence"),
+            )
+        except KeyError as e:
+            raise ErreurRequete(400, f"Champ obligatoire manquant: {e}")
+        return _resultat_json(await self._ecrire(self.depots.deposer, demande))
+
+    async def _retirer(self, params, donnees):
+        try:
+            taux = donnees.get("taux_interet")
+            demande = DemandeRetrait(
+                numero_client=str(donnees["numero_client"]),
+                montant=Montant.depuis(donnees["montant"]),
+                agent=str(donnees["agent"]),
+                type_retrait=donnees.get("type_retrait", "partiel"),
+                type_global=donnees.get("type_global", ""),
+                taux_interet=float(taux) if taux is not None else None,
+                cle_idempotence=donnees.get("cle_idempotence"),
+            )
+        except KeyError as e:
+            raise ErreurRequete(400, f"Champ obligatoire manquant: {e}")
+        return _resultat_json(await self._ecrire(self.retraits.retirer, demande))
+
+    async def _rapport_journalier(self, params, donnees):
+        date = params.get("date") or datetime.now().strftime("%Y-%m-%d")
+        datetime.strptime(date, "%Y-%m-%d")
+        return 200, await self._lire(self.consultation.rapport_journalier, date)
+
+    async def _rapport_mensuel(self, params, donnees):
+        maintenant = datetime.now()
+        annee = int(params.get("annee", maintenant.year))
+        mois = int(params.get("mois", maintenant.month))
+        if not 1 <= mois <= 12:
+            raise ErreurRequete(400, "Mois invalide")
+        return 200, await self._lire(self.consultation.rapport_mensuel, annee, mois)
+
+
+# ---- Client (guichets) ----
+class ClientAPI:
+    """Client du serveur API ; deposer/retirer ont la même signature que les services"""
+
+    def __init__(self, url: str, jeton: Optional[str] = None, timeout: float = 15):
+        self.url = url.rstrip("/")
+        self.jeton = jeton
+        self.timeout = timeout
+
+    def _appel(self, methode: str, chemin: str, donnees: Optional[Dict] = None):
+        corps = json.dumps(donnees, default=_json_defaut).encode("utf-8") if donnees is not None else None
+        requete = urllib.request.Request(self.url + chemin, data=corps, method=methode)
+        requete.add_header("Content-Type", "application/json")
+        if self.jeton:
+            requete.add_header("X-Jeton", self.jeton)
+        try:
+            with urllib.request.urlopen(requete, timeout=self.timeout) as reponse:
+                return reponse.status, json.loads(reponse.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read().decode("utf-8") or "{}")
+
+    @staticmethod
+    def _resultat(classe, statut: int, corps: Dict):
+        if statut not in (200, 422):
+            return classe(False, corps.get("erreur", f"Erreur serveur ({statut})"))
+        if corps.get("date_heure"):
+            corps["date_heure"] = datetime.fromisoformat(corps["date_heure"])
+        for champ in fields(classe):
+            if champ.type in (Montant, "Montant") and corps.get(champ.name) is not None:
+                corps[champ.name] = Montant.depuis(corps[champ.name])
+        return classe(**corps)
+
+    def deposer(self, demande: DemandeDepot) -> ResultatDepot:
+        return self._resultat(ResultatDepot, *self._appel("POST", "/depots", asdict(demande)))
+
+    def retirer(self, demande: DemandeRetrait) -> ResultatRetrait:
+        return self._resultat(ResultatRetrait, *self._appel("POST", "/retraits", asdict(demande)))
+
+    def rechercher(self, terme: str, limite: int = 50):
+        requete = urllib.parse.urlencode({"q": terme, "limite": limite})
+        statut, corps = self._appel("GET", f"/abonnes?{requete}")
+        return corps if statut == 200 else []
+
+    def profil(self, numero_client: str) -> Optional[Dict]:
+        statut, corps = self._appel("GET", f"/abonnes/{urllib.parse.quote(numero_client)}")
+        return corps if statut == 200 else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur API local S-MONEY")
+    parser.add_argument("--base", help="Chemin de la base (défaut: base des écrans, MyApp/data_epargne.db)")
+    parser.add_argument("--hote", default=HOTE_DEFAUT,
+                        help="Adresse d'écoute ; hors poste local, --jeton est obligatoire")
+    parser.add_argument("--port", type=int, default=PORT_DEFAUT)
+    parser.add_argument("--lecteurs", type=int, default=4, help="Threads de lecture")
+    parser.add_argument("--jeton", help="Jeton partagé exigé dans l'en-tête X-Jeton")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT_DEFAUT,
+                        help="Écritures validées au plus par transaction")
+    parser.add_argument("--copie-rapports", type=float, default=0, metavar="MINUTES",
+                        help="Rapports servis depuis une copie rafraîchie toutes les MINUTES (0: base)")
+    args = parser.parse_args(argv)
+
+    chemin_db = args.base
+    if not chemin_db:
+        from db import DBConfig
+        chemin_db = DBConfig.get_guichets_db_path()
+
+    try:
+        serveur = ServeurAPI(chemin_db, args.hote, args.port, args.lecteurs, args.jeton, args.taille_lot,
+                             args.copie_rapports)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        asyncio.run(serveur.servir())
+    except KeyboardInterrupt:
+        logger.info("Arrêt du serveur API")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
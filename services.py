@@ -0,0 +1,1066 @@
+import json
+import logging
+import math
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field, fields, replace
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from file_ecriture import FileEcriture
+from monnaie import Montant
+from performance import chronometrer
+
+# ==== COUCHE MÉTIER (SANS INTERFACE) ====
+# Les règles de dépôt, de retrait et du carnet fixe, indépendantes de Tkinter :
+# les écrans, les traitements par lots et les tests de charge appellent les mêmes
+# services. Chaque service reçoit une fabrique de connexions (connexion_db du
+# module appelant) et valide ses écritures dans une seule transaction, ou les
+# confie à une FileEcriture (écrivain unique, validation groupée) si elle est fournie.
+# Les montants sont des monnaie.Montant (centimes) ; les connexions fournies doivent
+# être ouvertes avec detect_types=monnaie.TYPES_DETECTES.
+
+logger = logging.getLogger(__name__)
+
+CASES_PAR_PAGE = 31
+PAGES_MAX = 8
+CASES_MAX = CASES_PAR_PAGE * PAGES_MAX  # 248
+
+DEPOT_MIN_DEFAUT = 500.0
+RETRAIT_MIN_DEFAUT = 1000.0
+TAUX_INTERET_DEFAUT = 5.0
+
+DUREE_FENETRE_S = 120.0  # fenêtre de déduplication en mémoire (clés d'idempotence)
+
+FabriqueConnexion = Callable[[], sqlite3.Connection]
+
+
+class ErreurMetier(Exception):
+    """Règle métier non respectée (message destiné à l'agent)"""
+
+    def __init__(self, message: str, titre: str = "Erreur"):
+        super().__init__(message)
+        self.titre = titre
+
+
+# ---- Requêtes / résultats ----
+@dataclass
+class DemandeDepot:
+    numero_client: str
+    montant: Montant
+    agent: str
+    mode: str = "normal"  # "normal" (mixte) ou "fixe" (carnet)
+    methode_paiement: Optional[str] = None
+    cle_idempotence: Optional[str] = None  # générée par le guichet (CleSaisie)
+
+    def __post_init__(self):
+        if self.montant is not None:
+            self.montant = Montant.depuis(self.montant)
+
+
+@dataclass
+class ResultatDepot:
+    succes: bool
+    message: str
+    titre: str = "Erreur"
+    reference: Optional[str] = None
+    numero_client: Optional[str] = None
+    numero_carte: Optional[str] = None
+    nom_complet: str = ""
+    montant: Montant = field(default_factory=Montant)
+    ancien_solde: Montant = field(default_factory=Montant)
+    nouveau_solde: Montant = field(default_factory=Montant)
+    depot_fixe: bool = False
+    nb_cases: int = 0
+    date_heure: Optional[datetime] = None
+    doublon: bool = False  # résultat d'origine renvoyé pour une clé déjà traitée
+
+    def bordereau(self, nom_agent: str) -> Dict:
+        """Données du bordereau de dépôt (export_pdf.generer_bordereaux)"""
+        return {
+            "nom_complet": self.nom_complet,
+            "numero_client": self.numero_client,
+            "numero_carte": self.numero_carte,
+            "montant": self.montant,
+            "ancien_solde": self.ancien_solde,
+            "nouveau_solde": self.nouveau_solde,
+            "ref": self.reference,
+            "date_heure": self.date_heure.strftime("%d/%m/%Y %H:%M"),
+            "nom_agent": nom_agent,
+        }
+
+
+@dataclass
+class DemandeRetrait:
+    numero_client: str
+    montant: Montant
+    agent: str
+    type_retrait: str = "partiel"  # "partiel" ou "global"
+    type_global: str = ""          # "fixe", "mixte" ou "bloqué" (retrait global)
+    taux_interet: Optional[float] = None  # en %, paramètre taux_interet par défaut
+    cle_idempotence: Optional[str] = None  # générée par le guichet (CleSaisie)
+
+    def __post_init__(self):
+        if self.montant is not None:
+            self.montant = Montant.depuis(self.montant)
+
+
+@dataclass
+class CalculRetrait:
+    montant_retrait: Montant  # débité du solde
+    commission: Montant
+    montant_net: Montant      # remis au client
+
+
+@dataclass
+class ResultatRetrait:
+    succes: bool
+    message: str
+    titre: str = "Erreur"
+    reference: Optional[str] = None
+    numero_client: Optional[str] = None
+    numero_carte: Optional[str] = None
+    nom_complet: str = ""
+    montant_retire: Montant = field(default_factory=Montant)
+    commission: Montant = field(default_factory=Montant)
+    montant_net: Montant = field(default_factory=Montant)
+    ancien_solde: Montant = field(default_factory=Montant)
+    nouveau_solde: Montant = field(default_factory=Montant)
+    montant_initial: Montant = field(default_factory=Montant)
+    agent: str = ""
+    date_heure: Optional[datetime] = None
+    doublon: bool = False  # résultat d'origine renvoyé pour une clé déjà traitée
+
+    def bordereau(self) -> Dict:
+        """Données du bordereau de retrait (export_retrait)"""
+        return {
+            "numero_client": self.numero_client,
+            "numero_carte": self.numero_carte,
+            "nom_complet": self.nom_complet,
+            "montant_retire": self.montant_retire,
+            "commission": self.commission,
+            "montant_net": self.montant_net,
+            "ancien_solde": self.ancien_solde,
+            "nouveau_solde": self.nouveau_solde,
+            "date_heure": self.date_heure.strftime("%d/%m/%Y %H:%M"),
+            "ref": self.reference,
+            "agent": self.agent,
+            "montant_initial": self.montant_initial,
+        }
+
+
+@dataclass
+class ProgressionCarnet:
+    numero_client: str
+    montant_initial: Montant
+    pages_completes: int
+    total_cases: int
+    total_retires: Montant
+    pages: List[Tuple[int, int]] = field(default_factory=list)  # (page, cases_remplies)
+    total_epargne: Montant = field(default_factory=Montant)
+    derniere_date: Optional[str] = None
+
+    @property
+    def montant_restant(self) -> Montant:
+        return self.total_epargne - self.total_retires
+
+    @property
+    def pourcentage(self) -> float:
+        return self.total_cases / CASES_MAX * 100
+
+
+# ---- Fonctions communes ----
+def lire_parametre(conn: sqlite3.Connection, cle: str, defaut: float) -> float:
+    """Valeur numérique d'un paramètre, defaut si absent ou invalide"""
+    row = conn.execute("SELECT valeur FROM parametres WHERE cle = ?", (cle,)).fetchone()
+    try:
+        return float(row[0]) if row and row[0] is not None else defaut
+    except (TypeError, ValueError):
+        return defaut
+
+
+def parametre(conn: sqlite3.Connection, references, cle: str, defaut: float) -> float:
+    """Paramètre depuis le cache de référence (references.CacheReference) s'il est fourni"""
+    if references is not None:
+        return references.parametre(cle, defaut)
+    return lire_parametre(conn, cle, defaut)
+
+
+def journaliser(conn: sqlite3.Connection, action: str, acteur: str,
+                cible: Optional[str] = None, details: Optional[str] = None,
+                maintenant: Optional[datetime] = None):
+    """Entrée de journal dans la transaction en cours"""
+    maintenant = maintenant or datetime.now()
+    conn.execute("""
+        INSERT INTO journal (action, acteur, cible, details, date_action, heure_action)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (action, acteur, cible, details,
+          maintenant.strftime("%Y-%m-%d"), maintenant.strftime("%H:%M:%S")))
+
+
+def executer_ecriture(connexion: FabriqueConnexion, file: Optional[FileEcriture], operation):
+    """operation(conn) dans une transaction : via la file d'écriture ou une connexion dédiée"""
+    if file is not None:
+        return file.executer(operation)
+    conn = connexion()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        resultat = operation(conn)
+        conn.commit()
+        return resultat
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# ---- Idempotence ----
+# Un envoi répété (double clic, nouvelle tentative après « database is locked »,
+# formulaire ressaisi) porte la même clé : la fenêtre en mémoire répond sans
+# toucher la base, et operations_idempotentes (même transaction que l'opération)
+# renvoie le résultat d'origine au-delà de la fenêtre ou depuis un autre poste.
+class CleSaisie:
+    """Clé d'idempotence d'un envoi non confirmé : la même pour ses reprises et doubles clics"""
+
+    def __init__(self, duree_s: float = DUREE_FENETRE_S):
+        self.duree_s = duree_s
+        self.reinitialiser()
+
+    def pour(self, *saisie) -> str:
+        """Clé de la saisie ; nouvelle si la saisie change ou si la clé a dépassé la fenêtre"""
+        maintenant = time.monotonic()
+        if saisie != self._saisie or maintenant - self._date > self.duree_s:
+            self._saisie, self._cle, self._date = saisie, uuid.uuid4().hex, maintenant
+        return self._cle
+
+    def reinitialiser(self):
+        """À appeler une fois le résultat confirmé ou le formulaire vidé : l'envoi suivant est neuf"""
+        self._saisie = None
+        self._cle = None
+        self._date = 0.0
+
+
+class FenetreIdempotence:
+    """Résultats récents par clé ; un second envoi de la même clé attend le premier"""
+
+    def __init__(self, duree_s: float = DUREE_FENETRE_S):
+        self.duree_s = duree_s
+        self._verrou = threading.Lock()
+        self._entrees: Dict[str, list] = {}  # clé -> [verrou, résultat, date]
+
+    def executer(self, cle: Optional[str], operation: Callable[[], object]):
+        if not cle:
+            return operation()
+        with self._verrou:
+            self._purger()
+            entree = self._entrees.setdefault(cle, [threading.Lock(), None, time.monotonic()])
+        with entree[0]:
+            if entree[1] is not None:
+                return replace(entree[1], doublon=True)
+            resultat = operation()
+            if resultat.succes:
+                entree[1], entree[2] = resultat, time.monotonic()
+            return resultat
+
+    def _purger(self):
+        limite = time.monotonic() - self.duree_s
+        for cle in [c for c, (verrou, _, date) in self._entrees.items()
+                    if date < limite and not verrou.locked()]:
+            del self._entrees[cle]
+
+
+_fenetre = FenetreIdempotence()
+
+
+def _valeur_json(valeur):
+    if isinstance(valeur, Montant):
+        return valeur.centimes
+    if isinstance(valeur, datetime):
+        return valeur.isoformat()
+    raise TypeError(f"Type non sérialisable: {type(valeur).__name__}")
+
+
+def resultat_enregistre(conn: sqlite3.Connection, cle: Optional[str], classe):
+    """Résultat d'origine d'une clé déjà traitée (doublon=True), sinon None"""
+    if not cle:
+        return None
+    row = conn.execute("SELECT resultat FROM operations_idempotentes WHERE cle = ?", (cle,)).fetchone()
+    if row is None:
+        return None
+    donnees = json.loads(row[0])
+    for champ in fields(classe):
+        if champ.type is Montant:
+            donnees[champ.name] = Montant(donnees[champ.name])
+    if donnees.get("date_heure"):
+        donnees["date_heure"] = datetime.fromisoformat(donnees["date_heure"])
+    donnees["doublon"] = True
+    return classe(**donnees)
+
+
+def enregistrer_resultat(conn: sqlite3.Connection, cle: Optional[str], operation: str, resultat):
+    """Mémorise le résultat de l'opération sous sa clé (dans la transaction en cours)"""
+    if cle:
+        conn.execute("""
+            INSERT INTO operations_idempotentes (cle, operation, reference, resultat, cree_le)
+            VALUES (?, ?, ?, ?, ?)
+        """, (cle, operation, resultat.reference, json.dumps(asdict(resultat), default=_valeur_json),
+              datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+def debiter_solde(conn: sqlite3.Connection, table: str, colonne_cle: str, cle,
+                  montant: Montant, plancher: Montant = Montant()) -> Montant:
+    """
+    Débite montant du solde si au moins plancher y reste, en une seule requête
+    (pas de fenêtre entre vérification et débit) ; retourne le nouveau solde
+    """
+    row = conn.execute(f"""
+        UPDATE {table}
+        SET solde = COALESCE(solde, 0) - ?
+        WHERE {colonne_cle} = ? AND COALESCE(solde, 0) - ? >= ?
+        RETURNING solde
+    """, (montant, cle, montant, plancher)).fetchone()
+    if row is None:
+        raise ErreurMetier("Fonds insuffisants : le solde a changé entre-temps, veuillez réessayer.")
+    return Montant.depuis_base(row[0])
+
+
+def _lire_abonne(conn: sqlite3.Connection, numero_client: str) -> Optional[Tuple]:
+    """(numero_client, nom complet, numero_carte, solde, type_compte, montant_initial)"""
+    row = conn.execute("""
+        SELECT a.numero_client,
+               TRIM(COALESCE(a.nom, '') || ' ' || COALESCE(a.postnom, '') || ' ' || COALESCE(a.prenom, '')),
+               a.numero_carte, COALESCE(a.solde, 0), a.type_compte, cf.montant_initial
+        FROM abonne a
+        LEFT JOIN compte_fixe cf ON a.numero_carte = cf.numero_carte
+        WHERE a.numero_client = ? OR a.numero_carte = ?
+    """, (numero_client, numero_client)).fetchone()
+    if not row:
+        return None
+    montant_initial = Montant.depuis_base(row[5]) if row[5] is not None else None
+    return row[0], row[1], row[2], Montant.depuis_base(row[3]), row[4], montant_initial
+
+
+# ---- Carnet du compte fixe ----
+class CarnetService:
+    """
+    Carnet du compte fixe : 8 pages de 31 cases, une case par montant initial déposé.
+    Chaque dépôt occupe une plage de cases (carnet_depots) ; compte_fixe.prochaine_case
+    est l'indice (à partir de 0) de la prochaine case libre, donc le nombre de cases
+    remplies. Pages et cartes se déduisent de ces plages par calcul.
+    carnet_progression résume chaque compte (cases, pages, épargné, retiré) ; elle est
+    tenue à jour dans la transaction des dépôts et des retraits.
+    """
+
+    def __init__(self, connexion: FabriqueConnexion):
+        self.connexion = connexion
+
+    @staticmethod
+    def configuration(conn: sqlite3.Connection, numero_client: str) -> Tuple[Montant, str]:
+        """(montant_initial, numero_carte) du compte fixe"""
+        row = conn.execute("""
+            SELECT montant_initial, numero_carte
+            FROM compte_fixe
+            WHERE numero_client = ?
+        """, (numero_client,)).fetchone()
+        montant_initial = Montant.depuis_base(row[0]) if row else Montant()
+        if montant_initial.centimes <= 0:
+            raise ErreurMetier("Configuration du compte fixe invalide")
+        return montant_initial, row[1]
+
+    @staticmethod
+    def total_cases(conn: sqlite3.Connection, numero_client: str) -> int:
+        """Cases remplies = curseur de la prochaine case libre"""
+        row = conn.execute(
+            "SELECT prochaine_case FROM compte_fixe WHERE numero_client = ?", (numero_client,)
+        ).fetchone()
+        return (row[0] or 0) if row else 0
+
+    @staticmethod
+    def pages(cases_remplies: int) -> List[Tuple[int, int]]:
+        """(page, cases_remplies) des pages entamées, déduits du nombre de cases"""
+        return [(page, min(CASES_PAR_PAGE, cases_remplies - (page - 1) * CASES_PAR_PAGE))
+                for page in range(1, math.ceil(cases_remplies / CASES_PAR_PAGE) + 1)]
+
+    @staticmethod
+    def tranches_par_page(depots: List[Tuple]) -> Dict[int, List[Tuple]]:
+        """
+        Découpe les dépôts (ref_depot, date_remplissage, premiere_case, nb_cases)
+        aux limites de page : {page: [(ref_depot, date_remplissage, nb_cases), ...]}
+        """
+        tranches: Dict[int, List[Tuple]] = {}
+        for ref_depot, date_remplissage, premiere_case, nb_cases in depots:
+            case, fin = premiere_case, premiere_case + nb_cases
+            while case < fin:
+                page, position = divmod(case, CASES_PAR_PAGE)
+                nb = min(fin - case, CASES_PAR_PAGE - position)
+                tranches.setdefault(page + 1, []).append((ref_depot, date_remplissage, nb))
+                case += nb
+        return tranches
+
+    @classmethod
+    def cases_pour_depot(cls, conn: sqlite3.Connection, numero_client: str,
+                         montant: Montant) -> Tuple[int, Montant, str]:
+        """Vérifie un dépôt fixe ; retourne (nb_cases, montant_initial, numero_carte)"""
+        montant_initial, numero_carte = cls.configuration(conn, numero_client)
+        if montant < montant_initial:
+            raise ErreurMetier(f"Minimum pour compte fixe: {montant_initial:,.2f} FC")
+        if not montant.multiple_de(montant_initial):
+            raise ErreurMetier(
+                f"Pour un compte fixe, le montant doit être un multiple de {montant_initial:,.2f} FC"
+            )
+        nb_cases = montant // montant_initial
+        if cls.total_cases(conn, numero_client) + nb_cases > CASES_MAX:
+            raise cls._carnet_plein()
+        return nb_cases, montant_initial, numero_carte
+
+    @staticmethod
+    def _carnet_plein() -> ErreurMetier:
+        return ErreurMetier(
+            "Ce compte fixe a atteint le maximum de 8 pages (248 cases). "
+            "Aucun dépôt supplémentaire n'est possible.",
+            titre="Compte fixe bloqué"
+        )
+
+    @classmethod
+    def remplir(cls, conn: sqlite3.Connection, numero_client: str, numero_carte: str,
+                ref_depot: str, montant_initial: Montant, nb_cases: int,
+                date_remplissage: str) -> int:
+        """Réserve nb_cases cases à la suite du curseur ; retourne l'indice de la première"""
+        row = conn.execute("""
+            UPDATE compte_fixe
+            SET prochaine_case = prochaine_case + ?
+            WHERE numero_client = ? AND prochaine_case + ? <= ?
+            RETURNING prochaine_case
+        """, (nb_cases, numero_client, nb_cases, CASES_MAX)).fetchone()
+        if not row:
+            raise cls._carnet_plein()
+        fin = row[0]
+        premiere_case = fin - nb_cases
+
+        conn.execute("""
+            INSERT INTO carnet_depots (
+                numero_client, numero_carte, ref_depot, premiere_case, nb_cases,
+                montant_unitaire, date_remplissage
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (numero_client, numero_carte, ref_depot, premiere_case, nb_cases,
+              montant_initial, date_remplissage))
+
+        conn.execute("""
+            INSERT INTO carnet_progression (
+                numero_client, numero_carte, total_cases, pages_completes,
+                montant_epargne, derniere_date
+            ) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(numero_client) DO UPDATE SET
+                total_cases = excluded.total_cases,
+                pages_completes = excluded.pages_completes,
+                montant_epargne = montant_epargne + excluded.montant_epargne,
+                derniere_date = excluded.derniere_date
+        """, (numero_client, numero_carte, fin, fin // CASES_PAR_PAGE,
+              montant_initial * nb_cases, date_remplissage))
+
+        # compte_fixe_pages (lu par les écrans d'inscription) : seules les pages touchées
+        for page in range(premiere_case // CASES_PAR_PAGE + 1, (fin - 1) // CASES_PAR_PAGE + 2):
+            remplies = min(CASES_PAR_PAGE, fin - (page - 1) * CASES_PAR_PAGE)
+            maj = conn.execute("""
+                UPDATE compte_fixe_pages
+                SET cases_remplies = ?
+                WHERE numero_client = ? AND page = ?
+            """, (remplies, numero_client, page))
+            if maj.rowcount == 0:
+                conn.execute("""
+                    INSERT INTO compte_fixe_pages (numero_client, numero_carte, page, cases_remplies)
+                    VALUES (?, ?, ?, ?)
+                """, (numero_client, numero_carte, page, remplies))
+        return premiere_case
+
+    @staticmethod
+    def enregistrer_retrait(conn: sqlite3.Connection, numero_client: str, montant: Montant):
+        """Ajoute un retrait au résumé du carnet (sans effet hors compte fixe)"""
+        conn.execute("""
+            INSERT INTO carnet_progression (numero_client, numero_carte, montant_retire)
+            SELECT numero_client, numero_carte, ? FROM compte_fixe WHERE numero_client = ?
+            ON CONFLICT(numero_client) DO UPDATE SET
+                montant_retire = montant_retire + excluded.montant_retire
+        """, (montant, numero_client))
+
+    @staticmethod
+    def reinitialiser(conn: sqlite3.Connection, numero_client: str):
+        """Vide le carnet (dépôts, pages, curseur, résumé)"""
+        conn.execute("DELETE FROM carnet_depots WHERE numero_client = ?", (numero_client,))
+        conn.execute("DELETE FROM carnet_progression WHERE numero_client = ?", (numero_client,))
+        conn.execute("UPDATE compte_fixe_pages SET cases_remplies = 0 WHERE numero_client = ?",
+                     (numero_client,))
+        conn.execute("UPDATE compte_fixe SET prochaine_case = 0 WHERE numero_client = ?",
+                     (numero_client,))
+
+    @staticmethod
+    def depots(conn: sqlite3.Connection, numero_client: str) -> List[Tuple]:
+        """(ref_depot, date_remplissage, premiere_case, nb_cases) dans l'ordre du carnet"""
+        return conn.execute("""
+            SELECT ref_depot, date_remplissage, premiere_case, nb_cases
+            FROM carnet_depots
+            WHERE numero_client = ?
+            ORDER BY premiere_case
+        """, (numero_client,)).fetchall()
+
+    @chronometrer("service.carnet.progression")
+    def progression(self, numero_client: str) -> Optional[ProgressionCarnet]:
+        """Progression du carnet, None si le client n'a pas de compte fixe"""
+        conn = self.connexion()
+        try:
+            row = conn.execute("""
+                SELECT cf.montant_initial, p.total_cases, p.pages_completes,
+                       p.montant_epargne, p.montant_retire, p.derniere_date
+                FROM compte_fixe cf
+                LEFT JOIN carnet_progression p ON p.numero_client = cf.numero_client
+                WHERE cf.numero_client = ?
+            """, (numero_client,)).fetchone()
+            if not row:
+                return None
+            total_cases = row[1] or 0
+            return ProgressionCarnet(numero_client, Montant.depuis_base(row[0]),
+                                     row[2] or 0, total_cases, Montant.depuis_base(row[4]),
+                                     self.pages(total_cases), Montant.depuis_base(row[3]), row[5])
+        finally:
+            conn.close()
+
+
+# ---- Dépôts ----
+class DepotService:
+    """Dépôts normaux (mixtes) et dépôts sur carnet fixe"""
+
+    def __init__(self, connexion: FabriqueConnexion, file: Optional[FileEcriture] = None,
+                 references=None, clients=None):
+        self.connexion = connexion
+        self.file = file
+        self.references = references  # references.CacheReference : paramètres sans requête
+        self.clients = clients        # clients.CacheClients : nouveau solde reporté après validation
+
+    @staticmethod
+    def generer_reference(maintenant: datetime) -> str:
+        return f"DEP{maintenant.strftime('%Y%m%d')}-{random.randint(10000, 99999)}"
+
+    def _reporter(self, resultat):
+        """Écriture traversante dans le cache des clients (opération validée)"""
+        if self.clients is not None and resultat.succes and not resultat.doublon:
+            self.clients.mettre_a_jour(resultat.numero_client, resultat.nouveau_solde)
+        return resultat
+
+    @chronometrer("service.depot")
+    def deposer(self, demande: DemandeDepot) -> ResultatDepot:
+        """Vérifie les règles puis enregistre le dépôt (solde, dépôt, carnet, journal)"""
+        if demande.montant is None or demande.montant <= 0:
+            return ResultatDepot(False, "Montant invalide (nombre positif requis)")
+        try:
+            return self._reporter(_fenetre.executer(demande.cle_idempotence, lambda: executer_ecriture(
+                self.connexion, self.file, lambda conn: self._deposer(conn, demande))))
+        except ErreurMetier as e:
+            return ResultatDepot(False, str(e), e.titre)
+        except sqlite3.Error as e:
+            logger.error("Erreur dépôt: %s", str(e))
+            return ResultatDepot(False, f"Erreur base de données : {e}")
+
+    def _deposer(self, conn: sqlite3.Connection, demande: DemandeDepot) -> ResultatDepot:
+        deja = resultat_enregistre(conn, demande.cle_idempotence, ResultatDepot)
+        if deja is not None:
+            return deja
+        abonne = _lire_abonne(conn, demande.numero_client)
+        if not abonne:
+            raise ErreurMetier("Aucun abonné trouvé avec ces identifiants")
+        numero_client, nom_complet, numero_carte, ancien_solde, type_compte, _ = abonne
+
+        if type_compte == "Fixe" and demande.mode == "normal":
+            raise ErreurMetier(
+                f"{nom_complet} a un compte fixe et ne peut pas effectuer de dépôt mixte."
+            )
+
+        depot_fixe = demande.mode == "fixe" and type_compte == "Fixe"
+        nb_cases = 0
+        if depot_fixe:
+            nb_cases, montant_initial, carte_fixe = CarnetService.cases_pour_depot(
+                conn, numero_client, demande.montant
+            )
+        else:
+            depot_min = Montant.depuis(parametre(conn, self.references, "depot_min", DEPOT_MIN_DEFAUT))
+            if demande.montant < depot_min:
+                raise ErreurMetier(f"Dépôt minimum: {depot_min.formater()}")
+
+        maintenant = datetime.now()
+        reference = self.generer_reference(maintenant)
+        date_depot = maintenant.strftime("%Y-%m-%d")
+
+        conn.execute("UPDATE abonne SET solde = solde + ? WHERE numero_client = ?",
+                     (demande.montant, numero_client))
+        conn.execute("""
+            INSERT INTO depots (numero_client, heure, montant, date_depot, ref_depot,
+                                nom_agent, nom_complet, methode_paiement, cle_idempotence)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (numero_client, maintenant.strftime("%H:%M:%S"), demande.montant, date_depot,
+              reference, demande.agent, nom_complet, demande.methode_paiement,
+              demande.cle_idempotence))
+
+        if depot_fixe:
+            CarnetService.remplir(conn, numero_client, carte_fixe, reference,
+                                  montant_initial, nb_cases, date_depot)
+
+        journaliser(conn, "Dépôt", demande.agent, nom_complet,
+                    f"Montant: {demande.montant}, Ref: {reference}", maintenant)
+
+        resultat = ResultatDepot(
+            True, f"Dépôt de {demande.montant:,.2f} FC effectué avec succès.", "Succès",
+            reference=reference, numero_client=numero_client, numero_carte=numero_carte,
+            nom_complet=nom_complet, montant=demande.montant, ancien_solde=ancien_solde,
+            nouveau_solde=ancien_solde + demande.montant, depot_fixe=depot_fixe,
+            nb_cases=nb_cases, date_heure=maintenant
+        )
+        enregistrer_resultat(conn, demande.cle_idempotence, "depot", resultat)
+        return resultat
+
+
+# ---- Retraits ----
+class RetraitService:
+    """Retraits partiels et globaux (commission fixe, intérêts du compte mixte)"""
+
+    def __init__(self, connexion: FabriqueConnexion, file: Optional[FileEcriture] = None,
+                 references=None, clients=None):
+        self.connexion = connexion
+        self.file = file
+        self.references = references  # references.CacheReference : paramètres sans requête
+        self.clients = clients        # clients.CacheClients : nouveau solde reporté après validation
+
+    @staticmethod
+    def generer_reference() -> str:
+        return f"R{random.randint(100000, 999999)}"
+
+    @staticmethod
+    def verifier_demande(demande: DemandeRetrait, type_compte: str, retrait_min: Montant):
+        """Règles indépendantes du solde (type de compte, minimum)"""
+        if demande.montant is None or demande.montant <= 0:
+            raise ErreurMetier("Le montant doit être supérieur à 0.")
+
+        if demande.type_retrait == "global":
+            if type_compte == "Fixe" and demande.type_global != "fixe":
+                raise ErreurMetier("Ce compte fixe ne peut que faire un retrait global de type fixe.")
+            if type_compte == "Mixte" and demande.type_global == "fixe":
+                raise ErreurMetier("Ce compte mixte ne peut pas faire un retrait global de type fixe.")
+            if demande.type_global == "bloqué":
+                raise ErreurMetier(
+                    "Ce type de retrait n'est pas encore défini. Veuillez contactez l'administrateur."
+                )
+
+        if demande.type_retrait == "partiel" or (
+                demande.type_retrait == "global" and demande.type_global == "mixte"):
+            if demande.montant < retrait_min:
+                raise ErreurMetier(f"Le montant minimum de retrait est {retrait_min:,.0f} FC")
+
+    @staticmethod
+    def verifier_plafond_bloque(montant: Montant, solde: Montant,
+                                montant_atteindre: Montant, pourcentage: int):
+        """Compte bloqué : solde cible atteint, retrait limité à pourcentage % du solde"""
+        if solde < montant_atteindre:
+            raise ErreurMetier(
+                f"Le solde ({solde:,.0f} FC) n'a pas atteint le montant requis ({montant_atteindre:,.0f} FC)"
+            )
+        plafond = solde.pourcentage(pourcentage)
+        if montant > plafond:
+            raise ErreurMetier(
+                f"Le montant dépasse le plafond de {pourcentage}% du solde (max : {plafond:,.0f} FC)"
+            )
+
+    @staticmethod
+    def calculer(demande: DemandeRetrait, solde: Montant, type_compte: str,
+                 montant_initial: Montant, taux_interet: float, nom_complet: str = "",
+                 regles_bloque: Optional[Tuple[Montant, int]] = None) -> CalculRetrait:
+        """
+        Montant débité, commission et net remis ; ErreurMetier si le solde ne suffit pas
+        regles_bloque : (montant à atteindre, pourcentage retirable) d'un compte bloqué
+        """
+        montant = demande.montant
+        zero = Montant()
+
+        if demande.type_retrait == "partiel":
+            if type_compte == "Fixe" and montant_initial > 0 and solde - montant < montant_initial:
+                raise ErreurMetier(
+                    f"Le solde après retrait doit être au moins égal au montant initial "
+                    f"({montant_initial:,.0f} FC).\n"
+                    f"Vous pouvez retirer au maximum {solde - montant_initial:,.0f} FC."
+                )
+            calcul = CalculRetrait(montant, zero, montant)
+        elif demande.type_global == "fixe":
+            commission = montant_initial
+            calcul = CalculRetrait(solde, commission, solde - commission)
+            if calcul.montant_net < 0:
+                raise ErreurMetier("Fonds insuffisants pour couvrir la commission.")
+        elif demande.type_global == "mixte":
+            interet = montant.pourcentage(taux_interet)
+            calcul = CalculRetrait(montant + interet, interet, montant)
+        else:
+            calcul = CalculRetrait(montant, zero, montant)
+
+        if calcul.montant_retrait > solde:
+            if demande.type_retrait == "global" and demande.type_global == "mixte":
+                montant_max = Montant.depuis(
+                    math.floor(solde.francs / (1 + Decimal(str(taux_interet)) / 100))
+                )
+                montant_total = montant_max + montant_max.pourcentage(taux_interet)
+                raise ErreurMetier(
+                    f"L'abonné {nom_complet} a un solde insuffisant et ne peut retirer que "
+                    f"{montant_max:,.0f} FC\n(soit un total de {montant_total:,.0f} FC avec commission)."
+                )
+            raise ErreurMetier(f"Fonds insuffisants.\nSolde actuel : {solde:,.0f} FC")
+        if type_compte == "Bloqué" and regles_bloque is not None:
+            RetraitService.verifier_plafond_bloque(calcul.montant_retrait, solde, *regles_bloque)
+        return calcul
+
+    @staticmethod
+    def plancher(demande: DemandeRetrait, type_compte: str, montant_initial: Montant) -> Montant:
+        """Solde minimal à laisser sur le compte (montant initial d'un compte fixe, retrait partiel)"""
+        if demande.type_retrait == "partiel" and type_compte == "Fixe" and montant_initial > 0:
+            return montant_initial
+        return Montant()
+
+    def _reporter(self, resultat):
+        """Écriture traversante dans le cache des clients (opération validée)"""
+        if self.clients is not None and resultat.succes and not resultat.doublon:
+            self.clients.mettre_a_jour(resultat.numero_client, resultat.nouveau_solde)
+        return resultat
+
+    @chronometrer("service.retrait")
+    def retirer(self, demande: DemandeRetrait) -> ResultatRetrait:
+        """Vérifie les règles puis débite le compte (retrait, solde, journal)"""
+        try:
+            return self._reporter(_fenetre.executer(demande.cle_idempotence, lambda: executer_ecriture(
+                self.connexion, self.file, lambda conn: self._retirer(conn, demande))))
+        except ErreurMetier as e:
+            return ResultatRetrait(False, str(e), e.titre)
+        except sqlite3.Error as e:
+            logger.error("Erreur retrait: %s", str(e))
+            return ResultatRetrait(False, f"Erreur base de données: {str(e)}")
+
+    def _retirer(self, conn: sqlite3.Connection, demande: DemandeRetrait) -> ResultatRetrait:
+        deja = resultat_enregistre(conn, demande.cle_idempotence, ResultatRetrait)
+        if deja is not None:
+            return deja
+        abonne = _lire_abonne(conn, demande.numero_client)
+        if not abonne:
+            raise ErreurMetier("Abonné introuvable.")
+        numero_client, nom_complet, numero_carte, solde, type_compte, montant_initial = abonne
+        montant_initial = montant_initial or Montant()
+
+        self.verifier_demande(demande, type_compte, Montant.depuis(
+            parametre(conn, self.references, "retrait_min", RETRAIT_MIN_DEFAUT)))
+        taux = demande.taux_interet
+        if taux is None:
+            taux = parametre(conn, self.references, "taux_interet", TAUX_INTERET_DEFAUT)
+        regles_bloque = None
+        if type_compte == "Bloqué":
+            montant_atteindre, pourcentage = conn.execute("""
+                SELECT COALESCE(montant_atteindre, 0), COALESCE(pourcentage_retrait, 30)
+                FROM abonne WHERE numero_client = ?
+            """, (numero_client,)).fetchone()
+            regles_bloque = (Montant.depuis_base(montant_atteindre), pourcentage)
+        calcul = self.calculer(demande, solde, type_compte, montant_initial, taux, nom_complet, regles_bloque)
+
+        # Débit conditionnel : le solde est revérifié par la requête qui le modifie
+        nouveau_solde = debiter_solde(conn, "abonne", "numero_client", numero_client,
+                                      calcul.montant_retrait,
+                                      self.plancher(demande, type_compte, montant_initial))
+        maintenant = datetime.now()
+        reference = self.generer_reference()
+        conn.execute("""
+            INSERT INTO retraits (
+                numero_client, montant, ref_retrait,
+                heure, date_retrait, agent, cle_idempotence
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (numero_client, calcul.montant_retrait, reference,
+              maintenant.strftime("%H:%M:%S"), maintenant.strftime("%Y-%m-%d"), demande.agent,
+              demande.cle_idempotence))
+        CarnetService.enregistrer_retrait(conn, numero_client, calcul.montant_retrait)
+        journaliser(conn, "Retrait", demande.agent, numero_client,
+                    f"Montant: {calcul.montant_retrait:,.0f} FC, Ref: {reference}", maintenant)
+
+        resultat = ResultatRetrait(
+            True,
+            f"Retrait effectué avec succès pour {nom_complet}\n"
+            f"• Montant net : {calcul.montant_net:,.0f} FC\n"
+            f"• Commission : {calcul.commission:,.0f} FC\n"
+            f"• Nouveau solde : {nouveau_solde:,.0f} FC",
+            "✅ Succès",
+            reference=reference, numero_client=numero_client, numero_carte=numero_carte,
+            nom_complet=nom_complet, montant_retire=calcul.montant_retrait,
+            commission=calcul.commission, montant_net=calcul.montant_net,
+            ancien_solde=solde, nouveau_solde=nouveau_solde,
+            montant_initial=montant_initial, date_heure=maintenant, agent=demande.agent
+        )
+        enregistrer_resultat(conn, demande.cle_idempotence, "retrait", resultat)
+        return resultat
+
+
+# ---- Consultation ----
+class ConsultationService:
+    """Lectures partagées par les écrans et l'API : recherche, profil, rapports"""
+
+    def __init__(self, connexion: FabriqueConnexion,
+                 connexion_rapports: Optional[FabriqueConnexion] = None):
+        self.connexion = connexion
+        # Rapports : connexion de lecture seule (lecture.connexion_rapport) si fournie
+        self.connexion_rapports = connexion_rapports or connexion
+
+    def _lignes(self, sql: str, params: Tuple = (), rapport: bool = False) -> List[Dict]:
+        conn = (self.connexion_rapports if rapport else self.connexion)()
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+    @chronometrer("service.consultation.recherche")
+    def rechercher(self, terme: str, limite: int = 50) -> List[Dict]:
+        """Abonnés dont le numéro, la carte, le nom ou le téléphone contient terme"""
+        motif = f"%{terme}%"
+        return self._lignes("""
+            SELECT numero_client, numero_carte, nom, postnom, prenom, telephone,
+                   type_compte, solde, statut, date_inscription, date_derniere_operation
+            FROM abonne
+            WHERE numero_client LIKE ? OR numero_carte LIKE ? OR nom LIKE ?
+               OR postnom LIKE ? OR prenom LIKE ? OR telephone LIKE ?
+            ORDER BY nom, postnom
+            LIMIT ?
+        """, (motif,) * 6 + (limite,))
+
+    @chronometrer("service.consultation.profil")
+    def profil(self, numero_client: str, nb_operations: int = 10) -> Optional[Dict]:
+        """Abonné, carnet éventuel et dernières opérations"""
+        lignes = self._lignes("""
+            SELECT a.numero_client, a.numero_carte, a.nom, a.postnom, a.prenom, a.sexe,
+                   a.telephone, a.adresse, a.type_compte, a.solde, a.statut,
+                   a.date_inscription, a.date_derniere_operation,
+                   a.suppleant, a.contact_suppleant, cf.montant_initial
+            FROM abonne a
+            LEFT JOIN compte_fixe cf ON a.numero_carte = cf.numero_carte
+            WHERE a.numero_client = ? OR a.numero_carte = ?
+        """, (numero_client, numero_client))
+        if not lignes:
+            return None
+        profil = lignes[0]
+        numero_client = profil["numero_client"]
+        profil["depots"] = self._lignes("""
+            SELECT date_depot, heure, montant, ref_depot, nom_agent
+            FROM depots WHERE numero_client = ?
+            ORDER BY horodatage DESC LIMIT ?
+        """, (numero_client, nb_operations))
+        profil["retraits"] = self._lignes("""
+            SELECT date_retrait, heure, montant, ref_retrait, agent
+            FROM retraits WHERE numero_client = ?
+            ORDER BY horodatage DESC LIMIT ?
+        """, (numero_client, nb_operations))
+        if profil["type_compte"] == "Fixe":
+            carnet = CarnetService(self.connexion).progression(numero_client)
+            if carnet:
+                profil["carnet"] = {
+                    "pages_completes": carnet.pages_completes,
+                    "total_cases": carnet.total_cases,
+                    "pourcentage": round(carnet.pourcentage, 1),
+                    "pages": carnet.pages,
+                }
+        return profil
+
+    @chronometrer("service.consultation.rapport_journalier")
+    def rapport_journalier(self, date: str) -> Dict:
+        """Dépôts et retraits d'une journée (AAAA-MM-JJ)"""
+        depots = self._lignes("""
+            SELECT d.date_depot, d.heure, d.numero_client,
+                   a.nom || ' ' || a.postnom || ' ' || a.prenom AS nom_complet,
+                   d.montant, d.ref_depot, d.nom_agent
+            FROM depots d
+            JOIN abonne a ON d.numero_client = a.numero_client
+            WHERE d.horodatage >= ? AND d.horodatage < date(?, '+1 day')
+            ORDER BY d.horodatage DESC
+        """, (date, date), rapport=True)
+        retraits = self._lignes("""
+            SELECT date_retrait, heure, numero_client, montant, ref_retrait, agent
+            FROM retraits
+            WHERE horodatage >= ? AND horodatage < date(?, '+1 day')
+            ORDER BY horodatage DESC
+        """, (date, date), rapport=True)
+        return {
+            "date": date,
+            "depots": depots,
+            "retraits": retraits,
+            "total_depots": sum((d["montant"] for d in depots), Montant()),
+            "total_retraits": sum((r["montant"] for r in retraits), Montant()),
+        }
+
+    @chronometrer("service.consultation.rapport_mensuel")
+    def rapport_mensuel(self, annee: int, mois: int) -> Dict:
+        """Totaux journaliers des dépôts et retraits d'un mois"""
+        debut = f"{annee:04d}-{mois:02d}-01"
+        fin = f"{annee + mois // 12:04d}-{mois % 12 + 1:02d}-01"  # exclu
+        # Cumuls journaliers (tenus à jour par le grand livre, annulations déduites)
+        jours = self._lignes("""
+            SELECT periode AS jour,
+                   SUM(CASE WHEN nature = 'depot' THEN montant ELSE 0 END) AS "depots [MONTANT]",
+                   SUM(CASE WHEN nature = 'retrait' THEN montant ELSE 0 END) AS "retraits [MONTANT]"
+            FROM cumul_operations
+            WHERE grain = 'jour' AND nature IN ('depot', 'retrait') AND periode >= ? AND periode < ?
+            GROUP BY jour
+            HAVING SUM(nombre) <> 0
+            ORDER BY jour
+        """, (debut, fin), rapport=True)
+        return {
+            "annee": annee,
+            "mois": mois,
+            "jours": jours,
+            "total_depots": sum((j["depots"] for j in jours), Montant()),
+            "total_retraits": sum((j["retraits"] for j in jours), Montant()),
+        }
+
+
+# ---- Relevé de compte ----
+# Dépôts et retraits fusionnés par le grand livre, en ordre chronologique ; le solde
+# courant est calculé par SUM() OVER sur la page, à partir du solde porté par le
+# curseur (solde d'ouverture pour la première page). Chaque page est une lecture
+# bornée de l'index (numero_client, horodatage) : le relevé s'affiche ou s'imprime
+# au fil des pages, quelle que soit la longueur de l'historique.
+LIBELLES_RELEVE = {
+    ("depot", 0): "Dépôt",
+    ("retrait", 0): "Retrait",
+    ("depot", 1): "Annulation dépôt",
+    ("retrait", 1): "Annulation retrait",
+}
+
+
+class LigneReleve(NamedTuple):
+    id: int
+    horodatage: str
+    libelle: str
+    reference: Optional[str]
+    agent: Optional[str]
+    credit: Optional[Montant]
+    debit: Optional[Montant]
+    solde: Montant
+
+    @property
+    def date(self) -> str:
+        return self.horodatage[:10]
+
+    @property
+    def heure(self) -> str:
+        return self.horodatage[11:]
+
+
+CurseurReleve = Tuple[str, int, Montant]  # (horodatage, id, solde) de la dernière ligne
+
+
+@dataclass
+class PageReleve:
+    lignes: List[LigneReleve]
+    suivante: Optional[CurseurReleve]  # None en fin de relevé
+
+
+@dataclass
+class TotauxReleve:
+    solde_ouverture: Montant
+    total_credits: Montant
+    total_debits: Montant
+    nb_lignes: int
+
+    @property
+    def solde_cloture(self) -> Montant:
+        return self.solde_ouverture + self.total_credits - self.total_debits
+
+
+class ReleveService:
+    """Relevé d'un client sur une période [debut, fin] (dates AAAA-MM-JJ, incluses)"""
+
+    TAILLE_PAGE = 200
+
+    def __init__(self, connexion: FabriqueConnexion):
+        self.connexion = connexion
+
+    @staticmethod
+    def _bornes(debut: Optional[str], fin: Optional[str]) -> Tuple[str, str]:
+        """Bornes d'horodatage [début, lendemain de fin) ; ValueError si une date est invalide"""
+        debut = date.fromisoformat(debut).isoformat() if debut else ""
+        fin = (date.fromisoformat(fin) + timedelta(days=1)).isoformat() if fin else "9999"
+        return debut, fin
+
+    def totaux(self, numero_client: str, debut: Optional[str] = None,
+               fin: Optional[str] = None) -> TotauxReleve:
+        """Solde d'ouverture et totaux de la période (index couvrant)"""
+        debut, fin = self._bornes(debut, fin)
+        conn = self.connexion()
+        try:
+            row = conn.execute("""
+                SELECT COALESCE(SUM(CASE WHEN horodatage < :debut THEN sens * montant END), 0),
+                       COALESCE(SUM(CASE WHEN horodatage >= :debut AND sens > 0 THEN montant END), 0),
+                       COALESCE(SUM(CASE WHEN horodatage >= :debut AND sens < 0 THEN montant END), 0),
+                       COUNT(CASE WHEN horodatage >= :debut THEN 1 END)
+                FROM grand_livre
+                WHERE numero_client = :client AND horodatage < :fin
+            """, {"client": numero_client, "debut": debut, "fin": fin}).fetchone()
+        finally:
+            conn.close()
+        return TotauxReleve(Montant.depuis_base(row[0]), Montant.depuis_base(row[1]),
+                            Montant.depuis_base(row[2]), row[3])
+
+    @chronometrer("service.releve.page")
+    def page(self, numero_client: str, debut: Optional[str] = None, fin: Optional[str] = None,
+             apres: Optional[CurseurReleve] = None, taille: int = TAILLE_PAGE) -> PageReleve:
+        """Page suivant le curseur apres (None : première page, solde d'ouverture calculé)"""
+        if apres is None:
+            solde = self.totaux(numero_client, debut, fin).solde_ouverture
+            apres = (self._bornes(debut, fin)[0], 0, solde)
+            condition = "horodatage >= :horodatage"
+        else:
+            condition = "horodatage >= :horodatage AND (horodatage, id) > (:horodatage, :id)"
+        fin = self._bornes(debut, fin)[1]
+
+        conn = self.connexion()
+        try:
+            lignes = conn.execute(f"""
+                SELECT id, horodatage, nature, annulation, reference, agent, sens, montant,
+                       :solde + SUM(sens * montant) OVER (ORDER BY horodatage, id) AS solde
+                FROM (
+                    SELECT id, horodatage, nature, annulation, reference, agent, sens, montant
+                    FROM grand_livre
+                    WHERE numero_client = :client AND {condition} AND horodatage < :fin
+                    ORDER BY horodatage, id
+                    LIMIT :limite
+                )
+                ORDER BY horodatage, id
+            """, {"client": numero_client, "horodatage": apres[0], "id": apres[1],
+                  "solde": Montant.depuis_base(apres[2]), "fin": fin,
+                  "limite": taille + 1}).fetchall()
+        finally:
+            conn.close()
+
+        releve = [
+            LigneReleve(id_, horodatage, LIBELLES_RELEVE[(nature, annulation)], reference, agent,
+                        Montant.depuis_base(montant) if sens > 0 else None,
+                        Montant.depuis_base(montant) if sens < 0 else None,
+                        Montant.depuis_base(solde))
+            for id_, horodatage, nature, annulation, reference, agent, sens, montant, solde
+            in lignes[:taille]
+        ]
+        suivante = None
+        if len(lignes) > taille:
+            derniere = releve[-1]
+            suivante = (derniere.horodatage, derniere.id, derniere.solde)
+        return PageReleve(releve, suivante)
+
+    def parcourir(self, numero_client: str, debut: Optional[str] = None,
+                  fin: Optional[str] = None, taille: int = TAILLE_PAGE):
+        """Toutes les lignes de la période, page par page (générateur)"""
+        apres = None
+        while True:
+            page = self.page(numero_client, debut, fin, apres, taille)
+            yield from page.lignes
+            if page.suivante is None:
+                return
+            apres = page.suivante
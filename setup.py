@@ -10,6 +10,19 @@ include_files = [
     ('export_carte.py', '.'), 
     ('depot_export.py', '.'), 
     ('interface_doublons.py', '.'), 
+    ('migrations.py', '.'), 
+    ('demarrage.py', '.'), 
+    ('performance.py', '.'), 
+    ('services.py', '.'), 
+    ('file_ecriture.py', '.'), 
+    ('lecture.py', '.'), 
+    ('monnaie.py', '.'), 
+    ('file_impression.py', '.'), 
+    ('capture.py', '.'), 
+    ('references.py', '.'), 
+    ('clients.py', '.'), 
+    ('pagination.py', '.'), 
+    ('cumuls.py', '.'), 
     ('data_epargne.db', '.'),          # base de données
     ('images', 'images'),              # dossier images
     ('money.ico', '.')                 # icône
@@ -11,30 +11,31 @@ import random
 import sqlite3
 from PIL import Image, ImageTk
 import tempfile
-from fpdf import FPDF
 import subprocess
 import webbrowser
 import traceback
-from interface_retrait import interface_retrait
-from fenetre_depot import FenetreDepot
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from typing import Optional
 
-try:
-    import cv2
-    import numpy as np
-    CV2_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: OpenCV not available - {e}")
-    CV2_AVAILABLE = False
-    cv2 = None
-    np = None
+from demarrage import importer
+
+# OpenCV/numpy ne sont chargés qu'à la première utilisation de la caméra
+cv2 = None
+np = None
+CV2_AVAILABLE = None
+
+def cv2_disponible() -> bool:
+    """Importe OpenCV au premier usage et indique s'il est disponible"""
+    global cv2, np, CV2_AVAILABLE
+    if CV2_AVAILABLE is None:
+        try:
+            cv2 = importer("cv2")
+            np = importer("numpy")
+            CV2_AVAILABLE = True
+        except ImportError as e:
+            print(f"Warning: OpenCV not available - {e}")
+            CV2_AVAILABLE = False
+    return CV2_AVAILABLE
 import tempfile
-from fpdf import FPDF
 import subprocess
 import webbrowser
 import traceback
@@ -76,7 +77,7 @@ class WebcamCapture:
         
     def detect_cameras(self):
         """Détecte les caméras disponibles"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return []  # Retourne une liste vide si OpenCV n'est pas installé
             
         index = 0
@@ -97,7 +98,7 @@ class WebcamCapture:
     
     def start_capture(self, index=0):
         """Démarre la capture vidéo"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return False
             
         if self.cap is not None:
@@ -119,7 +120,7 @@ class WebcamCapture:
     
     def get_frame(self):
         """Capture une frame de la webcam"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return None
             
         if self.cap is None or not self.cap.isOpened():
@@ -136,7 +137,7 @@ class WebcamCapture:
     
     def stop_capture(self):
         """Arrête la capture vidéo"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return
             
         if self.cap is not None:
@@ -149,7 +150,7 @@ class WebcamCapture:
     
     def switch_camera(self):
         """Change de caméra"""
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             return False
             
         if not self.camera_list:
@@ -603,7 +604,7 @@ class InscriptionInterface:
     def lancer_interface_capture(self):
         """Lance l'interface de capture indépendante"""
         # Vérifier si OpenCV est disponible
-        if not CV2_AVAILABLE:
+        if not cv2_disponible():
             messagebox.showwarning("Fonction désactivée", 
                                   "OpenCV n'est pas installé. La capture caméra est désactivée.")
             return
@@ -1348,6 +1349,12 @@ class InscriptionInterface:
     def exporter_carnet_pdf(self, numero_carte, montant_initial, pages_existantes):
         """Exporte le carnet de compte fixe en PDF"""
         try:
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib import colors
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.enums import TA_CENTER
+            
             with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
                 fichier = tmp.name
             
@@ -1543,6 +1550,7 @@ class InscriptionInterface:
     def exporter_pdf(self, abonne):
         """Exporte le profil de l'abonné en PDF"""
         try:
+            FPDF = importer("fpdf").FPDF
             pdf = FPDF()
             pdf.add_page()
             pdf.set_font("Arial", 'B', 16)
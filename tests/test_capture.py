@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import capture
+from capture import Capture, SourceSequence
+
+
+class SequenceSuivie(SourceSequence):
+    """Séquence qui compte ses fermetures"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fermetures = 0
+
+    def fermer(self):
+        self.fermetures += 1
+
+
+@pytest.fixture
+def images(tmp_path):
+    """Trois images 800x600 unies (BGR) : bleu, vert, rouge"""
+    chemins = []
+    for i, couleur in enumerate([(255, 0, 0), (0, 255, 0), (0, 0, 255)]):
+        image = np.zeros((600, 800, 3), dtype=np.uint8)
+        image[:] = couleur
+        chemin = str(tmp_path / f"image_{i}.png")
+        assert cv2.imwrite(chemin, image)
+        chemins.append(chemin)
+    return chemins
+
+
+def _attendre(condition, delai_s=5.0):
+    limite = time.monotonic() + delai_s
+    while not condition():
+        assert time.monotonic() < limite, "délai dépassé"
+        time.sleep(0.01)
+
+
+def test_seule_la_derniere_image_est_gardee(images, monkeypatch):
+    monkeypatch.setattr(capture, "ECHECS_MAX", 3)
+    source = SequenceSuivie(images, fps=200, boucle=False)
+    lecture = Capture(source, taille_apercu=(320, 240))
+    depart, _ = lecture.apercu()
+
+    assert lecture.demarrer()
+    _attendre(lambda: source.fermetures)
+
+    # Un seul emplacement : la dernière image (rouge, en RGB) et son aperçu réduit
+    image = lecture.image()
+    assert image.shape == (600, 800, 3)
+    assert tuple(image[0, 0]) == (255, 0, 0)
+    numero, apercu = lecture.apercu(depart)
+    assert numero > depart
+    assert apercu.size == (320, 240)
+    assert apercu.getpixel((0, 0)) == (255, 0, 0)
+    assert lecture.apercu(numero) == (numero, None)
+    lecture.arreter()
+
+
+def test_source_fermee_apres_echecs_max(images, monkeypatch):
+    monkeypatch.setattr(capture, "ECHECS_MAX", 3)
+    source = SequenceSuivie(images[:1], fps=200, boucle=False)
+    lecture = Capture(source)
+
+    assert lecture.demarrer()
+    _attendre(lambda: source.fermetures)
+
+    lecture._thread.join(1.0)
+    assert not lecture._thread.is_alive()
+    assert source.fermetures == 1
+    assert lecture.image() is not None  # la dernière image reste disponible
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+
+import pytest
+
+import file_impression
+from file_impression import ECHEC, EN_ATTENTE, IMPRIME, DossierSpool, FileImpression
+from monnaie import Montant
+
+
+@pytest.fixture
+def rendus(tmp_path, monkeypatch):
+    """Rendu de test : un petit fichier texte par bordereau, au lieu du PDF"""
+    dossier = tmp_path / "rendus"
+    dossier.mkdir()
+
+    def rendre(data):
+        chemin = dossier / f"bordereau_{data['reference']}.txt"
+        chemin.write_text(f"{data['reference']} {data['montant']}", encoding="utf-8")
+        return [str(chemin)]
+
+    monkeypatch.setitem(file_impression.RENDUS, "depot", rendre)
+    return dossier
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return DossierSpool(str(tmp_path / "spool"))
+
+
+def _file(tmp_path, imprimante) -> FileImpression:
+    return FileImpression(str(tmp_path / "impressions.db"), imprimante)
+
+
+def _soumettre(file, *references):
+    return [file.soumettre("depot", {"reference": ref, "montant": Montant.depuis(1500)})
+            for ref in references]
+
+
+def _travaux(file):
+    conn = sqlite3.connect(file.chemin_db)
+    try:
+        return {id_: (statut, tentatives) for id_, statut, tentatives in
+                conn.execute("SELECT id, statut, tentatives FROM travaux")}
+    finally:
+        conn.close()
+
+
+def test_impression_depose_les_fichiers_du_lot(tmp_path, rendus, spool):
+    file = _file(tmp_path, spool)
+    _soumettre(file, "DEP-1", "DEP-2", "DEP-3")
+
+    assert file.traiter_lot() == 3
+
+    assert sorted(os.listdir(spool.dossier)) == [
+        "bordereau_DEP-1.txt", "bordereau_DEP-2.txt", "bordereau_DEP-3.txt"]
+    with open(os.path.join(spool.dossier, "bordereau_DEP-2.txt"), encoding="utf-8") as f:
+        assert f.read() == f"DEP-2 {Montant.depuis(1500)}"
+    assert file.etat() == {IMPRIME: 3}
+    assert file.traiter_lot() == 0
+
+
+def test_imprimante_hors_ligne_conserve_les_travaux(tmp_path, rendus, spool):
+    file = _file(tmp_path, spool)
+    hors_ligne = os.path.join(spool.dossier, "HORS_LIGNE")
+    open(hors_ligne, "w").close()
+    _soumettre(file, "DEP-1")
+
+    assert not spool.disponible()
+    assert file.traiter_lot() == 0
+    assert file.etat() == {EN_ATTENTE: 1}
+    assert os.listdir(spool.dossier) == ["HORS_LIGNE"]
+
+    os.remove(hors_ligne)
+    assert file.traiter_lot() == 1
+    assert file.etat() == {IMPRIME: 1}
+    assert os.listdir(spool.dossier) == ["bordereau_DEP-1.txt"]
+
+
+class SpoolInterrompu(DossierSpool):
+    """Dossier dont l'envoi échoue à partir du fichier numéro limite (0 : toujours)"""
+
+    def __init__(self, dossier, limite=0):
+        super().__init__(dossier)
+        self.limite = limite
+        self.envois = 0
+
+    def envoyer(self, chemin):
+        if self.envois >= self.limite:
+            raise OSError("papier coincé")
+        self.envois += 1
+        super().envoyer(chemin)
+
+
+def test_envoi_interrompu_ne_reimprime_pas_les_travaux_partis(tmp_path, rendus):
+    imprimante = SpoolInterrompu(str(tmp_path / "spool"), limite=1)
+    file = _file(tmp_path, imprimante)
+    premier, deuxieme, troisieme = _soumettre(file, "DEP-1", "DEP-2", "DEP-3")
+
+    assert file.traiter_lot() == 3
+
+    assert os.listdir(imprimante.dossier) == ["bordereau_DEP-1.txt"]
+    assert _travaux(file) == {premier: (IMPRIME, 0), deuxieme: (EN_ATTENTE, 1),
+                              troisieme: (EN_ATTENTE, 0)}
+
+
+def test_echecs_repetes_passent_le_travail_en_echec(tmp_path, rendus, monkeypatch):
+    monkeypatch.setattr(file_impression, "DELAI_REESSAI_S", 0.0)
+    monkeypatch.setattr(file_impression, "DELAI_REESSAI_MAX_S", 0.0)
+    imprimante = SpoolInterrompu(str(tmp_path / "spool"))
+    file = _file(tmp_path, imprimante)
+    (travail,) = _soumettre(file, "DEP-1")
+
+    for tentative in range(1, file_impression.TENTATIVES_MAX):
+        assert file.traiter_lot() == 1
+        assert _travaux(file) == {travail: (EN_ATTENTE, tentative)}
+    assert file.traiter_lot() == 1
+    assert _travaux(file) == {travail: (ECHEC, file_impression.TENTATIVES_MAX)}
+    assert file.traiter_lot() == 0
+
+    imprimante.limite = 1
+    assert file.relancer_echecs() == 1
+    assert file.traiter_lot() == 1
+    assert file.etat() == {IMPRIME: 1}
+    assert os.listdir(imprimante.dossier) == ["bordereau_DEP-1.txt"]